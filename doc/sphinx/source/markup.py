@@ -22,8 +22,9 @@ def mark_solvers():
 
     solvers = [(sundials.CVode, "ODE"), (sundials.IDA, "DAE"), (radau5.Radau5ODE, "ODE"), (radau5.Radau5DAE, "DAE"),
                (euler.ExplicitEuler, "ODE"), (runge_kutta.RungeKutta4, "ODE"), (runge_kutta.RungeKutta34, "ODE"),
-               (runge_kutta.Dopri5, "ODE"), (rosenbrock.RodasODE, "ODE"), (odepack.LSODAR, "ODE"),(glimda.GLIMDA, "DAE"),
-               (euler.ImplicitEuler, "ODE"), (dasp3.DASP3ODE, "ODE_SING"), (odassl.ODASSL,"DAE_OVER")]
+               (runge_kutta.Dopri5, "ODE"), (rosenbrock.RodasODE, "ODE"), (odepack.LSODAR, "ODE"), (odepack.LSODES, "ODE"),(glimda.GLIMDA, "DAE"),
+               (euler.ImplicitEuler, "ODE"), (dasp3.DASP3ODE, "ODE_SING"), (odassl.ODASSL,"DAE_OVER"),
+               (sdirk_dae.SDIRK_DAE, "DAE")]
     
     
     rhs = lambda t,y: [1.0]
@@ -0,0 +1,71 @@
+#!/usr/bin/env python 
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as N
+import scipy.sparse as SP
+import nose
+from assimulo.solvers import KINSOL
+from assimulo.problem import Algebraic_Problem
+
+def run_example(with_plots=True):
+    r"""
+    Example to demonstrate the use of the Sundials solver Kinsol with
+    a user provided sparse Jacobian and the SPARSE linear solver.
+    Note that this will only work if Assimulo has been configured with
+    Sundials + SuperLU.
+    
+    on return:
+    
+       - :dfn:`alg_mod`    problem instance
+    
+       - :dfn:`alg_solver`    solver instance
+    
+    """
+    n = 10
+    
+    #Define the tridiagonal system matrix
+    A = SP.diags([-N.ones(n-1), 4*N.ones(n), -N.ones(n-1)], [-1, 0, 1], format="csc")
+    b = A.dot(N.ones(n))
+    
+    #Define the res
+    def res(y):
+        return A.dot(y) + 0.1*y**3 - b - 0.1
+        
+    def jac(y):
+        return (A + SP.diags(0.3*y**2, 0)).tocsc()
+    
+    #Define an Assimulo problem
+    alg_mod = Algebraic_Problem(res, y0=N.zeros(n), jac=jac, name='KINSOL example with sparse Jac')
+    alg_mod.jac_nnz = A.nnz
+    
+    #Define the KINSOL solver
+    alg_solver = KINSOL(alg_mod)
+    
+    #Sets the parameters
+    alg_solver.linear_solver = "sparse"
+    
+    #Solve
+    y = alg_solver.solve()
+    
+    #Basic test
+    for j in range(n):
+        nose.tools.assert_almost_equal(y[j], 1.0, 5)
+    
+    return alg_mod, alg_solver
+    
+if __name__=='__main__':
+    mod, solv = run_example()
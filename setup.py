@@ -92,7 +92,7 @@ if not (cython_version[0] > '0' or (cython_version[0] == '0' and cython_version[
 
 L.debug('Python version used: {}'.format(sys.version.split()[0]))
 
-thirdparty_methods= ["hairer","glimda", "odepack","odassl","dasp3"] 
+thirdparty_methods= ["hairer","glimda", "odepack","odassl","dasp3","kvaernoe"] 
 
 class Assimulo_prepare(object):
 # helper functions
@@ -186,6 +186,7 @@ class Assimulo_prepare(object):
         self.desSrc = os.path.join(self.curdir,self.build_assimulo)
         self.desLib = os.path.join(self.desSrc,"lib")
         self.desSolvers = os.path.join(self.desSrc,"solvers")
+        self.desBenchmarks = os.path.join(self.desSrc,"benchmarks")
         self.desExamples = os.path.join(self.desSrc,"examples")
         self.desMain = os.path.join(self.curdir,"build")
         self.desTests = os.path.join(self.desSrc,"tests")
@@ -197,6 +198,7 @@ class Assimulo_prepare(object):
         self.fileSrc     = os.listdir("src")
         self.fileLib     = os.listdir(os.path.join("src","lib"))
         self.fileSolvers = os.listdir(os.path.join("src","solvers"))
+        self.fileBenchmarks = os.listdir(os.path.join("src","benchmarks"))
         self.fileExamples= os.listdir("examples")
         self.fileMain    = ["setup.py","README","INSTALL","CHANGELOG","MANIFEST.in"]
         self.fileMainIncludes = ["README","CHANGELOG", "LICENSE"]
@@ -208,7 +210,7 @@ class Assimulo_prepare(object):
     def create_assimulo_dirs_and_populate(self):
         self._set_directories()
         
-        for subdir in ["lib", "solvers", "examples"]:
+        for subdir in ["lib", "solvers", "benchmarks", "examples"]:
             self.create_dir(os.path.join(self.build_assimulo,subdir))
         self.create_dir(os.path.join(self.build_assimulo, "tests", "solvers"))
         for pck in self.thirdparty_methods:
@@ -217,6 +219,7 @@ class Assimulo_prepare(object):
         self.copy_all_files(self.fileSrc, "src", self.desSrc)
         self.copy_all_files(self.fileLib, "src/lib", self.desLib)
         self.copy_all_files(self.fileSolvers, os.path.join("src","solvers"), self.desSolvers)
+        self.copy_all_files(self.fileBenchmarks, os.path.join("src","benchmarks"), self.desBenchmarks)
         self.copy_all_files(self.fileExamples, "examples", self.desExamples)
         self.copy_all_files(self.fileMain, None, self.desMain)
         self.copy_all_files(self.fileMainIncludes, None, self.desSrc)
@@ -412,6 +415,11 @@ class Assimulo_prepare(object):
                              include_path=[".","assimulo"])
         for el in ext_list:
             el.include_dirs = [np.get_include()]
+        
+        # SDIRK-DAE, the C code by Kvaernoe is compiled into the extension
+        ext_list += cythonize(["assimulo"+os.path.sep+"solvers"+os.path.sep+"sdirk_dae.pyx"], 
+                             include_path=[".","assimulo"])
+        ext_list[-1].include_dirs = [np.get_include(), "assimulo"+os.sep+"thirdparty"+os.sep+"kvaernoe"]
             
         # SUNDIALS
         if self.with_SUNDIALS:
@@ -426,7 +434,7 @@ class Assimulo_prepare(object):
             ext_list[-1].library_dirs = [self.libdirs]
             
             if self.SUNDIALS_version >= (3,0,0):
-                ext_list[-1].libraries = ["sundials_cvodes", "sundials_nvecserial", "sundials_idas", "sundials_sunlinsoldense", "sundials_sunlinsolspgmr", "sundials_sunmatrixdense", "sundials_sunmatrixsparse"]
+                ext_list[-1].libraries = ["sundials_cvodes", "sundials_nvecserial", "sundials_idas", "sundials_sunlinsoldense", "sundials_sunlinsolspgmr", "sundials_sunlinsolspbcgs", "sundials_sunlinsolsptfqmr", "sundials_sunlinsolspfgmr", "sundials_sunmatrixdense", "sundials_sunmatrixsparse"]
             else:
                 ext_list[-1].libraries = ["sundials_cvodes", "sundials_nvecserial", "sundials_idas"]
             if self.sundials_with_superlu and self.with_SLU: #If SUNDIALS is compiled with support for SuperLU
@@ -445,8 +453,11 @@ class Assimulo_prepare(object):
             ext_list[-1].include_dirs = [np.get_include(), "assimulo","assimulo"+os.sep+"lib", self.incdirs]
             ext_list[-1].library_dirs = [self.libdirs]
             ext_list[-1].libraries = ["sundials_kinsol", "sundials_nvecserial"]
-            
+
             if self.sundials_with_superlu and self.with_SLU: #If SUNDIALS is compiled with support for SuperLU
+                if self.SUNDIALS_version >= (3,0,0):
+                    ext_list[-1].libraries.extend(["sundials_sunlinsolsuperlumt", "sundials_sunmatrixsparse"])
+
                 ext_list[-1].include_dirs.append(self.SLUincdir)
                 ext_list[-1].library_dirs.append(self.SLUlibdir)
                 ext_list[-1].libraries.extend(self.superLUFiles)
@@ -623,7 +634,7 @@ ndc.setup(name=NAME,
       platforms=PLATFORMS,
       classifiers=CLASSIFIERS,
       package_dir = {'assimulo':'assimulo'},
-      packages=['assimulo', 'assimulo.lib','assimulo.solvers','assimulo.examples','assimulo.tests','assimulo.tests.solvers'],
+      packages=['assimulo', 'assimulo.lib','assimulo.solvers','assimulo.benchmarks','assimulo.examples','assimulo.tests','assimulo.tests.solvers'],
       #cmdclass = {'build_ext': build_ext},
       ext_modules = ext_list,
       package_data={'assimulo': ['version.txt', 'CHANGELOG', 'README', 'LICENSE']+license_info+['examples'+os.sep+'kinsol_ors_matrix.mtx',
@@ -37,7 +37,7 @@ cdef class Algebraic:
         """
         self.statistics = {} #Initialize the statistics dictionary
         self.options = {"verbosity":NORMAL, "y_nominal":None, "y_min":None, "y_max":None}
-        self.problem_info = {"dim":0,"jac_fcn":False,"jacv_fcn":False,'prec_solve':False,'prec_setup':False}
+        self.problem_info = {"dim":0,"jac_fcn":False,"jacv_fcn":False,'prec_solve':False,'prec_setup':False,"jac_fcn_nnz": -1}
         
         if problem is None:
             raise Algebraic_Exception('The problem needs to be a subclass of a Problem.')
@@ -54,6 +54,8 @@ cdef class Algebraic:
             self.problem_info["jac_fcn"] = True
         if hasattr(problem, "jacv"):
             self.problem_info["jacv_fcn"] = True
+        if hasattr(problem, "jac_nnz"):
+            self.problem_info["jac_fcn_nnz"] = problem.jac_nnz
         if hasattr(problem, "prec_solve"):
             self.problem_info["prec_solve"] = True
         if hasattr(problem, "prec_setup"):
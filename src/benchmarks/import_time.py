@@ -0,0 +1,95 @@
+#!/usr/bin/env python 
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Import time benchmarks. Each import is timed in a fresh interpreter,
+as in a short-lived worker process. The timeraw_ functions are asv
+benchmarks, standalone the benchmarks are run with
+
+    python -m assimulo.benchmarks.import_time
+"""
+
+import sys
+import subprocess
+
+#Modules that are expensive to load and should only be loaded on demand
+HEAVY_MODULES = ["scipy", "scipy.sparse", "scipy.linalg",
+                 "assimulo.lib.radau5", "assimulo.lib.odepack", "assimulo.lib.dopri5",
+                 "assimulo.lib.rodas", "assimulo.lib.radar5", "assimulo.lib.dasp3", 
+                 "assimulo.lib.odassl", "assimulo.lib.glimda",
+                 "assimulo.solvers.radau5", "assimulo.solvers.sundials", "assimulo.solvers.kinsol"]
+
+def timeraw_import_assimulo():
+    return "import assimulo"
+
+def timeraw_import_solvers():
+    return "import assimulo.solvers"
+
+def timeraw_import_cvode():
+    return "from assimulo.solvers import CVode"
+
+def timeraw_import_ida():
+    return "from assimulo.solvers import IDA"
+
+def timeraw_import_radau5ode():
+    return "from assimulo.solvers import Radau5ODE"
+
+def timeraw_import_lsodar():
+    return "from assimulo.solvers import LSODAR"
+
+def timeraw_import_all_solvers():
+    return "from assimulo.solvers import *"
+
+def measure_import(statement, repeat=5):
+    """
+    Executes statement in repeat fresh interpreters.
+    
+        Returns::
+        
+            The best elapsed time and the list of the heavy modules
+            (HEAVY_MODULES) that were loaded by statement.
+    """
+    code = "\n".join(["import sys",
+                      "from timeit import default_timer as timer",
+                      "time_start = timer()",
+                      statement,
+                      "time_stop = timer()",
+                      "print(repr((time_stop - time_start, [m for m in %r if m in sys.modules])))"%HEAVY_MODULES])
+    
+    times = []
+    for i in range(repeat):
+        output = subprocess.check_output([sys.executable, "-c", code])
+        elapsed, loaded = eval(output.decode().strip().splitlines()[-1])
+        times.append(elapsed)
+    
+    return min(times), loaded
+
+def main(repeat=5):
+    benchmarks = sorted((name, func) for name, func in globals().items() if name.startswith("timeraw_"))
+    
+    print("%-40s %12s  %s"%("Statement", "Time [ms]", "Heavy modules loaded"))
+    for name, func in benchmarks:
+        statement = func()
+        try:
+            elapsed, loaded = measure_import(statement, repeat)
+        except subprocess.CalledProcessError:
+            print("%-40s %12s"%(statement, "failed"))
+            continue
+        print("%-40s %12.1f  %s"%(statement, elapsed*1000, ", ".join(loaded)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python 
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The standard test problems of the benchmark suite. Every problem is
+formulated as an explicit ODE (explicit_problem) and as an implicit
+problem (implicit_problem) so that it can be solved by all solvers.
+"""
+
+import numpy as N
+
+from assimulo.problem import Explicit_Problem, Implicit_Problem
+
+class Benchmark_Problem(object):
+    """
+    Base class of the benchmark problems. Subclasses define rhs(t, y) and
+    optionally jac(t, y), the state events and the event handling.
+    """
+    name = "---"
+    stiff = False   #Should only be solved by stiff solvers
+    t0 = 0.0
+    tfinal = 1.0
+    y0 = None
+    jac = None
+    state_events = None
+    sw0 = None
+    
+    def explicit_problem(self):
+        """
+        Returns the problem as an Assimulo Explicit_Problem.
+        """
+        if self.state_events is None:
+            prob = Explicit_Problem(self.rhs, self.y0, self.t0, name=self.name)
+        else:
+            prob = Explicit_Problem(lambda t, y, sw: self.rhs(t, y), self.y0, self.t0, sw0=list(self.sw0), name=self.name)
+            prob.state_events = self.state_events
+            prob.handle_event = self.handle_event
+        if self.jac is not None:
+            prob.jac = self.jac
+        return prob
+    
+    def implicit_problem(self):
+        """
+        Returns the problem as an Assimulo Implicit_Problem with the residual
+        F(t,y,yd) = yd - f(t,y).
+        """
+        yd0 = self.rhs(self.t0, N.array(self.y0, dtype=float))
+        
+        if self.state_events is None:
+            prob = Implicit_Problem(lambda t, y, yd: yd - self.rhs(t, y), self.y0, yd0, self.t0, name=self.name)
+        else:
+            prob = Implicit_Problem(lambda t, y, yd, sw: yd - self.rhs(t, y), self.y0, yd0, self.t0, sw0=list(self.sw0), name=self.name)
+            prob.state_events = lambda t, y, yd, sw: self.state_events(t, y, sw)
+            prob.handle_event = self.handle_event
+        if self.jac is not None:
+            prob.jac = lambda c, t, y, yd: c*N.eye(len(y)) - self.jac(t, y)
+        return prob
+
+class VanDerPol(Benchmark_Problem):
+    """
+    The Van der Pol oscillator in the time scaled form
+    
+        y1' = y2
+        y2' = mu**2((1 - y1**2) y2 - y1)
+    
+    which is stiff for large mu.
+    """
+    tfinal = 2.0
+    y0 = [2.0, -0.66]
+    
+    def __init__(self, mu=1000.0):
+        self.mu = mu
+        self.stiff = mu > 10.0
+        self.name = "Van der Pol (mu = %g)"%mu
+    
+    def rhs(self, t, y):
+        return N.array([y[1], self.mu**2*((1.0-y[0]**2)*y[1]-y[0])])
+    
+    def jac(self, t, y):
+        return N.array([[0.0, 1.0],
+                        [self.mu**2*(-2.0*y[0]*y[1]-1.0), self.mu**2*(1.0-y[0]**2)]])
+
+class Robertson(Benchmark_Problem):
+    """
+    The chemical kinetics problem of Robertson.
+    """
+    name = "Robertson"
+    stiff = True
+    tfinal = 40.0
+    y0 = [1.0, 0.0, 0.0]
+    
+    def rhs(self, t, y):
+        r1 = 0.04*y[0]
+        r2 = 1.0e4*y[1]*y[2]
+        r3 = 3.0e7*y[1]**2
+        return N.array([-r1+r2, r1-r2-r3, r3])
+    
+    def jac(self, t, y):
+        return N.array([[-0.04, 1.0e4*y[2], 1.0e4*y[1]],
+                        [0.04, -1.0e4*y[2]-6.0e7*y[1], -1.0e4*y[1]],
+                        [0.0, 6.0e7*y[1], 0.0]])
+
+class HIRES(Benchmark_Problem):
+    """
+    The High Irradiance RESponse problem (HIRES) from plant physiology,
+    from the test set for IVP solvers.
+    """
+    name = "HIRES"
+    stiff = True
+    tfinal = 321.8122
+    y0 = [1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0057]
+    
+    def rhs(self, t, y):
+        f = N.empty(8)
+        f[0] = -1.71*y[0] + 0.43*y[1] + 8.32*y[2] + 0.0007
+        f[1] = 1.71*y[0] - 8.75*y[1]
+        f[2] = -10.03*y[2] + 0.43*y[3] + 0.035*y[4]
+        f[3] = 8.32*y[1] + 1.71*y[2] - 1.12*y[3]
+        f[4] = -1.745*y[4] + 0.43*y[5] + 0.43*y[6]
+        f[5] = -280.0*y[5]*y[7] + 0.69*y[3] + 1.71*y[4] - 0.43*y[5] + 0.69*y[6]
+        f[6] = 280.0*y[5]*y[7] - 1.81*y[6]
+        f[7] = -f[6]
+        return f
+    
+    def jac(self, t, y):
+        J = N.zeros((8,8))
+        J[0,0], J[0,1], J[0,2] = -1.71, 0.43, 8.32
+        J[1,0], J[1,1] = 1.71, -8.75
+        J[2,2], J[2,3], J[2,4] = -10.03, 0.43, 0.035
+        J[3,1], J[3,2], J[3,3] = 8.32, 1.71, -1.12
+        J[4,4], J[4,5], J[4,6] = -1.745, 0.43, 0.43
+        J[5,3], J[5,4], J[5,5], J[5,6], J[5,7] = 0.69, 1.71, -0.43-280.0*y[7], 0.69, -280.0*y[5]
+        J[6,5], J[6,6], J[6,7] = 280.0*y[7], -1.81, 280.0*y[5]
+        J[7,:] = -J[6,:]
+        return J
+
+class Pollution(Benchmark_Problem):
+    """
+    The air pollution model of the Dutch National Institute of Public
+    Health and Environmental Protection (20 species, 25 reactions), from
+    the test set for IVP solvers.
+    """
+    name = "Pollution"
+    stiff = True
+    tfinal = 60.0
+    
+    k = [0.35, 0.266e2, 0.123e5, 0.86e-3, 0.82e-3, 0.15e5, 0.13e-3, 0.24e5,
+         0.165e5, 0.9e4, 0.22e-1, 0.12e5, 0.188e1, 0.163e5, 0.48e7, 0.35e-3,
+         0.175e-1, 0.1e9, 0.444e12, 0.124e4, 0.21e1, 0.578e1, 0.474e-1,
+         0.178e4, 0.312e1]
+    
+    def __init__(self):
+        self.y0 = N.zeros(20)
+        self.y0[[1, 3, 6, 7, 8, 16]] = [0.2, 0.04, 0.1, 0.3, 0.01, 0.007]
+    
+    def rhs(self, t, y):
+        k = self.k
+        r = [k[0]*y[0], k[1]*y[1]*y[3], k[2]*y[4]*y[1], k[3]*y[6], k[4]*y[6],
+             k[5]*y[6]*y[5], k[6]*y[8], k[7]*y[8]*y[5], k[8]*y[10]*y[1],
+             k[9]*y[10]*y[0], k[10]*y[12], k[11]*y[9]*y[1], k[12]*y[13],
+             k[13]*y[0]*y[5], k[14]*y[2], k[15]*y[3], k[16]*y[3], k[17]*y[15],
+             k[18]*y[15], k[19]*y[16]*y[5], k[20]*y[18], k[21]*y[18],
+             k[22]*y[0]*y[3], k[23]*y[18]*y[0], k[24]*y[19]]
+        r = [0.0] + r #1-based reaction numbering as in the test set
+        
+        f = N.empty(20)
+        f[0]  = -r[1]-r[10]-r[14]-r[23]-r[24]+r[2]+r[3]+r[9]+r[11]+r[12]+r[22]+r[25]
+        f[1]  = -r[2]-r[3]-r[9]-r[12]+r[1]+r[21]
+        f[2]  = -r[15]+r[1]+r[17]+r[19]+r[22]
+        f[3]  = -r[2]-r[16]-r[17]-r[23]+r[15]
+        f[4]  = -r[3]+2.0*r[4]+r[6]+r[7]+r[13]+r[20]
+        f[5]  = -r[6]-r[8]-r[14]-r[20]+r[3]+2.0*r[18]
+        f[6]  = -r[4]-r[5]-r[6]+r[13]
+        f[7]  = r[4]+r[5]+r[6]+r[7]
+        f[8]  = -r[7]-r[8]
+        f[9]  = -r[12]+r[7]+r[9]
+        f[10] = -r[9]-r[10]+r[8]+r[11]
+        f[11] = r[9]
+        f[12] = -r[11]+r[10]
+        f[13] = -r[13]+r[12]
+        f[14] = r[14]
+        f[15] = -r[18]-r[19]+r[16]
+        f[16] = -r[20]
+        f[17] = r[20]
+        f[18] = -r[21]-r[22]-r[24]+r[23]+r[25]
+        f[19] = -r[25]+r[24]
+        return f
+
+class Brusselator2D(Benchmark_Problem):
+    """
+    The two dimensional Brusselator reaction-diffusion equations
+    
+        u_t = 1 + u**2 v - 4.4 u + alpha (u_xx + u_yy)
+        v_t = 3.4 u - u**2 v + alpha (v_xx + v_yy)
+    
+    on the unit square with periodic boundary conditions, discretized by
+    the method of lines on an n x n grid (2 n**2 equations).
+    """
+    stiff = True
+    tfinal = 10.0
+    
+    def __init__(self, n=16, alpha=0.1):
+        self.n = n
+        self.alpha = alpha
+        self.name = "Brusselator 2D (n = %d)"%n
+        
+        x = N.arange(n)/float(n)
+        X, Y = N.meshgrid(x, x, indexing="ij")
+        self.y0 = N.hstack(((22.0*Y*(1.0-Y)**1.5).reshape(-1), (27.0*X*(1.0-X)**1.5).reshape(-1)))
+    
+    def _laplace(self, w):
+        return (N.roll(w, 1, 0) + N.roll(w, -1, 0) + N.roll(w, 1, 1) + N.roll(w, -1, 1) - 4.0*w)*self.n**2
+    
+    def rhs(self, t, y):
+        n = self.n
+        u = y[:n*n].reshape(n, n)
+        v = y[n*n:].reshape(n, n)
+        uuv = u**2*v
+        du = 1.0 + uuv - 4.4*u + self.alpha*self._laplace(u)
+        dv = 3.4*u - uuv + self.alpha*self._laplace(v)
+        return N.hstack((du.reshape(-1), dv.reshape(-1)))
+
+class Pendulum(Benchmark_Problem):
+    """
+    The pendulum of the example mech_system_pendulum. The explicit form
+    is the index-1 formulation with the Lagrange multiplier eliminated,
+    the implicit form is the index-1 DAE of the Mechanical_System.
+    """
+    name = "Pendulum"
+    tfinal = 10.0
+    g = 13.7503671
+    y0 = [1.0, 0.0, 0.0, 0.0]
+    
+    def rhs(self, t, y):
+        p, v = y[0:2], y[2:4]
+        la = (v[0]**2 + v[1]**2 - p[1]*self.g)/(p[0]**2 + p[1]**2)
+        return N.array([v[0], v[1], -la*p[0], -self.g-la*p[1]])
+    
+    def implicit_problem(self):
+        from assimulo.examples.mech_system_pendulum import pendulum
+        prob = pendulum().generate_problem("ind1")
+        prob.name = self.name
+        return prob
+
+class BouncingBall(Benchmark_Problem):
+    """
+    The bouncing ball of the example lsodar_bouncing_ball, a problem with
+    frequent state events.
+    """
+    name = "Bouncing ball"
+    tfinal = 8.0
+    g = -9.81
+    y0 = [2.0, 0.0]
+    sw0 = [True, False]
+    
+    def rhs(self, t, y):
+        return N.array([y[1], self.g])
+    
+    def state_events(self, t, y, sw):
+        return N.array([y[0] if sw[0] else 5, y[1] if sw[1] else 5])
+    
+    def handle_event(self, solver, event_info):
+        if event_info[0][0] != 0:
+            solver.sw[0] = False
+            solver.sw[1] = True
+            solver.y[1] = -0.88*solver.y[1]
+        else:
+            solver.sw[0] = True
+            solver.sw[1] = False
+        if hasattr(solver, "yd"): #Consistent derivatives for the implicit problem
+            if solver.yd is not None:
+                solver.yd[0] = solver.y[1]
+
+#The standard problem set of the benchmarks
+PROBLEMS = {"vanderpol_mu1":    lambda: VanDerPol(1.0),
+            "vanderpol_mu10":   lambda: VanDerPol(10.0),
+            "vanderpol_mu100":  lambda: VanDerPol(100.0),
+            "vanderpol_mu1000": lambda: VanDerPol(1000.0),
+            "robertson":        Robertson,
+            "hires":            HIRES,
+            "pollution":        Pollution,
+            "brusselator2d":    Brusselator2D,
+            "pendulum":         Pendulum,
+            "bouncing_ball":    BouncingBall}
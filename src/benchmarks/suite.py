@@ -0,0 +1,266 @@
+#!/usr/bin/env python 
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Benchmark suite running the standard problem set (see problems.py)
+across the solvers of Assimulo. For each problem, solver and tolerance
+the wall time, the counters of the solver statistics, the peak memory
+and the error at the final time are recorded, which gives the
+work-precision diagrams of the solvers.
+
+The classes follow the conventions of airspeed velocity (asv), the
+standalone runner is
+
+    python -m assimulo.benchmarks.suite [--plots] [--json results.json]
+"""
+
+import sys
+import json
+import argparse
+from timeit import default_timer as timer
+
+import numpy as N
+
+from assimulo.benchmarks.problems import PROBLEMS
+
+try:
+    import tracemalloc
+except ImportError: #Python 2
+    tracemalloc = None
+
+SOLVERS = ["CVode", "IDA", "Radau5ODE", "_Radau5ODE", "RodasODE", "LSODAR",
+           "Dopri5", "RungeKutta34", "ImplicitEuler"]
+
+IMPLICIT_SOLVERS = ["IDA"]                     #Solve the implicit formulation
+NONSTIFF_SOLVERS = ["Dopri5", "RungeKutta34"]  #Not used for stiff problems
+FIXED_STEP_SOLVERS = ["ImplicitEuler"]         #The tolerance determines the step-size
+
+TOLERANCES = [1e-3, 1e-4, 1e-5, 1e-6, 1e-7, 1e-8]
+
+STATISTICS = ["nsteps", "nfcns", "njacs", "nlus", "nerrfails", "nstateevents"]
+
+_reference_solutions = {}
+
+def is_supported(problem, solver_name):
+    """
+    Returns True if the solver is benchmarked on the problem.
+    """
+    return not (problem.stiff and solver_name in NONSTIFF_SOLVERS)
+
+def create_solver(problem, solver_name, tol):
+    """
+    Creates and configures the solver solver_name for the problem with
+    the (relative and absolute) tolerance tol. For fixed step solvers the
+    step-size is (tfinal - t0)*sqrt(tol)/10.
+    """
+    import assimulo.solvers as solvers
+    
+    if solver_name in IMPLICIT_SOLVERS:
+        model = problem.implicit_problem()
+    else:
+        model = problem.explicit_problem()
+    
+    solver = getattr(solvers, solver_name)(model)
+    solver.verbosity = 50 #QUIET
+    
+    if solver_name in FIXED_STEP_SOLVERS:
+        solver.h = (problem.tfinal - problem.t0)*N.sqrt(tol)/10.0
+    else:
+        solver.rtol = tol
+        solver.atol = tol
+    
+    if solver_name == "CVode" and not problem.stiff:
+        solver.discr = "Adams"
+    if solver_name == "IDA" and hasattr(model, "algvar"):
+        solver.suppress_alg = True
+    
+    return solver
+
+def reference_solution(problem_name):
+    """
+    Returns the solution at the final time computed with a tolerance of
+    1e-12 (Radau5ODE or, if not available, CVode).
+    """
+    if problem_name not in _reference_solutions:
+        problem = PROBLEMS[problem_name]()
+        try:
+            solver = create_solver(problem, "Radau5ODE", 1e-12)
+        except (ImportError, AttributeError):
+            solver = create_solver(problem, "CVode", 1e-12)
+        solver.simulate(problem.tfinal)
+        _reference_solutions[problem_name] = N.array(solver.y)
+    
+    return _reference_solutions[problem_name]
+
+def run(problem_name, solver_name, tol=1e-6, error=True, memory=True):
+    """
+    Runs a benchmark.
+    
+        Returns::
+        
+            A dict with the elapsed time of simulate ("time"), the solver
+            statistics, the peak memory allocated during the simulation
+            ("peak_memory", bytes, requires tracemalloc) and the mixed
+            relative error at the final time ("error").
+            
+            The peak memory is measured in a second, traced, simulation
+            so that the tracing does not slow down the timed one. Set
+            memory to False to skip it.
+    """
+    problem = PROBLEMS[problem_name]()
+    solver = create_solver(problem, solver_name, tol)
+    
+    time_start = timer()
+    solver.simulate(problem.tfinal)
+    time_stop = timer()
+    
+    result = {"problem": problem_name, "solver": solver_name, "tol": tol,
+              "time": time_stop - time_start, "peak_memory": None}
+    
+    if memory and tracemalloc is not None:
+        traced_solver = create_solver(PROBLEMS[problem_name](), solver_name, tol)
+        tracemalloc.start()
+        try:
+            traced_solver.simulate(problem.tfinal)
+            result["peak_memory"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    
+    statistics = solver.get_statistics()
+    for key in STATISTICS:
+        result[key] = statistics[key] if key in statistics.keys() else 0
+    
+    if error:
+        y_ref = reference_solution(problem_name)
+        y = N.array(solver.y)[:len(y_ref)]
+        result["error"] = float(N.max(N.abs(y - y_ref)/(N.abs(y_ref) + 1e-8)))
+    
+    return result
+
+def work_precision(problem_name, solvers=SOLVERS, tolerances=TOLERANCES):
+    """
+    Runs the problem for the solvers and tolerances.
+    
+        Returns::
+        
+            A dict solver name -> list of the results (see run) for
+            each tolerance.
+    """
+    problem = PROBLEMS[problem_name]()
+    results = {}
+    
+    for solver_name in solvers:
+        if not is_supported(problem, solver_name):
+            continue
+        results[solver_name] = []
+        for tol in tolerances:
+            try:
+                results[solver_name].append(run(problem_name, solver_name, tol))
+            except Exception as e:
+                sys.stderr.write("%s with %s (tol = %g) failed: %s\n"%(problem_name, solver_name, tol, e))
+    
+    return results
+
+def plot_work_precision(problem_name, results):
+    """
+    Plots the work-precision diagram (error against elapsed time) of the
+    results of work_precision.
+    """
+    import pylab as P
+    
+    P.figure()
+    for solver_name in sorted(results):
+        res = [r for r in results[solver_name] if r["error"] > 0.0]
+        if res:
+            P.loglog([r["error"] for r in res], [r["time"] for r in res], "o-", label=solver_name)
+    P.xlabel("Error at the final time")
+    P.ylabel("Elapsed time [s]")
+    P.title(PROBLEMS[problem_name]().name)
+    P.legend(loc="best")
+
+def supported_cases():
+    """
+    Returns the benchmarked combinations of problems and solvers as a
+    list of strings "problem:solver".
+    """
+    return ["%s:%s"%(problem_name, solver_name) for problem_name in sorted(PROBLEMS) 
+            for solver_name in SOLVERS if is_supported(PROBLEMS[problem_name](), solver_name)]
+
+class SimulateSuite:
+    """
+    Runs every problem with every solver supporting it at the tolerance
+    1e-6 (asv). The parameter is a combination "problem:solver", so that
+    the unsupported combinations are not part of the parameter grid.
+    """
+    params = supported_cases()
+    param_names = ["case"]
+    timeout = 600
+    
+    def time_simulate(self, case):
+        run(*case.split(":"), error=False, memory=False)
+    
+    def peakmem_simulate(self, case):
+        run(*case.split(":"), error=False, memory=False)
+    
+    def track_nfcns(self, case):
+        return run(*case.split(":"), error=False, memory=False)["nfcns"]
+    
+    def track_njacs(self, case):
+        return run(*case.split(":"), error=False, memory=False)["njacs"]
+    
+    def track_nsteps(self, case):
+        return run(*case.split(":"), error=False, memory=False)["nsteps"]
+    
+    def track_error(self, case):
+        return run(*case.split(":"), memory=False)["error"]
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Runs the Assimulo benchmark suite.")
+    parser.add_argument("--problems", nargs="+", default=sorted(PROBLEMS), choices=sorted(PROBLEMS))
+    parser.add_argument("--solvers", nargs="+", default=SOLVERS, choices=SOLVERS)
+    parser.add_argument("--tolerances", nargs="+", type=float, default=TOLERANCES)
+    parser.add_argument("--json", help="Stores the results in the given file")
+    parser.add_argument("--plots", action="store_true", help="Plots the work-precision diagrams")
+    options = parser.parse_args(args)
+    
+    all_results = {}
+    print("%-18s %-14s %8s %10s %8s %8s %8s %12s %10s"%("Problem", "Solver", "Tol", "Time [s]", "Steps", "Fcns", "Jacs", "Memory [kB]", "Error"))
+    for problem_name in options.problems:
+        results = work_precision(problem_name, options.solvers, options.tolerances)
+        all_results[problem_name] = results
+        
+        for solver_name in options.solvers:
+            for r in results.get(solver_name, []):
+                memory = "-" if r["peak_memory"] is None else "%.0f"%(r["peak_memory"]/1024.0)
+                print("%-18s %-14s %8.0e %10.4f %8d %8d %8d %12s %10.2e"%(problem_name, solver_name, r["tol"], r["time"], 
+                                                                       r["nsteps"], r["nfcns"], r["njacs"], memory, r["error"]))
+        
+        if options.plots:
+            plot_work_precision(problem_name, results)
+    
+    if options.json:
+        with open(options.json, "w") as f:
+            json.dump(all_results, f, indent=1)
+    
+    if options.plots:
+        import pylab as P
+        P.show()
+    
+    return all_results
+
+if __name__ == "__main__":
+    main()
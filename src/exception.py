@@ -59,3 +59,6 @@ class DASP3_Exception(AssimuloException):
     pass
 class RKStarter_Exception(AssimuloException):
     pass
+
+class SDIRK_DAE_Exception(AssimuloException):
+    pass
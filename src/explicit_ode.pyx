@@ -151,7 +151,7 @@ cdef class Explicit_ODE(ODE):
         y0 = self.y
 
         #Log the first point
-        self.problem.handle_result(self,t0,y0)
+        self._handle_result(self,t0,y0)
 
         #Reinitiate the solver
         flag_initialize = True
@@ -189,7 +189,7 @@ cdef class Explicit_ODE(ODE):
             #Store data if not done after each step
             if REPORT_CONTINUOUSLY is False and len(tlist) > 0:
                 self.t, self.y = tlist[-1], ylist[-1].copy()
-                list(map(self.problem.handle_result,itertools.repeat(self,len(tlist)), tlist, ylist))
+                list(map(self._handle_result,itertools.repeat(self,len(tlist)), tlist, ylist))
             
             #Initialize flag to false
             flag_initialize = False
@@ -198,7 +198,7 @@ cdef class Explicit_ODE(ODE):
             if flag == ID_EVENT or (flag == ID_COMPLETE and tevent != tfinal) or (flag == ID_COMPLETE and TIME_EVENT and tret==tevent): #Event has been detected
                 
                 if self.store_event_points and output_list is not None and abs(output_list[opts["output_index"]-1]-self.t) > eps:
-                    self.problem.handle_result(self, self.t, self.y.copy())
+                    self._handle_result(self, self.t, self.y.copy())
                 
                 #Get and store event information
                 event_info = [[],flag == ID_COMPLETE]
@@ -233,7 +233,7 @@ cdef class Explicit_ODE(ODE):
             
             #Logg after the event handling if there was a communication point there.
             if flag_initialize and (output_list is None or self.store_event_points):#output_list[opts["output_index"]] == self.t):
-                self.problem.handle_result(self, self.t, self.y.copy())
+                self._handle_result(self, self.t, self.y.copy())
                 
             if self.t == tfinal: #Finished simulation (might occur due to event at the final time)
                 break
@@ -243,6 +243,9 @@ cdef class Explicit_ODE(ODE):
         option is active. Here possible interpolation is done and the result 
         handeled. Furthermore possible step events are checked.
         '''
+        if self._dense_solution is not None:
+            self._store_dense_output(self.t, t, y)
+        
         self.t, self.y = t, y.copy()
         
         #Store the elapsed time for a single step
@@ -274,14 +277,14 @@ cdef class Explicit_ODE(ODE):
             output_index = opts["output_index"]
             try:
                 while output_list[output_index] <= t:
-                    self.problem.handle_result(self, output_list[output_index], 
+                    self._handle_result(self, output_list[output_index], 
                                     self.interpolate(output_list[output_index]))
                     output_index = output_index + 1
             except IndexError:
                 pass
             opts["output_index"] = output_index
         else:
-            self.problem.handle_result(self,t,y.copy())
+            self._handle_result(self,t,y.copy())
         
         #Callback to the problem
         if self.problem_info["step_events"]:
@@ -166,9 +166,9 @@ cdef class Implicit_ODE(ODE):
 
         #Logg the first point
         if type == 0:
-            self.problem.handle_result(self,t0,y0)
+            self._handle_result(self,t0,y0)
         else:
-            self.problem.handle_result(self,t0,y0,yd0)
+            self._handle_result(self,t0,y0,yd0)
         
         #Reinitiate the solver
         flag_initialize = True
@@ -210,9 +210,9 @@ cdef class Implicit_ODE(ODE):
             if REPORT_CONTINUOUSLY is False and len(tlist) > 0:
                 self.t, self.y, self.yd = tlist[-1], ylist[-1].copy(), ydlist[-1].copy()
                 if type == 0:
-                    list(map(self.problem.handle_result,itertools.repeat(self,len(tlist)), tlist, ylist))
+                    list(map(self._handle_result,itertools.repeat(self,len(tlist)), tlist, ylist))
                 else:
-                    list(map(self.problem.handle_result,itertools.repeat(self,len(tlist)), tlist, ylist, ydlist))
+                    list(map(self._handle_result,itertools.repeat(self,len(tlist)), tlist, ylist, ydlist))
             
             #Initialize flag to false
             flag_initialize = False
@@ -221,7 +221,7 @@ cdef class Implicit_ODE(ODE):
             if flag == ID_EVENT or (flag == ID_COMPLETE and tevent != tfinal): #Event have been detected
                 
                 if self.store_event_points and output_list is not None and abs(output_list[opts["output_index"]-1]-self.t) > eps:
-                    self.problem.handle_result(self, self.t, self.y.copy(), self.yd.copy())
+                    self._handle_result(self, self.t, self.y.copy(), self.yd.copy())
                                 
                 #Get and store event information
                 event_info = [[],flag == ID_COMPLETE]
@@ -257,9 +257,9 @@ cdef class Implicit_ODE(ODE):
             #Logg after the event handling if there was a communication point there.
             if flag_initialize and (output_list is None or self.store_event_points):
                 if type == 0:
-                    self.problem.handle_result(self, self.t, self.y.copy())
+                    self._handle_result(self, self.t, self.y.copy())
                 else:
-                    self.problem.handle_result(self, self.t, self.y.copy(), self.yd.copy())
+                    self._handle_result(self, self.t, self.y.copy(), self.yd.copy())
                     
             if self.t == tfinal: #Finished simulation (might occur due to event at the final time)
                 break
@@ -269,6 +269,9 @@ cdef class Implicit_ODE(ODE):
         option is active. Here possible interpolation is done and the result 
         handeled. Furthermore possible step events are checked.
         '''
+        if self._dense_solution is not None:
+            self._store_dense_output(self.t, t, y)
+        
         self.t, self.y, self.yd = t, y.copy(), yd.copy()
                 
         #Store the elapsed time for a single step 
@@ -301,10 +304,10 @@ cdef class Implicit_ODE(ODE):
             try: 
                 while output_list[output_index] <= t: 
                     if self.problem_info["type"] == 0:
-                        self.problem.handle_result(self, output_list[output_index], 
+                        self._handle_result(self, output_list[output_index], 
                                         self.interpolate(output_list[output_index]))
                     else:
-                        self.problem.handle_result(self, output_list[output_index], 
+                        self._handle_result(self, output_list[output_index], 
                                         self.interpolate(output_list[output_index]),
                                         self.interpolate(output_list[output_index],1))      
                     output_index = output_index + 1
@@ -313,9 +316,9 @@ cdef class Implicit_ODE(ODE):
             opts["output_index"] = output_index
         else: 
             if self.problem_info["type"] == 0:
-                self.problem.handle_result(self,t,y.copy())
+                self._handle_result(self,t,y.copy())
             else:
-                self.problem.handle_result(self,t,y.copy(),yd.copy())
+                self._handle_result(self,t,y.copy(),yd.copy())
          
         #Callback to FMU 
         if self.problem_info["step_events"]:  
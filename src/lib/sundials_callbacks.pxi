@@ -16,11 +16,22 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import cython
+import sys
+from libc.math cimport fabs, sqrt
+from libc.float cimport DBL_EPSILON
 
 #=================
 # Module functions
 #=================
 
+cdef inline bint is_csc_matrix(object jac):
+    """
+    Checks if jac is stored on Scipy's CSC format. Scipy is not imported
+    here, if jac is a Scipy matrix then scipy.sparse is already loaded.
+    """
+    sparse = sys.modules.get("scipy.sparse")
+    return sparse is not None and isinstance(jac, sparse.csc_matrix)
+
 cdef N_Vector N_VNewEmpty_Euclidean(long int n):
   cdef N_Vector v = N_VNew_Serial(n)
   v.ops.nvwrmsnorm = v.ops.nvwl2norm #Overwrite the WRMS norm to the 2-Norm
@@ -75,3 +86,195 @@ cdef inline realtype2arr(realtype *data, int n):
     cdef N.ndarray[realtype, ndim=1, mode='c'] x=N.empty(n)
     memcpy(x.data, data, n*sizeof(realtype))
     return x
+
+#=======================
+# Built-in preconditioners
+#=======================
+
+cdef class BlockJacobiPreconditioner:
+    """
+    Block-Jacobi preconditioner. The diagonal blocks of the iteration 
+    matrix are approximated by difference quotients, where one state is
+    perturbed at a time so that couplings between the blocks do not
+    enter the blocks, and are LU-factorized block by block. Both the
+    factorization and the solve are performed in C.
+    """
+    cdef:
+        int dim            #Dimension of the problem
+        int nblocks        #Number of diagonal blocks
+        int *offsets       #Start index of each block (nblocks+1 entries)
+        int *mat_offsets   #Start index of each block in the matrix storage
+        int *block_of      #Block containing each state
+        int *pivots        #Pivots from the LU factorizations
+        realtype inc       #Increment used in the current difference quotient
+        realtype *jac      #Difference quotient approximation of the blocks (column major)
+        realtype *lu       #LU factorizations of the blocks (column major)
+        long int nfevals   #Number of function evaluations due to the difference quotients
+        N_Vector ytemp     #Work vectors
+        N_Vector ydtemp
+        N_Vector ftemp
+    
+    def __cinit__(self, blocks):
+        cdef int i, j, size = 0
+        
+        self.nblocks = len(blocks)
+        self.offsets = <int*>malloc((self.nblocks+1)*sizeof(int))
+        self.mat_offsets = <int*>malloc((self.nblocks+1)*sizeof(int))
+        
+        self.offsets[0] = 0
+        self.mat_offsets[0] = 0
+        for i in range(self.nblocks):
+            self.offsets[i+1] = self.offsets[i] + blocks[i]
+            self.mat_offsets[i+1] = self.mat_offsets[i] + blocks[i]*blocks[i]
+        self.dim = self.offsets[self.nblocks]
+        size = self.mat_offsets[self.nblocks]
+        
+        self.block_of = <int*>malloc(self.dim*sizeof(int))
+        for i in range(self.nblocks):
+            for j in range(self.offsets[i], self.offsets[i+1]):
+                self.block_of[j] = i
+        
+        self.pivots = <int*>malloc(self.dim*sizeof(int))
+        self.jac = <realtype*>malloc(size*sizeof(realtype))
+        self.lu  = <realtype*>malloc(size*sizeof(realtype))
+        self.nfevals = 0
+        
+        self.ytemp  = N_VNew_Serial(self.dim)
+        self.ydtemp = N_VNew_Serial(self.dim)
+        self.ftemp  = N_VNew_Serial(self.dim)
+    
+    def __dealloc__(self):
+        free(self.offsets)
+        free(self.mat_offsets)
+        free(self.block_of)
+        free(self.pivots)
+        free(self.jac)
+        free(self.lu)
+        
+        if self.ytemp != NULL:
+            N_VDestroy_Serial(self.ytemp)
+        if self.ydtemp != NULL:
+            N_VDestroy_Serial(self.ydtemp)
+        if self.ftemp != NULL:
+            N_VDestroy_Serial(self.ftemp)
+    
+    cdef void perturb(self, int k, N_Vector yv, N_Vector ytemp):
+        """
+        Copies y to ytemp and perturbs the k:th state.
+        """
+        cdef realtype *y  = (<N_VectorContent_Serial>yv.content).data
+        cdef realtype *yt = (<N_VectorContent_Serial>ytemp.content).data
+        cdef realtype srur = sqrt(DBL_EPSILON)
+        
+        memcpy(yt, y, self.dim*sizeof(realtype))
+        yt[k] = y[k] + srur*max(fabs(y[k]), 1.0)
+        self.inc = yt[k] - y[k]
+    
+    cdef void perturb_derivative(self, int k, N_Vector ydv, N_Vector ydtemp, realtype cj):
+        """
+        Copies yd to ydtemp and perturbs the k:th derivative with cj
+        times the increment used for the state.
+        """
+        cdef realtype *yd  = (<N_VectorContent_Serial>ydv.content).data
+        cdef realtype *ydt = (<N_VectorContent_Serial>ydtemp.content).data
+        
+        memcpy(ydt, yd, self.dim*sizeof(realtype))
+        ydt[k] = yd[k] + cj*self.inc
+    
+    cdef void store_column(self, int k, N_Vector f0v, N_Vector f1v):
+        """
+        Stores the difference quotient of the k:th state in the column
+        of the block containing it.
+        """
+        cdef realtype *f0 = (<N_VectorContent_Serial>f0v.content).data
+        cdef realtype *f1 = (<N_VectorContent_Serial>f1v.content).data
+        cdef realtype *col
+        cdef int i = self.block_of[k]
+        cdef int r, b = self.offsets[i+1] - self.offsets[i]
+        
+        self.nfevals += 1
+        col = self.jac + self.mat_offsets[i] + (k - self.offsets[i])*b
+        for r in range(b):
+            col[r] = (f1[self.offsets[i]+r] - f0[self.offsets[i]+r])/self.inc
+    
+    cdef int factorize(self, realtype alpha, realtype beta) nogil:
+        """
+        Forms alpha*I + beta*J for each block and computes its LU
+        factorization with partial pivoting. Returns zero on success and
+        otherwise the (one-based) column where a zero pivot was found.
+        """
+        cdef realtype *A
+        cdef int *piv
+        cdef realtype amax, tmp, m
+        cdef int i, b, r, c, cc, p
+        
+        for i in range(self.mat_offsets[self.nblocks]):
+            self.lu[i] = beta*self.jac[i]
+        
+        for i in range(self.nblocks):
+            b = self.offsets[i+1] - self.offsets[i]
+            A = self.lu + self.mat_offsets[i]
+            piv = self.pivots + self.offsets[i]
+            
+            for c in range(b):
+                A[c*b+c] += alpha
+            
+            for c in range(b):
+                #Find the pivot
+                p = c
+                amax = fabs(A[c*b+c])
+                for r in range(c+1, b):
+                    if fabs(A[c*b+r]) > amax:
+                        amax = fabs(A[c*b+r])
+                        p = r
+                piv[c] = p
+                if amax == 0.0:
+                    return self.offsets[i] + c + 1
+                
+                #Swap the rows
+                if p != c:
+                    for cc in range(b):
+                        tmp = A[cc*b+c]
+                        A[cc*b+c] = A[cc*b+p]
+                        A[cc*b+p] = tmp
+                
+                #Compute the multipliers and update the remaining columns
+                for r in range(c+1, b):
+                    A[c*b+r] /= A[c*b+c]
+                for cc in range(c+1, b):
+                    m = A[cc*b+c]
+                    if m != 0.0:
+                        for r in range(c+1, b):
+                            A[cc*b+r] -= A[c*b+r]*m
+        return 0
+    
+    cdef void solve(self, realtype *z) nogil:
+        """
+        Solves P*x = z in-place using the block LU factorizations.
+        """
+        cdef realtype *A
+        cdef realtype *zb
+        cdef int *piv
+        cdef realtype tmp
+        cdef int i, b, r, c
+        
+        for i in range(self.nblocks):
+            b = self.offsets[i+1] - self.offsets[i]
+            A = self.lu + self.mat_offsets[i]
+            piv = self.pivots + self.offsets[i]
+            zb = z + self.offsets[i]
+            
+            for c in range(b):
+                if piv[c] != c:
+                    tmp = zb[c]
+                    zb[c] = zb[piv[c]]
+                    zb[piv[c]] = tmp
+            
+            for c in range(b):
+                for r in range(c+1, b):
+                    zb[r] -= A[c*b+r]*zb[c]
+            
+            for c in range(b-1, -1, -1):
+                zb[c] /= A[c*b+c]
+                for r in range(c):
+                    zb[r] -= A[c*b+r]*zb[c]
@@ -122,8 +122,7 @@ IF SUNDIALS_VERSION >= (3,0,0):
                 else:
                     jac=(<object>pData.JAC)(t,y)
                 
-            if not isinstance(jac, sparse.csc.csc_matrix):
-                jac = sparse.csc.csc_matrix(jac)
+            if not is_csc_matrix(jac):
                 raise AssimuloException("The Jacobian must be stored on Scipy's CSC format.")
             ret_nnz = jac.nnz
             if ret_nnz > nnz:
@@ -184,8 +183,7 @@ ELSE:
                 else:
                     jac=(<object>pData.JAC)(t,y)
                 
-            if not isinstance(jac, sparse.csc.csc_matrix):
-                jac = sparse.csc.csc_matrix(jac)
+            if not is_csc_matrix(jac):
                 raise AssimuloException("The Jacobian must be stored on Scipy's CSC format.")
             ret_nnz = jac.nnz
             if ret_nnz > nnz:
@@ -244,7 +242,7 @@ IF SUNDIALS_VERSION >= (3,0,0):
                 traceback.print_exc()
                 return CVDLS_JACFUNC_UNRECVR
         
-        if isinstance(jac, sparse.csc.csc_matrix):
+        if is_csc_matrix(jac):
             for j in range(Neq):
                 col_i = Jacobian.cols[j]
                 for i in range(jac.indptr[j], jac.indptr[j+1]):
@@ -294,7 +292,7 @@ ELSE:
                 traceback.print_exc()
                 return CVDLS_JACFUNC_UNRECVR
                 
-        if isinstance(jac, sparse.csc.csc_matrix):
+        if is_csc_matrix(jac):
             for j in range(Neq):
                 col_i = DENSE_COL(Jacobian, j)
                 for i in range(jac.indptr[j], jac.indptr[j+1]):
@@ -735,10 +733,315 @@ cdef int ida_jacv(realtype t, N_Vector yy, N_Vector yp, N_Vector rr, N_Vector vv
             traceback.print_exc()
             return SPGMR_PSOLVE_FAIL_UNREC
 
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef int ida_prec_setup(realtype t, N_Vector yy, N_Vector yp, N_Vector rr,
+                      realtype cj, void *problem_data):
+        """
+        For information see IDAS documentation 4.6.9
+        """
+        cdef ProblemData pData = <ProblemData>problem_data
+        cdef N.ndarray y   = nv2arr(yy)
+        cdef N.ndarray yd  = nv2arr(yp)
+        cdef N.ndarray res = nv2arr(rr)
+
+        try:
+            pData.PREC_DATA = (<object>pData.PREC_SETUP)(t,y,yd,res,cj,pData.PREC_DATA)
+        except:
+            return IDA_REC_ERR #Recoverable Error (See Sundials description)
+
+        return IDASPILS_SUCCESS
+
+    cdef int ida_prec_solve(realtype t, N_Vector yy, N_Vector yp, N_Vector rr,
+                      N_Vector rvec, N_Vector z, realtype cj, realtype delta,
+                      void *problem_data):
+        """
+        For information see IDAS documentation 4.6.8
+        """
+        cdef ProblemData pData = <ProblemData>problem_data
+        cdef N.ndarray y   = nv2arr(yy)
+        cdef N.ndarray yd  = nv2arr(yp)
+        cdef N.ndarray res = nv2arr(rr)
+        cdef N.ndarray r   = nv2arr(rvec)
+        cdef realtype* zptr=(<N_VectorContent_Serial>z.content).data
+        cdef int i
+
+        try:
+            zres = (<object>pData.PREC_SOLVE)(t,y,yd,res,r,cj,delta,pData.PREC_DATA)
+        except:
+            return IDA_REC_ERR #Recoverable Error (See Sundials description)
+
+        for i in range(pData.dim):
+            zptr[i] = zres[i]
+
+        return IDASPILS_SUCCESS
+ELSE:
+    cdef int ida_prec_setup(realtype t, N_Vector yy, N_Vector yp, N_Vector rr,
+                      realtype cj, void *problem_data,
+                      N_Vector tmp1, N_Vector tmp2, N_Vector tmp3):
+        """
+        For information see IDAS documentation 4.6.9
+        """
+        cdef ProblemData pData = <ProblemData>problem_data
+        cdef N.ndarray y   = nv2arr(yy)
+        cdef N.ndarray yd  = nv2arr(yp)
+        cdef N.ndarray res = nv2arr(rr)
+
+        try:
+            pData.PREC_DATA = (<object>pData.PREC_SETUP)(t,y,yd,res,cj,pData.PREC_DATA)
+        except:
+            return IDA_REC_ERR #Recoverable Error (See Sundials description)
+
+        return IDASPILS_SUCCESS
+
+    cdef int ida_prec_solve(realtype t, N_Vector yy, N_Vector yp, N_Vector rr,
+                      N_Vector rvec, N_Vector z, realtype cj, realtype delta,
+                      void *problem_data, N_Vector tmp):
+        """
+        For information see IDAS documentation 4.6.8
+        """
+        cdef ProblemData pData = <ProblemData>problem_data
+        cdef N.ndarray y   = nv2arr(yy)
+        cdef N.ndarray yd  = nv2arr(yp)
+        cdef N.ndarray res = nv2arr(rr)
+        cdef N.ndarray r   = nv2arr(rvec)
+        cdef realtype* zptr=(<N_VectorContent_Serial>z.content).data
+        cdef int i
+
+        try:
+            zres = (<object>pData.PREC_SOLVE)(t,y,yd,res,r,cj,delta,pData.PREC_DATA)
+        except:
+            return IDA_REC_ERR #Recoverable Error (See Sundials description)
+
+        for i in range(pData.dim):
+            zptr[i] = zres[i]
+
+        return IDASPILS_SUCCESS
+
+# Built-in preconditioners
+# ========================
+
+cdef int block_jacobi_cv_setup(realtype t, N_Vector yy, N_Vector fyy, bint jok, 
+                               bint *jcurPtr, realtype gamma, void *problem_data):
+    """
+    Sets up the built-in block-Jacobi preconditioner P = I - gamma*J, where
+    the diagonal blocks of J are approximated by difference quotients.
+    """
+    cdef ProblemData pData = <ProblemData>problem_data
+    cdef BlockJacobiPreconditioner bj = pData.BJ
+    cdef int k, flag
+    
+    if jok: #Reuse the saved Jacobian blocks
+        jcurPtr[0] = 0
+    else:
+        for k in range(bj.dim):
+            bj.perturb(k, yy, bj.ytemp)
+            flag = cv_rhs(t, bj.ytemp, bj.ftemp, problem_data)
+            if flag != CV_SUCCESS:
+                return flag
+            bj.store_column(k, fyy, bj.ftemp)
+        jcurPtr[0] = 1
+    
+    if bj.factorize(1.0, -gamma) != 0:
+        return CV_REC_ERR #Singular block (See Sundials description)
+    
+    return CVSPILS_SUCCESS
+
+cdef int block_jacobi_ida_setup(realtype t, N_Vector yy, N_Vector yp, N_Vector rr,
+                                realtype cj, void *problem_data):
+    """
+    Sets up the built-in block-Jacobi preconditioner P = dF/dy + cj*dF/dyd,
+    where the diagonal blocks are approximated by difference quotients.
+    """
+    cdef ProblemData pData = <ProblemData>problem_data
+    cdef BlockJacobiPreconditioner bj = pData.BJ
+    cdef int k, flag
+    
+    for k in range(bj.dim):
+        bj.perturb(k, yy, bj.ytemp)
+        bj.perturb_derivative(k, yp, bj.ydtemp, cj)
+        flag = ida_res(t, bj.ytemp, bj.ydtemp, bj.ftemp, problem_data)
+        if flag != IDA_SUCCESS:
+            return flag
+        bj.store_column(k, rr, bj.ftemp)
+    
+    if bj.factorize(0.0, 1.0) != 0:
+        return IDA_REC_ERR #Singular block (See Sundials description)
+    
+    return IDASPILS_SUCCESS
+
+cdef inline int block_jacobi_solve(N_Vector rr, N_Vector z, void *problem_data):
+    """
+    Solves P*z = r with the built-in block-Jacobi preconditioner.
+    """
+    cdef ProblemData pData = <ProblemData>problem_data
+    cdef realtype* zptr = (<N_VectorContent_Serial>z.content).data
+    
+    memcpy(zptr, (<N_VectorContent_Serial>rr.content).data, pData.memSize)
+    pData.BJ.solve(zptr)
+    
+    return 0
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef int cv_bj_prec_setup(realtype t, N_Vector yy, N_Vector fyy,
+                      bint jok, bint *jcurPtr, realtype gamma, void *problem_data):
+        return block_jacobi_cv_setup(t, yy, fyy, jok, jcurPtr, gamma, problem_data)
+    
+    cdef int cv_bj_prec_solve(realtype t, N_Vector yy, N_Vector fyy,
+                      N_Vector rr, N_Vector z, realtype gamma, realtype delta,
+                      int lr, void *problem_data):
+        return block_jacobi_solve(rr, z, problem_data)
+    
+    cdef int ida_bj_prec_setup(realtype t, N_Vector yy, N_Vector yp, N_Vector rr,
+                      realtype cj, void *problem_data):
+        return block_jacobi_ida_setup(t, yy, yp, rr, cj, problem_data)
+    
+    cdef int ida_bj_prec_solve(realtype t, N_Vector yy, N_Vector yp, N_Vector rr,
+                      N_Vector rvec, N_Vector z, realtype cj, realtype delta,
+                      void *problem_data):
+        return block_jacobi_solve(rvec, z, problem_data)
+ELSE:
+    cdef int cv_bj_prec_setup(realtype t, N_Vector yy, N_Vector fyy,
+                      bint jok, bint *jcurPtr, realtype gamma, void *problem_data,
+                      N_Vector tmp1, N_Vector tmp2, N_Vector tmp3):
+        return block_jacobi_cv_setup(t, yy, fyy, jok, jcurPtr, gamma, problem_data)
+    
+    cdef int cv_bj_prec_solve(realtype t, N_Vector yy, N_Vector fyy,
+                      N_Vector rr, N_Vector z, realtype gamma, realtype delta,
+                      int lr, void *problem_data, N_Vector tmp):
+        return block_jacobi_solve(rr, z, problem_data)
+    
+    cdef int ida_bj_prec_setup(realtype t, N_Vector yy, N_Vector yp, N_Vector rr,
+                      realtype cj, void *problem_data,
+                      N_Vector tmp1, N_Vector tmp2, N_Vector tmp3):
+        return block_jacobi_ida_setup(t, yy, yp, rr, cj, problem_data)
+    
+    cdef int ida_bj_prec_solve(realtype t, N_Vector yy, N_Vector yp, N_Vector rr,
+                      N_Vector rvec, N_Vector z, realtype cj, realtype delta,
+                      void *problem_data, N_Vector tmp):
+        return block_jacobi_solve(rvec, z, problem_data)
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef int ida_bbd_local(sunindextype Nlocal, realtype t, N_Vector yy, N_Vector yp, 
+                      N_Vector gval, void *problem_data):
+        """
+        Local residual function used by the band-block preconditioner.
+        """
+        return ida_res(t, yy, yp, gval, problem_data)
+ELSE:
+    cdef int ida_bbd_local(long int Nlocal, realtype t, N_Vector yy, N_Vector yp, 
+                      N_Vector gval, void *problem_data):
+        """
+        Local residual function used by the band-block preconditioner.
+        """
+        return ida_res(t, yy, yp, gval, problem_data)
+
+# Callback functions for compiled problems
+# ========================================
+#
+# The functions below forward the calls from Sundials directly to the C
+# functions of a Native_Explicit_Problem or Native_Implicit_Problem. They do
+# not touch any Python objects so that Sundials can run without the GIL. The
+# return values of the C functions follow the Sundials convention: 0 on
+# success, a positive value for a recoverable and a negative value for an
+# unrecoverable error.
+
+ctypedef int (*native_rhs_fn)(realtype t, realtype *y, realtype *ydot, void *user_data) nogil
+ctypedef int (*native_res_fn)(realtype t, realtype *y, realtype *yd, realtype *res, void *user_data) nogil
+ctypedef int (*native_cv_jac_fn)(realtype t, realtype *y, realtype *jac, void *user_data) nogil
+ctypedef int (*native_ida_jac_fn)(realtype t, realtype c, realtype *y, realtype *yd, realtype *jac, void *user_data) nogil
+ctypedef int (*native_cv_root_fn)(realtype t, realtype *y, realtype *g, void *user_data) nogil
+ctypedef int (*native_ida_root_fn)(realtype t, realtype *y, realtype *yd, realtype *g, void *user_data) nogil
+
+ctypedef struct NativeProblemData:
+    void *RHS          #The compiled residual or right-hand-side
+    void *JAC          #The compiled jacobian (column major)
+    void *ROOT         #The compiled root function
+    void *user_data    #Passed as the last argument to the functions above
+
+cdef int cv_rhs_native(realtype t, N_Vector yv, N_Vector yvdot, void* problem_data) nogil:
+    """
+    Calls the compiled right-hand-side of the problem.
+    """
+    cdef NativeProblemData *nData = <NativeProblemData*>problem_data
+    
+    return (<native_rhs_fn>nData.RHS)(t, (<N_VectorContent_Serial>yv.content).data, 
+                                      (<N_VectorContent_Serial>yvdot.content).data, nData.user_data)
+
+cdef int cv_root_native(realtype t, N_Vector yv, realtype *gout, void* problem_data) nogil:
+    """
+    Calls the compiled root function of the problem.
+    """
+    cdef NativeProblemData *nData = <NativeProblemData*>problem_data
+    
+    return (<native_cv_root_fn>nData.ROOT)(t, (<N_VectorContent_Serial>yv.content).data, gout, nData.user_data)
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef int cv_jac_native(realtype t, N_Vector yv, N_Vector fy, SUNMatrix Jac, 
+                void *problem_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3) nogil:
+        """
+        Calls the compiled jacobian of the problem.
+        """
+        cdef NativeProblemData *nData = <NativeProblemData*>problem_data
+        
+        return (<native_cv_jac_fn>nData.JAC)(t, (<N_VectorContent_Serial>yv.content).data, 
+                                             (<SUNMatrixContent_Dense>Jac.content).data, nData.user_data)
+ELSE:
+    cdef int cv_jac_native(long int Neq, realtype t, N_Vector yv, N_Vector fy, DlsMat Jacobian, 
+                void *problem_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3) nogil:
+        """
+        Calls the compiled jacobian of the problem.
+        """
+        cdef NativeProblemData *nData = <NativeProblemData*>problem_data
+        
+        return (<native_cv_jac_fn>nData.JAC)(t, (<N_VectorContent_Serial>yv.content).data, 
+                                             Jacobian.data, nData.user_data)
+
+cdef int ida_res_native(realtype t, N_Vector yv, N_Vector yvdot, N_Vector residual, void* problem_data) nogil:
+    """
+    Calls the compiled residual of the problem.
+    """
+    cdef NativeProblemData *nData = <NativeProblemData*>problem_data
+    
+    return (<native_res_fn>nData.RHS)(t, (<N_VectorContent_Serial>yv.content).data, 
+                                      (<N_VectorContent_Serial>yvdot.content).data,
+                                      (<N_VectorContent_Serial>residual.content).data, nData.user_data)
+
+cdef int ida_root_native(realtype t, N_Vector yv, N_Vector yvdot, realtype *gout, void* problem_data) nogil:
+    """
+    Calls the compiled root function of the problem.
+    """
+    cdef NativeProblemData *nData = <NativeProblemData*>problem_data
+    
+    return (<native_ida_root_fn>nData.ROOT)(t, (<N_VectorContent_Serial>yv.content).data, 
+                                            (<N_VectorContent_Serial>yvdot.content).data, gout, nData.user_data)
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef int ida_jac_native(realtype t, realtype c, N_Vector yv, N_Vector yvdot, N_Vector residual, SUNMatrix Jac,
+                 void *problem_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3) nogil:
+        """
+        Calls the compiled jacobian of the problem.
+        """
+        cdef NativeProblemData *nData = <NativeProblemData*>problem_data
+        
+        return (<native_ida_jac_fn>nData.JAC)(t, c, (<N_VectorContent_Serial>yv.content).data, 
+                                              (<N_VectorContent_Serial>yvdot.content).data,
+                                              (<SUNMatrixContent_Dense>Jac.content).data, nData.user_data)
+ELSE:
+    cdef int ida_jac_native(long int Neq, realtype t, realtype c, N_Vector yv, N_Vector yvdot, N_Vector residual, DlsMat Jacobian,
+                 void* problem_data, N_Vector tmp1, N_Vector tmp2, N_Vector tmp3) nogil:
+        """
+        Calls the compiled jacobian of the problem.
+        """
+        cdef NativeProblemData *nData = <NativeProblemData*>problem_data
+        
+        return (<native_ida_jac_fn>nData.JAC)(t, c, (<N_VectorContent_Serial>yv.content).data, 
+                                              (<N_VectorContent_Serial>yvdot.content).data,
+                                              Jacobian.data, nData.user_data)
+
 # Error handling callback functions
 # =================================
 
-cdef void cv_err(int error_code, const char *module, const char *function, char *msg, void *problem_data):
+cdef void cv_err(int error_code, const char *module, const char *function, char *msg, void *problem_data) with gil:
     """
     This method overrides the default handling of error messages.
     """
@@ -751,7 +1054,7 @@ cdef void cv_err(int error_code, const char *module, const char *function, char
         if error_code < 0: #Error
             print '[CVode Error]', msg
             
-cdef void ida_err(int error_code, const char *module, const char *function, char *msg, void *problem_data):
+cdef void ida_err(int error_code, const char *module, const char *function, char *msg, void *problem_data) with gil:
     """
     This method overrides the default handling of error messages.
     """
@@ -788,6 +1091,7 @@ cdef class ProblemData:
         int memSizeJac     #dim*dim*sizeof(realtype) used when copying memory
         int verbose        #Defines the verbosity
         object PREC_DATA   #Arbitrary data from the preconditioner
+        BlockJacobiPreconditioner BJ #Built-in block-Jacobi preconditioner
         N.ndarray work_y
         N.ndarray work_yd
         N.ndarray work_ys
@@ -17,6 +17,28 @@
 
 import cython
 
+cdef int kin_jac_dense_copy(object jac, realtype* data, int Neq) except -1:
+    """
+    Copies the Jacobian provided by the problem into the column major 
+    storage of a dense Sundials matrix.
+    """
+    cdef N.ndarray jac_arr
+    cdef int i, j
+    
+    if is_csc_matrix(jac):
+        for j in range(Neq):
+            for i in range(jac.indptr[j], jac.indptr[j+1]):
+                data[j*Neq + jac.indices[i]] = jac.data[i]
+    else:
+        #A Fortran ordered array has the same layout as the Sundials 
+        #matrix and is copied as is, other arrays are converted once
+        jac_arr = N.asfortranarray(jac, dtype=N.double)
+        if jac_arr.ndim != 2 or jac_arr.shape[0] != Neq or jac_arr.shape[1] != Neq:
+            raise AssimuloException("The Jacobian must be of shape (%d, %d)."%(Neq, Neq))
+        memcpy(data, PyArray_DATA(jac_arr), Neq*Neq*sizeof(realtype))
+    
+    return 0
+
 IF SUNDIALS_VERSION >= (3,0,0):
     cdef int kin_jac(N_Vector xv, N_Vector fval, SUNMatrix Jac, 
                     void *problem_data, N_Vector tmp1, N_Vector tmp2):
@@ -26,21 +48,59 @@ IF SUNDIALS_VERSION >= (3,0,0):
         """
         cdef SUNMatrixContent_Dense Jacobian = <SUNMatrixContent_Dense>Jac.content
         cdef ProblemDataEquationSolver pData = <ProblemDataEquationSolver>problem_data
-        cdef realtype* col_i=Jacobian.cols[0]
         cdef N.ndarray x = nv2arr(xv)
-        cdef int i,j, Neq = pData.dim
         
         try:
             jac=(<object>pData.JAC)(x)
-
-            for i in range(Neq):
-                col_i = Jacobian.cols[i]
-                for j in range(Neq):
-                    col_i[j] = jac[j,i]
+            
+            kin_jac_dense_copy(jac, Jacobian.data, pData.dim)
 
             return KINDLS_SUCCESS
-        except:
+        except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
             return KINDLS_JACFUNC_RECVR #Recoverable Error (See Sundials description)
+        except Exception as e:
+            pData.exception = e #Raised again after KINSol has returned
+            return KINDLS_JACFUNC_UNRECVR
+    
+    cdef int kin_jac_sparse(N_Vector xv, N_Vector fval, SUNMatrix Jac,
+                    void *problem_data, N_Vector tmp1, N_Vector tmp2):
+        """
+        This method is used to connect the assimulo.Problem.jac to the Sundials
+        Sparse Jacobian function.
+        """
+        cdef SUNMatrixContent_Sparse Jacobian = <SUNMatrixContent_Sparse>Jac.content
+        cdef ProblemDataEquationSolver pData = <ProblemDataEquationSolver>problem_data
+        cdef N.ndarray x = nv2arr(xv)
+        cdef N.ndarray jac_data
+        cdef int i
+        cdef sunindextype nnz = Jacobian.NNZ
+        cdef int ret_nnz
+        cdef sunindextype dim = Jacobian.N
+        cdef sunindextype* rowvals = Jacobian.rowvals[0]
+        cdef sunindextype* colptrs = Jacobian.colptrs[0]
+        
+        try:
+            jac=(<object>pData.JAC)(x)
+            
+            if not is_csc_matrix(jac):
+                raise AssimuloException("The Jacobian must be stored on Scipy's CSC format.")
+            ret_nnz = jac.nnz
+            if ret_nnz > nnz:
+                raise AssimuloException("The Jacobian has more entries than supplied to the problem class via 'jac_nnz'")
+            
+            jac_data = N.ascontiguousarray(jac.data, dtype=N.double)
+            memcpy(Jacobian.data, PyArray_DATA(jac_data), ret_nnz*sizeof(realtype))
+            for i in range(ret_nnz):
+                rowvals[i] = jac.indices[i]
+            for i in range(dim+1):
+                colptrs[i] = jac.indptr[i]
+            
+            return KINDLS_SUCCESS
+        except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+            return KINDLS_JACFUNC_RECVR #Recoverable Error (See Sundials description)
+        except Exception as e:
+            pData.exception = e #Raised again after KINSol has returned
+            return KINDLS_JACFUNC_UNRECVR
 ELSE:
     cdef int kin_jac(long int Neq, N_Vector xv, N_Vector fval, DlsMat Jacobian, 
                     void *problem_data, N_Vector tmp1, N_Vector tmp2):
@@ -49,21 +109,63 @@ ELSE:
         Jacobian function.
         """
         cdef ProblemDataEquationSolver pData = <ProblemDataEquationSolver>problem_data
-        cdef realtype* col_i=DENSE_COL(Jacobian,0)
         cdef N.ndarray x = nv2arr(xv)
-        cdef int i,j
         
         try:
             jac=(<object>pData.JAC)(x)
-
-            for i in range(Neq):
-                col_i = DENSE_COL(Jacobian, i)
-                for j in range(Neq):
-                    col_i[j] = jac[j,i]
+            
+            kin_jac_dense_copy(jac, Jacobian.data, Neq)
 
             return KINDLS_SUCCESS
-        except:
+        except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+            return KINDLS_JACFUNC_RECVR #Recoverable Error (See Sundials description)
+        except Exception as e:
+            pData.exception = e #Raised again after KINSol has returned
+            return KINDLS_JACFUNC_UNRECVR
+    
+    cdef int kin_jac_sparse(N_Vector xv, N_Vector fval, SlsMat Jacobian,
+                    void *problem_data, N_Vector tmp1, N_Vector tmp2):
+        """
+        This method is used to connect the assimulo.Problem.jac to the Sundials
+        Sparse Jacobian function.
+        """
+        cdef ProblemDataEquationSolver pData = <ProblemDataEquationSolver>problem_data
+        cdef N.ndarray x = nv2arr(xv)
+        cdef N.ndarray jac_data
+        cdef int i
+        cdef int nnz = Jacobian.NNZ
+        cdef int ret_nnz
+        cdef int dim = Jacobian.N
+        
+        IF SUNDIALS_VERSION >= (2,6,3):
+            cdef int* rowvals = Jacobian.rowvals[0]
+            cdef int* colptrs = Jacobian.colptrs[0]
+        ELSE:
+            cdef int* rowvals = Jacobian.rowvals
+            cdef int* colptrs = Jacobian.colptrs
+        
+        try:
+            jac=(<object>pData.JAC)(x)
+            
+            if not is_csc_matrix(jac):
+                raise AssimuloException("The Jacobian must be stored on Scipy's CSC format.")
+            ret_nnz = jac.nnz
+            if ret_nnz > nnz:
+                raise AssimuloException("The Jacobian has more entries than supplied to the problem class via 'jac_nnz'")
+            
+            jac_data = N.ascontiguousarray(jac.data, dtype=N.double)
+            memcpy(Jacobian.data, PyArray_DATA(jac_data), ret_nnz*sizeof(realtype))
+            for i in range(ret_nnz):
+                rowvals[i] = jac.indices[i]
+            for i in range(dim+1):
+                colptrs[i] = jac.indptr[i]
+            
+            return KINDLS_SUCCESS
+        except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
             return KINDLS_JACFUNC_RECVR #Recoverable Error (See Sundials description)
+        except Exception as e:
+            pData.exception = e #Raised again after KINSol has returned
+            return KINDLS_JACFUNC_UNRECVR
             
 cdef int kin_jacv(N_Vector vv, N_Vector Jv, N_Vector vx, int* new_u,
             void *problem_data):
@@ -109,6 +211,30 @@ cdef int kin_res(N_Vector xv, N_Vector fval, void *problem_data):
         traceback.print_exc()
         return KIN_SYSFUNC_FAIL
 
+cdef int kin_res_fp(N_Vector xv, N_Vector fval, void *problem_data):
+    """
+    Fixed point fct, G(x) = x - F(x), called by KINSOL for the strategy
+    KIN_FP
+    """
+    cdef ProblemDataEquationSolver pData = <ProblemDataEquationSolver>problem_data
+    cdef N.ndarray x = nv2arr(xv)
+    cdef realtype* xptr = (<N_VectorContent_Serial>xv.content).data
+    cdef realtype* resptr = (<N_VectorContent_Serial>fval.content).data
+    cdef int i
+
+    try:
+        res = (<object>pData.RES)(x)
+
+        for i in range(pData.dim):
+            resptr[i] = xptr[i] - res[i]
+
+        return KIN_SUCCESS
+    except(N.linalg.LinAlgError,ZeroDivisionError,AssimuloRecoverableError):
+        return KIN_REC_ERR
+    except:
+        traceback.print_exc()
+        return KIN_SYSFUNC_FAIL
+
 
 IF SUNDIALS_VERSION >= (3,0,0):
     cdef int kin_prec_solve(N_Vector u, N_Vector uscaleN, N_Vector fval, 
@@ -217,6 +343,69 @@ ELSE:
         
         return KIN_SUCCESS
         
+# Built-in preconditioners
+# ========================
+
+cdef int block_jacobi_kin_setup(N_Vector uN, N_Vector fvalN, void *problem_data):
+    """
+    Sets up the built-in block-Jacobi preconditioner P = dF/du, where the
+    diagonal blocks are approximated by difference quotients.
+    """
+    cdef ProblemDataEquationSolver pData = <ProblemDataEquationSolver>problem_data
+    cdef BlockJacobiPreconditioner bj = pData.BJ
+    cdef int k, flag
+    
+    for k in range(bj.dim):
+        bj.perturb(k, uN, bj.ytemp)
+        flag = kin_res(bj.ytemp, bj.ftemp, problem_data)
+        if flag != KIN_SUCCESS:
+            return flag
+        bj.store_column(k, fvalN, bj.ftemp)
+    
+    if bj.factorize(0.0, 1.0) != 0:
+        return KIN_REC_ERR #Singular block
+    
+    return KIN_SUCCESS
+
+cdef inline int block_jacobi_kin_solve(N_Vector v, void *problem_data):
+    """
+    Solves P*z = r with the built-in block-Jacobi preconditioner, where
+    v contains r on input and z on output.
+    """
+    cdef ProblemDataEquationSolver pData = <ProblemDataEquationSolver>problem_data
+    
+    pData.BJ.solve((<N_VectorContent_Serial>v.content).data)
+    
+    return KIN_SUCCESS
+
+IF SUNDIALS_VERSION >= (3,0,0):
+    cdef int kin_bj_prec_setup(N_Vector uN, N_Vector uscaleN, N_Vector fvalN, 
+             N_Vector fscaleN, void *problem_data):
+        return block_jacobi_kin_setup(uN, fvalN, problem_data)
+    
+    cdef int kin_bj_prec_solve(N_Vector u, N_Vector uscaleN, N_Vector fval, 
+             N_Vector fscaleN, N_Vector v, void *problem_data):
+        return block_jacobi_kin_solve(v, problem_data)
+    
+    cdef int kin_bbd_local(sunindextype Nlocal, N_Vector uu, N_Vector gval, void *problem_data):
+        """
+        Local residual function used by the band-block preconditioner.
+        """
+        return kin_res(uu, gval, problem_data)
+ELSE:
+    cdef int kin_bj_prec_setup(N_Vector uN, N_Vector uscaleN, N_Vector fvalN, 
+             N_Vector fscaleN, void *problem_data, N_Vector tmp1, N_Vector tmp2):
+        return block_jacobi_kin_setup(uN, fvalN, problem_data)
+    
+    cdef int kin_bj_prec_solve(N_Vector u, N_Vector uscaleN, N_Vector fval, 
+             N_Vector fscaleN, N_Vector v, void *problem_data, N_Vector tmp):
+        return block_jacobi_kin_solve(v, problem_data)
+    
+    cdef int kin_bbd_local(long int Nlocal, N_Vector uu, N_Vector gval, void *problem_data):
+        """
+        Local residual function used by the band-block preconditioner.
+        """
+        return kin_res(uu, gval, problem_data)
 
 cdef void kin_err(int err_code, const char *module, const char *function, char *msg, void *eh_data):
     cdef ProblemDataEquationSolver pData = <ProblemDataEquationSolver>eh_data
@@ -283,3 +472,5 @@ cdef class ProblemDataEquationSolver:
         list nl_fnorm      # The norm of the residual at each nonlinear iteration (if the verbosity is set high enough)
         list l_fnorm
         list log
+        BlockJacobiPreconditioner BJ #Built-in block-Jacobi preconditioner
+        object exception   # Exception raised in a Jacobian callback, raised again after KINSol
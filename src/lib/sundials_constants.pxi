@@ -206,6 +206,8 @@ DEF KIN_REPTD_SYSFUNC_ERR   =-15
 
 DEF KIN_NONE       =0
 DEF KIN_LINESEARCH =1
+DEF KIN_PICARD     =2
+DEF KIN_FP         =3
 
 # -----------------------------------------------------------------
 # KINDirect constants
@@ -238,3 +240,5 @@ DEF IDA_ROOT_IND       = 1   # Index to user data root handling
 DEF IDA_ROOTF_IND      = 0   # Index to user data root function
 DEF IDA_SW_IND         = 1   # Index to user data root switches
 
+#Iterative (Krylov) linear solvers available through the SPILS interface
+KRYLOV_SOLVERS = ["SPGMR", "SPBCGS", "SPTFQMR", "SPFGMR"]
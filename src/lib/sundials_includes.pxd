@@ -58,6 +58,7 @@ cdef extern from "nvector/nvector_serial.h":
     cdef N_Vector N_VMake_Serial(long int vec_length, realtype *v_data)
     N_Vector *N_VCloneVectorArray_Serial(int count, N_Vector w)
     N_Vector *N_VCloneVectorArrayEmpty_Serial(int count, N_Vector w)
+    void N_VDestroyVectorArray_Serial(N_Vector *vs, int count)
     void N_VSetArrayPointer_Serial(realtype *v_data, N_Vector v)
     void N_VConst_Serial(realtype c, N_Vector z)
     N_Vector N_VNew_Serial(long int vec_length)
@@ -155,6 +156,14 @@ IF SUNDIALS_VERSION >= (3,0,0):
         SUNLinearSolver SUNDenseLinearSolver(N_Vector y, SUNMatrix A)
     cdef extern from "sunlinsol/sunlinsol_spgmr.h":
         SUNLinearSolver SUNSPGMR(N_Vector y, int pretype, int maxl)
+        int SUNSPGMRSetMaxRestarts(SUNLinearSolver S, int maxrs)
+    cdef extern from "sunlinsol/sunlinsol_spfgmr.h":
+        SUNLinearSolver SUNSPFGMR(N_Vector y, int pretype, int maxl)
+        int SUNSPFGMRSetMaxRestarts(SUNLinearSolver S, int maxrs)
+    cdef extern from "sunlinsol/sunlinsol_spbcgs.h":
+        SUNLinearSolver SUNSPBCGS(N_Vector y, int pretype, int maxl)
+    cdef extern from "sunlinsol/sunlinsol_sptfqmr.h":
+        SUNLinearSolver SUNSPTFQMR(N_Vector y, int pretype, int maxl)
         
 ELSE: 
     #Dummy defines
@@ -242,7 +251,7 @@ cdef extern from "cvodes/cvodes.h":
     int CVodeInit(void *cvode_mem, CVRhsFn f, realtype t0, N_Vector y0)
     int CVodeReInit(void *cvode_mem, realtype t0, N_Vector y0)
     void CVodeFree(void **cvode_mem)
-    int CVode(void *cvode_mem, realtype tout, N_Vector yout, realtype *tret, int itask)
+    int CVode(void *cvode_mem, realtype tout, N_Vector yout, realtype *tret, int itask) nogil
     
     #Functions for settings options
     int CVodeSetMaxOrd(void *cvode_mem, int maxord)
@@ -361,6 +370,9 @@ IF SUNDIALS_VERSION >= (3,0,0):
     ELSE:
         cdef inline SUNLinearSolver SUNSuperLUMT(N_Vector y, SUNMatrix A, int num_threads): return NULL
     
+    cdef extern from "cvodes/cvodes_bandpre.h":
+        int CVBandPrecInit(void *cvode_mem, sunindextype N, sunindextype mu, sunindextype ml)
+    
     cdef inline int cv_spils_jtsetup_dummy(realtype t, N_Vector y, N_Vector fy, void *user_data): return 0    
     cdef inline tuple version(): return (3,0,0)
 ELSE:
@@ -372,6 +384,13 @@ ELSE:
 
     cdef extern from "cvodes/cvodes_spgmr.h":
         int CVSpgmr(void *cvode_mem, int pretype, int max1)
+    cdef extern from "cvodes/cvodes_spbcgs.h":
+        int CVSpbcg(void *cvode_mem, int pretype, int max1)
+    cdef extern from "cvodes/cvodes_sptfqmr.h":
+        int CVSptfqmr(void *cvode_mem, int pretype, int max1)
+    
+    cdef extern from "cvodes/cvodes_bandpre.h":
+        int CVBandPrecInit(void *cvode_mem, long int N, long int mu, long int ml)
     
     cdef extern from "cvodes/cvodes_spils.h":
         int CVSpilsSetJacTimesVecFn(void *cvode_mem,  CVSpilsJacTimesVecFn jtv)
@@ -413,6 +432,10 @@ cdef extern from "cvodes/cvodes_spils.h":
     int CVSpilsGetNumRhsEvals(void *cvode_mem, long int *nfevalsLS) #Number of res evals due to jacÄvector evals
     int CVSpilsGetNumPrecEvals(void *cvode_mem, long int *npevals)
     int CVSpilsGetNumPrecSolves(void *cvode_mem, long int *npsolves)
+    int CVSpilsSetEpsLin(void *cvode_mem, realtype eplifac)
+
+cdef extern from "cvodes/cvodes_bandpre.h":
+    int CVBandPrecGetNumRhsEvals(void *cvode_mem, long int *nfevalsBP)
 
 cdef extern from "idas/idas.h":
     ctypedef int (*IDAResFn)(realtype tt, N_Vector yy, N_Vector yp, N_Vector rr, void *user_data)
@@ -421,7 +444,7 @@ cdef extern from "idas/idas.h":
     int IDAReInit(void* ida_mem, realtype t0, N_Vector y0, N_Vector yp0)
     void IDAFree(void **ida_mem)
     int IDASolve(void* ida_mem, realtype tout,realtype  *tret, N_Vector yret, 
-                            N_Vector ypret, int itask)
+                            N_Vector ypret, int itask) nogil
     
     #Functions for settings options
     int IDASStolerances(void *ida_mem, realtype reltol, realtype abstol)
@@ -532,7 +555,22 @@ IF SUNDIALS_VERSION >= (3,0,0):
                     N_Vector yp, N_Vector rr, realtype c_j, void *user_data)
         int IDASpilsSetJacTimes(void *ida_mem,
                 IDASpilsJacTimesSetupFn jtsetup, IDASpilsJacTimesVecFn jtimes)
+        
+        ctypedef int (*IDASpilsPrecSetupFn)(realtype tt, N_Vector yy, N_Vector yp,
+                    N_Vector rr, realtype c_j, void *user_data)
+        ctypedef int (*IDASpilsPrecSolveFn)(realtype tt, N_Vector yy, N_Vector yp,
+                    N_Vector rr, N_Vector rvec, N_Vector zvec, realtype c_j,
+                    realtype delta, void *user_data)
                 
+    cdef extern from "idas/idas_bbdpre.h":
+        ctypedef int (*IDABBDLocalFn)(sunindextype Nlocal, realtype tt, N_Vector yy, 
+                    N_Vector yp, N_Vector gval, void *user_data)
+        ctypedef int (*IDABBDCommFn)(sunindextype Nlocal, realtype tt, N_Vector yy, 
+                    N_Vector yp, void *user_data)
+        int IDABBDPrecInit(void *ida_mem, sunindextype Nlocal, sunindextype mudq, 
+                    sunindextype mldq, sunindextype mukeep, sunindextype mlkeep, 
+                    realtype dq_rel_yy, IDABBDLocalFn Gres, IDABBDCommFn Gcomm)
+    
     cdef inline int ida_spils_jtsetup_dummy(realtype tt, N_Vector yy, N_Vector yp, N_Vector rr, realtype c_j, void *user_data): return 0
 ELSE:
     cdef extern from "idas/idas_dense.h":
@@ -544,13 +582,40 @@ ELSE:
     
     cdef extern from "idas/idas_spgmr.h":
         int IDASpgmr(void *ida_mem, int max1)
+    cdef extern from "idas/idas_spbcgs.h":
+        int IDASpbcg(void *ida_mem, int max1)
+    cdef extern from "idas/idas_sptfqmr.h":
+        int IDASptfqmr(void *ida_mem, int max1)
         
     cdef extern from "idas/idas_spils.h":
         int IDASpilsSetJacTimesVecFn(void *ida_mem, IDASpilsJacTimesVecFn ida_jacv)
+        int IDASpilsSetMaxRestarts(void *ida_mem, int maxrs)
+    
+    cdef extern from "idas/idas_bbdpre.h":
+        ctypedef int (*IDABBDLocalFn)(long int Nlocal, realtype tt, N_Vector yy, 
+                    N_Vector yp, N_Vector gval, void *user_data)
+        ctypedef int (*IDABBDCommFn)(long int Nlocal, realtype tt, N_Vector yy, 
+                    N_Vector yp, void *user_data)
+        int IDABBDPrecInit(void *ida_mem, long int Nlocal, long int mudq, 
+                    long int mldq, long int mukeep, long int mlkeep, 
+                    realtype dq_rel_yy, IDABBDLocalFn Gres, IDABBDCommFn Gcomm)
+        ctypedef int (*IDASpilsPrecSetupFn)(realtype tt, N_Vector yy, N_Vector yp,
+                    N_Vector rr, realtype c_j, void *user_data,
+                    N_Vector tmp1, N_Vector tmp2, N_Vector tmp3)
+        ctypedef int (*IDASpilsPrecSolveFn)(realtype tt, N_Vector yy, N_Vector yp,
+                    N_Vector rr, N_Vector rvec, N_Vector zvec, realtype c_j,
+                    realtype delta, void *user_data, N_Vector tmp)
 
 cdef extern from "idas/idas_spils.h":
     int IDASpilsGetNumJtimesEvals(void *ida_mem, long int *njvevals) #Number of jac*vector
     int IDASpilsGetNumResEvals(void *ida_mem, long int *nfevalsLS) #Number of rhs due to jac*vector
+    int IDASpilsGetNumPrecEvals(void *ida_mem, long int *npevals)
+    int IDASpilsGetNumPrecSolves(void *ida_mem, long int *npsolves)
+    int IDASpilsSetPreconditioner(void *ida_mem, IDASpilsPrecSetupFn psetup, IDASpilsPrecSolveFn psolve)
+    int IDASpilsSetEpsLin(void *ida_mem, realtype eplifac)
+
+cdef extern from "idas/idas_bbdpre.h":
+    int IDABBDPrecGetNumGfnEvals(void *ida_mem, long int *ngevalsBBDP)
 
 
 ####################
@@ -575,6 +640,7 @@ cdef extern from "kinsol/kinsol.h":
     int KINSetUserData(void *kinmem, void *user_data)
     int KINSetPrintLevel(void *kinmemm, int printfl)
     int KINSetNumMaxIters(void *kinmem, long int mxiter)
+    int KINSetMAA(void *kinmem, long int maa)
     int KINSetNoInitSetup(void *kinmem, booleantype noInitSetup)
     int KINSetNoResMon(void *kinmem, booleantype noNNIResMon)
     int KINSetMaxSetupCalls(void *kinmem, long int msbset)
@@ -624,6 +690,14 @@ IF SUNDIALS_VERSION >= (3,0,0):
                     N_Vector fval, N_Vector fscale, N_Vector v, void *problem_data)
         ctypedef int (*KINSpilsPrecSetupFn)(N_Vector u, N_Vector uscale,
                     N_Vector fval, N_Vector fscale, void *problem_data)
+    
+    cdef extern from "kinsol/kinsol_bbdpre.h":
+        ctypedef int (*KINBBDLocalFn)(sunindextype Nlocal, N_Vector uu, 
+                    N_Vector gval, void *user_data)
+        ctypedef int (*KINBBDCommFn)(sunindextype Nlocal, N_Vector uu, void *user_data)
+        int KINBBDPrecInit(void *kinmem, sunindextype Nlocal, sunindextype mudq, 
+                    sunindextype mldq, sunindextype mukeep, sunindextype mlkeep, 
+                    realtype dq_rel_uu, KINBBDLocalFn gloc, KINBBDCommFn gcomm)
 ELSE:
     # functions used for supplying jacobian, and receiving info from linear solver
     cdef extern from "kinsol/kinsol_direct.h":
@@ -638,12 +712,43 @@ ELSE:
     
     cdef extern from "kinsol/kinsol_spgmr.h":
         int KINSpgmr(void *kinmem, int maxl)
+    cdef extern from "kinsol/kinsol_spbcgs.h":
+        int KINSpbcg(void *kinmem, int maxl)
+    cdef extern from "kinsol/kinsol_sptfqmr.h":
+        int KINSptfqmr(void *kinmem, int maxl)
         
     cdef extern from "kinsol/kinsol_spils.h":
         ctypedef int (*KINSpilsPrecSolveFn)(N_Vector u, N_Vector uscale,
                     N_Vector fval, N_Vector fscale, N_Vector v, void *problem_data, N_Vector tmp)
         ctypedef int (*KINSpilsPrecSetupFn)(N_Vector u, N_Vector uscale,
                     N_Vector fval, N_Vector fscale, void *problem_data, N_Vector tmp1, N_Vector tmp2)
+        int KINSpilsSetMaxRestarts(void *kinmem, int maxrs)
+    
+    cdef extern from "kinsol/kinsol_bbdpre.h":
+        ctypedef int (*KINBBDLocalFn)(long int Nlocal, N_Vector uu, 
+                    N_Vector gval, void *user_data)
+        ctypedef int (*KINBBDCommFn)(long int Nlocal, N_Vector uu, void *user_data)
+        int KINBBDPrecInit(void *kinmem, long int Nlocal, long int mudq, 
+                    long int mldq, long int mukeep, long int mlkeep, 
+                    realtype dq_rel_uu, KINBBDLocalFn gloc, KINBBDCommFn gcomm)
+    
+    IF SUNDIALS_VERSION >= (2,6,0):
+        cdef extern from "kinsol/kinsol_sparse.h":
+            ctypedef int (*KINSlsSparseJacFn)(N_Vector u, N_Vector fval, SlsMat J, 
+                    void *user_data, N_Vector tmp1, N_Vector tmp2)
+            int KINSlsSetSparseJacFn(void *kinmem, KINSlsSparseJacFn jac)
+            int KINSlsGetNumJacEvals(void *kinmem, long int *njevals)
+        IF SUNDIALS_WITH_SUPERLU:
+            cdef extern from "kinsol/kinsol_superlumt.h":
+                int KINSuperLUMT(void *kinmem, int numthreads, int n, int nnz)
+        ELSE:
+            cdef inline int KINSuperLUMT(void *kinmem, int numthreads, int n, int nnz): return -1
+    ELSE:
+        cdef inline int KINSuperLUMT(void *kinmem, int numthreads, int n, int nnz): return -1
+        ctypedef int (*KINSlsSparseJacFn)(N_Vector u, N_Vector fval, SlsMat J, 
+                    void *user_data, N_Vector tmp1, N_Vector tmp2)
+        cdef inline int KINSlsSetSparseJacFn(void *kinmem, KINSlsSparseJacFn jac): return -1
+        cdef inline int KINSlsGetNumJacEvals(void *kinmem, long int *njevals): return -1
 
 cdef extern from "kinsol/kinsol_direct.h":
     # optional output fcts for linear direct solver
@@ -666,6 +771,9 @@ cdef extern from "kinsol/kinsol_spils.h":
     int KINSpilsGetNumFuncEvals(void *kinmem, long int *nfevalsLS)
     int KINSpilsSetPreconditioner(void *kinmem, KINSpilsPrecSetupFn psetup, KINSpilsPrecSolveFn psolve)
 
+cdef extern from "kinsol/kinsol_bbdpre.h":
+    int KINBBDPrecGetNumGfnEvals(void *kinmem, long int *ngevalsBBDP)
+
 #=========================
 # END SUNDIALS DEFINITIONS
 #=========================
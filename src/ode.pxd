@@ -40,7 +40,13 @@ cdef class ODE:
     cdef public object _event_info
     
     #cdef public list t,y,yd,p,sw_cur
-    cdef public list t_sol, y_sol, yd_sol, p_sol, sw
+    cdef public list t_sol, y_sol, yd_sol, sw
+    cdef N.ndarray _p_sol_buffer
+    cdef int _p_sol_count
+    cdef object _dense_solution
+    cdef int _cache_hits, _cache_misses
+    cdef object _handle_result
+    cdef public object _step_trace
         
     cpdef log_message(self, message, int level)
     cpdef log_event(self, double time, object event_info, int level)
@@ -54,5 +60,7 @@ cdef class ODE:
     cpdef finalize(self)
     cpdef initialize(self)
     cdef _reset_solution_variables(self)
+    cdef _reserve_sensitivity_result(self, int npoints)
+    cpdef _store_sensitivity_result(self, N.ndarray sens)
     cpdef get_elapsed_step_time(self)
     cpdef _chattering_check(self, object event_info)
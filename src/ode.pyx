@@ -24,7 +24,7 @@ import multiprocessing
 
 from exception import *
 from problem import Explicit_Problem, Delay_Explicit_Problem, Implicit_Problem, SingPerturbed_Problem
-from support import Statistics
+from support import Statistics, DenseSolution, StepTrace, SimulationCache, TimedCallback
 
 include "constants.pxi" #Includes the constants (textual include)
 
@@ -41,6 +41,8 @@ cdef class ODE:
         problem.
         """
         self.statistics = Statistics() #Initialize the statistics dictionary
+        self.statistics.add_key("ncachehits", "Number of simulation cache hits")
+        self.statistics.add_key("ncachemisses", "Number of simulation cache misses")
         self.options = {"report_continuously":False,
                         "display_progress":True,
                         "verbosity":NORMAL,
@@ -48,9 +50,14 @@ cdef class ODE:
                         "store_event_points":True, 
                         "time_limit":0, 
                         "clock_step":False, 
+                        "dense_output":False,
+                        "trace_steps":False,
+                        "cache_dir":None,
+                        "cache_size":1024**3,
+                        "profile":False,
                         "num_threads":1} #multiprocessing.cpu_count()
         #self.internal_flags = {"state_events":False,"step_events":False,"time_events":False} #Flags for checking the problem (Does the problem have state events?)
-        self.supports = {"state_events":False,"interpolated_output":False,"report_continuously":False,"sensitivity_calculations":False,"interpolated_sensitivity_output":False} #Flags for determining what the solver supports
+        self.supports = {"state_events":False,"interpolated_output":False,"report_continuously":False,"sensitivity_calculations":False,"interpolated_sensitivity_output":False,"step_trace":False} #Flags for determining what the solver supports
         self.problem_info = {"dim":0,"dimRoot":0,"dimSens":0,"state_events":False,"step_events":False,"time_events":False
                              ,"jac_fcn":False, "sens_fcn":False, "jacv_fcn":False,"switches":False,"type":0,"jaclag_fcn":False,'prec_solve':False,'prec_setup':False
                              ,"jac_fcn_nnz": -1}
@@ -137,6 +144,7 @@ cdef class ODE:
         self.statistics.add_key("nfcnjacs", "Number of function eval. due to Jacobian eval.")
         self.statistics.add_key("nerrfails", "Number of error test failures")
         self.statistics.add_key("nlus", "Number of LU decompositions")
+        self.statistics.add_key("nlureuses", "Number of reused LU decompositions")
         self.statistics.add_key("nniters", "Number of nonlinear iterations")
         self.statistics.add_key("nnfails", "Number of nonlinear convergence failures")
         self.statistics.add_key("nstatefcns", "Number of state function evaluations")
@@ -162,7 +170,44 @@ cdef class ODE:
         self.t_sol = []
         self.y_sol = []
         self.yd_sol = []
-        self.p_sol = [[] for i in range(self.problem_info["dimSens"])]
+        self._p_sol_count = 0
+        self._p_sol_buffer = N.empty((self.problem_info["dimSens"], 0, self.problem_info["dim"]))
+    
+    cdef _reserve_sensitivity_result(self, int npoints):
+        """
+        Makes sure that the sensitivity result buffer can hold at least
+        npoints additional result points.
+        """
+        cdef int capacity = self._p_sol_buffer.shape[1]
+        cdef N.ndarray buffer
+        
+        if self._p_sol_count + npoints <= capacity:
+            return
+        
+        capacity = max(self._p_sol_count + npoints, 2*capacity)
+        buffer = N.empty((self._p_sol_buffer.shape[0], capacity, self._p_sol_buffer.shape[2]))
+        buffer[:, :self._p_sol_count, :] = self._p_sol_buffer[:, :self._p_sol_count, :]
+        self._p_sol_buffer = buffer
+    
+    cpdef _store_sensitivity_result(self, N.ndarray sens):
+        """
+        Appends the sensitivities (a dimSens x dim matrix) at a result
+        point to p_sol.
+        """
+        if self._p_sol_count == self._p_sol_buffer.shape[1]:
+            self._reserve_sensitivity_result(16)
+        self._p_sol_buffer[:, self._p_sol_count, :] = sens
+        self._p_sol_count += 1
+    
+    def _get_p_sol(self):
+        """
+        The sensitivity result as an array of shape (dimSens, number of
+        result points, dim), i.e. p_sol[i] contains the result of the
+        i-th sensitivity parameter.
+        """
+        return self._p_sol_buffer[:, :self._p_sol_count, :]
+    
+    p_sol = property(_get_p_sol)
         
         
     cpdef simulate(self, double tfinal, int ncp=0, object ncp_list=None):
@@ -242,6 +287,31 @@ cdef class ODE:
             if not self.report_continuously:
                  self.log_message("The problem contains step events: report_continuously is set to True", WHISPER)
             self.report_continuously = True
+        
+        if self.options["dense_output"] and (self.supports["interpolated_output"] is False or self.supports["report_continuously"] is False):
+            self.log_message("The current solver does not support dense output. Setting dense_output to False and continues.", WHISPER)
+            self.options["dense_output"] = False
+        elif self.options["dense_output"] and not self.report_continuously:
+            self.log_message("Dense output requires the solution after each step: report_continuously is set to True", WHISPER)
+            self.report_continuously = True
+        
+        if self.options["trace_steps"] and self.supports["step_trace"] is False:
+            self.log_message("The current solver does not support tracing the steps. Setting trace_steps to False and continues.", WHISPER)
+            self.options["trace_steps"] = False
+        elif self.options["trace_steps"] and not self.report_continuously:
+            self.log_message("Tracing the steps requires the solver to return after each step: report_continuously is set to True", WHISPER)
+            self.report_continuously = True
+        
+        #Look up the result in the simulation cache
+        cache_key = None
+        if self.options["cache_dir"] is not None:
+            cache = SimulationCache(self.options["cache_dir"], self.options["cache_size"])
+            cache_key = self._get_cache_key(tfinal, ncp, ncp_list)
+            if cache_key is not None:
+                result = self._load_cached_result(cache, cache_key)
+                if result is not None:
+                    self.log_message('Simulation result (' + str(t0) + ' - ' + str(self.t) + ' seconds) loaded from the cache.', NORMAL)
+                    return result
             
         #Determine the output list
         if ncp != 0:
@@ -262,6 +332,10 @@ cdef class ODE:
             output_list = None
             output_index = 0
         
+        #Preallocate the sensitivity result for the known output points
+        if output_list is not None and self.problem_info["dimSens"] > 0:
+            self._reserve_sensitivity_result(len(output_list) + 1)
+        
         #Determine if we are using one step mode or normal mode
         if self.problem_info['step_events'] or self.options['report_continuously']:
             REPORT_CONTINUOUSLY = 1
@@ -277,11 +351,24 @@ cdef class ODE:
         #Time and Step events
         TIME_EVENT = 1 if self.problem_info['time_events'] is True else 0
 
+        #Create the dense output, filled in after each step
+        if self.options["dense_output"]:
+            self._dense_solution = DenseSolution(self.problem_info["dim"], self._get_dense_output_degree(), self.options["backward"])
+        else:
+            self._dense_solution = None
+        
+        #Create the step trace, filled in by the solver after each step
+        self._step_trace = StepTrace() if self.options["trace_steps"] else None
+        
         #Simulation starting, call initialize
         self.problem.initialize(self)
         self.initialize()
         
-        #Start of simulation, start the clock
+        self._handle_result = self._timed(self.problem.handle_result, "handle_result")
+        
+        #Start of simulation, start the clock. The timings are accumulated
+        #over the simulations unless the solver resets its statistics
+        timed_start = sum(self.statistics.timings.values())
         time_start = timer()
         
         #Start the simulation
@@ -290,10 +377,19 @@ cdef class ODE:
         #End of simulation, stop the clock
         time_stop = timer()
         
+        #The remaining time is spent inside the solver itself
+        if self.options["profile"]:
+            timed = sum(self.statistics.timings.values()) - timed_start
+            self.statistics.add_timing("solver", max(time_stop-time_start-timed, 0.0))
+        
         #Simulation complete, call finalize
         self.finalize()
         self.problem.finalize(self)
         
+        #The statistics are reset in initialize
+        if cache_key is not None:
+            self._update_cache_statistics()
+        
         #Print the simulation statistics
         self.print_statistics(NORMAL)
         
@@ -303,9 +399,137 @@ cdef class ODE:
         
         #Return the results
         if isinstance(self.problem, Explicit_Problem) or isinstance(self.problem, Delay_Explicit_Problem) or isinstance(self.problem, SingPerturbed_Problem):
+            result = (self.t_sol, N.array(self.y_sol))
+        else:
+            result = (self.t_sol, N.array(self.y_sol), N.array(self.yd_sol))
+        
+        #Store the results in the simulation cache
+        if cache_key is not None:
+            cache.store(cache_key, self._get_cached_arrays(result))
+        
+        if self._dense_solution is not None:
+            result = result + (self._dense_solution,)
+        
+        return result
+    
+    def _get_cache_key(self, tfinal, ncp, ncp_list):
+        """
+        Returns the simulation cache key of the current simulation, built
+        from the fingerprint of the problem, the solver options and the
+        initial data, or None if the simulation cannot be cached.
+        """
+        if not hasattr(self.problem, "fingerprint"):
+            self.log_message("The problem does not have a fingerprint, the simulation cache is not used.", WHISPER)
+            return None
+        if self.options["dense_output"] or self.options["trace_steps"] or self.problem_info["dimSens"] > 0:
+            self.log_message("Dense output, step traces and sensitivity results are not cached, the simulation cache is not used.", WHISPER)
+            return None
+        
+        options = dict((k, v) for k, v in self.options.items() if k not in ("verbosity", "display_progress", "cache_dir", "cache_size"))
+        
+        try:
+            return SimulationCache.key(self.problem.fingerprint, type(self).__name__, options, 
+                                       self.t, self.y, self.yd, self.p, self.sw, tfinal, ncp, ncp_list)
+        except TypeError as e:
+            self.log_message("The simulation cache is not used, the fingerprint of the problem, the options, p and sw must consist of "
+                             "numbers, strings, arrays and lists, tuples and dicts of these. " + str(e), WHISPER)
+            return None
+    
+    def _get_cached_arrays(self, result):
+        """
+        Returns the arrays of a simulation result that are stored in the
+        simulation cache.
+        """
+        arrays = {"t": N.array(result[0]), "y": result[1]}
+        if len(result) > 2:
+            arrays["yd"] = result[2]
+        if self.sw is not None:
+            arrays["sw"] = N.array(self.sw)
+        return arrays
+    
+    def _load_cached_result(self, cache, key):
+        """
+        Loads a simulation result from the simulation cache and updates the
+        state of the solver accordingly. The cached points are passed on to
+        problem.handle_result as in a normal simulation. Returns the result
+        as given by simulate or None if it is not cached.
+        """
+        explicit = isinstance(self.problem, Explicit_Problem) or isinstance(self.problem, Delay_Explicit_Problem) or isinstance(self.problem, SingPerturbed_Problem)
+        names = ["t", "y"] if explicit else ["t", "y", "yd"]
+        if self.sw is not None:
+            names.append("sw")
+        
+        cached = cache.load(key, names)
+        
+        if cached is None:
+            self._cache_misses += 1
+            self._update_cache_statistics()
+            return None
+        self._cache_hits += 1
+        self._update_cache_statistics()
+        
+        self.problem.initialize(self)
+        
+        #Replay the cached points
+        if explicit:
+            for t, y in zip(cached["t"], cached["y"]):
+                self.problem.handle_result(self, float(t), N.array(y))
+        else:
+            for t, y, yd in zip(cached["t"], cached["y"], cached["yd"]):
+                self.problem.handle_result(self, float(t), N.array(y), N.array(yd))
+            self.yd = N.array(cached["yd"][-1])
+        self.t = float(cached["t"][-1])
+        self.y = N.array(cached["y"][-1])
+        if self.sw is not None:
+            self.sw = cached["sw"].tolist()
+        
+        self.problem.finalize(self)
+        
+        if explicit:
             return self.t_sol, N.array(self.y_sol)
         else:
             return self.t_sol, N.array(self.y_sol), N.array(self.yd_sol)
+    
+    def _update_cache_statistics(self):
+        self.statistics["ncachehits"] = self._cache_hits
+        self.statistics["ncachemisses"] = self._cache_misses
+    
+    def _get_dense_output_degree(self):
+        """
+        Returns the degree of the continuous extension of the solver, used
+        for sampling it when _get_dense_output_polynomial is not available.
+        """
+        return 3
+    
+    def _get_dense_output_polynomial(self, double t_left, double t_right):
+        """
+        Returns the interpolation polynomial of the last step as a tuple
+        (coefficients, t_ref, h_ref), see DenseSolution.add_step, or None
+        if the solver does not keep such a representation.
+        """
+        return None
+    
+    def _store_dense_output(self, double t_left, double t_right, y_right):
+        """
+        Stores the continuous extension of the step [t_left, t_right] in
+        the dense output. Called after each step, while the solver
+        interpolates in that step.
+        """
+        if t_left == t_right:
+            return
+        
+        polynomial = self._get_dense_output_polynomial(t_left, t_right)
+        if polynomial is not None:
+            self._dense_solution.add_step(t_left, t_right, *polynomial)
+            return
+        
+        times = self._dense_solution.nodes(t_left, t_right)
+        values = N.empty((len(times), self.problem_info["dim"]))
+        for i in range(len(times)-1):
+            values[i,:] = self.interpolate(times[i])
+        values[-1,:] = y_right
+        
+        self._dense_solution.add_step_values(t_left, t_right, values)
         
     def _simulate(self,t0, tfinal, output_list, REPORT_CONTINUOUSLY, INTERPOLATE_OUTPUT, TIME_EVENT):
          pass
@@ -449,6 +673,144 @@ cdef class ODE:
     
     store_event_points = property(_get_store_event_points,_set_store_event_points)
     
+    def _set_dense_output(self, dense_output):
+        self.options["dense_output"] = bool(dense_output)
+    
+    def _get_dense_output(self):
+        """
+        This options specifies if the continuous extension of the solver
+        should be stored after each step. If True, simulate additionally
+        returns a DenseSolution object which evaluates the solution at
+        arbitrary times in the simulated interval, e.g. sol(t_array).
+        Requires a solver that supports interpolated output and implies
+        report_continuously.
+        
+            Parameters::
+            
+                dense_output
+                  
+                        - Default False
+                    
+                        - Should be a Boolean.
+
+        """
+        return self.options["dense_output"]
+    
+    dense_output = property(_get_dense_output,_set_dense_output)
+    
+    def _set_trace_steps(self, trace_steps):
+        self.options["trace_steps"] = bool(trace_steps)
+    
+    def _get_trace_steps(self):
+        """
+        Specifies if the solver should record the time, step size, order,
+        nonlinear iterations, error test failures and Jacobian/LU updates
+        of each step. The record is retrieved with get_step_trace after
+        the simulation. Requires (and sets) report_continuously.
+        
+            Parameters::
+            
+                trace_steps
+                  
+                        - Default False
+                    
+                        - Should be a Boolean.
+
+        """
+        return self.options["trace_steps"]
+    
+    trace_steps = property(_get_trace_steps,_set_trace_steps)
+    
+    def _set_cache_dir(self, cache_dir):
+        self.options["cache_dir"] = None if cache_dir is None else str(cache_dir)
+    
+    def _get_cache_dir(self):
+        """
+        Directory of the persistent simulation cache. If set, and the problem
+        has the attribute fingerprint (a string identifying the problem),
+        simulation results are stored on disk keyed by the fingerprint,
+        the solver options and the initial data. Repeated simulations are
+        then loaded from the cache (as memory-mapped arrays) instead of
+        being recomputed.
+        
+            Parameters::
+            
+                cache_dir
+                  
+                        - Default None (no caching)
+                    
+                        - Should be a string (path).
+
+        """
+        return self.options["cache_dir"]
+    
+    cache_dir = property(_get_cache_dir,_set_cache_dir)
+    
+    def _set_cache_size(self, cache_size):
+        try:
+            cache_size = int(cache_size)
+        except (ValueError, TypeError):
+            raise AssimuloException("The cache size must be an integer.")
+        if cache_size <= 0:
+            raise AssimuloException("The cache size must be positive.")
+        self.options["cache_size"] = cache_size
+    
+    def _get_cache_size(self):
+        """
+        The disk budget (in bytes) of the simulation cache. The least
+        recently used results are removed when it is exceeded.
+        
+            Parameters::
+            
+                cache_size
+                  
+                        - Default 1 GB
+                    
+                        - Should be a positive integer.
+
+        """
+        return self.options["cache_size"]
+    
+    cache_size = property(_get_cache_size,_set_cache_size)
+    
+    def _set_profile(self, profile):
+        self.options["profile"] = bool(profile)
+    
+    def _get_profile(self):
+        """
+        Specifies if the wall time spent in the different parts of the
+        simulation should be measured. The time is accumulated in the
+        categories rhs (or res), jac, jacv, prec_setup, prec_solve,
+        state_events, handle_result and solver (the time spent inside the
+        solver itself) and is printed together with the statistics. The
+        timings are also available as a dictionary from
+        solver.statistics.get_timings().
+        
+            Parameters::
+            
+                profile
+                  
+                        - Default False
+                    
+                        - Should be a Boolean.
+
+        """
+        return self.options["profile"]
+    
+    profile = property(_get_profile,_set_profile)
+    
+    def _timed(self, func, category):
+        """
+        Returns func wrapped so that the time spent in it is added to the
+        timing category of the statistics if the option profile is set,
+        otherwise the (unwrapped) function itself.
+        """
+        if isinstance(func, TimedCallback):
+            func = func.func
+        if func is None or not self.options["profile"]:
+            return func
+        return TimedCallback(func, category, self.statistics)
+    
     def _set_clock_step(self, clock_step):
         self.options["clock_step"] = clock_step
     
@@ -552,6 +914,17 @@ cdef class ODE:
             Elapsed time (note -1.0 indicates that it was not used)
         """
         return self.elapsed_step_time
+    
+    def get_step_trace(self):
+        """
+        Returns the record of the steps of the last simulation, see the
+        option trace_steps.
+        
+        Returns::
+        
+            A StepTrace, or None if the steps were not traced.
+        """
+        return self._step_trace
         
     def _compact_atol(self):
         """
@@ -17,8 +17,10 @@
 
 import numpy as N
 cimport numpy as N
+import ctypes
 
 from assimulo.support import set_type_shape_array
+from assimulo.exception import AssimuloException, AssimuloRecoverableError
 
 include "constants.pxi" #Includes the constants (textual include)
 
@@ -91,16 +93,13 @@ cdef class cImplicit_Problem(cProblem):
         Method for specifying how the result is handled. By default the
         data is stored in three vectors: solver.(t/y/yd).
         """
-        cdef int i = 0
-        
         solver.t_sol.extend([t])
         solver.y_sol.extend([y])
         solver.yd_sol.extend([yd])
         
         #Store sensitivity result (variable _sensitivity_result are set from the solver by the solver)
         if self._sensitivity_result == 1:
-            for i in range(solver.problem_info["dimSens"]):
-                solver.p_sol[i] += [solver.interpolate_sensitivity(t, i=i)] 
+            solver._store_sensitivity_result(solver.interpolate_sensitivities(t))
         
     cpdef res_internal(self, N.ndarray[double, ndim=1] res, double t, N.ndarray[double, ndim=1] y, N.ndarray[double, ndim=1] yd):
         try:
@@ -150,15 +149,12 @@ cdef class cExplicit_Problem(cProblem):
         Method for specifying how the result is to be handled. As default the
         data is stored in two vectors: solver.(t/y).
         """
-        cdef int i = 0
-        
         solver.t_sol.extend([t])
         solver.y_sol.extend([y])
         
         #Store sensitivity result (variable _sensitivity_result are set from the solver by the solver)
         if self._sensitivity_result == 1:
-            for i in range(solver.problem_info["dimSens"]):
-                solver.p_sol[i] += [solver.interpolate_sensitivity(t, i=i)] 
+            solver._store_sensitivity_result(solver.interpolate_sensitivities(t))
                 
     cpdef int rhs_internal(self, N.ndarray[double, ndim=1] yd, double t, N.ndarray[double, ndim=1] y):
         try:
@@ -191,11 +187,18 @@ cdef class cDelay_Explicit_Problem(cExplicit_Problem):
 
 cdef class cSingPerturbed_Problem(cExplicit_Problem):
     
-    def __init__(self, rhs1=None, rhs2=None, yy0=None, zz0=None, double t0=0.0, eps=None, name = None):
+    cdef public int n, m
+    cdef public object eps
+    
+    def __init__(self, rhs1=None, rhs2=None, yy0=None, zz0=None, double t0=0.0, eps=None, name = None, jac1=None, jac2=None):
         if rhs1 is not None:
             self.rhs1 = rhs1
         if rhs2 is not None:
             self.rhs2 = rhs2
+        if jac1 is not None:
+            self.jac1 = jac1
+        if jac2 is not None:
+            self.jac2 = jac2
         if eps is not None:
             self.eps = eps
         if yy0 is not None:
@@ -215,16 +218,52 @@ cdef class cSingPerturbed_Problem(cExplicit_Problem):
         self.m = len(self.zz0) if zz0 is not None else 0
         cExplicit_Problem.__init__(self, y0=y0, t0=t0, name=name)   
         
-    def rhs(self,t,y):
-        yy=y[:self.n]
-        zz=y[self.n:]
-        yydot=self.rhs1(t,yy,zz)
-        zzdot=self.rhs2(t,yy,zz)
+        # the Jacobian is assembled from the blocks if both are given
+        if hasattr(self, "jac1") and hasattr(self, "jac2") and not hasattr(self, "jac"):
+            self.jac = self.block_jac
+    
+    cdef _rhs_into(self, N.ndarray yd, double t, N.ndarray y):
+        """
+        Writes the slow and the fast right-hand-side into the two parts of yd.
+        """
+        cdef N.ndarray yy = y[:self.n], zz = y[self.n:]
+        cdef N.ndarray zzdot = yd[self.n:]
+        
+        yd[:self.n] = self.rhs1(t,yy,zz)
+        zzdot[:] = self.rhs2(t,yy,zz)
         # componentwise division by eps as it is the diagonal of 
         # a diagonal matrix
-        if self.eps != None: 
-            zzdot /= self.eps 
-        return N.hstack((yydot,zzdot))
+        if self.eps is not None: 
+            zzdot /= self.eps
+        
+    def rhs(self,t,y):
+        cdef N.ndarray yd = N.empty(self.n+self.m)
+        self._rhs_into(yd, t, N.asarray(y, dtype=N.double))
+        return yd
+    
+    cpdef int rhs_internal(self, N.ndarray[double, ndim=1] yd, double t, N.ndarray[double, ndim=1] y):
+        try:
+            self._rhs_into(yd, t, y)
+        except:
+            return ID_FAIL
+        return ID_OK
+    
+    def block_jac(self, t, y):
+        """
+        Assembles the (dense) Jacobian of rhs from the blocks returned
+        by jac1 and jac2, the rows of the fast part are divided by eps.
+        """
+        cdef int n = self.n
+        cdef N.ndarray yy, zz, jac = N.empty((self.n+self.m, self.n+self.m))
+        
+        y = N.asarray(y, dtype=N.double)
+        yy, zz = y[:n], y[n:]
+        
+        jac[:n,:n], jac[:n,n:] = self.jac1(t,yy,zz)
+        jac[n:,:n], jac[n:,n:] = self.jac2(t,yy,zz)
+        if self.eps is not None:
+            jac[n:] /= N.reshape(self.eps, (-1,1))
+        return jac
             
 class Delay_Explicit_Problem(cDelay_Explicit_Problem):
     pass
@@ -299,6 +338,21 @@ class Implicit_Problem(cImplicit_Problem):
                 
                 Returns:
                     A numpy array of size len(y)*len(y).
+            
+            def prec_setup(self, t, y, yd, res, c, data)
+                Prepares the (left) preconditioner P, an approximation of
+                dF/dx + c*dF/dx', used by the iterative linear solvers. The 
+                argument data is the value returned by the previous call
+                (None on the first call).
+                
+                Returns:
+                    Data passed on to prec_solve.
+            
+            def prec_solve(self, t, y, yd, res, r, c, delta, data)
+                Solves the preconditioner system P*z = r.
+                
+                Returns:
+                    A numpy array of size len(y).
                     
             def handle_result(self, solver, t, y, yd)
                 Method for specifying how the result is  handled. 
@@ -515,6 +569,26 @@ class SingPerturbed_Problem(cSingPerturbed_Problem):
                     rhs2(t,y,z)    - 'fast' ODE
                     Returns:
                         A numpy array of size len(z).
+            jac1
+                Function that calculates the Jacobian of rhs1, (optional)
+                
+                    jac1(t,y,z)    - Jacobian of the 'slow' ODE
+                    Returns:
+                        The blocks (d rhs1/dy, d rhs1/dz) as a tuple of
+                        arrays of size len(y) x len(y) and len(y) x len(z).
+            jac2
+                Function that calculates the Jacobian of rhs2, (optional)
+                
+                    jac2(t,y,z)    - Jacobian of the 'fast' ODE
+                    Returns:
+                        The blocks (d rhs2/dy, d rhs2/dz) as a tuple of
+                        arrays of size len(z) x len(y) and len(z) x len(z).
+                
+                If both jac1 and jac2 are given the Jacobian of the
+                full system, jac(t,y), is assembled from the blocks as
+                a dense matrix. It replaces the finite difference
+                approximation of the solvers, the block structure is
+                not used in their linear algebra.
             eps diagonal of a len(z) x len(z) matrix with small numbers
                     A numpy array of size len(z)
             
@@ -528,6 +602,196 @@ class SingPerturbed_Problem(cSingPerturbed_Problem):
     pass
 
 
+_c_double_p = ctypes.POINTER(ctypes.c_double)
+_native_rhs = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, _c_double_p, _c_double_p, ctypes.c_void_p)
+_native_res = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, _c_double_p, _c_double_p, _c_double_p, ctypes.c_void_p)
+_native_explicit_jac = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, _c_double_p, _c_double_p, ctypes.c_void_p)
+_native_implicit_jac = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, ctypes.c_double, _c_double_p, _c_double_p, _c_double_p, ctypes.c_void_p)
+_native_explicit_root = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, _c_double_p, _c_double_p, ctypes.c_void_p)
+_native_implicit_root = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, _c_double_p, _c_double_p, _c_double_p, ctypes.c_void_p)
+
+def _as_c_array(x):
+    return N.ascontiguousarray(x, dtype=N.double)
+
+def _check_native_flag(int flag, name):
+    if flag > 0:
+        raise AssimuloRecoverableError("The compiled function '%s' returned the recoverable error flag %d."%(name, flag))
+    if flag < 0:
+        raise AssimuloException("The compiled function '%s' failed with the flag %d."%(name, flag))
+
+class Native_Explicit_Problem(Explicit_Problem):
+    """
+        Problem for our explicit integrators (ODEs) where the right-hand-side
+        and, optionally, the Jacobian and the state events are compiled C 
+        functions. The functions are given by their addresses, e.g. 
+        ctypes.cast(f, ctypes.c_void_p).value for a ctypes function or 
+        int(ffi.cast("intptr_t", f)) for a cffi function.
+        
+        CVode calls the functions directly and releases the GIL during the 
+        integration, so that several problems can be solved concurrently in
+        threads. The other solvers call the functions through ctypes.
+        
+        The functions should return 0 on success, a positive value on a 
+        recoverable error and a negative value on an unrecoverable error.
+        Switches and sensitivities are not supported.
+        
+        Parameters::
+            
+            rhs_address
+                Address of the function that calculates the right-hand-side,
+                
+                    int rhs(double t, double *y, double *yd, void *user_data)
+            
+            y0
+                Defines the starting values 
+            t0
+                Defines the starting time
+            jac_address (optional)
+                Address of the function that calculates the Jacobian, J=df/dx,
+                stored in column major order,
+                
+                    int jac(double t, double *y, double *J, void *user_data)
+                    
+            state_events_address (optional)
+                Address of the function that calculates the event (root) 
+                functions,
+                
+                    int state_events(double t, double *y, double *g, void *user_data)
+                    
+            nstate_events
+                The number of event functions.
+            user_data
+                Address passed on as the last argument to the functions.
+                Default 0 (NULL).
+    """
+    def __init__(self, rhs_address, y0, t0=0.0, jac_address=None, state_events_address=None, 
+                       nstate_events=0, user_data=None, name=None):
+        Explicit_Problem.__init__(self, y0=y0, t0=t0, name=name)
+        
+        self.rhs_address = int(rhs_address)
+        self.jac_address = int(jac_address) if jac_address else None
+        self.state_events_address = int(state_events_address) if state_events_address else None
+        self.nstate_events = nstate_events
+        self.user_data = int(user_data) if user_data else 0
+        
+        self._rhs_fcn = _native_rhs(self.rhs_address)
+        if self.jac_address:
+            self._jac_fcn = _native_explicit_jac(self.jac_address)
+            self.jac = self._native_jac
+        if self.state_events_address:
+            if nstate_events < 1:
+                raise AssimuloException("The number of event functions, nstate_events, must be positive.")
+            self._state_events_fcn = _native_explicit_root(self.state_events_address)
+            self.state_events = self._native_state_events
+    
+    def rhs(self, t, y, sw=None):
+        y = _as_c_array(y)
+        yd = N.empty(len(y))
+        _check_native_flag(self._rhs_fcn(t, y.ctypes.data_as(_c_double_p), yd.ctypes.data_as(_c_double_p), self.user_data), "rhs")
+        return yd
+    
+    def _native_jac(self, t, y, sw=None):
+        y = _as_c_array(y)
+        jac = N.empty((len(y), len(y)), order="F")
+        _check_native_flag(self._jac_fcn(t, y.ctypes.data_as(_c_double_p), jac.ctypes.data_as(_c_double_p), self.user_data), "jac")
+        return jac
+    
+    def _native_state_events(self, t, y, sw=None):
+        y = _as_c_array(y)
+        g = N.empty(self.nstate_events)
+        _check_native_flag(self._state_events_fcn(t, y.ctypes.data_as(_c_double_p), g.ctypes.data_as(_c_double_p), self.user_data), "state_events")
+        return g
+
+class Native_Implicit_Problem(Implicit_Problem):
+    """
+        Problem for our implicit integrators (DAEs) where the residual and,
+        optionally, the Jacobian and the state events are compiled C 
+        functions. The functions are given by their addresses, see 
+        Native_Explicit_Problem.
+        
+        IDA calls the functions directly and releases the GIL during the 
+        integration. The other solvers call the functions through ctypes.
+        
+        The functions should return 0 on success, a positive value on a 
+        recoverable error and a negative value on an unrecoverable error.
+        Switches and sensitivities are not supported.
+        
+        Parameters::
+            
+            res_address
+                Address of the function that calculates the residual,
+                
+                    int res(double t, double *y, double *yd, double *res, void *user_data)
+            
+            y0
+                Defines the starting values of y0.
+            yd0
+                Defines the starting values of yd0.
+            t0
+                Defines the starting time.
+            jac_address (optional)
+                Address of the function that calculates the Jacobian, 
+                J = dF/dx + c*dF/dx', stored in column major order,
+                
+                    int jac(double t, double c, double *y, double *yd, double *J, void *user_data)
+                    
+            state_events_address (optional)
+                Address of the function that calculates the event (root) 
+                functions,
+                
+                    int state_events(double t, double *y, double *yd, double *g, void *user_data)
+                    
+            nstate_events
+                The number of event functions.
+            user_data
+                Address passed on as the last argument to the functions.
+                Default 0 (NULL).
+    """
+    def __init__(self, res_address, y0, yd0, t0=0.0, jac_address=None, state_events_address=None, 
+                       nstate_events=0, user_data=None, name=None):
+        Implicit_Problem.__init__(self, y0=y0, yd0=yd0, t0=t0, name=name)
+        
+        self.res_address = int(res_address)
+        self.jac_address = int(jac_address) if jac_address else None
+        self.state_events_address = int(state_events_address) if state_events_address else None
+        self.nstate_events = nstate_events
+        self.user_data = int(user_data) if user_data else 0
+        
+        self._res_fcn = _native_res(self.res_address)
+        if self.jac_address:
+            self._jac_fcn = _native_implicit_jac(self.jac_address)
+            self.jac = self._native_jac
+        if self.state_events_address:
+            if nstate_events < 1:
+                raise AssimuloException("The number of event functions, nstate_events, must be positive.")
+            self._state_events_fcn = _native_implicit_root(self.state_events_address)
+            self.state_events = self._native_state_events
+    
+    def res(self, t, y, yd, sw=None):
+        y = _as_c_array(y)
+        yd = _as_c_array(yd)
+        res = N.empty(len(y))
+        _check_native_flag(self._res_fcn(t, y.ctypes.data_as(_c_double_p), yd.ctypes.data_as(_c_double_p), 
+                                         res.ctypes.data_as(_c_double_p), self.user_data), "res")
+        return res
+    
+    def _native_jac(self, c, t, y, yd, sw=None):
+        y = _as_c_array(y)
+        yd = _as_c_array(yd)
+        jac = N.empty((len(y), len(y)), order="F")
+        _check_native_flag(self._jac_fcn(t, c, y.ctypes.data_as(_c_double_p), yd.ctypes.data_as(_c_double_p), 
+                                         jac.ctypes.data_as(_c_double_p), self.user_data), "jac")
+        return jac
+    
+    def _native_state_events(self, t, y, yd, sw=None):
+        y = _as_c_array(y)
+        yd = _as_c_array(yd)
+        g = N.empty(self.nstate_events)
+        _check_native_flag(self._state_events_fcn(t, y.ctypes.data_as(_c_double_p), yd.ctypes.data_as(_c_double_p), 
+                                                  g.ctypes.data_as(_c_double_p), self.user_data), "state_events")
+        return g
+
+
 cdef class cAlgebraic_Problem:
     
     name = "---"
@@ -16,59 +16,61 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 __all__ = ["euler","radau5","sundials","runge_kutta","rosenbrock",
-           "glimda","odepack","radar5","dasp3","odassl"]
+           "glimda","odepack","radar5","dasp3","odassl","sdirk_dae"]
 
 import sys
+import importlib
 
-#Import all the solvers from the different modules
-try:
-    from .euler import ExplicitEuler
-    from .euler import ImplicitEuler
-except ImportError as ie:
-    sys.stderr.write("Could not find " + str(ie) + "\n")
-try:
-    from .radau5 import Radau5ODE
-    from .radau5 import Radau5DAE
-    from .radau5 import _Radau5ODE
-    from .radau5 import _Radau5DAE 
-except ImportError as ie:
-    sys.stderr.write("Could not find " + str(ie) + "\n")
-try:
-    from .sundials import IDA
-    from .sundials import CVode
-except ImportError as ie:
-    sys.stderr.write("Could not find " + str(ie) + "\n")
-try:
-    from .kinsol import KINSOL
-except ImportError as ie:
-    sys.stderr.write("Could not find " + str(ie) + "\n")
-try:
-    from .runge_kutta import RungeKutta34
-    from .runge_kutta import RungeKutta4
-    from .runge_kutta import Dopri5
-except ImportError as ie:
-    sys.stderr.write("Could not find " + str(ie) + "\n")
-try:
-    from .rosenbrock import RodasODE
-except ImportError as ie:
-    sys.stderr.write("Could not find " + str(ie) + "\n")
-try:
-    from .odassl import ODASSL
-except ImportError as ie:
-    sys.stderr.write("Could not find " + str(ie) + "\n")
-try:
-    from .odepack import LSODAR
-except ImportError as ie:
-    sys.stderr.write("Could not find " + str(ie) + "\n")
-try:
-    from .radar5 import Radar5ODE
-except ImportError as ie:
-    sys.stderr.write("Could not find " + str(ie) + "\n")
-try:
-    from .dasp3 import DASP3ODE
-except ImportError as ie:
-    sys.stderr.write("Could not find " + str(ie) + "\n")
-try:
-    from .glimda import GLIMDA
-except ImportError as ie:
-    sys.stderr.write("Could not find " + str(ie) + "\n")
+#The module of each solver. The solvers are imported on first access so
+#that importing a solver does not load the other solvers, their compiled
+#extensions or Scipy.
+_solver_modules = {"ExplicitEuler": "euler",
+                   "ImplicitEuler": "euler",
+                   "Radau5ODE": "radau5",
+                   "Radau5DAE": "radau5",
+                   "_Radau5ODE": "radau5",
+                   "_Radau5DAE": "radau5",
+                   "IDA": "sundials",
+                   "CVode": "sundials",
+                   "KINSOL": "kinsol",
+                   "RungeKutta34": "runge_kutta",
+                   "RungeKutta4": "runge_kutta",
+                   "Dopri5": "runge_kutta",
+                   "RodasODE": "rosenbrock",
+                   "ODASSL": "odassl",
+                   "LSODAR": "odepack",
+                   "LSODES": "odepack",
+                   "Radar5ODE": "radar5",
+                   "DASP3ODE": "dasp3",
+                   "GLIMDA": "glimda",
+                   "SDIRK_DAE": "sdirk_dae"}
+
+def _import_solver(name):
+    module = importlib.import_module("." + _solver_modules[name], __name__)
+    solver = getattr(module, name)
+    globals()[name] = solver
+    return solver
+
+if sys.version_info >= (3,7):
+    def __getattr__(name):
+        if name not in _solver_modules:
+            raise AttributeError("module %r has no attribute %r"%(__name__, name))
+        try:
+            return _import_solver(name)
+        except ImportError as ie:
+            sys.stderr.write("Could not find " + str(ie) + "\n")
+            raise AttributeError("module %r has no attribute %r"%(__name__, name))
+    
+    def __dir__():
+        return sorted(set(globals()) | set(_solver_modules))
+else:
+    #Module level __getattr__ is not supported, import all the solvers
+    _missing = set()
+    for _name in sorted(_solver_modules):
+        if _solver_modules[_name] in _missing:
+            continue
+        try:
+            _import_solver(_name)
+        except ImportError as ie:
+            _missing.add(_solver_modules[_name])
+            sys.stderr.write("Could not find " + str(ie) + "\n")
@@ -82,28 +82,98 @@ class DASP3ODE(Explicit_ODE):
         
         self.statistics.add_key("nyder", "Number of slow function evaluations (Y)")
         self.statistics.add_key("nzder", "Number of fast function evaluations (Z)")
+        
+        #Solver support
+        self.supports["report_continuously"] = True
+        self.supports["interpolated_output"] = True
+        
+        #The last three accepted points (newest first) and the derivatives
+        #of the slow part at the last two, used for the interpolation
+        self._thist = N.empty((3,))
+        self._yhist = N.empty((3,self.n+self.m))
+        self._ydhist = N.empty((2,self.n))
+        self._nhist = 0
+        
+        #The initial size of the result buffer when no output points are given
+        self._nbuffer = 128
 
     def initialize(self):
         #Reset statistics
         self.statistics.reset()
-            
-        self._tlist = []
-        self._ylist = []
+    
+    def _store_result(self, t, y):
+        """
+        Stores a point of the result in the buffer of the current call to
+        integrate, the buffer is doubled when full.
+        """
+        if self._nout == len(self._tout):
+            self._tout = N.resize(self._tout, (2*self._nout,))
+            self._yout = N.resize(self._yout, (2*self._nout,self.n+self.m))
+        self._tout[self._nout] = t
+        self._yout[self._nout] = y
+        self._nout += 1
+        
+    def interpolate(self, time):
+        """
+        Interpolates the solution in the last step. The slow part (Y) is
+        interpolated with a cubic Hermite polynomial and the fast part (Z)
+        with the polynomial through the last three accepted points.
+        """
+        n, m = self.n, self.m
+        t1, t0 = self._thist[0], self._thist[1]
+        h = t1 - t0
+        s = (time - t0)/h
+        
+        y = N.empty((n+m,))
+        y[:n] = (1.0+2.0*s)*(1.0-s)**2*self._yhist[1,:n] + s*(1.0-s)**2*h*self._ydhist[1] \
+               + s**2*(3.0-2.0*s)*self._yhist[0,:n] + s**2*(s-1.0)*h*self._ydhist[0]
+        
+        z1, z0 = self._yhist[0,n:], self._yhist[1,n:]
+        d1 = (z1 - z0)/h
+        y[n:] = z1 + (time - t1)*d1
+        if self._nhist > 2:
+            d0 = (z0 - self._yhist[2,n:])/(t0 - self._thist[2])
+            y[n:] += (time - t1)*(time - t0)*(d1 - d0)/(t1 - self._thist[2])
+        
+        return y
         
     def _solout(self, t, wsy, wsz, n, m, jstop):
         """
         This method is called after every successful step taken by DASP3
-        """        
-        self._tlist.append(t)
-        self._ylist.append(N.hstack((wsy[:n],wsz[:m])))
+        """
+        #Shift the history and store the new point
+        self._thist[1:] = self._thist[:2]
+        self._yhist[1:] = self._yhist[:2]
+        self._ydhist[1] = self._ydhist[0]
+        self._thist[0] = t
+        self._yhist[0,:n] = wsy[:n]
+        self._yhist[0,n:] = wsz[:m]
+        self._ydhist[0] = wsy[n:2*n]
+        self._nhist += 1
+        
+        if self._nhist == 1: #The first call is at the initial time
+            return jstop
+        
+        y = self._yhist[0]
         
         if self._opts["report_continuously"]:
-            initialize_flag = self.report_solution(t, N.hstack((wsy[:n],wsz[:m])), self._opts)
+            initialize_flag = self.report_solution(t, y, self._opts)
             if initialize_flag: 
                 jstop = -1
+                self._interrupted = True
         else:
-            self._tlist.append(t)
-            self._ylist.append(N.hstack((wsy[:n],wsz[:m])))
+            if self._opts["output_list"] is None:
+                self._store_result(t, y)
+            else:
+                output_list = self._opts["output_list"]
+                output_index = self._opts["output_index"]
+                try:
+                    while output_list[output_index] <= t:
+                        self._store_result(output_list[output_index], self.interpolate(output_list[output_index]))
+                        output_index += 1
+                except IndexError:
+                    pass
+                self._opts["output_index"] = output_index
         
         return jstop
             
@@ -115,6 +185,21 @@ class DASP3ODE(Explicit_ODE):
         m = self.problem.m
         n = self.problem.n
         
+        #Start from the current state, it may have been changed in an event
+        self.wsy[:n] = y[:n]
+        self.wsz[:m] = y[n:]
+        
+        #Allocate the result buffer for this call
+        if opts["output_list"] is None:
+            nbuffer = self._nbuffer
+        else:
+            nbuffer = len(opts["output_list"]) - opts["output_index"] + 1
+        self._tout = N.empty((nbuffer,))
+        self._yout = N.empty((nbuffer,n+m))
+        self._nout = 0
+        self._nhist = 0
+        self._interrupted = False
+        
         a = N.empty((m,m))
         w = N.empty((m,m))
         slu= N.empty((2*m,))
@@ -131,10 +216,14 @@ class DASP3ODE(Explicit_ODE):
 
         #Checking return
         if lflag ==  0:
-            flag = ID_PY_COMPLETE
+            flag = ID_PY_EVENT if self._interrupted else ID_PY_COMPLETE
         else:
             raise Exception("DASP3 failed with flag %d"%lflag)
         
+        #Store the last point if it is not an output point
+        if not opts["report_continuously"] and self._nhist > 1 and (self._nout == 0 or self._tout[self._nout-1] != t):
+            self._store_result(t, self._yhist[0])
+        
         #Retrieving statistics
         self.statistics["nsteps"]      += dasp3dp.COUNTS.NSTEP
         self.statistics["nyder"]        += dasp3dp.COUNTS.NYDER
@@ -142,7 +231,14 @@ class DASP3ODE(Explicit_ODE):
         self.statistics["nerrfails"]     +=  dasp3dp.COUNTS.NREJ
         self.statistics["nlus"]         += 0
         
-        return flag, self._tlist, self._ylist
+        return flag, self._tout[:self._nout], self._yout[:self._nout]
+    
+    def state_event_info(self):
+        """
+        DASP3 does not support state events, the integration is only
+        interrupted by step events.
+        """
+        return []
     
     def print_statistics(self, verbose=NORMAL):
         """
@@ -17,8 +17,9 @@
 
 cimport numpy as N
 import numpy as N
-import numpy.linalg as LIN
+import scipy.linalg as LIN
 import scipy.sparse as sp
+from scipy.sparse.linalg import splu
 
 #from assimulo.ode import *
 from assimulo.explicit_ode cimport Explicit_ODE
@@ -47,16 +48,22 @@ cdef class ImplicitEuler(Explicit_ODE):
         
     with :math:`h` being the step-size and :math:`y_n` the previous 
     solution to the equation.
+    
+    The LU factorization of the Newton iteration matrix is reused as long
+    as neither the Jacobian nor the step-size change, and the Jacobian is
+    only updated when the Newton iteration converges slowly or fails.
     """
     cdef N.ndarray yd1
-    cdef N.ndarray _old_jac
+    cdef object _old_jac
     cdef object f
     cdef public object event_func
     cdef int _leny
     cdef double _eps
     cdef int _needjac
     cdef int _curjac
-    cdef int _steps_since_last_jac
+    cdef int _needlu
+    cdef object _lu
+    cdef double _lu_h
     cdef N.ndarray _yold
     cdef N.ndarray _ynew
     #cdef N.ndarray _event_info
@@ -90,7 +97,7 @@ cdef class ImplicitEuler(Explicit_ODE):
         self._eps  = N.finfo('double').eps
         self._needjac = True #Do we need a new jacobian?
         self._curjac = False #Is the current jacobian up to date?
-        self._steps_since_last_jac = 0 #Keep track on how long ago we updated the jacobian
+        self._needlu = True #Do we need a new LU factorization?
         self._inith = 0 #Used for taking an initial step of correct length after an event.
     
     def set_problem_data(self): 
@@ -99,12 +106,12 @@ cdef class ImplicitEuler(Explicit_ODE):
                 return self.problem.state_events(t, y, self.sw) 
             def f(t, y): 
                 return self.problem.rhs(t, y, self.sw)
-            self.f = f
-            self.event_func = event_func
+            self.f = self._timed(f, "rhs")
+            self.event_func = self._timed(event_func, "state_events")
             self._event_info = N.array([0] * self.problem_info["dimRoot"]) 
             self.g_old = self.event_func(self.t, self.y)
         else: 
-            self.f = self.problem.rhs
+            self.f = self._timed(self.problem.rhs, "rhs")
     
     
     def _set_usejac(self, jac):
@@ -153,6 +160,7 @@ cdef class ImplicitEuler(Explicit_ODE):
         
         if opts["initialize"]:
             self.set_problem_data()
+            self._needjac = True #The problem may have changed
             tr = []
             yr = []
         
@@ -318,13 +326,15 @@ cdef class ImplicitEuler(Explicit_ODE):
         """
         self._curjac = True #The jacobian is up to date
         self._needjac = False #A new jacobian is not needed
-        self._steps_since_last_jac = 0
+        self._needlu = True #The iteration matrix has to be factorized
         
         if self.usejac: #Retrieve the user-defined jacobian
             jac = self.problem.jac(t,y)
             
-            if isinstance(jac, sp.csc_matrix):
-                jac = jac.toarray()
+            if sp.issparse(jac):
+                jac = sp.csc_matrix(jac)
+            else:
+                jac = N.array(jac, dtype=float)
         else:           #Calculate a numeric jacobian
             delt = N.array([(self._eps*max(abs(yi),1.e-5))**0.5 for yi in y])*N.identity(self._leny) #Calculate a disturbance
             Fdelt = N.array([self.f(t,y+e) for e in delt]) #Add the disturbance (row by row) 
@@ -336,6 +346,29 @@ cdef class ImplicitEuler(Explicit_ODE):
         self.statistics["njacs"] += 1 #add the number of jacobian evaluation
         return jac
     
+    cdef _factorize(self, double h):
+        """
+        Computes the LU factorization of the iteration matrix h*J-I.
+        """
+        if sp.issparse(self._old_jac):
+            self._lu = splu(sp.csc_matrix(h*self._old_jac - sp.identity(self._leny, format="csc")))
+        else:
+            A = h*self._old_jac
+            A.flat[::self._leny+1] -= 1.0
+            self._lu = LIN.lu_factor(A, overwrite_a=True, check_finite=False)
+        
+        self._lu_h = h
+        self._needlu = False
+        self.statistics["nlus"] += 1
+    
+    cdef N.ndarray _solve(self, N.ndarray b):
+        """
+        Solves (h*J-I)x = b using the current LU factorization.
+        """
+        if sp.issparse(self._old_jac):
+            return self._lu.solve(b)
+        else:
+            return LIN.lu_solve(self._lu, b, check_finite=False)
     
     
     cdef double WRMS(self, N.ndarray x, N.ndarray w):
@@ -357,11 +390,11 @@ cdef class ImplicitEuler(Explicit_ODE):
         This calculates the next step in the integration.
         """
         cdef double new_norm, old_norm
+        cdef double rate = 0.0 #Convergence rate of the Newton iteration
         cdef double tn1 = t+h
         cdef N.ndarray yn = y.copy() #Old y
         #cdef N.ndarray yn1 = y.copy() #First newton guess
         cdef N.ndarray yn1 = y+h*self.f(t,y) #First newton guess
-        cdef N.ndarray I = N.eye(self._leny)
         self.statistics["nfcns"] += 1
         
         FLAG_CONV = False
@@ -370,22 +403,29 @@ cdef class ImplicitEuler(Explicit_ODE):
             FLAG_FAIL = False
 
             if self._needjac: #If the jacobian should be updated or not
-                jac = self._jacobian(tn1, yn1)
+                self._old_jac = self._jacobian(tn1, yn1)
+            
+            if self._needlu or h != self._lu_h: #Factorize h*J-I, reused until J or h changes
+                self._factorize(h)
             else:
-                jac = self._old_jac
+                self.statistics["nlureuses"] += 1
             
+            rate = 0.0
             for i in range(self.newt):
                 self.statistics["nniters"] += 1
                 
                 #jac = self._jacobian(tn1, yn1)
                 
                 #ynew = yn1 - N.dot(LIN.inv(h*jac-I),(yn-yn1+h*self.problem.rhs(tn1,yn1)))
-                ynew = yn1 - LIN.solve(h*jac-I, yn-yn1+h*self.f(tn1,yn1) )
+                ynew = yn1 - self._solve(yn-yn1+h*self.f(tn1,yn1))
                 self.statistics["nfcns"] += 1
                 
                 #print tn1, self.WRMS(ynew-yn1, 1.0/(self.rtol*N.abs(yn1)+self.atol))
                 new_norm = self.WRMS(ynew-yn1, 1.0/(self.rtol*N.abs(yn1)+self.atol))
                 
+                if i > 0:
+                    rate = max(rate, new_norm/old_norm)
+                
                 if new_norm < 0.1: #Newton converged
                     FLAG_CONV = True
                     break
@@ -408,17 +448,15 @@ cdef class ImplicitEuler(Explicit_ODE):
                     self._needjac = True
             
             if FLAG_CONV:
-                self._steps_since_last_jac += 1
                 self.statistics["nsteps"] += 1
                 
-                if self._steps_since_last_jac > 20: #Need to update the jacobian
+                if rate > 0.5: #Slow convergence, update the jacobian in the next step
                     self._needjac = True 
                 break
         else:
             raise AssimuloException("Newton iteration failed at %f"%t)
                 
         self._curjac = False #The Jacobian is no longer current
-        self._old_jac = jac #Store the old jacobian
         
         #Internal values only used for defining the interpolation function.
         self._yold = yn
@@ -531,12 +569,12 @@ cdef class ExplicitEuler(Explicit_ODE):
                 return self.problem.state_events(t, y, self.sw) 
             def f(t, y): 
                 return self.problem.rhs(t, y, self.sw)
-            self.f = f
-            self.event_func = event_func
+            self.f = self._timed(f, "rhs")
+            self.event_func = self._timed(event_func, "state_events")
             self._event_info = N.array([0] * self.problem_info["dimRoot"]) 
             self.g_old = self.event_func(self.t, self.y)
         else: 
-            self.f = self.problem.rhs
+            self.f = self._timed(self.problem.rhs, "rhs")
     
     cpdef step(self,double t,N.ndarray y,double tf,dict opts):
         cdef double h
@@ -16,6 +16,7 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import numpy as N
+import scipy.sparse as sp
 import sys
 
 from assimulo.exception import *
@@ -64,6 +65,8 @@ class GLIMDA(Implicit_ODE):
         self.options["maxh"]     = N.inf #Maximum step-size.
         self.options["minh"]     = N.finfo(N.double).eps #Minimum step-size      
         self.options["maxretry"] = 15 #Maximum number of consecutive retries  
+        self.options["usejac"]   = True if self.problem_info["jac_fcn"] else False
+        self.options["adconst"]  = True #The leading term (A,D) is constant
         
         #Solver support 
         self.supports["report_continuously"] = True 
@@ -72,6 +75,7 @@ class GLIMDA(Implicit_ODE):
         
         self._leny = len(self.y) #Dimension of the problem
         self._type = '(implicit)'
+        self._jac_cache = None
         
     def initialize(self):
         #Reset statistics
@@ -118,16 +122,63 @@ class GLIMDA(Implicit_ODE):
             self._ylist.append(y.copy())
             self._ydlist.append(yd.copy())
     
+    def _jacobian_parts(self, t, y, yd):
+        """
+        Returns the matrices A = dF/dyd and B = dF/dy computed from the
+        user-defined Jacobian dF/dy + c*dF/dyd. The result of the last
+        call is kept, as GLIMDA asks for A and B at the same point.
+        """
+        if self._jac_cache is not None:
+            tc, yc, ydc, A, B = self._jac_cache
+            if t == tc and N.array_equal(y, yc) and N.array_equal(yd, ydc):
+                return A, B
+        
+        if self.problem_info["switches"]:
+            jac = lambda *args: self.problem.jac(*(args + (self.sw,)))
+        else:
+            jac = self.problem.jac
+        dense = lambda J: J.toarray() if sp.issparse(J) else N.array(J, dtype=N.double)
+        
+        if self.problem_info["type"] == 0: #Explicit problem, F = yd - f(t,y)
+            A = N.eye(self._leny)
+            B = -dense(jac(t,y))
+        else:
+            B = dense(jac(0.0,t,y,yd))
+            A = dense(jac(1.0,t,y,yd)) - B
+        
+        self._jac_cache = (t, y.copy(), yd.copy(), A, B)
+        return A, B
+    
+    def _dfdy(self, yd, y, t, mat_a, ierr):
+        """
+        Computes A = df/dy in GLIMDA's notation, i.e. dF/dyd.
+        """
+        mat_a[:,:] = self._jacobian_parts(t, y, yd)[0]
+    
+    def _dfdx(self, yd, y, t, jac, ierr):
+        """
+        Computes B = df/dx in GLIMDA's notation, i.e. dF/dy.
+        """
+        jac[:,:] = self._jacobian_parts(t, y, yd)[1]
+    
+    def _dqdx(self, y, t, mat_d, ierr):
+        """
+        Computes D = dq/dx which is the identity since q(x,t) = x. Only
+        used for a non-constant leading term, where GLIMDA's numerical D
+        is also evaluated at the tolerances when converting them to q.
+        """
+        mat_d[:,:] = N.eye(self._leny)
+    
     def integrate(self, t, y, yd, tf, opts):
         #F = f(y,x,t) #f(q'(x,t),x,t)=0
         #Q = q(x,t)
         
         ITOL  = 1 #Both atol and rtol are vectors
-        INUMA = 1 #Evaluates A = df/dy numerically
-        INUMD = 1 #Evaluates D = dq/dx numerically
-        INUMB = 1 #Evaluates B = df/dx numerically
+        INUMA = 0 if self.usejac else 1 #Evaluates A = df/dy numerically
+        INUMD = 1 if self.adconst else 0 #Evaluates D = dq/dx numerically (once if the leading term is constant)
+        INUMB = 0 if self.usejac else 1 #Evaluates B = df/dx numerically
         IODE = 0 #Problem is a DAE (1 == ODE)
-        IADCONST = 1 #The leading term (A,D) is constant 
+        IADCONST = 1 if self.adconst else 0 #The leading term (A,D) is constant 
         
         #Options vectors
         IOPT = N.array([0]*9) #Integer options
@@ -157,12 +208,16 @@ class GLIMDA(Implicit_ODE):
         ROPT[9] = 0.8 #Threshould for changing the convergence rate when changing the order downwards
         ROPT[10]= 0.0 #Minimum condition number
         
-        #Dummy methods
-        dfdy_dummy = lambda t:x #df/dy
-        dfdx_dummy = lambda t:x #df/dx
-        dqdx_dummy = lambda t:x #dq/dx
+        #Partial derivatives (dummy methods if evaluated numerically)
+        dfdy_dummy = self._dfdy if self.usejac else (lambda t:x) #df/dy
+        dfdx_dummy = self._dfdx if self.usejac else (lambda t:x) #df/dx
+        dqdx_dummy = (lambda t:x) if self.adconst else self._dqdx #dq/dx
         qeval_dummy = lambda x,t:x #q(x,t)
-        res_dummy = lambda yd,y,t:self.problem.res(t,y,yd) #Needed to correct the order of the arguments
+        self._jac_cache = None
+        if self.problem_info["switches"]:
+            res_dummy = lambda yd,y,t:self.problem.res(t,y,yd,self.sw) #Needed to correct the order of the arguments
+        else:
+            res_dummy = lambda yd,y,t:self.problem.res(t,y,yd) #Needed to correct the order of the arguments
 
         #Store the opts
         self._opts = opts
@@ -498,3 +553,52 @@ class GLIMDA(Implicit_ODE):
         return self.options["inith"]
         
     inith = property(_get_initial_step,_set_initial_step)
+    
+    def _set_usejac(self, jac):
+        self.options["usejac"] = bool(jac)
+    
+    def _get_usejac(self):
+        """
+        This sets the option to use the user defined Jacobian. If a
+        user provided jacobian is implemented into the problem the
+        default setting is to use that Jacobian. If not, an
+        approximation is used. The matrices dF/dyd and dF/dy needed by
+        GLIMDA are obtained from the Jacobian dF/dy + c*dF/dyd.
+        
+            Parameters::
+            
+                usejac  
+                        - True - use user defined Jacobian
+                          False - use an approximation
+                    
+                        - Should be a Boolean.
+                        
+                            Example:
+                                usejac = False
+        """
+        return self.options["usejac"]
+    
+    usejac = property(_get_usejac,_set_usejac)
+    
+    def _set_adconst(self, adconst):
+        self.options["adconst"] = bool(adconst)
+    
+    def _get_adconst(self):
+        """
+        Defines if the leading term dF/dyd is constant, in which case it
+        is only evaluated once at the start of the integration. Set to
+        False if dF/dyd depends on y or t.
+        
+            Parameters::
+            
+                adconst
+                        - Default True.
+                    
+                        - Should be a Boolean.
+                        
+                            Example:
+                                adconst = False
+        """
+        return self.options["adconst"]
+    
+    adconst = property(_get_adconst,_set_adconst)
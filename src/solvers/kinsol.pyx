@@ -58,6 +58,7 @@ cdef class KINSOL(Algebraic):
     
     cdef object pt_fcn, pt_jac, pt_jacv, pt_prec_setup, pt_prec_solve
     cdef object _added_linear_solver
+    cdef long int _maa #Anderson acceleration depth used when the memory was created
     cdef SUNDIALS.SUNMatrix sun_matrix
     cdef SUNDIALS.SUNLinearSolver sun_linearsolver
     
@@ -89,7 +90,14 @@ cdef class KINSOL(Algebraic):
         self.options["no_min_epsilon"] = False #Specifies wheter the scaled linear residual is bounded from below
         self.options["max_beta_fails"] = 10
         self.options["max_krylov"] = 0
+        self.options["max_restarts"] = 0 #Maximum number of restarts (SPGMR, SPFGMR)
+        self.options["builtin_precond"] = "NONE" #Built-in preconditioner (BAND, BLOCK_JACOBI)
+        self.options["mupper"] = 0 #Upper half-bandwidth of the banded preconditioner
+        self.options["mlower"] = 0 #Lower half-bandwidth of the banded preconditioner
+        self.options["prec_blocks"] = None #Block sizes of the block-Jacobi preconditioner
         self.options["precond"] = PREC_NONE
+        self.options["num_threads"] = 1 #Number of threads used by the SPARSE linear solver
+        self.options["maa"] = 0 #Anderson acceleration depth (FP, PICARD)
         
         #Statistics
         self.statistics["nfevals"]    = 0 #Function evaluations
@@ -182,9 +190,10 @@ cdef class KINSOL(Algebraic):
     cdef initialize_kinsol(self):
         cdef int flag #Used for return
 
-        self.y_temp  = arr2nv(self.y)
-        self.y_scale = arr2nv([1.0]*self.problem_info["dim"])
-        self.f_scale = arr2nv([1.0]*self.problem_info["dim"])
+        if self.y_temp == NULL:
+            self.y_temp  = arr2nv(self.y)
+            self.y_scale = arr2nv([1.0]*self.problem_info["dim"])
+            self.f_scale = arr2nv([1.0]*self.problem_info["dim"])
    
         if self.kinsol_mem == NULL: #The solver is not initialized
             
@@ -194,6 +203,13 @@ cdef class KINSOL(Algebraic):
                 raise KINSOLError(KIN_MEM_NULL)
             self.pData.KIN_MEM = self.kinsol_mem
             
+            #The Anderson acceleration memory is allocated in KINInit. A depth
+            #larger than the number of unknowns gives rank-deficient least squares problems
+            flag = SUNDIALS.KINSetMAA(self.kinsol_mem, min(self.options["maa"], self.problem_info["dim"]))
+            if flag < 0:
+                raise KINSOLError(flag)
+            self._maa = self.options["maa"]
+            
             #Specify the residual and the initial conditions to the solver
             flag = SUNDIALS.KINInit(self.kinsol_mem, kin_res, self.y_temp)
             if flag < 0:
@@ -238,15 +254,67 @@ cdef class KINSOL(Algebraic):
                     flag = SUNDIALS.KINDlsSetDenseJacFn(self.kinsol_mem, kin_jac);
                 if flag < 0:
                     raise KINSOLError(flag)
-        elif self.options["linear_solver"] == "SPGMR":
+        elif self.options["linear_solver"] == "SPARSE":
+            if SUNDIALS.with_superlu() == 0:
+                raise AssimuloException("No support for SuperLU was detected, please verify that SuperLU and SUNDIALS has been installed correctly.")
+            if not self.problem_info["jac_fcn"]:
+                raise Exception("For the SPARSE linear solver, the Jacobian must be provided.")
+            if self.problem_info["jac_fcn_nnz"] == -1:
+                raise Exception("Need to specify the number of non zero elements in the Jacobian via the option 'jac_nnz'")
+            
+            IF SUNDIALS_VERSION >= (3,0,0):
+                #Create a sparse Sundials matrix and the SuperLU_MT linear solver
+                self.sun_matrix = SUNDIALS.SUNSparseMatrix(self.pData.dim, self.pData.dim, self.problem_info["jac_fcn_nnz"], CSC_MAT)
+                self.sun_linearsolver = SUNDIALS.SUNSuperLUMT(self.y_temp, self.sun_matrix, self.options["num_threads"])
+                #Attach it to Kinsol
+                flag = SUNDIALS.KINDlsSetLinearSolver(self.kinsol_mem, self.sun_linearsolver, self.sun_matrix)
+            ELSE:
+                flag = SUNDIALS.KINSuperLUMT(self.kinsol_mem, self.options["num_threads"], self.pData.dim, self.problem_info["jac_fcn_nnz"])
+            if flag < 0:
+                raise KINSOLError(flag)
+            
+            IF SUNDIALS_VERSION >= (3,0,0):
+                flag = SUNDIALS.KINDlsSetJacFn(self.kinsol_mem, kin_jac_sparse)
+            ELSE:
+                flag = SUNDIALS.KINSlsSetSparseJacFn(self.kinsol_mem, kin_jac_sparse)
+            if flag < 0:
+                raise KINSOLError(flag)
+        elif self.options["linear_solver"] in KRYLOV_SOLVERS:
+            #The built-in preconditioners require a preconditioning type
+            pretype = self.options["precond"]
+            if self.options["builtin_precond"] != "NONE" and pretype == PREC_NONE:
+                pretype = PREC_RIGHT
+            
             IF SUNDIALS_VERSION >= (3,0,0):
                 #Create the linear solver
-                self.sun_linearsolver = SUNDIALS.SUNSPGMR(self.y_temp, self.options["precond"], self.options["max_krylov"])
+                if self.options["linear_solver"] == "SPGMR":
+                    self.sun_linearsolver = SUNDIALS.SUNSPGMR(self.y_temp, pretype, self.options["max_krylov"])
+                    flag = SUNDIALS.SUNSPGMRSetMaxRestarts(self.sun_linearsolver, self.options["max_restarts"])
+                    if flag < 0:
+                        raise KINSOLError(flag)
+                elif self.options["linear_solver"] == "SPFGMR":
+                    self.sun_linearsolver = SUNDIALS.SUNSPFGMR(self.y_temp, pretype, self.options["max_krylov"])
+                    flag = SUNDIALS.SUNSPFGMRSetMaxRestarts(self.sun_linearsolver, self.options["max_restarts"])
+                    if flag < 0:
+                        raise KINSOLError(flag)
+                elif self.options["linear_solver"] == "SPBCGS":
+                    self.sun_linearsolver = SUNDIALS.SUNSPBCGS(self.y_temp, pretype, self.options["max_krylov"])
+                else:
+                    self.sun_linearsolver = SUNDIALS.SUNSPTFQMR(self.y_temp, pretype, self.options["max_krylov"])
                 #Attach it to Kinsol
                 flag = SUNDIALS.KINSpilsSetLinearSolver(self.kinsol_mem, self.sun_linearsolver)
             ELSE:
-                #Specify the use of KINSpgmr linear solver.
-                flag = SUNDIALS.KINSpgmr(self.kinsol_mem, self.options["max_krylov"])
+                #Specify the use of the iterative linear solver.
+                if self.options["linear_solver"] == "SPGMR":
+                    flag = SUNDIALS.KINSpgmr(self.kinsol_mem, self.options["max_krylov"])
+                    if flag >= 0:
+                        flag = SUNDIALS.KINSpilsSetMaxRestarts(self.kinsol_mem, self.options["max_restarts"])
+                elif self.options["linear_solver"] == "SPBCGS":
+                    flag = SUNDIALS.KINSpbcg(self.kinsol_mem, self.options["max_krylov"])
+                elif self.options["linear_solver"] == "SPTFQMR":
+                    flag = SUNDIALS.KINSptfqmr(self.kinsol_mem, self.options["max_krylov"])
+                else:
+                    raise Exception("The linear solver 'SPFGMR' requires SUNDIALS 3.0 or newer.")
             if flag < 0:
                 raise KINSOLError(flag)
             
@@ -255,7 +323,19 @@ cdef class KINSOL(Algebraic):
                 if flag < 0:
                     raise KINSOLError(flag)
             
-            if self.problem_info["prec_setup"] or self.problem_info["prec_solve"]:
+            if self.options["builtin_precond"] == "BAND":
+                flag = SUNDIALS.KINBBDPrecInit(self.kinsol_mem, self.pData.dim, self.options["mupper"], self.options["mlower"],
+                                               self.options["mupper"], self.options["mlower"], 0.0, kin_bbd_local, NULL)
+                if flag < 0:
+                    raise KINSOLError(flag)
+            elif self.options["builtin_precond"] == "BLOCK_JACOBI":
+                if self.options["prec_blocks"] is None:
+                    raise Exception("The block-Jacobi preconditioner requires the block sizes to be set via the option 'prec_blocks'.")
+                self.pData.BJ = BlockJacobiPreconditioner(self.options["prec_blocks"])
+                flag = SUNDIALS.KINSpilsSetPreconditioner(self.kinsol_mem, kin_bj_prec_setup, kin_bj_prec_solve)
+                if flag < 0:
+                    raise KINSOLError(flag)
+            elif self.problem_info["prec_setup"] or self.problem_info["prec_solve"]:
                 if not self.problem_info["prec_setup"]:
                     flag = SUNDIALS.KINSpilsSetPreconditioner(self.kinsol_mem, NULL,kin_prec_solve)
                     if flag < 0:
@@ -352,24 +432,65 @@ cdef class KINSOL(Algebraic):
         else:
             return 3
     
+    cdef free_kinsol(self):
+        """
+        Frees the Kinsol memory together with the attached linear solver.
+        """
+        if self.kinsol_mem != NULL:
+            SUNDIALS.KINFree(&self.kinsol_mem)
+            self.kinsol_mem = NULL
+            
+        IF SUNDIALS_VERSION >= (3,0,0):
+            if self.sun_matrix != NULL:
+                SUNDIALS.SUNMatDestroy(self.sun_matrix)
+                self.sun_matrix = NULL
+                
+            if self.sun_linearsolver != NULL:
+                SUNDIALS.SUNLinSolFree(self.sun_linearsolver)
+                self.sun_linearsolver = NULL
+        
+        self._added_linear_solver = False
+    
     cpdef _solve(self, y0=None):
         """
         Solves the system.
         """
+        #A changed Anderson acceleration depth requires new Kinsol memory
+        if self.options["maa"] != self._maa:
+            self.free_kinsol()
+            self.initialize_kinsol()
+        
         if y0 is not None:
             arr2nv_inplace(y0, self.y_temp)
         else:
             arr2nv_inplace(self.y, self.y_temp)
             
-        if not self._added_linear_solver:
+        #The Picard iteration uses the Jacobian as the linear part of the system
+        if self.options["strategy"] == KIN_PICARD:
+            if self.options["linear_solver"] in ("DENSE", "SPARSE") and not self.problem_info["jac_fcn"]:
+                raise AssimuloException("The Picard iteration requires the Jacobian (problem.jac) as the linear part of the system.")
+            if self.options["linear_solver"] not in ("DENSE", "SPARSE") and not self.problem_info["jacv_fcn"]:
+                raise AssimuloException("The Picard iteration with an iterative linear solver requires the Jacobian times vector function (problem.jacv) as the linear part of the system.")
+        
+        #The fixed point iteration does not use a linear solver
+        if not self._added_linear_solver and self.options["strategy"] != KIN_FP:
             self.add_linear_solver()
+        
+        #The fixed point iteration is formulated as y = G(y) = y - F(y)
+        flag = SUNDIALS.KINSetSysFunc(self.kinsol_mem, kin_res_fp if self.options["strategy"] == KIN_FP else kin_res)
+        if flag < 0:
+            raise KINSOLError(flag)
             
         #Update the solver options
         self.update_options()
         
+        self.pData.exception = None
         flag = SUNDIALS.KINSol(self.kinsol_mem, self.y_temp, self.options["strategy"], self.y_scale, self.f_scale)
         self.y = nv2arr(self.y_temp)
         
+        if self.pData.exception is not None:
+            exception, self.pData.exception = self.pData.exception, None
+            raise exception
         if flag < 0:
             raise KINSOLError(flag)
         if flag == KIN_STEP_LT_STPTOL:
@@ -396,7 +517,7 @@ cdef class KINSOL(Algebraic):
         cdef int flag
         cdef long int nfevalsLS, njevals, nbacktr, nbcfails, nniters
         cdef long int nliters, nlcfails, npevals, npsolves
-        cdef long int nfevals
+        cdef long int nfevals, nfevalsBP = 0
         
         flag = SUNDIALS.KINGetNumFuncEvals(self.kinsol_mem, &nfevals)
         if flag < 0:
@@ -418,7 +539,9 @@ cdef class KINSOL(Algebraic):
             raise KINSOLError(flag)
         self.statistics["nbcfails"] = nbcfails
         
-        if self.options["linear_solver"] == "SPGMR":
+        if not self._added_linear_solver:
+            pass
+        elif self.options["linear_solver"] in KRYLOV_SOLVERS:
             
             flag = SUNDIALS.KINSpilsGetNumLinIters(self.kinsol_mem, &nliters)
             if flag < 0:
@@ -448,7 +571,15 @@ cdef class KINSOL(Algebraic):
             flag = SUNDIALS.KINSpilsGetNumFuncEvals(self.kinsol_mem, &nfevalsLS)
             if flag < 0:
                 raise KINSOLError(flag)
-            self.statistics["nfevalsLS"] = nfevalsLS
+            
+            #Function evaluations due to the built-in preconditioners
+            if self.options["builtin_precond"] == "BAND":
+                flag = SUNDIALS.KINBBDPrecGetNumGfnEvals(self.kinsol_mem, &nfevalsBP)
+                if flag < 0:
+                    raise KINSOLError(flag)
+            elif self.options["builtin_precond"] == "BLOCK_JACOBI" and self.pData.BJ is not None:
+                nfevalsBP = self.pData.BJ.nfevals
+            self.statistics["nfevalsLS"] = nfevalsLS + nfevalsBP
             
         elif self.options["linear_solver"] == "DENSE":
         
@@ -462,6 +593,15 @@ cdef class KINSOL(Algebraic):
                 raise KINSOLError(flag)
             self.statistics["nfevalsLS"] = nfevalsLS
         
+        elif self.options["linear_solver"] == "SPARSE":
+            
+            IF SUNDIALS_VERSION >= (3,0,0):
+                flag = SUNDIALS.KINDlsGetNumJacEvals(self.kinsol_mem, &njevals)
+            ELSE:
+                flag = SUNDIALS.KINSlsGetNumJacEvals(self.kinsol_mem, &njevals)
+            if flag < 0:
+                raise KINSOLError(flag)
+            self.statistics["njevals"] = njevals
             
     def print_statistics(self, verbose=NORMAL):
         """
@@ -474,7 +614,9 @@ cdef class KINSOL(Algebraic):
         self.log_message(' Number of Backtrack Operations (Linesearch) : '+ str(self.statistics["nbacktr"]),   verbose) #The function KINGetNumBacktrackOps returns the number of backtrack operations (step length adjustments) performed by the line search algorithm.
         self.log_message(' Number of Beta-condition Failures           : '+ str(self.statistics["nbcfails"]),  verbose) #The function KINGetNumBetaCondFails returns the number of β-condition failures.
         
-        if self.options["linear_solver"] == "SPGMR":
+        if not self._added_linear_solver:
+            pass
+        elif self.options["linear_solver"] in KRYLOV_SOLVERS:
             self.log_message(' Number of Jacobian*Vector Evaluations       : '+ str(self.statistics["njevals"]),   verbose)
             self.log_message(' Number of F-Eval During Jac*Vec-Eval        : '+ str(self.statistics["nfevalsLS"]), verbose)
             self.log_message(' Number of Linear Iterations                 : '+ str(self.statistics["nliters"]), verbose)
@@ -482,12 +624,16 @@ cdef class KINSOL(Algebraic):
         elif self.options["linear_solver"] == "DENSE":
             self.log_message(' Number of Jacobian evaluations              : '+ str(self.statistics["njevals"]),   verbose)
             self.log_message(' Number of F-eval during Jac-eval            : '+ str(self.statistics["nfevalsLS"]), verbose)
+        elif self.options["linear_solver"] == "SPARSE":
+            self.log_message(' Number of Jacobian evaluations              : '+ str(self.statistics["njevals"]),   verbose)
         
     
         self.log_message('\nSolver options:\n',                                     verbose)
         self.log_message(' Solver                  : Kinsol',                       verbose)
-        self.log_message(' Linear Solver           : ' + str(self.options["linear_solver"]),                       verbose)
-        self.log_message(' Globalization Strategy  : ' + ("LINESEARCH" if self.options["strategy"]==1 else "NONE"),                       verbose)
+        self.log_message(' Linear Solver           : ' + (str(self.options["linear_solver"]) if self._added_linear_solver else "NONE"),                       verbose)
+        self.log_message(' Globalization Strategy  : ' + {KIN_NONE: "NONE", KIN_LINESEARCH: "LINESEARCH", KIN_PICARD: "PICARD", KIN_FP: "FP"}[self.options["strategy"]],                       verbose)
+        if self.options["strategy"] == KIN_FP or self.options["strategy"] == KIN_PICARD:
+            self.log_message(' Anderson Depth          : ' + str(self.options["maa"]),  verbose)
         self.log_message(' Function Tolerances     : ' + str(self.options["ftol"]),  verbose)
         self.log_message(' Step Tolerances         : ' + str(self.options["stol"]),  verbose)
         self.log_message(' Variable Scaling        : ' + str(self.options["y_scale"]),  verbose)
@@ -589,10 +735,10 @@ cdef class KINSOL(Algebraic):
     max_beta_fails = property(_get_max_beta_fails_method,_set_max_beta_fails_method)
     
     def _set_linear_solver(self, lsolver):
-        if lsolver.upper() == "DENSE" or lsolver.upper() == "SPGMR":
+        if lsolver.upper() == "DENSE" or lsolver.upper() == "SPARSE" or lsolver.upper() in KRYLOV_SOLVERS:
             self.options["linear_solver"] = lsolver.upper()
         else:
-            raise Exception('The linear solver must be either "DENSE" or "SPGMR".')
+            raise Exception('The linear solver must be either "DENSE", "SPARSE", "SPGMR", "SPBCGS", "SPTFQMR" or "SPFGMR".')
         
     def _get_linear_solver(self):
         """
@@ -601,19 +747,53 @@ cdef class KINSOL(Algebraic):
             Parameters::
             
                 linearsolver
-                        - Default 'DENSE'. Can also be 'SPGMR'.
+                        - Default 'DENSE'. Can also be 'SPARSE' or one
+                          of the iterative solvers 'SPGMR', 'SPBCGS', 
+                          'SPTFQMR' or 'SPFGMR' (requires SUNDIALS >= 3.0).
+                          
+                          'SPARSE' uses SuperLU_MT and requires the 
+                          Jacobian to be returned on Scipy's CSC format
+                          together with the number of non zero elements
+                          specified via the problem attribute 'jac_nnz'.
         """
         return self.options["linear_solver"]
     
     linear_solver = property(_get_linear_solver, _set_linear_solver)
     
+    def _set_number_threads(self, num_threads):
+        try:
+            self.options["num_threads"] = int(num_threads)
+        except:
+            raise Exception("The number of threads should be an integer.")
+        if self.options["num_threads"] < 1:
+            raise Exception("The number of threads should be a positive integer.")
+    
+    def _get_number_threads(self):
+        """
+        Specifies the number of threads used by the SPARSE linear solver.
+        
+            Parameters::
+            
+                num_threads
+                        - Default 1
+                        
+                        - Should be a positive integer.
+        """
+        return self.options["num_threads"]
+    
+    num_threads = property(_get_number_threads, _set_number_threads)
+    
     def _set_globalization_strategy(self, lsolver):
         if lsolver.upper() == "LINESEARCH":
-            self.options["strategy"] = KIN_LINSEARCH
+            self.options["strategy"] = KIN_LINESEARCH
         elif lsolver.upper() == "NONE":
             self.options["strategy"] = KIN_NONE
+        elif lsolver.upper() == "PICARD":
+            self.options["strategy"] = KIN_PICARD
+        elif lsolver.upper() == "FP":
+            self.options["strategy"] = KIN_FP
         else:
-            raise Exception('The linear solver must be either "LINESEARCH" or "NONE".')
+            raise Exception('The globalization strategy must be either "LINESEARCH", "NONE", "PICARD" or "FP".')
         
     def _get_globalization_strategy(self):
         """
@@ -623,11 +803,52 @@ cdef class KINSOL(Algebraic):
             
                 linearsolver
                         - Default 'LINSEARCH'. Can also be 'NONE'.
+                        
+                        - 'FP' uses a fixed point iteration, 
+                          y = y - F(y), which requires neither a
+                          Jacobian nor a linear solver.
+                          
+                        - 'PICARD' uses a Picard iteration where the
+                          Jacobian (problem.jac) is the constant linear
+                          part of the system. It requires problem.jac, or
+                          problem.jacv for the iterative linear solvers.
+                          
+                        - Both 'FP' and 'PICARD' can be combined with
+                          Anderson acceleration, see anderson_depth.
         """
         return self.options["strategy"]
     
     globalization_strategy = property(_get_globalization_strategy, _set_globalization_strategy)
     
+    def _set_anderson_depth(self, maa):
+        try:
+            self.options["maa"] = int(maa)
+        except:
+            raise Exception("The Anderson acceleration depth should be an integer.")
+        if self.options["maa"] < 0:
+            raise Exception("The Anderson acceleration depth should be a positive integer.")
+    
+    def _get_anderson_depth(self):
+        """
+        Specifies the number of previous iterates used by the Anderson
+        acceleration of the 'FP' and 'PICARD' iterations. Zero means
+        that no acceleration is used.
+        
+            Parameters::
+            
+                anderson_depth
+                        - Default 0
+                        
+                        - Should be a positive integer smaller than
+                          max_iter. A depth larger than the number of
+                          unknowns is reduced to the number of unknowns.
+        
+        See SUNDIALS documentation 'KINSetMAA'
+        """
+        return self.options["maa"]
+    
+    anderson_depth = property(_get_anderson_depth, _set_anderson_depth)
+    
     def _set_max_krylov(self, max_krylov):
         try:
             self.options["max_krylov"] = int(max_krylov)
@@ -656,6 +877,161 @@ cdef class KINSOL(Algebraic):
     
     max_dim_krylov_subspace = property(_get_max_krylov, _set_max_krylov)
     
+    def _set_max_restarts(self, max_restarts):
+        try:
+            self.options["max_restarts"] = int(max_restarts)
+        except:
+            raise Exception("Maximum number of restarts should be an integer.")
+        if self.options["max_restarts"] < 0:
+            raise Exception("Maximum number of restarts should be a positive integer.")
+            
+    def _get_max_restarts(self):
+        """
+        Specifies the maximum number of restarts for the linear solvers
+        'SPGMR' and 'SPFGMR'.
+        
+            Parameters::
+            
+                    max_restarts
+                            - A positive integer.
+                            - Default 0
+            
+            Returns::
+            
+                The current value of max_restarts.
+                
+        See SUNDIALS documentation 'KINSpilsSetMaxRestarts'
+        """
+        return self.options["max_restarts"]
+    
+    max_restarts = property(_get_max_restarts, _set_max_restarts)
+    
+    def _set_builtin_precond(self, precond):
+        if str(precond).upper() in ["NONE", "BAND", "BLOCK_JACOBI"]:
+            self.options["builtin_precond"] = str(precond).upper()
+        else:
+            raise Exception('The built-in preconditioner must be either "NONE", "BAND" or "BLOCK_JACOBI".')
+    
+    def _get_builtin_precond(self):
+        """
+        Specifies a built-in preconditioner to be used together with the
+        iterative linear solvers. The built-in preconditioners are
+        computed and applied entirely in C, using difference quotients
+        of the residual. If set, a user-defined prec_setup/prec_solve is
+        not used.
+        
+            Parameters::
+            
+                    builtin_precond
+                            - Should be either "NONE", "BAND" or
+                              "BLOCK_JACOBI".
+                            
+                              "BAND" uses a banded preconditioner with
+                              half-bandwidths mupper and mlower.
+                              
+                              "BLOCK_JACOBI" uses a block-diagonal
+                              preconditioner with blocks given by 
+                              prec_blocks.
+                            - Default "NONE"
+            
+            Returns::
+            
+                The current value of builtin_precond.
+                
+        See SUNDIALS documentation 'KINBBDPrecInit'
+        """
+        return self.options["builtin_precond"]
+    
+    builtin_precond = property(_get_builtin_precond, _set_builtin_precond)
+    
+    def _set_mupper(self, mupper):
+        try:
+            self.options["mupper"] = int(mupper)
+        except:
+            raise Exception("The upper half-bandwidth should be an integer.")
+        if self.options["mupper"] < 0:
+            raise Exception("The upper half-bandwidth should be a positive integer.")
+    
+    def _get_mupper(self):
+        """
+        Specifies the upper half-bandwidth used by the built-in banded
+        preconditioner.
+        
+            Parameters::
+            
+                    mupper
+                            - A positive integer.
+                            - Default 0
+            
+            Returns::
+            
+                The current value of mupper.
+        """
+        return self.options["mupper"]
+    
+    mupper = property(_get_mupper, _set_mupper)
+    
+    def _set_mlower(self, mlower):
+        try:
+            self.options["mlower"] = int(mlower)
+        except:
+            raise Exception("The lower half-bandwidth should be an integer.")
+        if self.options["mlower"] < 0:
+            raise Exception("The lower half-bandwidth should be a positive integer.")
+    
+    def _get_mlower(self):
+        """
+        Specifies the lower half-bandwidth used by the built-in banded
+        preconditioner.
+        
+            Parameters::
+            
+                    mlower
+                            - A positive integer.
+                            - Default 0
+            
+            Returns::
+            
+                The current value of mlower.
+        """
+        return self.options["mlower"]
+    
+    mlower = property(_get_mlower, _set_mlower)
+    
+    def _set_prec_blocks(self, blocks):
+        if blocks is None:
+            self.options["prec_blocks"] = None
+            return
+        try:
+            blocks = [int(b) for b in blocks]
+        except (ValueError, TypeError):
+            raise Exception("The block sizes should be a list of integers.")
+        if min(blocks) <= 0:
+            raise Exception("The block sizes should be positive integers.")
+        if sum(blocks) != self.problem_info["dim"]:
+            raise Exception("The block sizes must sum up to the dimension of the problem.")
+        self.options["prec_blocks"] = blocks
+    
+    def _get_prec_blocks(self):
+        """
+        Specifies the sizes of the consecutive diagonal blocks used by 
+        the built-in block-Jacobi preconditioner.
+        
+            Parameters::
+            
+                    prec_blocks
+                            - A list of positive integers summing up to
+                              the dimension of the problem.
+                            - Default None
+            
+            Returns::
+            
+                The current block sizes.
+        """
+        return self.options["prec_blocks"]
+    
+    prec_blocks = property(_get_prec_blocks, _set_prec_blocks)
+    
     def get_residual_norm_nonlinear_iterations(self): 
         return self.pData.nl_fnorm
         
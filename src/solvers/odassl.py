@@ -16,6 +16,7 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import numpy as np
+import scipy.sparse as sp
 
 from assimulo.ode import *
 from assimulo.support import set_type_shape_array
@@ -194,6 +195,39 @@ class ODASSL_Common(object):
         return self.options["usejac"]
     
     usejac = property(_get_usejac,_set_usejac)
+    
+    def _set_scaled_rows(self, rows):
+        if rows is None:
+            self.options["scaled_rows"] = None
+            return
+        try:
+            start, stop = [int(i) for i in rows]
+        except (ValueError, TypeError):
+            raise ODASSL_Exception('scaled_rows must be None or a tuple (start, stop) of integers.')
+        if not 0 <= start < stop <= self.problem_info["neq"]:
+            raise ODASSL_Exception('scaled_rows must satisfy 0 <= start < stop <= number of equations.')
+        self.options["scaled_rows"] = (start, stop)
+    
+    def _get_scaled_rows(self):
+        """
+        Defines the rows of the iteration matrix which are scaled to
+        unit two-norm before the factorization. For better results the
+        rows corresponding to the differential part should be scaled.
+        
+            Parameters::
+            
+                scaled_rows
+                        - Default: None (no scaling)
+                        
+                        - Should be a tuple (start, stop), the rows
+                          start, ..., stop-1 are scaled.
+                        
+                            Example:
+                                scaled_rows = (0, 4)
+        """
+        return self.options["scaled_rows"]
+    
+    scaled_rows = property(_get_scaled_rows, _set_scaled_rows)
 
 
 class ODASSL(ODASSL_Common, OverdeterminedDAE):
@@ -238,6 +272,7 @@ class ODASSL(ODASSL_Common, OverdeterminedDAE):
         self.options["usejac"]   = True if self.problem_info["jac_fcn"] else False
         self.options["maxsteps"] = 5000
         self.options["maxord"]   = 0
+        self.options["scaled_rows"] = None
 
         #Solver support
         self.supports["report_continuously"] = True
@@ -246,6 +281,9 @@ class ODASSL(ODASSL_Common, OverdeterminedDAE):
         
         #Internal
         self._leny = len(self.y) #Dimension of the problem
+        if not hasattr(self.problem, "neq"):
+            #The number of equations is determined once from the residual
+            self.problem_info["neq"] = len(set_type_shape_array(self.problem.res(self.t0, self.y0, self.yd0)))
         
     def initialize(self):
         #Reset statistics
@@ -254,15 +292,16 @@ class ODASSL(ODASSL_Common, OverdeterminedDAE):
     def integrate(self, t, y, yprime, tf, opts):
         ny  = self.problem_info["dim"]
         
-        neq = len(set_type_shape_array(self.problem.res(t,y,yprime)))
-        #neq = self.problem_info["neq"]
-        lrw = 40+8*ny + neq**2 + 3*neq
+        neq = self.problem_info["neq"]
+        maxord = self.options["maxord"] if self.options["maxord"] > 0 else 5
+        lrw = 40+(maxord+3)*ny + neq**2 + 3*neq
         rwork = np.zeros((lrw,))                                                
         liw = 22+neq
         iwork = np.zeros((liw,),np.int)                                                                          
-        jac_dummy = lambda t,x,xp: x
+        jac_dummy = lambda t,x,xp,cj: x
         info = np.zeros((15,),np.int) 
         info[1] = 1  # Tolerances are vectors  
+        info[4] = 1 if self.usejac else 0 # User-defined Jacobian
         info[2] = normal_mode = 1 if opts["output_list"] is None or opts["report_continuously"] else 0  # intermediate output mode
         info[6] = 1 if self.options["maxh"] > 0.0 else 0       
         rwork[1] = self.options["maxh"]            
@@ -270,9 +309,10 @@ class ODASSL(ODASSL_Common, OverdeterminedDAE):
         rwork[2] = self.options["inith"]
         info[8] =  1 if self.options["maxord"] > 0 else 0  
         iwork[2] = self.options["maxord"]                     
-        #info[11] will be set later (see Ticket #230)                        
-        #iwork[0] = ML
-        #iwork[1] = MU
+        if self.options["scaled_rows"] is not None:
+            info[11] = 1 # Row scaling of the iteration matrix
+            iwork[0] = self.options["scaled_rows"][0] + 1 # ML
+            iwork[1] = self.options["scaled_rows"][1]     # MU
          
         atol = self.options["atol"]
         rtol = set_type_shape_array(self.options["rtol"])
@@ -301,12 +341,20 @@ class ODASSL(ODASSL_Common, OverdeterminedDAE):
             return self.problem.res(t,y,yd)
         callback_residual = py_residual
         #----
+        
+        def py_jacobian(t,y,yd,cj):
+            #The iteration matrix is split into the first ny rows and the remaining
+            #neq-ny rows, for neq == ny the second part is a dummy row
+            jac = self.problem.jac(cj,t,y,yd)
+            jac = jac.toarray() if sp.issparse(jac) else np.asarray(jac)
+            return jac[:ny], jac[ny:] if neq > ny else np.zeros((1,ny))
+        callback_jacobian = py_jacobian if self.usejac else jac_dummy
         if opts["report_continuously"]:
             idid = 1
             while idid==1:
                 t,y,yprime,tf,info,idid,rwork,iwork = \
                    odassl.odassl(callback_residual,neq,ny,t,y,yprime,
-                        tf,info,rtol,atol,rwork,iwork,jac_dummy)
+                        tf,info,rtol,atol,rwork,iwork,callback_jacobian)
                 
                 initialize_flag = self.report_solution(t, y, yprime, opts)
                 if initialize_flag:
@@ -322,7 +370,7 @@ class ODASSL(ODASSL_Common, OverdeterminedDAE):
                 while idid==1:
                     t,y,yprime,tf,info,idid,rwork,iwork = \
                        odassl.odassl(callback_residual,neq,ny,t,y,yprime,
-                             tf,info,rtol,atol,rwork,iwork,jac_dummy)
+                             tf,info,rtol,atol,rwork,iwork,callback_jacobian)
                     
                     tlist.append(t)
                     ylist.append(y.copy())
@@ -337,7 +385,7 @@ class ODASSL(ODASSL_Common, OverdeterminedDAE):
                 for tout in output_list: 
                     t,y,yprime,tout,info,idid,rwork,iwork = \
                       odassl.odassl(callback_residual,neq,ny,t,y,yprime, \
-                             tout,info,rtol,atol,rwork,iwork,jac_dummy)
+                             tout,info,rtol,atol,rwork,iwork,callback_jacobian)
                     tlist.append(t)
                     ylist.append(y.copy())
                     ydlist.append(yprime.copy())
@@ -352,6 +400,7 @@ class ODASSL(ODASSL_Common, OverdeterminedDAE):
         self.statistics["nsteps"]      += iwork[10]
         self.statistics["nfcns"]        += iwork[11]
         self.statistics["njacs"]        += iwork[12]
+        self.statistics["nfcnjacs"]     += (iwork[12]*ny if not self.usejac else 0)
         self.statistics["nerrfails"]     += iwork[13]
         self.statistics["nnfails"]         += iwork[14]
         
@@ -24,9 +24,10 @@ from assimulo.ode import *
 import logging
 
 from assimulo.explicit_ode import Explicit_ODE
+from assimulo.support import rk_stages
 
 try:
-    from assimulo.lib.odepack import dlsodar, dcfode, dintdy
+    from assimulo.lib.odepack import dlsodar, dlsodes, dcfode
     from assimulo.lib.odepack import set_lsod_common, get_lsod_common
 except ImportError:
     sys.stderr.write("Could not find ODEPACK functions.\n")
@@ -42,6 +43,29 @@ def g_dummy(t,y):
 def jac_dummy(t,y):
     return N.zeros((len(y),len(y)))
 
+def _nordsieck_interpolate(t, yh, tcur, hcur, hu, y):
+    """
+    Evaluates the Nordsieck polynomial of the last step at the time(s) t,
+    the vectorized counterpart of ODEPACK's subroutine DINTDY (K=0). The
+    columns of yh are the scaled derivatives hcur**j/j!*y^(j)(tcur), 
+    j=0,...,nq. Times outside of the last step, [tcur-hu,tcur], give y.
+    Returns a vector for a scalar t and else an array with a row for 
+    each time.
+    """
+    times = N.array(t, dtype=N.double, ndmin=1)
+    s = ((times - tcur)/hcur).reshape(-1,1)
+    
+    dky = N.empty((len(times), yh.shape[0]))
+    dky[:] = yh[:,-1]
+    for j in range(yh.shape[1]-2,-1,-1):
+        dky *= s
+        dky += yh[:,j]
+    
+    tp = tcur - hu - 100.*N.finfo(N.double).eps*N.copysign(abs(tcur)+abs(hu), hu)
+    dky[(times-tp)*(times-tcur) > 0.] = y
+    
+    return dky if N.ndim(t) > 0 else dky[0]
+
 class LSODAR(Explicit_ODE):
     """
         LOSDAR is a multistep method for solving explicit ordinary 
@@ -78,24 +102,26 @@ class LSODAR(Explicit_ODE):
         self.options["maxordn"] = 12
         self.options["maxords"] =  5
         self.options["maxh"] = 0.
+        self.options["ml"] = None
+        self.options["mu"] = None
         
         self._leny = len(self.y) #Dimension of the problem
-        self._nordsieck_array = []
         self._nordsieck_order = 0
         self._nordsieck_time  = 0.0
         self._nordsieck_h  = 0.0
-        self._update_nordsieck = False
+        self._rkNordsieck = None
         
         # Solver support
         self.supports["state_events"] = True
         self.supports["report_continuously"] = True
         self.supports["interpolated_output"] = True
+        self.supports["step_trace"] = True
         
-        self._RWORK = N.array([0.0]*(22 + self.problem_info["dim"] * 
-                               max(16,self.problem_info["dim"]+9) + 
-                               3*self.problem_info["dimRoot"]))
+        self._RWORK = N.array([0.0]*self._get_lrw())
         self._IWORK = N.array([0]*(20 + self.problem_info["dim"]))
         
+        self.statistics.add_key("nstarterfcns", "Number of function evaluations in the RK starter")
+        
         
     def initialize(self):
         """
@@ -112,29 +138,54 @@ class LSODAR(Explicit_ODE):
         # Runge-Kutta starter will be started if desired (see options) 
         # only after an event occured.
         self._rkstarter_active = False
+        self._rkNordsieck = None
+        
+        #The size of the matrix part of RWORK depends on the band
+        if len(self._RWORK) != self._get_lrw():
+            self._RWORK = N.array([0.0]*self._get_lrw())
+        
+    def _get_lrw(self):
+        """
+        Returns the length of RWORK, the iteration matrix is stored either
+        full or band-packed with 2*ml+mu+1 rows.
+        """
+        dim = self.problem_info["dim"]
+        rows = dim if self._band is None else 2*self._band[0]+self._band[1]+1
+        
+        return 22 + dim*max(16,rows+9) + 3*self.problem_info["dimRoot"]
+    
+    def _get_band(self):
+        if self.options["ml"] is None and self.options["mu"] is None:
+            return None
+        ml = self.options["ml"] if self.options["ml"] is not None else 0
+        mu = self.options["mu"] if self.options["mu"] is not None else 0
+        return ml, mu
+    
+    _band = property(_get_band)
+        
+    def _get_dense_output_polynomial(self, t_left, t_right):
+        #The Nordsieck array of the step, scaled with HCUR around TCUR
+        return self._get_nordsieck_array().T.copy(), self._RWORK[12], self._RWORK[11]
+        
+    def _get_nordsieck_array(self):
+        """
+        Returns the Nordsieck history array of the last step as a view of
+        RWORK, with the nq+1 scaled derivatives as columns.
+        """
+        nordsieck_start_index = 21+3*self.problem_info["dimRoot"] - 1
+        nq = self._IWORK[14] #The current order, NQCUR
+        
+        return self._RWORK[nordsieck_start_index:nordsieck_start_index+(nq+1)*self._leny].reshape((self._leny,-1),order='F')
         
     def interpolate(self, t):
         """
         Helper method to interpolate the solution at time t using the Nordsieck history
-        array. Wrapper to ODEPACK's subroutine DINTDY.
+        array of the last step, see _nordsieck_interpolate. t can also be an array
+        of times, the result is then an array with a row for each time.
         """
-        #print 'interpolate at t={} and nyh={}'.format(t,self._nyh)
-        if self._update_nordsieck:
-            #Nordsieck start index
-            nordsieck_start_index = 21+3*self.problem_info["dimRoot"] - 1
-            
-            hu, nqu ,nq ,nyh, nqnyh = get_lsod_common()
-            self._nordsieck_array = \
-                     self._RWORK[nordsieck_start_index:nordsieck_start_index+(nq+1)*nyh].reshape((nyh,-1),order='F') 
-            self._nyh = nyh
-            self._update_nordsieck = False
-                    
-        dky, iflag = dintdy(t, 0, self._nordsieck_array, self._nyh)
-        if iflag!= 0 and iflag!=-2:
-            raise ODEPACK_Exception("DINTDY returned with iflag={} (see ODEPACK documentation).".format(iflag))   
-        elif iflag==-2:
-            dky=self.y.copy()
-        return dky
+        #RWORK(11-13) hold HU, HCUR and TCUR
+        return _nordsieck_interpolate(t, self._get_nordsieck_array(), self._RWORK[12], 
+                                      self._RWORK[11], self._RWORK[10], self.y)
      
     def autostart(self,t,y,sw0=[]):
         """
@@ -209,8 +260,10 @@ class LSODAR(Explicit_ODE):
             #H=self.autostart(t,y)
             #H=3*H
             # b) compute the Nordsieck array and put it into RWORK
-            rkNordsieck = RKStarterNordsieck(self.problem.rhs,H,number_of_steps=self.rkstarter)
-            t,nordsieck = rkNordsieck(t,y,self.sw)
+            if self._rkNordsieck is None or self._rkNordsieck.number_of_steps != self.rkstarter:
+                self._rkNordsieck = RKStarterNordsieck(self.problem.rhs,H,number_of_steps=self.rkstarter,problem=self.problem)
+            t,nordsieck = self._rkNordsieck(t,y,self.sw if self.problem_info["switches"] else None)
+            self.statistics["nstarterfcns"] += self._rkNordsieck.nfcns
             nordsieck=nordsieck.T
             nordsieck_start_index = 21+3*self.problem_info["dimRoot"] - 1
             RWORK[nordsieck_start_index:nordsieck_start_index+nordsieck.size] = \
@@ -249,11 +302,11 @@ class LSODAR(Explicit_ODE):
             #RWORK[6]=dls001.hmin
             #RWORK[5]=dls001.hmxi
             
-            number_of_fevals=N.array([1,2,4,7,11])
-            # d) Reset statistics
+            # d) Reset statistics, the evaluations of the starter are
+            #    counted in nstarterfcns
             IWORK[9:13]=[0]*4
             dls001.nst=1
-            dls001.nfe=number_of_fevals[self.rkstarter-1]   # from the starter
+            dls001.nfe=0
             dls001.nje=0
             dlsr01.nge=0
             # set common block
@@ -268,15 +321,48 @@ class LSODAR(Explicit_ODE):
     def _jacobian(self, t, y):
         """
         Calculates the Jacobian, either by an approximation or by the user
-        defined (jac specified in the problem class).
+        defined (jac specified in the problem class). If a band is set,
+        the Jacobian is returned band-packed.
         """
         jac = self.problem.jac(t,y)
         
+        if self._band is not None:
+            return self._band_packed(jac)
+        
         if isinstance(jac, sp.csc_matrix):
             jac = jac.toarray()
         
         return jac
     
+    def _band_packed(self, jac):
+        """
+        Stores the Jacobian in LINPACK band format, df(i)/dy(j) in row 
+        i-j+mu, with ml additional rows for the LU factors. The Jacobian
+        is either a sparse matrix, a full matrix or already band-packed
+        with ml+mu+1 rows. Elements outside the band are ignored.
+        """
+        ml, mu = self._band
+        dim = self.problem_info["dim"]
+        pd = N.zeros((2*ml+mu+1, dim))
+        
+        if sp.issparse(jac):
+            jac = sp.coo_matrix(jac)
+            jac.sum_duplicates()
+            inside = (jac.row-jac.col <= ml) & (jac.col-jac.row <= mu)
+            pd[jac.row[inside]-jac.col[inside]+mu, jac.col[inside]] = jac.data[inside]
+            return pd
+        
+        jac = N.array(jac, dtype=N.double, ndmin=2)
+        if jac.shape == (ml+mu+1, dim):
+            pd[:ml+mu+1,:] = jac
+        else:
+            for k in range(-ml, mu+1):
+                if k >= 0:
+                    pd[mu-k,k:] = N.diagonal(jac, k)
+                else:
+                    pd[mu-k,:dim+k] = N.diagonal(jac, k)
+        return pd
+    
     def integrate(self, t, y, tf, opts):
         ITOL  = 2 #Only  atol is a  vector
         ITASK = 5 #For one step mode and hitting exactly tcrit, normally tf
@@ -285,7 +371,11 @@ class LSODAR(Explicit_ODE):
         # provide work arrays and set common blocks (if needed)
         ISTATE, RWORK, IWORK = self.integrate_start( t, y)
         
-        JT = 1 if self.usejac else 2#Jacobian type indicator
+        #Jacobian type indicator, full (1,2) or banded (4,5)
+        if self._band is None:
+            JT = 1 if self.usejac else 2
+        else:
+            JT = 4 if self.usejac else 5
         JROOT = N.array([0]*self.problem_info["dimRoot"])
         
         #Setting work options
@@ -294,6 +384,8 @@ class LSODAR(Explicit_ODE):
         
         #Setting iwork options
         IWORK[5] = self.maxsteps
+        if self._band is not None:
+            IWORK[0], IWORK[1] = self._band
         
         #Setting maxord to IWORK
         IWORK[7] = self.maxordn
@@ -327,6 +419,10 @@ class LSODAR(Explicit_ODE):
         rtol = self.rtol*N.ones(self.problem_info["dim"])
         rhs = self.problem.rhs
         
+        #The counters of LSODAR start from zero in each call to integrate
+        if self._step_trace is not None:
+            self._step_trace.restart()
+        
         #if normal_mode == 0:
         if opts["report_continuously"] or opts["output_list"] is None:
             
@@ -337,7 +433,6 @@ class LSODAR(Explicit_ODE):
                         ITASK, ISTATE, IOPT, RWORK, IWORK, jac_fcn, JT, g_fcn, JROOT,
                         f_extra_args = rhs_extra_args, g_extra_args = g_extra_args)
                 
-                self._update_nordsieck = True
                 self._IWORK = IWORK
                 self._RWORK = RWORK
                 #hu, nqu ,nq ,nyh, nqnyh = get_lsod_common()
@@ -346,6 +441,10 @@ class LSODAR(Explicit_ODE):
                 #self._nyh = nyh              
                 self._event_info = roots
                 
+                #A new Jacobian is always evaluated together with a new LU
+                if self._step_trace is not None:
+                    self._step_trace.record(t, RWORK[10], IWORK[13], njacs=IWORK[12], nlus=IWORK[12])
+                
                 if opts["report_continuously"]:
                     flag_initialize = self.report_solution(t, y, opts)
                     if flag_initialize:
@@ -366,36 +465,47 @@ class LSODAR(Explicit_ODE):
             
         else:
             
-            #Change the ITASK
-            ITASK = 4 #For computation of yout
-            
             output_index = opts["output_index"]
-            output_list  = opts["output_list"][output_index:]
+            output_list  = opts["output_list"]
             
             flag = ID_PY_COMPLETE
-
-            for tout in output_list:
-                output_index += 1
-
-                y, t, ISTATE, RWORK, IWORK, roots = dlsodar(rhs, y.copy(), t, tout, ITOL, 
+            
+            #Take steps to tf and interpolate the output points passed in 
+            #each step together
+            while (ISTATE == 2 or ISTATE == 1) and t < tf:
+                
+                y, t, ISTATE, RWORK, IWORK, roots = dlsodar(rhs, y.copy(), t, tf, ITOL, 
                     rtol, atol,
                     ITASK, ISTATE, IOPT, RWORK, IWORK, jac_fcn, JT, g_fcn, JROOT,
                     f_extra_args = rhs_extra_args, g_extra_args = g_extra_args)
                 
-                #Store results
-                tlist.append(t)
-                ylist.append(y.copy())
+                self._IWORK = IWORK
+                self._RWORK = RWORK
                 self._event_info = roots
                 
-                #Checking return
-                if ISTATE == 2 and t >= tf:
-                    flag = ID_PY_COMPLETE
-                    break
-                elif ISTATE == 3:
+                if ISTATE < 0:
+                    raise ODEPACK_Exception("LSODAR failed with flag %d"%ISTATE)
+                
+                #Store results
+                output_end = N.searchsorted(output_list, t, side="right")
+                if output_end > output_index:
+                    tout = output_list[output_index:output_end]
+                    yout = self.interpolate(tout)
+                    #At tcrit, tn can be off by roundoff while y is y(tcrit)
+                    yout[tout == t] = y
+                    tlist.extend(tout)
+                    ylist.extend(yout)
+                    output_index = output_end
+                
+                if ISTATE == 3:
                     flag = ID_PY_EVENT
                     break
-                elif ISTATE < 0:
-                    raise ODEPACK_Exception("LSODAR failed with flag %d"%ISTATE)
+            
+            #Store the point where the integration stopped (event or tf) 
+            #if it is not an output point
+            if len(tlist) == 0 or tlist[-1] != t:
+                tlist.append(t)
+                ylist.append(y.copy())
             
             opts["output_index"] = output_index
         # deciding on restarting options
@@ -450,6 +560,8 @@ class LSODAR(Explicit_ODE):
             self.log_message(' Maximal order BDF       : {}'.format(self.maxords),  verbose)
         if self.maxh > 0. :
             self.log_message(' Maximal stepsize maxh   : {}'.format(self.maxh),  verbose)
+        if self._band is not None:
+            self.log_message(' Jacobian                : banded (ml={}, mu={})'.format(*self._band),  verbose)
         self.log_message('',                                                         verbose)
     
     def _set_usejac(self, jac):
@@ -656,6 +768,60 @@ class LSODAR(Explicit_ODE):
         self.options["rkstarter"] = rkstarter
     
     rkstarter = property(_get_rkstarter, _set_rkstarter)
+    
+    def _get_ml(self):
+        """
+        The lower half-bandwidth of the Jacobian. If ml or mu is set,
+        the Jacobian is treated as banded, both by the difference 
+        quotients and when a user defined Jacobian is used. The user 
+        defined Jacobian can then be returned as a sparse matrix, as a
+        full matrix or band-packed, i.e. as an array with ml+mu+1 rows 
+        where df(i)/dy(j) is stored in row i-j+mu and column j.
+        
+            Parameters::
+            
+                ml
+                            - Default None (full Jacobian)
+                            
+                            - Should be a non-negative integer. If only
+                              one of ml and mu is set, the other is 0.
+        """
+        return self.options["ml"]
+    
+    def _set_ml(self, ml):
+        self.options["ml"] = self._check_bandwidth(ml)
+    
+    ml = property(_get_ml, _set_ml)
+    
+    def _get_mu(self):
+        """
+        The upper half-bandwidth of the Jacobian, see ml.
+        
+            Parameters::
+            
+                mu
+                            - Default None (full Jacobian)
+                            
+                            - Should be a non-negative integer. If only
+                              one of ml and mu is set, the other is 0.
+        """
+        return self.options["mu"]
+    
+    def _set_mu(self, mu):
+        self.options["mu"] = self._check_bandwidth(mu)
+    
+    mu = property(_get_mu, _set_mu)
+    
+    def _check_bandwidth(self, width):
+        if width is None:
+            return None
+        try:
+            width = int(width)
+        except (TypeError, ValueError):
+            raise ODEPACK_Exception("The half-bandwidth must be a non-negative integer.")
+        if width < 0 or width >= self.problem_info["dim"]:
+            raise ODEPACK_Exception("The half-bandwidth must be a non-negative integer less than the dimension of the problem.")
+        return width
 
 class RKStarterNordsieck(object):
     """
@@ -714,7 +880,7 @@ class RKStarterNordsieck(object):
                       [-0.1491588850008383,0.,19145766/113939551,8434687/36458574,2012005/39716421,8409989/57254530,10739409/94504714,0.,-3321/86525909,-30352753/150092385,0.,70257074/109630355,
                        0.,0.],
                       [0.03877310906055409,0.,3021245/89251943,5956469/58978530,851373/32201684,11559106/149527791,11325471/112382620,0.,-12983/235976962,17692261/82454251,0.,
-                       38892959/120069679,11804845./141497517]])]  
+                       38892959/120069679,11804845./141497517,0.]])]  
 
     co_ord_s=[[],[],[4],[4,6],[6,9,11]]                       
     b_s=[    N.array([1]),
@@ -725,7 +891,7 @@ class RKStarterNordsieck(object):
                        38892959/120069679,11804845./141497517,0.])] 
                                
     C_s=[    N.array([0.]),
-             N.array([0.]),
+             N.array([0.,1.]),
              N.array([0.,1./2,3./4,1.,1./2,1.]),
              N.array([0.,1./6,1./6,1./3,1./3,1.,1.,2./3,1.]),
              N.array([0.,1./20,3./40,3./20,1./4,7./28,1./4,2./4,1.,2./4,3./4,3./4,1.,1.])]    # C-values in Butcher tableau of 8-stages Runge-Kutta                           
@@ -743,7 +909,7 @@ class RKStarterNordsieck(object):
              N.array([[802./5625,68./225,-67./225,-143./5625,144./625,6./125],[699./5000,81./200,-39./200,99./5000,144./625,0.],[11./72,25./72,25./72,11./72,0.,0.]])]   
              
     C_n=[    N.array([0.]),
-             N.array([0.]),
+             N.array([0.,0.]),
              N.array([0.,1./2,1./2,1.]),
              N.array([0.,2./5,3./5,1.,1./2,1.])]
 
@@ -764,10 +930,22 @@ class RKStarterNordsieck(object):
                 [9./16,27./64,81./256,243./1024],
                 [1.,1.,1.,1.]])]
                       
+    # A matrices of the autonomous starters rk_like2-4, the stages are
+    # evaluated with the step size H/number_of_steps
+    A_g=[None, None,
+         N.array([[0.,0.],[1.,0.]]),
+         N.array([[0.,0.,0.,0.],[1.,0.,0.,0.],[1.,1.,0.,0.],[3./2.,0.,0.,0.]]),
+         N.array([[0.,0.,0.,0.,0.,0.],
+                  [1.,0.,0.,0.,0.,0.],
+                  [0.,2.,0.,0.,0.,0.],
+                  [3./4.,0.,9./4.,0.,0.,0.],
+                  [1./2.,1.,1./2.,2.,0.,0.],
+                  [1./12.,2.,1./4.,2./3.,2.,0.]])]
+                      
     scale=N.array([1, 1, 1/2., 1./6., 1./24., 1./120.]).reshape(-1,1)
     
     
-    def __init__(self,  rhs, H, method='RKs_f', eval_at=0., number_of_steps=4):
+    def __init__(self,  rhs, H, method='RKs_f', eval_at=0., number_of_steps=4, problem=None):
         """
         Initiates the Runge-Kutta Starter.
         
@@ -790,8 +968,14 @@ class RKStarterNordsieck(object):
                             - the number of steps :math:`(k)` to start the multistep method with
                               This will determine the initial order of the method, which is
                               :math:`k` for BDF methods and :math:`k+1` for Adams Moulton Methods   .
+                              
+                problem
+                            - the explicit problem of rhs (optional). Without switches
+                              the stages are then evaluated by its rhs_internal, see
+                              support.rk_stages.
         """
         self.f = rhs
+        self.problem = problem
         self.H = H
         self.method=method
         
@@ -801,92 +985,74 @@ class RKStarterNordsieck(object):
         self.eval_at = float(eval_at)
         if not self.eval_at == 0.:
            raise RKStarter_Exception("Parameter eval_at different from 0 not yet implemented.")
+        
+        # Rows of the Butcher tableau giving the equidistant states y[1:]
+        s = number_of_steps
+        self._coef_s = N.vstack((self.A_s[s-1][self.co_ord_s[s-1]], self.b_s[s-1]))
+        self._K = None
+        self._ytmp = None
+        self.nfcns = 0
+    
+    def _stage_buffers(self, stages, n):
+        """
+        Returns the preallocated stage derivative and stage value arrays.
+        """
+        if self._K is None or self._K.shape != (stages, n):
+            self._K = N.empty((stages, n))
+            self._ytmp = N.empty(n)
+        return self._K, self._ytmp
 
-    def RKs_f(self,t0,y0,sw0):
+    def RKs_f(self,t0,y0,args):
 
         s=self.number_of_steps
-        A_s,C_s,b_s,co_ord_s=self.A_s,self.C_s,self.b_s,self.co_ord_s
-        A_s=A_s[s-1]
-        C_s=C_s[s-1]
-        b_s=b_s[s-1]
-        co_ord_s=co_ord_s[s-1]
+        A_s=self.A_s[s-1]
+        C_s=self.C_s[s-1]
         H=(s-1)*self.H
-        K=N.zeros((N.size(A_s,0),len(y0)))
-        for i in range(N.size(A_s,0)):
-            K[i,:]=self.f(t0+C_s[i]*H,y0+H*N.dot(A_s[i,:],K),sw0)   
-        y=N.zeros((s,len(y0)))
+        K,ytmp=self._stage_buffers(A_s.shape[0],len(y0))
+        self.nfcns+=rk_stages(self.f,t0,y0,A_s,C_s,H,K,ytmp,args,self.problem)
+        y=N.empty((s,len(y0)))
         y[0,:]=y0
-        for i in range(1,s):
-            if i==s-1:
-                y[i,:]=y0+H*N.dot(b_s,K)
-            else:
-                y[i,:]=y0+H*N.dot(A_s[co_ord_s[i-1],:],K)
+        y[1:,:]=y0+H*N.dot(self._coef_s,K)
         return y    
-    def RKn_f(self,t0,y0,sw0):
+    def RKn_f(self,t0,y0,args):
         s=self.number_of_steps
         H=(s-1)*self.H
-        A_n,C_n,b_n=self.A_n,self.C_n,self.b_n
-        A_n=A_n[s-1]
-        C_n=C_n[s-1]
-        b_n=b_n[s-1]
-        
-        K=N.zeros((N.size(A_n,0),len(y0)))
-        for i in range(N.size(A_n,0)):
-            K[i,:]=self.f(t0+C_n[i]*H,y0+H*N.dot(A_n[i,:],K),sw0)
-        y=N.zeros((s,len(y0)))  
+        A_n=self.A_n[s-1]
+        C_n=self.C_n[s-1]
+        b_n=N.atleast_2d(self.b_n[s-1])
+        
+        K,ytmp=self._stage_buffers(A_n.shape[0],len(y0))
+        self.nfcns+=rk_stages(self.f,t0,y0,A_n,C_n,H,K,ytmp,args,self.problem)
+        y=N.empty((s,len(y0)))  
         y[0,:]=y0
-        for i in range(1,s):
-                y[i,:]=y0+H*N.dot(b_n[i-1],K)
+        y[1:,:]=y0+H*N.dot(b_n[:s-1],K)
         return y
   
-            
-    def rk_like4(self, t0, y0, sw0): 
-        """
-        rk_like computes Runge-Kutta stages
-        Note, the currently implementation is **only** correct for
-        autonomous systems.
+    def rk_like(self, t0, y0, args):
         """
-        f = lambda y: self.f(t0, y, sw0)
-        h = self.H/4.
-        k1 = h*f(y0)
-        k2 = h*f(y0 + k1)
-        k3 = h*f(y0 + 2. * k2)
-        k4 = h*f(y0 + 3./4. * k1 + 9./4. * k3)
-        k5 = h*f(y0 + k1/2. + k2 + k3/2. + 2. * k4)
-        k6 = h*f(y0+k1/12.+2. * k2 + k3/4. + 2./3. * k4 + 2. * k5)
-        return N.array([y0,k1,k2,k3,k4,k5,k6])
-    def rk_like3(self, t0, y0, sw0): 
-        """
-        rk_like computes Runge-Kutta stages
+        rk_like computes the Runge-Kutta stages of rk_like2-4, scaled with 
+        the step size H/number_of_steps.
         Note, the currently implementation is **only** correct for
         autonomous systems.
-
         """
-        f = lambda y: self.f(t0, y, sw0)
-        h = self.H/3.
-        k1 = h*f(y0)
-        k2 = h*f(y0 + k1)
-        k3 = h*f(y0 + k1+ k2)
-        k4 = h*f(y0 + 3./2. * k1)
-        return N.array([y0,k1,k2,k3,k4])
-    def rk_like2(self, t0, y0, sw0):
-        """
-        rk_like2 computes Runge-Kutta 2nd-stages
-        Note, the currently implementation is **only** correct for
-        autonomous systems.
-        """
-        f=lambda y: self.f(t0, y, sw0)
-        h=self.H/2.
-        k1=h*f(y0)
-        k2=h*f(y0+k1)
-        return N.array([y0,k1,k2])
-    def rk_like13(self, t0, y0, sw0):
+        A=self.A_g[self.number_of_steps]
+        h=self.H/self.number_of_steps
+        K,ytmp=self._stage_buffers(A.shape[0],len(y0))
+        self.nfcns+=rk_stages(self.f,t0,y0,A,N.zeros(A.shape[0]),h,K,ytmp,args,self.problem)
+        return N.vstack((y0,h*K))
+    def rk_like4(self, t0, y0, args): 
+        return self.rk_like(t0, y0, args)
+    def rk_like3(self, t0, y0, args): 
+        return self.rk_like(t0, y0, args)
+    def rk_like2(self, t0, y0, args):
+        return self.rk_like(t0, y0, args)
+    def rk_like13(self, t0, y0, args):
         """
         rk_like6 computes Runge-Kutta 8th-stages 
         """
         h = self.H
         self.Gamma_2=self.Gamma_0[3]
-        f=lambda y: self.f(t0 , y , sw0)
+        f=lambda y: self.f(t0 , y , *args)
         K=N.zeros((6,len(y0)))
         sol=N.zeros((3,len(y0)))
         b=N.zeros((2,len(y0)))          #remove the fifth stage value that is for error estimation
@@ -903,13 +1069,13 @@ class RKStarterNordsieck(object):
         nord[1,:] = h*K[0,:]
         nord[2:,:] = Sc.solve(self.A[self.number_of_steps],b)
         return nord     
-    def rk_like14(self, t0, y0, sw0):
+    def rk_like14(self, t0, y0, args):
         """
         rk_like6 computes Runge-Kutta 8th-stages 
         """
         h = self.H
         Gamma_2=self.Gamma_0[4]
-        f=lambda y: self.f(t0 , y , sw0)
+        f=lambda y: self.f(t0 , y , *args)
         K=N.zeros((8,len(y0)))
         sol=N.zeros((4,len(y0)))
         b=N.zeros((3,len(y0)))          #remove the fifth stage value that is for error estimation
@@ -926,13 +1092,13 @@ class RKStarterNordsieck(object):
         nord[1,:] = h*K[0,:]
         nord[2:,:] = Sc.solve(self.A[self.number_of_steps],b)
         return nord       
-    def rk_like15(self, t0, y0, sw0):
+    def rk_like15(self, t0, y0, args):
         """
         rk_like6 computes Runge-Kutta 5th-stages ****needs to be modified****
         """
         h = self.H
         Gamma_2=self.Gamma_0[5]
-        f=lambda y: self.f(t0 , y , sw0)
+        f=lambda y: self.f(t0 , y , *args)
         K=N.zeros((14,len(y0)))
         sol=N.zeros((8,len(y0)))
         b=N.zeros((4,len(y0)))          #remove the fifth stage value that is for error estimation
@@ -956,13 +1122,12 @@ class RKStarterNordsieck(object):
         nord=self.scale[:self.number_of_steps+1]*N.dot(self.Gamma_0[self.number_of_steps-1].T,k)
  
         return nord  
-    def Nordsieck_RKn(self,t0,y,sw0):
+    def Nordsieck_RKn(self,t0,y,yf):
         s=self.number_of_steps
         H=(s-1)*self.H
         co_nord=[N.array([1./2,1.]),N.array([2./5,3./5,1.])]
-        l=size(y,0)
+        l=N.size(y,0)
         y0=y[0,:]
-        yf=self.f(t0,y0,sw0)
         
         if l==3:
             co=N.array([co_nord[0]])
@@ -976,24 +1141,22 @@ class RKStarterNordsieck(object):
             nord=Sc.solve(nord_n[0:3,0:3],b)
         nord=N.vstack((y0,H*yf,nord[::-1]))       
         return nord
-    def Nordsieck_RKs(self,t0,y,sw0):
+    def Nordsieck_RKs(self,t0,y,yf):
         s=self.number_of_steps
         H=(s-1)*self.H
         co_nord=[N.array([1]),N.array([1./2,1]),N.array([1./3,2./3,1]),
                  N.array([1./4,2./4,3./4,1.])]
-        A=self.A
         y0=y[0,:]
-        yf=self.f(t0,y0,sw0)
         co=co_nord[s-2]
         co=N.array([co])
         b=y[1:]-y0-H*co.T*yf
-        nord=Sc.solve(A[s],b)
+        nord=Sc.solve(N.atleast_2d(self.A[s]),b)
         nord=N.vstack((y0,H*yf,nord))
         return nord
         
         
         
-    def __call__(self, t0 , y0, sw0=[]):
+    def __call__(self, t0 , y0, sw0=None):
         """
         Evaluates the Runge-Kutta starting values
         
@@ -1001,24 +1164,530 @@ class RKStarterNordsieck(object):
             
                 y0   
                     - starting value
+                    
+                sw0
+                    - the switches passed to the rhs function, None
+                      if the rhs function does not take switches
+        
+        The number of rhs evaluations of the call is stored in the
+        attribute nfcns.
         """
+        args = () if sw0 is None else (sw0,)
+        y0 = N.asarray(y0, dtype=N.double)
+        self.nfcns = 0
+        
         if self.method=='RK_G':
-        # We construct a call like: rk_like4(self, t0, y0, sw0) 
-            k=self.__getattribute__('rk_like{}'.format(self.number_of_steps))(t0, y0, sw0)
+        # We construct a call like: rk_like4(self, t0, y0, args) 
+            k=self.__getattribute__('rk_like{}'.format(self.number_of_steps))(t0, y0, args)
             t = t0+self.eval_at*self.H
             #t= t0 + self.H
             k=self.nordsieck(k)
             
         elif self.method=='RKs_f':
-            y=self.RKs_f(t0, y0, sw0)
+            y=self.RKs_f(t0, y0, args)
             t = t0+self.eval_at*self.H
-            k=self.Nordsieck_RKs(t0,y,sw0)
+            # the first stage is the rhs evaluated at (t0,y0)
+            k=self.Nordsieck_RKs(t0,y,self._K[0].copy())
 
         elif self.method=='RKn_f':
-            y=self.RKn_f(t0,y0,sw0)
+            y=self.RKn_f(t0,y0,args)
             t=t0+self.eval_at*self.H
-            k=self.Nordsieck_RKn(t0,y,sw0)
+            k=self.Nordsieck_RKn(t0,y,self._K[0].copy())
         return t,k 
 
 
                 
+
+class LSODES(Explicit_ODE):
+    """
+        LSODES is a multistep method for solving explicit ordinary 
+        differential equations on the form,
+        
+        .. math::
+    
+            \dot{y} = f(t,y), \quad y(t_0) = y_0.
+            
+        LSODES uses either an ADAMS method or a BDF method. In the BDF 
+        case the Jacobian is treated as a general sparse matrix, which is
+        factorized by a sparse direct solver. Its sparsity structure is 
+        taken from the user defined Jacobian (see usejac) or is 
+        determined by the solver through calls to the right-hand side.
+        The memory needed is thus proportional to the number of nonzero
+        elements of the Jacobian and its LU factors instead of the
+        square of the dimension.
+        
+        LSODES does not support state events (root functions), they are
+        ignored if the problem defines state_events. Use LSODAR for such
+        problems.
+        
+        LSODES is part of ODEPACK, http://www.netlib.org/odepack/opkd-sum
+    """
+
+    def __init__(self, problem):
+        """
+        Initiates the solver.
+        
+            Parameters::
+            
+                problem     
+                            - The problem to be solved. Should be an instance
+                              of the 'Explicit_Problem' class.
+        """
+        Explicit_ODE.__init__(self, problem) #Calls the base class
+        
+        #Default values
+        self.options["atol"]     = 1.0e-6*N.ones(self.problem_info["dim"]) #Absolute tolerance
+        self.options["rtol"]     = 1.0e-6 #Relative tolerance
+        self.options["usejac"]   = True if self.problem_info["jac_fcn"] else False
+        self.options["maxsteps"] = 100000
+        self.options["discr"]    = "BDF"
+        self.options["maxord"]   = 5
+        self.options["maxh"]     = 0.
+        
+        self._leny = len(self.y) #Dimension of the problem
+        self._RWORK = N.array([0.0])
+        self._IWORK = N.array([0], dtype=N.intc)
+        
+        # Solver support
+        self.supports["report_continuously"] = True
+        self.supports["interpolated_output"] = True
+        
+    def initialize(self):
+        """
+        Initializes the overall simulation process
+        (called before _simulate) 
+        """ 
+        #Reset statistics
+        self.statistics.reset()
+    
+    def _get_dense_output_polynomial(self, t_left, t_right):
+        #The Nordsieck array of the step, scaled with HCUR around TCUR
+        return self._get_nordsieck_array().T.copy(), self._RWORK[12], self._RWORK[11]
+    
+    def _get_nordsieck_array(self):
+        """
+        Returns the Nordsieck history array of the last step as a view of
+        RWORK, with the nq+1 scaled derivatives as columns.
+        """
+        nordsieck_start_index = self._IWORK[21] - 1 #LYH = IWORK(22)
+        nq = self._IWORK[14] #The current order, NQCUR
+        
+        return self._RWORK[nordsieck_start_index:nordsieck_start_index+(nq+1)*self._leny].reshape((self._leny,-1),order='F')
+    
+    def interpolate(self, t):
+        """
+        Helper method to interpolate the solution at time t using the Nordsieck history
+        array of the last step, see _nordsieck_interpolate. t can also be an array
+        of times, the result is then an array with a row for each time.
+        """
+        #RWORK(11-13) hold HU, HCUR and TCUR
+        return _nordsieck_interpolate(t, self._get_nordsieck_array(), self._RWORK[12], 
+                                      self._RWORK[11], self._RWORK[10], self.y)
+    
+    def _sparsity_structure(self, t, y):
+        """
+        Returns the sparsity structure of the user defined Jacobian at 
+        (t,y) as a CSC matrix. For a sparse Jacobian all stored elements 
+        are part of the structure, for a full Jacobian the nonzero 
+        elements.
+        """
+        jac = self.problem.jac(t,y)
+        
+        if sp.issparse(jac):
+            jac = sp.csc_matrix(jac)
+            jac.sum_duplicates()
+        else:
+            jac = sp.csc_matrix(N.array(jac, dtype=N.double, ndmin=2))
+        jac.sort_indices()
+        
+        return jac
+    
+    def _jacobian_column(self, t, y, j, pdj):
+        """
+        Loads column j (starting from 1) of the user defined Jacobian
+        into pdj, which is preset to zero by the solver. The columns are
+        requested in order and the Jacobian is evaluated for the first.
+        """
+        if j == 1:
+            jac = self.problem.jac(t,y)
+            self._jac = sp.csc_matrix(jac) if sp.issparse(jac) else \
+                        sp.csc_matrix(N.array(jac, dtype=N.double, ndmin=2))
+        
+        jac = self._jac
+        start, end = jac.indptr[j-1], jac.indptr[j]
+        pdj[jac.indices[start:end]] = jac.data[start:end]
+        
+        return pdj
+    
+    def _work_arrays(self, t, y):
+        """
+        Returns the method flag and the work arrays for a (re-)start of
+        the solver, with the sparsity structure in IWORK if the user
+        defined Jacobian is used.
+        """
+        dim = self.problem_info["dim"]
+        maxord = self.options["maxord"]
+        
+        if self.options["discr"] == "Adams":
+            MF = 10
+            nnz = 0
+        elif self.usejac:
+            MF = 21 #Structure in IA/JA, user defined Jacobian
+            structure = self._sparsity_structure(t, y)
+            nnz = structure.nnz
+        else:
+            MF = 222 #Structure and Jacobian from calls to the rhs
+            nnz = structure = None
+        
+        #Estimate of the work space, RWORK is enlarged in integrate if
+        #the sparse factorization needs more, which is then kept
+        lrw = 20 + (maxord+4)*dim
+        if MF != 10:
+            nnz = nnz if nnz is not None else 10*dim
+            lrw += 3*nnz + 20*dim
+        RWORK = N.zeros(max(lrw, self._RWORK.size))
+        
+        if MF == 21:
+            IWORK = N.zeros(31+dim+nnz, dtype=N.intc)
+            IWORK[30:31+dim] = structure.indptr+1
+            IWORK[31+dim:]   = structure.indices+1
+        else:
+            IWORK = N.zeros(30, dtype=N.intc)
+        
+        return MF, RWORK, IWORK
+    
+    def integrate(self, t, y, tf, opts):
+        ITOL  = 2 #Only  atol is a  vector
+        ITASK = 5 #For one step mode and hitting exactly tcrit, normally tf
+        IOPT  = 1 #optional inputs are used
+        ISTATE = 1 #(Re-)start of the integration
+        
+        MF, RWORK, IWORK = self._work_arrays(t, y)
+        
+        #Setting work options
+        RWORK[0] = tf #Do not integrate past tf
+        RWORK[5] = self.options["maxh"]
+        
+        #Setting iwork options
+        IWORK[4] = self.options["maxord"]
+        IWORK[5] = self.maxsteps
+        
+        jac_fcn = self._jacobian_column if MF == 21 else jac_dummy
+        
+        #Extra args to rhs
+        rhs_extra_args = (self.sw,) if self.problem_info["switches"] else ()
+        
+        #Store the opts
+        self._opts = opts
+        
+        #Outputs
+        tlist = []
+        ylist = []
+        
+        #Tolerances:
+        atol = self.atol
+        rtol = self.rtol*N.ones(self.problem_info["dim"])
+        rhs = self.problem.rhs
+        
+        def call_dlsodes(y, t, tout, ITASK, ISTATE, RWORK, IWORK):
+            y, t, ISTATE, RWORK, IWORK = dlsodes(rhs, y.copy(), t, tout, ITOL, rtol, atol,
+                    ITASK, ISTATE, IOPT, RWORK, IWORK, jac_fcn, MF,
+                    f_extra_args = rhs_extra_args)
+            
+            #Restart with more work space if the sparse factorization
+            #needs more than estimated (nothing is done by the solver)
+            while ISTATE == -3 and IWORK[16] > len(RWORK):
+                RWORK = N.append(RWORK, N.zeros(max(IWORK[16],2*len(RWORK))-len(RWORK)))
+                y, t, ISTATE, RWORK, IWORK = dlsodes(rhs, y.copy(), t, tout, ITOL, rtol, atol,
+                        ITASK, 1, IOPT, RWORK, IWORK, jac_fcn, MF,
+                        f_extra_args = rhs_extra_args)
+            
+            self._RWORK = RWORK
+            self._IWORK = IWORK
+            
+            return y, t, ISTATE, RWORK, IWORK
+        
+        if opts["report_continuously"] or opts["output_list"] is None:
+            
+            flag = ID_PY_COMPLETE
+            
+            while (ISTATE == 2 or ISTATE == 1) and t < tf:
+            
+                y, t, ISTATE, RWORK, IWORK = call_dlsodes(y, t, tf, ITASK, ISTATE, RWORK, IWORK)
+                
+                if ISTATE < 0:
+                    raise ODEPACK_Exception("LSODES failed with flag %d"%ISTATE)
+                
+                if opts["report_continuously"]:
+                    flag_initialize = self.report_solution(t, y, opts)
+                    if flag_initialize:
+                        #If a step event has occured the integration has to be reinitialized
+                        flag = ID_PY_EVENT
+                        break
+                else:
+                    #Store results
+                    tlist.append(t)
+                    ylist.append(y.copy())
+            
+        else:
+            
+            output_index = opts["output_index"]
+            output_list  = opts["output_list"]
+            
+            flag = ID_PY_COMPLETE
+            
+            #Take steps to tf and interpolate the output points passed in 
+            #each step together
+            while (ISTATE == 2 or ISTATE == 1) and t < tf:
+                
+                y, t, ISTATE, RWORK, IWORK = call_dlsodes(y, t, tf, ITASK, ISTATE, RWORK, IWORK)
+                
+                if ISTATE < 0:
+                    raise ODEPACK_Exception("LSODES failed with flag %d"%ISTATE)
+                
+                #Store results
+                output_end = N.searchsorted(output_list, t, side="right")
+                if output_end > output_index:
+                    tout = output_list[output_index:output_end]
+                    yout = self.interpolate(tout)
+                    #At tcrit, tn can be off by roundoff while y is y(tcrit)
+                    yout[tout == t] = y
+                    tlist.extend(tout)
+                    ylist.extend(yout)
+                    output_index = output_end
+            
+            #Store the point where the integration stopped if it is not 
+            #an output point
+            if len(tlist) == 0 or tlist[-1] != t:
+                tlist.append(t)
+                ylist.append(y.copy())
+            
+            opts["output_index"] = output_index
+        
+        #Retrieving statistics
+        self.statistics["nsteps"]        += IWORK[10]
+        self.statistics["nfcns"]         += IWORK[11]
+        self.statistics["njacs"]         += IWORK[12]
+        self.statistics["nlus"]          += IWORK[20]
+       
+        return flag, tlist, ylist
+        
+    def get_algorithm_data(self):
+        """
+        Returns the order and step size used in the last successful step.
+        """
+        hu, nqu ,nq ,nyh, nqnyh = get_lsod_common()
+            
+        return hu, nqu
+    
+    def state_event_info(self):
+        """
+        LSODES does not monitor state events, an integration is only
+        interrupted by step events.
+        """
+        return []
+    
+    def print_statistics(self, verbose=NORMAL):
+        """
+        Prints the run-time statistics for the problem.
+        """
+        Explicit_ODE.print_statistics(self, verbose) #Calls the base class
+
+        self.log_message('\nSolver options:\n',                                      verbose)
+        self.log_message(' Solver                  : LSODES ',         verbose)
+        self.log_message(' Discretization method   : {}'.format(self.options["discr"]),  verbose)
+        self.log_message(' Absolute tolerances     : {}'.format(self.options["atol"]),  verbose)
+        self.log_message(' Relative tolerances     : {}'.format(self.options["rtol"]),  verbose)
+        if self.options["discr"] == "BDF":
+            self.log_message(' Jacobian                : {}'.format('user defined, sparse' if self.usejac else 'sparse difference quotients'),  verbose)
+        if self.maxh > 0. :
+            self.log_message(' Maximal stepsize maxh   : {}'.format(self.maxh),  verbose)
+        self.log_message('',                                                         verbose)
+    
+    def _set_usejac(self, jac):
+        self.options["usejac"] = bool(jac)
+    
+    def _get_usejac(self):
+        """
+        This sets the option to use the user defined jacobian. If a
+        user provided jacobian is implemented into the problem the
+        default setting is to use that jacobian. If not, an
+        approximation is used, where the sparsity structure is 
+        determined from calls to the right-hand side.
+        
+        The sparsity structure of the user defined jacobian is taken 
+        from its value at the start of the integration: all stored 
+        elements of a sparse matrix or the nonzero elements of a full
+        matrix.
+        
+            Parameters::
+            
+                usejac  
+                        - True - use user defined jacobian
+                          False - use an approximation
+                    
+                        - Should be a boolean.
+                        
+                            Example:
+                                usejac = False
+        """
+        return self.options["usejac"]
+    
+    usejac = property(_get_usejac,_set_usejac)
+    
+    def _set_atol(self,atol):
+        
+        self.options["atol"] = N.array(atol,dtype=N.double) if len(N.array(atol,dtype=N.double).shape)>0 else N.array([atol],dtype=N.double)
+    
+        if len(self.options["atol"]) == 1:
+            self.options["atol"] = self.options["atol"]*N.ones(self._leny)
+        elif len(self.options["atol"]) != self._leny:
+            raise ODEPACK_Exception("atol must be of length one or same as the dimension of the problem.")
+
+    def _get_atol(self):
+        """
+        Defines the absolute tolerance(s) that is to be used by the solver.
+        Can be set differently for each variable.
+        
+            Parameters::
+            
+                atol    
+                        - Default '1.0e-6'.
+                
+                        - Should be a positive float or a numpy vector
+                          of floats.
+                        
+                            Example:
+                                atol = [1.0e-4, 1.0e-6]
+        """
+        return self.options["atol"]
+    
+    atol=property(_get_atol,_set_atol)
+    
+    def _set_rtol(self,rtol):
+        try:
+            self.options["rtol"] = float(rtol)
+        except (ValueError, TypeError):
+            raise ODEPACK_Exception('Relative tolerance must be a (scalar) float.')
+        if self.options["rtol"] <= 0.0:
+            raise ODEPACK_Exception('Relative tolerance must be a positive (scalar) float.')
+    
+    def _get_rtol(self):
+        """
+        Defines the relative tolerance that is to be used by the solver.
+        
+            Parameters::
+            
+                rtol    
+                        - Default '1.0e-6'.
+                
+                        - Should be a positive float.
+                        
+                            Example:
+                                rtol = 1.0e-4
+        """
+        return self.options["rtol"]
+        
+    rtol=property(_get_rtol,_set_rtol)
+
+    def _get_maxsteps(self):
+        """
+        The maximum number of steps allowed to be taken to reach the
+        final time.
+        
+            Parameters::
+            
+                maxsteps
+                            - Default 100000
+                            
+                            - Should be a positive integer
+        """
+        return self.options["maxsteps"]
+    
+    def _set_maxsteps(self, max_steps):
+        try:
+            max_steps = int(max_steps)
+        except (TypeError, ValueError):
+            raise ODEPACK_Exception("Maximum number of steps must be a positive integer.")
+        self.options["maxsteps"] = max_steps
+    
+    maxsteps = property(_get_maxsteps, _set_maxsteps)
+    
+    def _get_maxh(self):
+        """
+        The absolute value of the maximal stepsize
+        
+        Parameters::
+        
+               maxh
+                          - Default:  0.  (no maximal step size)
+                          
+                          - Should be a positive float
+        """
+        return self.options["maxh"]
+    def _set_maxh(self,maxh):
+        if not (isinstance(maxh,float) and maxh >= 0.):
+           raise ODEPACK_Exception("Maximal step size maxh should be a positive float")
+        self.options["maxh"]=maxh
+    maxh = property(_get_maxh, _set_maxh)
+    
+    def _set_discr_method(self, discr='BDF'):
+        if str(discr).upper() == 'BDF':
+            self.options["discr"] = "BDF"
+            self.options["maxord"] = 5
+        elif str(discr).upper() == 'ADAMS':
+            self.options["discr"] = "Adams"
+            self.options["maxord"] = 12
+        else:
+            raise ODEPACK_Exception('Discretization method must be either Adams or BDF')
+    
+    def _get_discr_method(self):
+        """
+        This determines the discretization method.
+        
+            Parameters::
+            
+                discr   
+                        - Default 'BDF', which indicates the use
+                          of the BDF method with a sparse Jacobian. 
+                          Can also be set to 'Adams' which indicates 
+                          the use of the Adams method with functional
+                          iteration (nonstiff problems).
+                
+                    Example:
+                        discr = 'BDF'
+        
+        Note:: 
+        
+            Automatically sets the maximum order to 5 in the BDF case
+            and to 12 in the Adams case. If necessary, change the maximum
+            order After setting the discretization method.
+        """
+        return self.options["discr"]
+    
+    discr = property(_get_discr_method, _set_discr_method)
+    
+    def _get_maxord(self):
+        """
+        The maximum order of the method.
+        
+            Parameters::
+            
+                maxord
+                            - Default 5 (BDF) or 12 (Adams)
+                            
+                            - Should be a positive integer
+        """
+        return self.options["maxord"]
+    
+    def _set_maxord(self, maxord):
+        try:
+            maxord = int(maxord)
+        except (TypeError, ValueError):
+            raise ODEPACK_Exception("Maximum order must be a positive integer.")
+        max_allowed = 5 if self.options["discr"] == "BDF" else 12
+        if not 0 < maxord <= max_allowed:
+            raise ODEPACK_Exception("Maximum order should be a positive integer not exceeding {}.".format(max_allowed))
+        self.options["maxord"] = maxord
+    
+    maxord = property(_get_maxord, _set_maxord)
@@ -34,6 +34,13 @@ except ImportError:
 class Radar_Exception(Exception):
     pass
 
+class Radar_MemoryFull(Radar_Exception):
+    """
+    Raised when a time lag refers to a part of the history which is no
+    longer stored in the past vector.
+    """
+    pass
+
 class Radar5ODE(Explicit_ODE):
     """
     Radar5     
@@ -88,6 +95,8 @@ class Radar5ODE(Explicit_ODE):
         self.statistics["errfail"]     = 0 #Number of step rejections
         self.statistics["nlu"]         = 0 #Number of LU decompositions
         self.statistics["nstepstotal"] = 0 #Number of total computed steps (may NOT be equal to nsteps+nerrfail)
+        self.statistics["nhist"]       = 0 #Maximum number of past steps referred to by the time lags
+        self.statistics["pastmem"]     = 0 #Memory high-water mark of the past vector (bytes)
         
         #Internal values
         self._leny = len(self.y) #Dimension of the problem
@@ -103,6 +112,15 @@ class Radar5ODE(Explicit_ODE):
         self._ipast = N.unique(flat_lagcompmap).tolist()+[0]
         self._grid = N.array([])
         
+        #Mapping between the delayed components and the past vector, 
+        #used by the batched evaluation of the delayed arguments
+        self._lag_offsets = N.cumsum([0]+[len(comp) for comp in self.problem.lagcompmap])
+        self._lag_of_comp = N.repeat(N.arange(self._ntimelags), N.diff(self._lag_offsets))
+        self._lag_comps = N.array(flat_lagcompmap, dtype=int) + 1
+        self._lag_comp_pos = None
+        self._lag_cache = None
+        self._nhist = 0
+        
 #        if hasattr(problem, 'pbar'):
         
     def initialize(self):
@@ -112,6 +130,7 @@ class Radar5ODE(Explicit_ODE):
             
         self._tlist = []
         self._ylist = []
+        self._nhist = 0
         
     def _solout(self,nr, told, t, hold, y, cont,irtrn):
         """
@@ -197,18 +216,125 @@ class Radar5ODE(Explicit_ODE):
         return self.past[I] + theta*(self.past[nrds+I] + (theta-self.C2M1)*(self.past[2*nrds+I] + (theta-self.C1M1)*(self.past[3*nrds+I])))  
 
     def arglag(self, i, t, y, past, ipast):
-        return self.problem.time_lags(t,y)[i-1]
+        #All time lags are evaluated at once, reuse them for the same (t,y)
+        if self._lag_cache is None or self._lag_cache[0] != t or not N.array_equal(self._lag_cache[1], y):
+            self._lag_cache = (t, N.array(y), N.asarray(self.problem.time_lags(t,y), dtype=N.double))
+        return self._lag_cache[2][i-1]
+    
+    def _locate_lags(self, lags, past):
+        """
+        Locates the intervals in the past vector containing the deviated
+        arguments, using a single search for all time lags. Returns the
+        (Fortran) positions and the theta values, a position of zero
+        means that the time lag has to be handled by radar5.lagr5 
+        (initial segment, extrapolation, breaking points and full memory).
+        """
+        idif = int(radar5.posits.idif)
+        mxst = int(radar5.posits.mxst)
+        x0b = float(radar5.posits.x0b)
+        iact = (int(radar5.posits.iact)-1)//idif
+        
+        pos = N.zeros(len(lags), dtype=int)
+        theta = N.zeros(len(lags))
+        
+        #The stored intervals in chronological order (circular memory),
+        #intervals which have not been computed yet have a zero step
+        order = (iact + 1 + N.arange(mxst-1)) % mxst
+        order = order[past[order*idif+idif-1] > 0.0]
+        if len(order) == 0 or order[-1] != (iact-1) % mxst:
+            return pos, theta
+        starts = past[order*idif]
+        steps  = past[order*idif+idif-1]
+        if N.any(N.diff(starts) <= 0.0):
+            return pos, theta
+        
+        ik = N.searchsorted(starts, lags) - 1
+        inside = (lags > x0b) & (lags <= starts[-1] + steps[-1]) & (ik >= 0)
+        
+        #The time lag which is currently treated for breaking points
+        ilbp = int(radar5.bpcom.ilbp)
+        if (radar5.bplog.bpd or radar5.bplog.first) and 0 < ilbp <= len(lags):
+            inside[ilbp-1] = False
+        
+        ik = ik[inside]
+        pos[inside] = order[ik]*idif + 1
+        theta[inside] = (lags[inside] - (starts[ik] + steps[ik]))/steps[ik]
+        
+        return pos, theta
+    
+    def _check_past(self, lags, past):
+        """
+        Checks that the deviated arguments are still available in the 
+        (circular) past vector, Radar5 itself stops the execution if not.
+        """
+        idif = int(radar5.posits.idif)
+        mxst = int(radar5.posits.mxst)
+        oldest = ((int(radar5.posits.iact)-1)//idif + 1) % mxst
         
-
+        #Until the memory has wrapped around, the oldest slot is unfilled
+        #(zero step) and everything back to x0b is still stored
+        if past[oldest*idif+idif-1] <= 0.0:
+            return
+        
+        if N.any((lags > float(radar5.posits.x0b)) & (lags < past[oldest*idif])):
+            raise Radar_MemoryFull("The time lags refer further back than the %d steps stored in the past vector, increase mxst."%mxst)
+    
+    def _update_history_depth(self, pos):
+        """
+        Keeps track of how many steps back in the past vector the time
+        lags refer to.
+        """
+        idif = int(radar5.posits.idif)
+        mxst = int(radar5.posits.mxst)
+        iact = (int(radar5.posits.iact)-1)//idif
+        
+        pos = pos[pos > 0]
+        if len(pos) > 0:
+            self._nhist = max(self._nhist, N.max((iact - (pos-1)//idif) % mxst))
+    
     def compute_ydelay(self, t, y, past, ipast):
-        ydelay = self._yDelayTemp
-        for i in range(1, self._ntimelags+1):
-            theta, pos = radar5.lagr5(i, t, y, self.arglag, past,  self.problem.phi,  ipast)
+        if self._lag_comp_pos is None:
+            #Place of the delayed components in the past vector (see radar5.ylagr5)
+            ipast_rds = N.asarray(ipast)[:self._nrdens]
+            if N.all(N.isin(self._lag_comps, ipast_rds)):
+                self._lag_comp_pos = N.array([N.flatnonzero(ipast_rds == comp)[-1] for comp in self._lag_comps])
+            else:
+                self._lag_comp_pos = False
+        
+        if self._lag_comp_pos is False:
+            self.arglag(1, t, y, past, ipast)
+            self._check_past(self._lag_cache[2], past)
+            
+            ydelay = self._yDelayTemp
+            for i in range(1, self._ntimelags+1):
+                theta, pos = radar5.lagr5(i, t, y, self.arglag, past,  self.problem.phi,  ipast)
+                self._update_history_depth(N.array([pos]))
 
-            for j, val in enumerate(self.problem.lagcompmap[i-1]):
-                ydelay[i-1][j] = radar5.ylagr5(val+1, theta, pos, self.problem.phi,  past,  ipast)
+                for j, val in enumerate(self.problem.lagcompmap[i-1]):
+                    ydelay[i-1][j] = radar5.ylagr5(val+1, theta, pos, self.problem.phi,  past,  ipast)
 
-        return ydelay
+            return ydelay
+        
+        #Evaluate all the time lags once and locate them in the past vector
+        self.arglag(1, t, y, past, ipast)
+        self._check_past(self._lag_cache[2], past)
+        pos, theta = self._locate_lags(self._lag_cache[2], past)
+        for i in N.flatnonzero(pos == 0):
+            theta[i], pos[i] = radar5.lagr5(i+1, t, y, self.arglag, past, self.problem.phi, ipast)
+        self._update_history_depth(pos)
+        
+        #Evaluate the dense output polynomials for all delayed components
+        nrds = self._nrdens
+        I = N.maximum(pos[self._lag_of_comp], 0) + self._lag_comp_pos
+        TH = theta[self._lag_of_comp]
+        ydelay = past[I] + TH*(past[nrds+I] + (TH-self.C2M1)*(past[2*nrds+I] + (TH-self.C1M1)*(past[3*nrds+I])))
+        
+        #Deviated arguments on the initial segment are given by phi
+        for i in N.flatnonzero(pos == -1):
+            for j in range(self._lag_offsets[i], self._lag_offsets[i+1]):
+                ydelay[j] = radar5.ylagr5(self._lag_comps[j], theta[i], pos[i], self.problem.phi, past, ipast)
+        
+        return N.split(ydelay, self._lag_offsets[1:-1])
 
     def F(self, t, y, past, ipast):
         #print 'F:', t, y, past, ipast
@@ -223,7 +349,7 @@ class Radar5ODE(Explicit_ODE):
     def Fjac(self, t, y, past, ipast):
         # First find the correct place in the past vector for each time-lag
         # then evaluate all required solution components at that point
-        ydelay = self.compute_ydelay(t,y,  None, None,  past,  ipast)
+        ydelay = self.compute_ydelay(t, y, past, ipast)
         
         # Now we can compute the right-hand-side
         return self.problem.jac(t, y, ydelay)
@@ -259,14 +385,11 @@ class Radar5ODE(Explicit_ODE):
         IWORK[2] = self.newt
         IWORK[7] = 1
         IWORK[10] = self.ieflag
-        IWORK[11] = self.mxst
         IWORK[12] = len(self.grid)
         IWORK[13] = 1
         IWORK[14] = self._nrdens
         
         self.idif = 4*self._nrdens + 2
-        lrpast = self.mxst*self.idif
-        past = N.zeros(lrpast)
         
         #past = N.zeros(self.mxst*(4*self.problem.nrdens+2))
 #        print WORK
@@ -283,7 +406,14 @@ class Radar5ODE(Explicit_ODE):
         self._opts = opts
         #print "INIT", t,y,tf,self.inith, self.problem.ipast
         #print "GRID", self.problem.grid, self.problem.ngrid
-        #t, y, h, iwork, flag, past = radar5.assimulo_radar5(self.F,            \
+        #The past vector is used as a ring buffer by Radar5 and can not be
+        #enlarged during the integration, see mxst
+        IWORK[11] = self.mxst
+        past = N.zeros(self.mxst*self.idif)
+        
+        self._lag_comp_pos = None
+        self._lag_cache = None
+        
         a = radar5.assimulo_radar5(self.F,            \
                                        self.problem.phi,        \
                                        self.arglag,             \
@@ -312,13 +442,7 @@ class Radar5ODE(Explicit_ODE):
                                        MLMAS,                   \
                                        MUMAS,
                                        past),
-#                                       lrpast)#,                   \
-                                       #past,                    \
-                                       #IWORK[14]+1,             \
-##                                       IWORK[14],               \
-                                       #self.problem.ngrid,      \
-                                       #len(past)                \
-                                       #)
+            
         t, y, h, iwork, flag, past = a[0]
         #print a[0]
         #print len(a[0])
@@ -336,6 +460,8 @@ class Radar5ODE(Explicit_ODE):
             raise Exception("Radar5 failed with flag %d"%flag)
         
         #Retrieving statistics
+        self.statistics["nhist"]        = max(self.statistics["nhist"], self._nhist)
+        self.statistics["pastmem"]      = max(self.statistics["pastmem"], past.nbytes)
         self.statistics["nsteps"]      += iwork[16]
         self.statistics["nfcn"]        += iwork[13]
         self.statistics["njac"]        += iwork[14]
@@ -356,6 +482,8 @@ class Radar5ODE(Explicit_ODE):
         self.log_message(' Number of Jacobian evaluations           : '+ str(self.statistics["njac"]),    verbose)
         self.log_message(' Number of error test failures            : '+ str(self.statistics["errfail"]),       verbose)
         self.log_message(' Number of LU decompositions              : '+ str(self.statistics["nlu"]),       verbose)
+        self.log_message(' Number of past steps needed by the lags  : '+ str(self.statistics["nhist"]),     verbose)
+        self.log_message(' Memory used by the past vector (bytes)   : '+ str(self.statistics["pastmem"]),   verbose)
         
         self.log_message('\nSolver options:\n',                                      verbose)
         self.log_message(' Solver                  : Radar5 ' + self._type,          verbose)
@@ -858,6 +986,12 @@ class Radar5ODE(Explicit_ODE):
         """
         The maximum number of steps stored in the dense output array.
         The dimension of this array will be nrdens*(4*self.nrdens+2).
+        The array is used in a circular fashion, i.e. only the last mxst
+        steps are kept and the memory used does not depend on the number
+        of steps taken. The time lags may not refer further back than the
+        stored steps, otherwise the integration is stopped and mxst needs
+        to be increased (the statistics 'nhist' gives the number of steps
+        which were needed). The size can not be changed during a simulation.
         
             Parameters::
             
@@ -876,7 +1010,7 @@ class Radar5ODE(Explicit_ODE):
         if (self.options["mxst"] < 1):
             raise Radar_Exception("mxst must be a positive integer.")
 
-        mxst = property(_get_mxst, _set_mxst)
+    mxst = property(_get_mxst, _set_mxst)
         
     def _set_usejaclag(self, jaclag):
         self.options["usejaclag"] = bool(jaclag)
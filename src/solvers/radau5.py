@@ -99,6 +99,7 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
         self.supports["report_continuously"] = True
         self.supports["interpolated_output"] = True
         self.supports["state_events"] = True
+        self.supports["step_trace"] = True
         
         self._leny = len(self.y) #Dimension of the problem
         self._type = '(explicit)'
@@ -158,6 +159,13 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
         self.cont = cont #Saved to be used by the interpolation function.
         self._werr = werr
         
+        if self._step_trace is not None and t != told: #The first call is at the initial time
+            #Radau IIA with three stages is of order 5, the counters of the
+            #step are given by /STATR5/ (one linear solve per Newton iteration)
+            stats = radau5.statr5
+            self._step_trace.record(t, t-told, 5, nniters=int(stats.nsols), nerrfails=int(stats.nrejs), 
+                                    njacs=int(stats.njacs), nlus=int(stats.ndecs))
+        
         if self.problem_info["state_events"]:
             flag, t, y = self.event_locator(told, t, y)
             #Convert to Fortram indicator.
@@ -241,8 +249,12 @@ class Radau5ODE(Radau_Common,Explicit_ODE):
         #Store the opts
         self._opts = opts
         
-        t, y, h, iwork, flag =  radau5.radau5(self.f, t, y.copy(), tf, self.inith, self.rtol*N.ones(self.problem_info["dim"]), self.atol, 
-                        ITOL, jac_dummy, IJAC, MLJAC, MUJAC, mas_dummy, IMAS, MLMAS, MUMAS, self._solout, IOUT, WORK, IWORK)
+        #The counters of Radau5 start from zero in each call
+        if self._step_trace is not None:
+            self._step_trace.restart()
+        
+        t, y, h, iwork, flag =  radau5.radau5(self._timed(self.f, "rhs"), t, y.copy(), tf, self.inith, self.rtol*N.ones(self.problem_info["dim"]), self.atol, 
+                        ITOL, self._timed(jac_dummy, "jac"), IJAC, MLJAC, MUJAC, mas_dummy, IMAS, MLMAS, MUMAS, self._solout, IOUT, WORK, IWORK)
         
         #Checking return
         if flag == 1:
@@ -849,6 +861,7 @@ class Radau5DAE(Radau_Common,Implicit_ODE):
         self.supports["report_continuously"] = True
         self.supports["interpolated_output"] = True
         self.supports["state_events"] = True
+        self.supports["step_trace"] = True
         
         self._leny = len(self.y) #Dimension of the problem
         self._type = '(implicit)'
@@ -900,6 +913,13 @@ class Radau5DAE(Radau_Common,Implicit_ODE):
         """
         self.cont = cont #Saved to be used by the interpolation function.
         
+        if self._step_trace is not None and t != told: #The first call is at the initial time
+            #Radau IIA with three stages is of order 5, the counters of the
+            #step are given by /STATR5/ (one linear solve per Newton iteration)
+            stats = radau5.statr5
+            self._step_trace.record(t, t-told, 5, nniters=int(stats.nsols), nerrfails=int(stats.nrejs), 
+                                    njacs=int(stats.njacs), nlus=int(stats.ndecs))
+        
         yd = y[self._leny:2*self._leny].copy()
         y = y[:self._leny].copy()
         if self.problem_info["state_events"]:
@@ -996,8 +1016,12 @@ class Radau5DAE(Radau_Common,Implicit_ODE):
         
         atol = N.append(self.atol, self.atol)
         
-        t, y, h, iwork, flag =  radau5.radau5(self._f, t, y.copy(), tf, self.inith, self.rtol*N.ones(self.problem_info["dim"]*2), atol, 
-                        ITOL, jac_dummy, IJAC, MLJAC, MUJAC, self._mas_f, IMAS, MLMAS, MUMAS, self._solout, IOUT, WORK, IWORK)
+        #The counters of Radau5 start from zero in each call
+        if self._step_trace is not None:
+            self._step_trace.restart()
+        
+        t, y, h, iwork, flag =  radau5.radau5(self._timed(self._f, "res"), t, y.copy(), tf, self.inith, self.rtol*N.ones(self.problem_info["dim"]*2), atol, 
+                        ITOL, self._timed(jac_dummy, "jac"), IJAC, MLJAC, MUJAC, self._mas_f, IMAS, MLMAS, MUMAS, self._solout, IOUT, WORK, IWORK)
         
         #Checking return
         if flag == 1:
@@ -416,8 +416,8 @@ class RodasODE(Rodas_Common, Explicit_ODE):
         #Store the opts
         self._opts = opts
         
-        t, y, h, iwork, flag = rodas.rodas(self.f, IFCN, t, y.copy(), tf, self.inith, self.rtol*N.ones(self.problem_info["dim"]), self.atol,
-                    ITOL, jac_dummy, IJAC, MLJAC, MUJAC, dfx_dummy, IDFX, mas_dummy, IMAS, MLMAS, MUMAS, self._solout, IOUT, WORK, IWORK)
+        t, y, h, iwork, flag = rodas.rodas(self._timed(self.f, "rhs"), IFCN, t, y.copy(), tf, self.inith, self.rtol*N.ones(self.problem_info["dim"]), self.atol,
+                    ITOL, self._timed(jac_dummy, "jac"), IJAC, MLJAC, MUJAC, dfx_dummy, IDFX, mas_dummy, IMAS, MLMAS, MUMAS, self._solout, IOUT, WORK, IWORK)
                     
         #Checking return
         if flag == 1:
@@ -89,6 +89,9 @@ class Dopri5(Explicit_ODE):
         else:
             self.f = self.problem.rhs
     
+    def _get_dense_output_degree(self):
+        return 4 #The dense output of DOPRI5 is of order 4
+    
     def interpolate(self, time):
         y = N.empty(self._leny)
         for i in range(self._leny):
@@ -162,7 +165,7 @@ class Dopri5(Explicit_ODE):
         #Store the opts
         self._opts = opts
         
-        t, y, iwork, flag = dopri5.dopri5(self.f, t, y.copy(), tf, self.rtol*N.ones(self.problem_info["dim"]), self.atol, ITOL, self._solout, IOUT, WORK, IWORK)
+        t, y, iwork, flag = dopri5.dopri5(self._timed(self.f, "rhs"), t, y.copy(), tf, self.rtol*N.ones(self.problem_info["dim"]), self.atol, ITOL, self._solout, IOUT, WORK, IWORK)
         
         #Checking return
         if flag == 1:
@@ -475,6 +478,7 @@ class RungeKutta34(Explicit_ODE):
             self.g_old = self.event_func(self.t, self.y) 
         else: 
             self.f = self.problem.rhs_internal
+        self.f = self._timed(self.f, "rhs")
     
     def _set_initial_step(self, initstep):
         try:
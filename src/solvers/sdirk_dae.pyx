@@ -1,4 +1,4 @@
-#!/usr/bin/env python 
+#!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
 # Copyright (C) 2010 Modelon AB
@@ -15,563 +15,730 @@
 # You should have received a copy of the GNU Lesser General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+cimport numpy as N
 import numpy as N
+from libc.stdlib cimport malloc, free
+from libc.string cimport memcpy
+from libc.math cimport isfinite
 
+import threading
+
+from assimulo.implicit_ode cimport Implicit_ODE
 from assimulo.exception import *
-from assimulo.ode import *
 
-from assimulo.explicit_ode import Implicit_ODE
+include "constants.pxi" #Includes the constants (textual include)
+
+cdef extern from "sdirk_dae_kernel.h":
+    cdef struct kernel_problem "problem":
+        int n
+        double *v
+        double *vp
+        double x
+
+    cdef struct kernel_information "information":
+        int num_jacobian
+        double *abserr
+        double relerr
+        double xend
+        double h0
+        double hmax
+
+    cdef struct kernel_etcetera "etcetera":
+        double h
+        double gh
+        int jacobi_status
+        int new_jacobian
+        int new_fact
+        int steps_red
+
+    cdef struct kernel_method "method":
+        int s
+        double a[4][4]
+
+    cdef struct kernel_statistic "statistic":
+        int rejected_steps
+        int notkonv_steps
+        int function_evaluations
+        int jacobi_evaluations
+        int factorisations
+        int solutions
+
+    kernel_statistic number_of
+    const double HMIN
 
-try:
-    from assimulo.lib.odepack import dlsodar, dcfode, dintdy
-    from assimulo.lib.odepack import set_lsod_common, get_lsod_common
-except ImportError:
-    print "Could not find ODEPACK functions"
+    void (*sdirk_dae_res)(kernel_etcetera *etc, double *vp, double *v, double x, double *res)
+    void (*sdirk_dae_jac)(kernel_etcetera *etc, double *v, double *vp, double x, double *dfdvp, double *dfdv)
 
-class SDIRK_DAE(Implicit_ODE):
+    int one_step(kernel_problem **var, kernel_problem **var_old, kernel_information *info,
+                 kernel_method *rk, kernel_etcetera *etc)
+    int adjust_stepsize(double step_fact, kernel_etcetera *etc)
+    int set_coeff(kernel_method *rk)
+    int zero_stat()
+    int work_alloc(int n, kernel_problem *var, kernel_etcetera *etc)
+    int work_free(kernel_problem *var, kernel_etcetera *etc)
+
+#Return flags of one_step
+SDIRK_DAE_ERRORS = {1: "The Newton matrix is singular.",
+                    2: "The Newton iterations failed to converge.",
+                    3: "The local error test failed repeatedly, the step size became too small.",
+                    4: "The error tolerance is too stringent."}
+
+#Exceptions in the callbacks after which the step is retried with a smaller step size
+RECOVERABLE_ERRORS = (N.linalg.LinAlgError, ZeroDivisionError, AssimuloRecoverableError)
+
+#The kernel passes its work structure to the residual and the Jacobian. It
+#is the first member of a context holding the solver, so that the callbacks
+#find the solver taking the step.
+cdef struct kernel_context:
+    kernel_etcetera etc
+    void *solver
+
+#The step counters of the kernel are global, steps are therefore taken one
+#at a time (see SDIRK_DAE.integrate)
+_kernel_lock = threading.RLock()
+
+cdef class SDIRK_DAE(Implicit_ODE):
     """
-        SDIRK_DAE is a special implicit Runge-Kutta methodstep for solving implicit ordinary 
-        differential equations of index index on the form,
-        
-        .. math::
-    
-            F(t, y, \dot{y}) = 0, \quad y(t_0) = y_0.
-            
-        
-        
-        The core integrator SDIRK_DAE is the original code by Anne Kvaernoe, 
-        http://www.math.ntnu.no/~anne/
+    SDIRK_DAE solves fully implicit differential algebraic equations of
+    index one on the form,
+
+    .. math::
+
+        F(t, y, \dot{y}) = 0, \quad y(t_0) = y_0.
+
+    The method is a singly diagonally implicit Runge-Kutta method of order
+    three with four stages and an embedded method of order two for the
+    error estimate. The steps are taken one at a time by the compiled
+    kernel, the original code by Anne Kvaernoe,
+    http://www.math.ntnu.no/~anne/. The kernel is kept between calls, so
+    restarts after events only require a new Jacobian. The dense output
+    is the cubic Hermite interpolant of the last step.
+
+    Note that the Jacobian is evaluated at the start of a step and that
+    the stage values are solved for with a modified Newton method using
+    a LU factorization of the Newton matrix, dF/dyd + h*gamma*dF/dy.
+
+    Several instances can be simulated at once, also from the residual of
+    another SDIRK_DAE. The step counters of the kernel are global, so the
+    steps of instances simulated in different threads are taken one at a
+    time.
     """
+    cdef kernel_problem _vars[2]
+    cdef kernel_problem *_var
+    cdef kernel_problem *_var_old
+    cdef kernel_information _info
+    cdef kernel_context _context
+    cdef kernel_statistic _counts
+    cdef kernel_method _rk
+    cdef int _leny
+    cdef double _hnext
+    cdef N.ndarray _abserr
+    cdef N.ndarray _work_y, _work_yd
+    cdef double[::1] _wy, _wyd
+    cdef object _res, _jac_parts
+    cdef object _error
+    cdef int _error_recoverable
+    cdef public object event_func
+    cdef public object g_old
+
+    def __cinit__(self):
+        self._vars[0].v = NULL
+        self._vars[0].vp = NULL
+        self._vars[1].v = NULL
+        self._vars[1].vp = NULL
+        self._context.solver = <void*>self
 
     def __init__(self, problem):
         """
         Initiates the solver.
-        
+
             Parameters::
-            
-                problem     
+
+                problem
                             - The problem to be solved. Should be an instance
                               of the 'Implicit_Problem' class.
         """
         Implicit_ODE.__init__(self, problem) #Calls the base class
-        
+
         #Default values
         self.options["atol"]     = 1.0e-6*N.ones(self.problem_info["dim"]) #Absolute tolerance
         self.options["rtol"]     = 1.0e-6 #Relative tolerance
-        self.options["usejac"]   = False
-        self.options["hmax"] = 0.
-                
-        # - Statistic values
-        self.statistics["nsteps"]      = 0 #Number of steps
-        self.statistics["nfcn"]        = 0 #Number of function evaluations
-        self.statistics["njac"]        = 0 #Number of Jacobian evaluations
-        
-        self._leny = len(self.y) #Dimension of the problem
-        
-        # Solver support
-        self.supports["state_events"] = False
+        self.options["usejac"]   = True if self.problem_info["jac_fcn"] else False
+        self.options["inith"]    = 0.01 #Initial step-size
+        self.options["maxh"]     = N.inf #Maximum step-size
+        self.options["maxsteps"] = 100000
+
+        #Solver support
         self.supports["report_continuously"] = True
-        self.supports["interpolated_output"] = False
-        
-    def initialize(self):
-        """
-        Initializes the overall simulation process
-        (called before _simulate) 
-        """ 
+        self.supports["interpolated_output"] = True
+        self.supports["state_events"] = True
+        self.supports["step_trace"] = True
+
+        self._leny = len(self.y) #Dimension of the problem
+        self._event_info = None
+        self._error = None
+        self._hnext = 0.0
+
+        #Work arrays for the arguments to the residual and the Jacobian
+        self._work_y  = N.empty(self._leny)
+        self._work_yd = N.empty(self._leny)
+        self._wy  = self._work_y
+        self._wyd = self._work_yd
+
+        #The work arrays of the kernel, the values of the last two steps
+        #are kept in _vars and swapped by the kernel after each step
+        if self._vars[0].v == NULL:
+            work_alloc(self._leny, &self._vars[1], &self._context.etc)
+            self._vars[0].v  = <double*>malloc(self._leny*sizeof(double))
+            self._vars[0].vp = <double*>malloc(self._leny*sizeof(double))
+        self._vars[0].n = self._leny
+        self._vars[1].n = self._leny
+        self._var = &self._vars[0]
+        self._var_old = &self._vars[1]
+
+        set_coeff(&self._rk)
+
+    def __dealloc__(self):
+        cdef int i
+        if self._vars[0].v != NULL:
+            work_free(&self._vars[1], &self._context.etc)
+            for i in range(2):
+                free(self._vars[i].v)
+                free(self._vars[i].vp)
+
+    cpdef initialize(self):
         #Reset statistics
-        for k in self.statistics.keys():
-            self.statistics[k] = 0
-            
-        #self._tlist = []
-        #self._ylist = []
-        
-        
-    def integrate_start(self, t, y):
-        
-        # first call or classical restart after a discontinuity
-        ISTATE=1
-        RWORK = N.array([0.0]*(22 + self.problem_info["dim"] * 
-                               max(16,self.problem_info["dim"]+9) + 
-                               3*self.problem_info["dimRoot"]))
-        # Integer work array
-        IWORK = N.array([0]*(20 + self.problem_info["dim"]))
-
- 
-        return ISTATE, RWORK, IWORK
-                                     
-    
-    def integrate(self, t, y, tf, opts):
-        ITOL  = 2 #Only  atol is a  vector
-        ITASK = 5 #For one step mode and hitting exactly tcrit, normally tf
-        IOPT = 1 #optional inputs are used
-        
-        # provide work arrays and set common blocks (if needed)
-        ISTATE, RWORK, IWORK = self.integrate_start( t, y)
-        
-        JT = 1 if self.usejac else 2#Jacobian type indicator
-        JROOT = N.array([0]*self.problem_info["dimRoot"])
-        
-        #Setting work options
-        RWORK[0] = tf #Do not integrate past tf
-        RWORK[5] = self.options["hmax"]
-        
-        #Setting iwork options
-        IWORK[5] = self.maxsteps
-        
-        #Setting maxord to IWORK
-        IWORK[7] = self.maxordn
-        IWORK[8] = self.maxords
+        self.statistics.reset()
 
-        
-        #Dummy methods
-        g_dummy = (lambda t:x) if not self.problem_info["state_events"] else self.problem.state_events
-        jac_dummy = (lambda t,y:N.zeros((len(y),len(y)))) if not self.usejac else self.problem.jac
-        
-        #Extra args to rhs and state_events
-        rhs_extra_args = (self.sw,) if self.problem_info["switches"] else ()
-        g_extra_args = (self.sw,) if self.problem_info["switches"] else ()
-        
-        #Store the opts
-        self._opts = opts
-        
-        #Outputs
-        tlist = []
-        ylist = []
-        
-        #Nordsieck start index
-        nordsieck_start_index = 21+3*self.problem_info["dimRoot"] - 1
-        
-        #Run in normal mode?
-        normal_mode = 1 if opts["output_list"] != None else 0
-        #if normal_mode == 0:
-        if opts["report_continuously"] or opts["output_list"] == None:
-            while (ISTATE == 2 or ISTATE == 1) and t < tf:
-            
-                y, t, ISTATE, RWORK, IWORK, roots = dlsodar(self.problem.rhs, y.copy(), t, tf, ITOL, 
-                        self.rtol*N.ones(self.problem_info["dim"]), self.atol,
-                        ITASK, ISTATE, IOPT, RWORK, IWORK, jac_dummy, JT, g_dummy, JROOT,
-                        f_extra_args = rhs_extra_args, g_extra_args = g_extra_args)
-                
-                hu, nqu ,nq ,nyh, nqnyh = get_lsod_common()
-                #print 't= {}, tN={}, y={}, ns={}, hu={}'.format(t , RWORK[12], y, RWORK[nordsieck_start_index],hu)
-                self._nordsieck_array = \
-                     RWORK[nordsieck_start_index:nordsieck_start_index+(nq+1)*nyh].reshape((nyh,-1),order='F') 
-                self._nyh = nyh              
-                self._event_info = roots
-                
-                if opts["report_continuously"]:
-                    flag_initialize = self.report_solution(t, y, opts)
-                    if flag_initialize:
-                        #If a step event has occured the integration has to be reinitialized
-                        ISTATE = 3
-                else:
-                    #Store results
-                    tlist.append(t)
-                    ylist.append(y.copy())
-            
-                #Checking return
-                if ISTATE == 2:
-                    flag = ID_PY_COMPLETE
-                elif ISTATE == 3:
-                    flag = ID_PY_EVENT
-                else:
-                    raise ODEPACK_Exception("LSODAR failed with flag %d"%ISTATE)
-            
+        #Start with the initial step-size
+        self._hnext = 0.0
+
+    def set_problem_data(self):
+        if self.problem_info["type"] == 0: #Explicit problem, F = yd - f(t,y)
+            if self.problem_info["switches"]:
+                def res(t, y, yd):
+                    return yd - self.problem.rhs(t, y, self.sw)
+            else:
+                def res(t, y, yd):
+                    return yd - self.problem.rhs(t, y)
         else:
-            
-            #Change the ITASK
-            ITASK = 4 #For computation of yout
-            
-            output_index = opts["output_index"]
-            output_list  = opts["output_list"][output_index:]
+            if self.problem_info["switches"]:
+                def res(t, y, yd):
+                    return self.problem.res(t, y, yd, self.sw)
+            else:
+                res = self.problem.res
+        self._res = self._timed(res, "res")
+        self._jac_parts = self._timed(self._jacobian_parts, "jac") if self.usejac else None
 
-            for tout in output_list:
-                output_index += 1
+        if self.problem_info["state_events"]:
+            if self.problem_info["type"] == 1:
+                def event_func(t, y, yd):
+                    return self.problem.state_events(t, y, yd, self.sw)
+            else:
+                def event_func(t, y, yd):
+                    return self.problem.state_events(t, y, self.sw)
+            self.event_func = self._timed(event_func, "state_events")
+            self._event_info = [0] * self.problem_info["dimRoot"]
+            self.g_old = self.event_func(self.t, self.y, self.yd)
 
-                y, t, ISTATE, RWORK, IWORK, roots = dlsodar(self.problem.rhs, y.copy(), t, tout, ITOL, 
-                    self.rtol*N.ones(self.problem_info["dim"]), self.atol,
-                    ITASK, ISTATE, IOPT, RWORK, IWORK, jac_dummy, JT, g_dummy, JROOT,
-                    f_extra_args = rhs_extra_args, g_extra_args = g_extra_args)
-                
-                #Store results
-                tlist.append(t)
-                ylist.append(y.copy())
-                self._event_info = roots
-                
-                #Checking return
-                if ISTATE == 2 and t >= tf:
-                    flag = ID_PY_COMPLETE
-                    break
-                elif ISTATE == 3:
-                    flag = ID_PY_EVENT
-                    break
-                elif ISTATE < 0:
-                    raise ODEPACK_Exception("LSODAR failed with flag %d"%ISTATE)
-        
-            opts["output_index"] = output_index
-        # deciding on restarting options
-        self._rkstarter_active = True if ISTATE == 3 and self.rkstarter > 1 else False
-        #print 'rkstarter_active set to {} and ISTATE={}'.format(self._rkstarter_active, ISTATE)
-        
-        #Retrieving statistics
-        self.statistics["ng"]            += IWORK[9]
-        self.statistics["nsteps"]        += IWORK[10]
-        self.statistics["nfcn"]          += IWORK[11]
-        self.statistics["njac"]          += IWORK[12]
-        self.statistics["nevents"] += 1  if flag == ID_PY_EVENT else 0
-        # save RWORK, IWORK for restarting feature
-        if self.rkstarter>1:
-            self._RWORK=RWORK
-            self._IWORK=IWORK        
-       
-        return flag, tlist, ylist
+    def _jacobian_parts(self, t, y, yd):
+        """
+        Returns the Jacobians dF/dyd and dF/dy, computed from the user-defined
+        Jacobian dF/dy + c*dF/dyd.
+        """
+        if self.problem_info["type"] == 0: #Explicit problem, F = yd - f(t,y)
+            return N.eye(self._leny), -N.asarray(self.problem.jac(t, y), dtype=N.double)
         
-    def get_algorithm_data(self):
+        if self.problem_info["switches"]:
+            B = N.array(self.problem.jac(0.0, t, y, yd, self.sw), dtype=N.double)
+            A = N.asarray(self.problem.jac(1.0, t, y, yd, self.sw), dtype=N.double) - B
+        else:
+            B = N.array(self.problem.jac(0.0, t, y, yd), dtype=N.double)
+            A = N.asarray(self.problem.jac(1.0, t, y, yd), dtype=N.double) - B
+        return A, B
+
+    cdef _restart(self, double t, N.ndarray y, N.ndarray yd, double tf):
         """
-        Returns the order and step size used in the last successful step.
+        Sets up the kernel to start integrating from (t, y, yd) towards tf.
         """
-        hu, nqu ,nq ,nyh, nqnyh = get_lsod_common()
-            
-        return hu, nqu
-    
-    def state_event_info(self):
+        cdef int i
+        cdef double h
+        cdef double[::1] yv = N.ascontiguousarray(y, dtype=N.double)
+        cdef double[::1] ydv = N.ascontiguousarray(yd, dtype=N.double)
+
+        for i in range(self._leny):
+            self._var.v[i] = yv[i]
+            self._var.vp[i] = ydv[i]
+        self._var.x = t
+        self._reset_history()
+
+        self._abserr = N.ascontiguousarray(self.options["atol"], dtype=N.double)
+        self._info.abserr = <double*>self._abserr.data
+        self._info.relerr = self.options["rtol"]
+        self._info.num_jacobian = 0 if self._jac_parts is not None else 1
+        self._info.xend = tf
+        self._info.hmax = self.options["maxh"]
+        self._info.h0 = self._hnext if self._hnext > 0.0 else self.options["inith"]
+
+        #Continue with the step-size of the last step, with a new Jacobian
+        h = min(self._info.h0, self._info.hmax)
+        self._context.etc.h = h
+        self._context.etc.gh = h*self._rk.a[0][0]
+        self._context.etc.new_jacobian = 1
+        self._context.etc.new_fact = 1
+        self._context.etc.jacobi_status = 1
+        self._context.etc.steps_red = 0
+
+    cdef _reset_history(self):
+        """
+        Sets the previous step values, used for predicting the stage values,
+        to the current values.
+        """
+        memcpy(self._var_old.v, self._var.v, self._leny*sizeof(double))
+        memcpy(self._var_old.vp, self._var.vp, self._leny*sizeof(double))
+        self._var_old.x = self._var.x - HMIN
+
+    cdef _recover(self, double h):
+        """
+        Handles an error raised in the residual or the Jacobian during a
+        step of size h. Recoverable errors lead to a retry with half the
+        step-size, other errors are raised.
+        """
+        error, self._error = self._error, None
+
+        if not self._error_recoverable:
+            raise error
+
+        self._reset_history()
+        if adjust_stepsize(0.5*h/self._context.etc.h, &self._context.etc) != 0:
+            raise SDIRK_DAE_Exception("The step-size became too small after a recoverable error at t = %e: %s"%(self._var.x, error))
+        self._context.etc.new_jacobian = 1
+        self._context.etc.new_fact = 1
+        self._context.etc.jacobi_status = 1
+
+    cdef _set_error(self, error, int recoverable):
+        self._error = error
+        self._error_recoverable = recoverable
+
+    cpdef integrate(self, double t, N.ndarray y, N.ndarray yd, double tf, dict opts):
+        global number_of
+        cdef int flag, ret, nsteps = 0, clipped
+        cdef int maxsteps = self.options["maxsteps"]
+        cdef double h
+        cdef kernel_problem *swap
+        cdef kernel_statistic outer
+        cdef list tr = [], yr = [], ydr = []
+
+        if opts["initialize"]:
+            self.set_problem_data()
+
+        self._restart(t, y, yd, tf)
+
+        self._counts.rejected_steps = 0
+        self._counts.notkonv_steps = 0
+        self._counts.function_evaluations = 0
+        self._counts.jacobi_evaluations = 0
+        self._counts.factorisations = 0
+        self._counts.solutions = 0
+
+        flag = ID_PY_OK
+        try:
+            while flag == ID_PY_OK and tf - self._var.x > HMIN:
+                if nsteps >= maxsteps:
+                    raise SDIRK_DAE_Exception("The maximum number of steps, %d, was reached at t = %e."%(maxsteps, self._var.x))
+
+                #Do not step past tf
+                clipped = self._var.x + self._context.etc.h > tf
+                if clipped:
+                    adjust_stepsize((tf - self._var.x)/self._context.etc.h, &self._context.etc)
+
+                h = self._context.etc.h
+
+                #Count the evaluations of this step only, the counters of a
+                #step interrupted by the callbacks (e.g. another SDIRK_DAE
+                #simulated in the residual) are restored afterwards
+                with _kernel_lock:
+                    outer = number_of
+                    zero_stat()
+                    ret = one_step(&self._var, &self._var_old, &self._info, &self._rk, &self._context.etc)
+                    self._add_counts()
+                    number_of = outer
+
+                if self._error is not None:
+                    if ret == 0: #Discard the step
+                        swap = self._var
+                        self._var = self._var_old
+                        self._var_old = swap
+                    self._recover(h)
+                    continue
+                if ret != 0:
+                    raise SDIRK_DAE_Exception("%s The error occurred at t = %e."%(SDIRK_DAE_ERRORS[ret], self._var.x))
+                nsteps += 1
+                if not clipped: #Restart with the step-size of the last (full) step
+                    self._hnext = h
+
+                if tf - self._var.x <= HMIN:
+                    self._var.x = tf
+                flag = self._step_completed(self._var_old.x, self._var.x - self._var_old.x, opts, tr, yr, ydr)
+
+            if nsteps == 0 and flag == ID_PY_OK: #Already at tf
+                self._var.x = tf
+                flag = self._step_completed(t, 0.0, opts, tr, yr, ydr)
+        finally:
+            self._store_statistics(nsteps)
+
+        if flag == ID_PY_OK:
+            flag = ID_PY_COMPLETE
+
+        #Store the point where the integration stopped if it is not an output point
+        if not opts["report_continuously"] and opts["output_list"] is not None and flag == ID_PY_COMPLETE:
+            if len(tr) == 0 or tr[-1] != self._var.x:
+                tr.append(self._var.x)
+                yr.append(self._get_array(self._var.v))
+                ydr.append(self._get_array(self._var.vp))
+
+        return flag, tr, yr, ydr
+
+    cdef _step_completed(self, double told, double h, dict opts, list tr, list yr, list ydr):
         """
-        Returns the state events indicator as a list where a one (1)
-        indicates that the event function have been activated and a (0)
-        if not.
+        Handles the step from told, i.e. event detection and output.
         """
+        cdef int flag = ID_PY_OK
+        cdef double t = self._var.x
+        y  = self._get_array(self._var.v)
+        yd = self._get_array(self._var.vp)
+
+        if self._step_trace is not None and h > 0.0:
+            self._step_trace.record(t, h, 3) #The SDIRK method is of order 3
+
+        if self.problem_info["state_events"] and h > 0.0:
+            flag, t, y, yd = self.event_locator(told, t, y, yd)
+
+        if opts["report_continuously"]:
+            if self.report_solution(t, y, yd, opts):
+                flag = ID_PY_EVENT
+        elif opts["output_list"] is None:
+            tr.append(t)
+            yr.append(y)
+            ydr.append(yd)
+        else:
+            output_list = opts["output_list"]
+            output_index = opts["output_index"]
+            while output_index < len(output_list) and output_list[output_index] <= t:
+                tr.append(output_list[output_index])
+                yr.append(self.interpolate(output_list[output_index]))
+                ydr.append(self.interpolate(output_list[output_index], 1))
+                output_index += 1
+            opts["output_index"] = output_index
+
+            if flag == ID_PY_EVENT and (len(tr) == 0 or tr[-1] != t):
+                tr.append(t)
+                yr.append(y)
+                ydr.append(yd)
+
+        return flag
+
+    cdef N.ndarray _get_array(self, double *v):
+        cdef N.ndarray[double, ndim=1, mode="c"] arr = N.empty(self._leny)
+        memcpy(arr.data, v, self._leny*sizeof(double))
+        return arr
+
+    cdef void _add_counts(self):
+        self._counts.rejected_steps       += number_of.rejected_steps
+        self._counts.notkonv_steps        += number_of.notkonv_steps
+        self._counts.function_evaluations += number_of.function_evaluations
+        self._counts.jacobi_evaluations   += number_of.jacobi_evaluations
+        self._counts.factorisations       += number_of.factorisations
+        self._counts.solutions            += number_of.solutions
+
+    cdef _store_statistics(self, int nsteps):
+        cdef int nfcnjacs = 0
+
+        if self._info.num_jacobian:
+            nfcnjacs = self._counts.jacobi_evaluations*(2*self._leny+1)
+
+        self.statistics["nsteps"]    += nsteps
+        self.statistics["nfcns"]     += self._counts.function_evaluations - nfcnjacs
+        self.statistics["njacs"]     += self._counts.jacobi_evaluations
+        self.statistics["nfcnjacs"]  += nfcnjacs
+        self.statistics["nerrfails"] += self._counts.rejected_steps
+        self.statistics["nnfails"]   += self._counts.notkonv_steps
+        self.statistics["nniters"]   += self._counts.solutions
+        self.statistics["nlus"]      += self._counts.factorisations
+
+    def interpolate(self, double time, int k=0):
+        """
+        Evaluates the cubic Hermite interpolant of the last step, (k=0), or
+        its derivative, (k=1), at the time point time.
+        """
+        cdef kernel_problem *p0 = self._var_old
+        cdef kernel_problem *p1 = self._var
+        cdef double h = p1.x - p0.x
+        cdef double s = (time - p0.x)/h
+        cdef double c0, c1, c2, c3
+        cdef int i
+        cdef N.ndarray[double, ndim=1, mode="c"] res = N.empty(self._leny)
+
+        if k == 0:
+            c0 = (2.0*s - 3.0)*s*s + 1.0
+            c1 = ((s - 2.0)*s + 1.0)*s*h
+            c2 = (3.0 - 2.0*s)*s*s
+            c3 = (s - 1.0)*s*s*h
+        elif k == 1:
+            c0 = 6.0*(s - 1.0)*s/h
+            c1 = (3.0*s - 4.0)*s + 1.0
+            c2 = -c0
+            c3 = (3.0*s - 2.0)*s
+        else:
+            raise SDIRK_DAE_Exception("Only the solution (k=0) and its derivative (k=1) can be interpolated.")
+
+        for i in range(self._leny):
+            res[i] = c0*p0.v[i] + c1*p0.vp[i] + c2*p1.v[i] + c3*p1.vp[i]
+
+        return res
+
+    def state_event_info(self):
         return self._event_info
 
+    def set_event_info(self, event_info):
+        self._event_info = event_info
+
     def print_statistics(self, verbose=NORMAL):
         """
         Prints the run-time statistics for the problem.
         """
+        Implicit_ODE.print_statistics(self, verbose) #Calls the base class
+
         self.log_message('\nSolver options:\n',                                      verbose)
-        self.log_message(' Solver                  : LSODAR ',         verbose)
-        self.log_message(' Absolute tolerances     : {}'.format(self.options["atol"]),  verbose)
-        self.log_message(' Relative tolerances     : {}'.format(self.options["rtol"]),  verbose)
-        if self.rkstarter==1:
-           self.log_message(' Starter                 : {}'.format('classical'),  verbose)
-        else:
-           self.log_message(' Starter                 : Runge-Kutta order {}'.format(self.rkstarter),  verbose)
-        if self.maxordn < 12 or self.maxords < 5:
-            self.log_message(' Maximal order Adams     : {}'.format(self.maxordn),  verbose)
-            self.log_message(' Maximal order BDF       : {}'.format(self.maxords),  verbose)
-        if self.hmax > 0. :
-            self.log_message(' Maximal stepsize hmax   : {}'.format(self.hmax),  verbose)
+        self.log_message(' Solver                  : SDIRK_DAE',                     verbose)
+        self.log_message(' Tolerances (absolute)   : ' + str(self._compact_atol()),  verbose)
+        self.log_message(' Tolerances (relative)   : ' + str(self.options["rtol"]),  verbose)
+        self.log_message(' Jacobian                : ' + ('user-defined' if self.usejac else 'finite differences'), verbose)
         self.log_message('',                                                         verbose)
 
-        self.log_message('Final Run Statistics: %s \n' % self.problem.name,        verbose)
-        
-        self.log_message(' Number of steps                          : {}'.format(self.statistics["nsteps"]),          verbose)               
-        self.log_message(' Number of function evaluations           : {}'.format(self.statistics["nfcn"]),         verbose)
-        self.log_message(' Number of Jacobian evaluations           : {}'.format(self.statistics["njac"]),    verbose)
-        self.log_message(' Number of event function evaluations     : {}'.format(self.statistics["ng"]),       verbose)
-        self.log_message(' Number of detected state events          : {}'.format(self.statistics["nevents"]), verbose)
-        
-    
     def _set_usejac(self, jac):
         self.options["usejac"] = bool(jac)
-    
+
     def _get_usejac(self):
         """
         This sets the option to use the user defined jacobian. If a
         user provided jacobian is implemented into the problem the
         default setting is to use that jacobian. If not, an
         approximation is used.
-        
+
             Parameters::
-            
-                usejac  
+
+                usejac
                         - True - use user defined jacobian
                           False - use an approximation
-                    
+
                         - Should be a boolean.
-                        
+
                             Example:
                                 usejac = False
         """
         return self.options["usejac"]
-    
+
     usejac = property(_get_usejac,_set_usejac)
-    
+
     def _set_atol(self,atol):
-        
+
         self.options["atol"] = N.array(atol,dtype=N.float) if len(N.array(atol,dtype=N.float).shape)>0 else N.array([atol],dtype=N.float)
-    
+
         if len(self.options["atol"]) == 1:
             self.options["atol"] = self.options["atol"]*N.ones(self._leny)
         elif len(self.options["atol"]) != self._leny:
-            raise ODEPACK_Exception("atol must be of length one or same as the dimension of the problem.")
+            raise SDIRK_DAE_Exception("atol must be of length one or same as the dimension of the problem.")
 
     def _get_atol(self):
         """
         Defines the absolute tolerance(s) that is to be used by the solver.
         Can be set differently for each variable.
-        
+
             Parameters::
-            
-                atol    
+
+                atol
                         - Default '1.0e-6'.
-                
+
                         - Should be a positive float or a numpy vector
                           of floats.
-                        
+
                             Example:
                                 atol = [1.0e-4, 1.0e-6]
         """
         return self.options["atol"]
-    
+
     atol=property(_get_atol,_set_atol)
-    
+
     def _set_rtol(self,rtol):
         try:
             self.options["rtol"] = float(rtol)
         except (ValueError, TypeError):
-            raise ODEPACK_Exception('Relative tolerance must be a (scalar) float.')
+            raise SDIRK_DAE_Exception('Relative tolerance must be a (scalar) float.')
         if self.options["rtol"] <= 0.0:
-            raise ODEPACK_Exception('Relative tolerance must be a positive (scalar) float.')
-    
+            raise SDIRK_DAE_Exception('Relative tolerance must be a positive (scalar) float.')
+
     def _get_rtol(self):
         """
         Defines the relative tolerance that is to be used by the solver.
-        
+
             Parameters::
-            
-                rtol    
+
+                rtol
                         - Default '1.0e-6'.
-                
+
                         - Should be a positive float.
-                        
+
                             Example:
                                 rtol = 1.0e-4
         """
         return self.options["rtol"]
-        
+
     rtol=property(_get_rtol,_set_rtol)
 
+    def _set_initial_step(self, inith):
+        try:
+            self.options["inith"] = float(inith)
+        except (ValueError, TypeError):
+            raise SDIRK_DAE_Exception('The initial step-size must be a (scalar) float.')
+        if self.options["inith"] <= 0.0:
+            raise SDIRK_DAE_Exception('The initial step-size must be a positive (scalar) float.')
+
+    def _get_initial_step(self):
+        """
+        This determines the initial step-size to be used in the integration.
+        After an event the integration is restarted with the step-size of
+        the last step instead.
+
+            Parameters::
+
+                inith
+                            - Default '0.01'.
+
+                            - Should be a positive float.
+
+                                Example:
+                                    inith = 0.001
+        """
+        return self.options["inith"]
+
+    inith = property(_get_initial_step,_set_initial_step)
+
+    def _set_max_h(self,max_h):
+        try:
+            self.options["maxh"] = float(max_h)
+        except (ValueError,TypeError):
+            raise SDIRK_DAE_Exception('Maximal stepsize must be a (scalar) float.')
+        if self.options["maxh"] <= 0.0:
+            raise SDIRK_DAE_Exception('Maximal stepsize must be a positive (scalar) float.')
+
+    def _get_max_h(self):
+        """
+        Defines the maximal step-size that is to be used by the solver.
+
+            Parameters::
+
+                maxh
+                        - Default: no maximal step-size.
+
+                        - Should be a positive float.
+
+                            Example:
+                                maxh = 0.01
+
+        """
+        return self.options["maxh"]
+
+    maxh=property(_get_max_h,_set_max_h)
+
     def _get_maxsteps(self):
         """
         The maximum number of steps allowed to be taken to reach the
         final time.
-        
+
             Parameters::
-            
+
                 maxsteps
-                            - Default 10000
-                            
+                            - Default 100000
+
                             - Should be a positive integer
         """
         return self.options["maxsteps"]
-    
+
     def _set_maxsteps(self, max_steps):
         try:
             max_steps = int(max_steps)
         except (TypeError, ValueError):
-            raise ODEPACK_Exception("Maximum number of steps must be a positive integer.")
+            raise SDIRK_DAE_Exception("Maximum number of steps must be a positive integer.")
+        if max_steps <= 0:
+            raise SDIRK_DAE_Exception("Maximum number of steps must be a positive integer.")
         self.options["maxsteps"] = max_steps
-    
+
     maxsteps = property(_get_maxsteps, _set_maxsteps)
-    def _get_hmax(self):
-        """
-        The absolute value of the maximal stepsize for all methods
-        
-        Parameters::
-        
-               hmax
-                          - Default:  0.  (no maximal step size)
-                          
-                          - Should be a positive float
-        """
-        return self.options["hmax"]
-    def _set_hmax(self,hmax):
-        if not (isinstance(hmax,float) and hmax >= 0.):
-           raise ODEPACK_Exception("Maximal step size hmax should be a positive float")
-        self.options["hmax"]=hmax
-    hmax = property(_get_hmax, _set_hmax)
-    def _get_maxordn(self):
-        """
-        The maximum order used by the Adams-Moulton method (nonstiff case)
-        
-            Parameters::
-            
-                maxordn
-                            - Default 12
-                            
-                            - Should be a positive integer
-        """
-        return self.options["maxordn"]
-    
-    def _set_maxordn(self, maxordn):
-        try:
-            maxordn = int(maxordn)
-        except (TypeError, ValueError):
-            raise ODEPACK_Exception("Maximum order must be a positive integer.")
-        if maxordn > 12:
-            raise ODEPACK_Exception("Maximum order should not exceed 12.")    
-        self.options["maxordn"] = maxordn
-    
-    maxordn = property(_get_maxordn, _set_maxordn)
-    def _get_maxords(self):
-        """
-        The maximum order used by the BDF method (stiff case)
-        
-            Parameters::
-            
-                maxords
-                            - Default 5
-                            
-                            - Should be a positive integer
-        """
-        return self.options["maxords"]
-    
-    def _set_maxords(self, maxords):
+
+cdef void _residual(kernel_etcetera *etc, double *vp, double *v, double x, double *res) noexcept:
+    """
+    The residual F(t, y, yd) of the solver owning etc, called by the
+    kernel. Errors are stored in the solver and raised after the step,
+    meanwhile a zero residual is returned.
+    """
+    cdef SDIRK_DAE solver = <SDIRK_DAE>(<kernel_context*>etc).solver
+    cdef int i, n = solver._leny
+    cdef double[::1] r
+
+    if solver._error is None:
+        memcpy(&solver._wy[0], v, n*sizeof(double))
+        memcpy(&solver._wyd[0], vp, n*sizeof(double))
         try:
-            maxords = int(maxords)
-        except (TypeError, ValueError):
-            raise ODEPACK_Exception("Maximum order must be a positive integer.")
-        if maxords > 5:
-            raise ODEPACK_Exception("Maximum order should not exceed 5.")    
-        self.options["maxords"] = maxords
-    
-    maxords = property(_get_maxords, _set_maxords)
-    def _get_rkstarter(self):
-        """
-        This defines how LSODAR is started. 
-        (classically or with a fourth order Runge-Kutta starter)
-        
-            Parameters::
-            
-                rkstarter
-                            - Default False  starts LSODAR in the classical multistep way
-                            
-                            - Should be a Boolean
-        """
-        return self.options["rkstarter"]
-    
-    def _set_rkstarter(self, rkstarter):
-        if not rkstarter in {1,2,3,4,5}:
-            raise ODEPACK_Exception("Must be a positive integer less than 6")
-        self.options["rkstarter"] = rkstarter
-    
-    rkstarter = property(_get_rkstarter, _set_rkstarter)
-class RKStarterNordsieck(object):
+            r = N.ascontiguousarray(solver._res(x, solver._work_y, solver._work_yd), dtype=N.double).reshape(-1)
+            if r.shape[0] != n:
+                raise SDIRK_DAE_Exception("The residual should return an array of length %d."%n)
+            for i in range(n):
+                if not isfinite(r[i]):
+                    raise AssimuloRecoverableError("The residual is not finite at t = %e."%x)
+                res[i] = r[i]
+            return
+        except RECOVERABLE_ERRORS as e:
+            solver._set_error(e, True)
+        except BaseException as e:
+            solver._set_error(e, False)
+
+    for i in range(n):
+        res[i] = 0.0
+
+cdef void _jacobian(kernel_etcetera *etc, double *v, double *vp, double x, double *dfdvp, double *dfdv) noexcept:
     """
-    A family of Runge-Kutta starters producing a 
-    Nordsieck array to (re-)start a Nordsieck based multistep
-    method with a given order.
-    
-    See: Mohammadi (2013): https://lup.lub.lu.se/luur/download?func=downloadFile&recordOId=4196026&fileOId=4196027
+    The Jacobians dF/dyd and dF/dy of the solver owning etc, called by
+    the kernel. Errors are handled as in _residual.
     """
-    Gamma_0=[N.array([[1.,0.],                        # 1st order
-                      [0.,1.]]),
-             N.array([[1.,0.,0.],                     # 2nd order
-                      [0.,1.,-1.],
-                      [0.,0.,1.]]),
-             N.array([[1.,0.,0.,0.],                  # 3rd order
-                      [0.,1.,-5./3.,1.],         
-                      [0.,0.,3.,-2.],
-                      [0.,0.,0.,1.],
-                      [0.,0.,-4./3.,0.]]),
-             N.array([[1.,0.,0.,0.,0.],               # 4th order
-                      [0.,1.,-5./6.,4./9.,-1./9.],         
-                      [0.,0.,0.,0.,0.],
-                      [0.,0.,1./2.,-4./9.,1./9.],
-                      [0.,0.,7./3.,-19./9.,7./9.],
-                      [0.,0.,-3.,10./3.,-4./3.],
-                      [0.,0.,1.,-11./9.,5./9.]])]  
-                      
-    scale=N.array([1, 1, 1/2., 1./6., 1./24., 1./120.]).reshape(-1,1)
-    
-    def __init__(self,  rhs, H, eval_at=0.,number_of_steps=4):
-        """
-        Initiates the Runge-Kutta Starter.
-        
-            Parameters::
-                            
-                rhs     
-                            - The problem's rhs function
-                             
-                H
-                            - starter step size
-                            
-                eval_at
-                            - Where to evaluate the Nordiseck vector
-                              evaluation point is (eval_at)*H
-                              Possible choices 
-                              eval_at=0.
-                              eval_at=1.
-             
-                number_of_steps
-                            - the number of steps :math:`(k)` to start the multistep method with
-                              This will determine the initial order of the method, which is
-                              :math:`k` for BDF methods and :math:`k+1` for Adams Moulton Methods   .
-        """
-        self.f = rhs
-        self.H = H
-        
-        if not 1 < number_of_steps < 5:
-            raise RKStarter_Exception('Step number larget than 4 not yet implemented')            
-        self.number_of_steps = number_of_steps 
-        self.eval_at = float(eval_at)
-        if not self.eval_at == 0.:
-           raise RKStarter_Exception("Parameter eval_at different from 0 not yet implemented.")                    
-    def rk_like4(self, t0, y0, sw0): 
-        """
-        rk_like computes Runge-Kutta stages
-        Note, the currently implementation is **only** correct for
-        autonomous systems.
-        """
-        f = lambda y: self.f(t0, y, sw0)
-        h = self.H/4.
-        k1 = h*f(y0)
-        k2 = h*f(y0 + k1)
-        k3 = h*f(y0 + 2. * k2)
-        k4 = h*f(y0 + 3./4. * k1 + 9./4. * k3)
-        k5 = h*f(y0 + k1/2. + k2 + k3/2. + 2. * k4)
-        k6 = h*f(y0+k1/12.+2. * k2 + k3/4. + 2./3. * k4 + 2. * k5)
-        return N.array([y0,k1,k2,k3,k4,k5,k6])
-    def rk_like3(self, t0, y0, sw0): 
-        """
-        rk_like computes Runge-Kutta stages
-        Note, the currently implementation is **only** correct for
-        autonomous systems.
+    cdef SDIRK_DAE solver = <SDIRK_DAE>(<kernel_context*>etc).solver
+    cdef int i, j, n = solver._leny
+    cdef double[:,::1] A, B
 
-        """
-        f = lambda y: self.f(t0, y, sw0)
-        h = self.H/3.
-        k1 = h*f(y0)
-        k2 = h*f(y0 + k1)
-        k3 = h*f(y0 + k1+ k2)
-        k4 = h*f(y0 + 3./2. * k1)
-        return N.array([y0,k1,k2,k3,k4])
-    def rk_like2(self, t0, y0, sw0):
-        """
-        rk_like2 computes Runge-Kutta 2nd-stages
-        Note, the currently implementation is **only** correct for
-        autonomous systems.
-        """
-        f=lambda y: self.f(t0, y, sw0)
-        h=self.H/2
-        k1=h*f(y0)
-        k2=h*f(y0+k1)
-        return N.array([y0,k1,k2])        
-    def nordsieck(self,k):
-        """
-        Nordsieck array computed at initial point
-        """
-        nord=self.scale[:self.number_of_steps+1]*N.dot(self.Gamma_0[self.number_of_steps-1].T,k)
-        return nord  
-    def __call__(self, t0 , y0, sw0=[]):
-        """
-        Evaluates the Runge-Kutta starting values
-        
-            Parameters::
-            
-                y0   
-                    - starting value
-        """
-        # We construct a call like: rk_like4(self, t0, y0, sw0) 
-        k=self.__getattribute__('rk_like{}'.format(self.number_of_steps))(t0, y0, sw0)
-        t = t0+self.eval_at*self.H
-        return t, self.nordsieck(k)
+    if solver._error is None:
+        memcpy(&solver._wy[0], v, n*sizeof(double))
+        memcpy(&solver._wyd[0], vp, n*sizeof(double))
+        try:
+            dFdyd, dFdy = solver._jac_parts(x, solver._work_y, solver._work_yd)
+            A = N.ascontiguousarray(dFdyd, dtype=N.double)
+            B = N.ascontiguousarray(dFdy, dtype=N.double)
+            if A.shape[0] != n or A.shape[1] != n or B.shape[0] != n or B.shape[1] != n:
+                raise SDIRK_DAE_Exception("The Jacobian should be of size %dx%d."%(n,n))
+            for i in range(n):
+                for j in range(n):
+                    dfdvp[n*i+j] = A[i,j]
+                    dfdv[n*i+j] = B[i,j]
+            return
+        except RECOVERABLE_ERRORS as e:
+            solver._set_error(e, True)
+        except BaseException as e:
+            solver._set_error(e, False)
+
+    for i in range(n):
+        for j in range(n):
+            dfdvp[n*i+j] = 1.0 if i == j else 0.0
+            dfdv[n*i+j] = 0.0
+
+#The residual and the Jacobian called by the kernel
+sdirk_dae_res = _residual
+sdirk_dae_jac = _jacobian
@@ -17,13 +17,13 @@
 
 import numpy as N 
 cimport numpy as N
+cimport cython
 from numpy cimport PyArray_DATA
 
 N.import_array()
 
 import numpy.linalg
 import traceback 
-import scipy.sparse as sparse
  
 from assimulo.exception import * 
 
@@ -44,6 +44,138 @@ include "../lib/sundials_constants.pxi" #Sundials related constants
 include "../lib/sundials_callbacks.pxi"
 include "../lib/sundials_callbacks_ida_cvode.pxi"
 
+#Options of the built-in preconditioners, shared by IDA and CVode
+@cython.binding(True)
+def _set_builtin_precond(self, precond):
+    if str(precond).upper() in ["NONE", "BAND", "BLOCK_JACOBI"]:
+        self.options["builtin_precond"] = str(precond).upper()
+    else:
+        raise AssimuloException('The built-in preconditioner must be either "NONE", "BAND" or "BLOCK_JACOBI".')
+
+@cython.binding(True)
+def _get_builtin_precond(self):
+    """
+    Specifies a built-in preconditioner to be used together with the
+    iterative linear solvers. The built-in preconditioners are
+    computed and applied entirely in C, using difference quotients
+    of the residual (IDA) or the right-hand-side (CVode). If set, a
+    user-defined prec_setup/prec_solve is not used.
+    
+        Parameters::
+        
+                builtin_precond
+                        - Should be either "NONE", "BAND" or
+                          "BLOCK_JACOBI".
+                        
+                          "BAND" uses a banded preconditioner with
+                          half-bandwidths mupper and mlower.
+                          
+                          "BLOCK_JACOBI" uses a block-diagonal
+                          preconditioner with blocks given by 
+                          prec_blocks.
+                        - Default "NONE"
+        
+        Returns::
+        
+            The current value of builtin_precond.
+            
+    See SUNDIALS documentation 'IDABBDPrecInit' and 'CVBandPrecInit'
+    """
+    return self.options["builtin_precond"]
+
+@cython.binding(True)
+def _set_mupper(self, mupper):
+    try:
+        self.options["mupper"] = int(mupper)
+    except:
+        raise AssimuloException("The upper half-bandwidth should be an integer.")
+    if self.options["mupper"] < 0:
+        raise AssimuloException("The upper half-bandwidth should be a positive integer.")
+
+@cython.binding(True)
+def _get_mupper(self):
+    """
+    Specifies the upper half-bandwidth used by the built-in banded
+    preconditioner.
+    
+        Parameters::
+        
+                mupper
+                        - A positive integer.
+                        - Default 0
+        
+        Returns::
+        
+            The current value of mupper.
+    """
+    return self.options["mupper"]
+
+@cython.binding(True)
+def _set_mlower(self, mlower):
+    try:
+        self.options["mlower"] = int(mlower)
+    except:
+        raise AssimuloException("The lower half-bandwidth should be an integer.")
+    if self.options["mlower"] < 0:
+        raise AssimuloException("The lower half-bandwidth should be a positive integer.")
+
+@cython.binding(True)
+def _get_mlower(self):
+    """
+    Specifies the lower half-bandwidth used by the built-in banded
+    preconditioner.
+    
+        Parameters::
+        
+                mlower
+                        - A positive integer.
+                        - Default 0
+        
+        Returns::
+        
+            The current value of mlower.
+    """
+    return self.options["mlower"]
+
+@cython.binding(True)
+def _set_prec_blocks(self, blocks):
+    if blocks is None:
+        self.options["prec_blocks"] = None
+        return
+    try:
+        blocks = [int(b) for b in blocks]
+    except (ValueError, TypeError):
+        raise AssimuloException("The block sizes should be a list of integers.")
+    if min(blocks) <= 0:
+        raise AssimuloException("The block sizes should be positive integers.")
+    if sum(blocks) != self.problem_info["dim"]:
+        raise AssimuloException("The block sizes must sum up to the dimension of the problem.")
+    self.options["prec_blocks"] = blocks
+
+@cython.binding(True)
+def _get_prec_blocks(self):
+    """
+    Specifies the sizes of the consecutive diagonal blocks used by 
+    the built-in block-Jacobi preconditioner.
+    
+        Parameters::
+        
+                prec_blocks
+                        - A list of positive integers summing up to
+                          the dimension of the problem.
+                        - Default None
+        
+        Returns::
+        
+            The current block sizes.
+    """
+    return self.options["prec_blocks"]
+
+def _checked_prec_blocks(self):
+    if self.options["prec_blocks"] is None:
+        raise AssimuloException("The block-Jacobi preconditioner requires the block sizes to be set via the option 'prec_blocks'.")
+    return self.options["prec_blocks"]
+
 
 cdef class IDA(Implicit_ODE):
     """
@@ -61,13 +193,17 @@ cdef class IDA(Implicit_ODE):
     """
     cdef void* ida_mem
     cdef ProblemData pData      #A struct containing information about the problem
+    cdef NativeProblemData nData #The compiled functions of a native problem
+    cdef bint native            #Whether the compiled functions are used
     cdef N_Vector yTemp, ydTemp, nv_atol
     cdef N_Vector *ySO
     cdef N_Vector *ydSO
+    cdef N_Vector *dkySO        #Views of the rows of _sens_buffer
+    cdef N.ndarray _sens_buffer
     cdef object f
     cdef public object event_func
     #cdef public dict statistics
-    cdef object pt_root, pt_fcn, pt_jac, pt_jacv, pt_sens
+    cdef object pt_root, pt_fcn, pt_jac, pt_jacv, pt_sens, pt_prec_solve, pt_prec_setup
     cdef public N.ndarray yS0
     #cdef N.ndarray _event_info
     cdef public N.ndarray g_old
@@ -90,6 +226,13 @@ cdef class IDA(Implicit_ODE):
         self.options["suppress_alg"] = False #Turn on or off the local error test on algebraic variables
         self.options["suppress_sens"] = False #Turn on or off the local error test on the sensitivity variables
         self.options["linear_solver"] = "DENSE"
+        self.options["maxkrylov"] = 5        #Maximum dimension of the Krylov subspace
+        self.options["maxrestarts"] = 5      #Maximum number of restarts (SPGMR, SPFGMR)
+        self.options["epslin"] = 0.05        #Safety factor in the linear convergence test
+        self.options["builtin_precond"] = "NONE" #Built-in preconditioner (BAND, BLOCK_JACOBI)
+        self.options["mupper"] = 0           #Upper half-bandwidth of the banded preconditioner
+        self.options["mlower"] = 0           #Lower half-bandwidth of the banded preconditioner
+        self.options["prec_blocks"] = None   #Block sizes of the block-Jacobi preconditioner
         self.options["maxsteps"] = 10000     #Maximum number of steps
         self.options["maxh"] = 0.0           #Maximum step-size
         self.options["maxord"] = 5           #Maximum order of method
@@ -109,6 +252,7 @@ cdef class IDA(Implicit_ODE):
         self.supports["interpolated_output"] = True
         self.supports["interpolated_sensitivity_output"] = True
         self.supports["state_events"] = True
+        self.supports["step_trace"] = True
         
         #Get options from Problem
         if hasattr(problem, 'pbar'):
@@ -148,6 +292,15 @@ cdef class IDA(Implicit_ODE):
         if self.problem_info["jacv_fcn"] is True: #Sets the jacobian times vector
             self.pt_jacv = self.problem.jacv
             self.pData.JACV = <void*>self.pt_jacv#<void*>self.problem.jacv
+        
+        if self.problem_info["prec_solve"] is True: #Sets the preconditioner solve function
+            self.pt_prec_solve = self.problem.prec_solve
+            self.pData.PREC_SOLVE = <void*>self.pt_prec_solve
+            
+        if self.problem_info["prec_setup"] is True: #Sets the preconditioner setup function
+            self.pt_prec_setup = self.problem.prec_setup
+            self.pData.PREC_SETUP = <void*>self.pt_prec_setup
+            self.pData.PREC_DATA = None
             
         if self.problem_info["sens_fcn"] is True: #Sets the sensitivity function
             self.pt_sens = self.problem.sens
@@ -160,9 +313,45 @@ cdef class IDA(Implicit_ODE):
         else:
             self.pData.dimSens = 0
         
+        #Sets the compiled functions of a native problem
+        self.native = hasattr(self.problem, "res_address")
+        if self.native:
+            self.nData.RHS = <void*><size_t>self.problem.res_address
+            self.nData.JAC = <void*><size_t>self.problem.jac_address if self.problem.jac_address else NULL
+            self.nData.ROOT = <void*><size_t>self.problem.state_events_address if self.problem.state_events_address else NULL
+            self.nData.user_data = <void*><size_t>self.problem.user_data
+            
+            if (self.problem_info["state_events"] and self.nData.ROOT == NULL) or (self.problem_info["jac_fcn"] and self.nData.JAC == NULL) \
+               or self.problem_info["jacv_fcn"] or self.problem_info["prec_solve"] or self.problem_info["dimSens"] > 0:
+                raise AssimuloException("A native problem can only be combined with compiled residual, Jacobian and state event functions.")
+        
         self.pData.verbose = 2
         self.pData.create_work_arrays()  
     
+    cdef void* user_data(self):
+        """
+        Returns the user data given to IDA, the compiled functions of a
+        native problem or the problem data.
+        """
+        if self.native:
+            return <void*>&self.nData
+        return <void*>self.pData
+    
+    cdef int ida_solve(self, realtype tout, realtype *tret, N_Vector yout, N_Vector ydout, int itask):
+        """
+        Calls IDASolve. The GIL is released if the problem is native.
+        """
+        cdef int flag
+        cdef void* ida_mem = self.ida_mem
+        
+        if self.native:
+            with nogil:
+                flag = SUNDIALS.IDASolve(ida_mem, tout, tret, yout, ydout, itask)
+        else:
+            flag = SUNDIALS.IDASolve(ida_mem, tout, tret, yout, ydout, itask)
+        
+        return flag
+    
     def __dealloc__(self):
         
         if self.yTemp != NULL:
@@ -176,6 +365,9 @@ cdef class IDA(Implicit_ODE):
         if self.nv_atol != NULL:
             N_VDestroy_Serial(self.nv_atol)
         
+        if self.dkySO != NULL:
+            SUNDIALS.N_VDestroyVectorArray_Serial(self.dkySO, self._sens_buffer.shape[0])
+        
         if self.ida_mem != NULL: 
             #Free Memory
             SUNDIALS.IDAFree(&self.ida_mem)
@@ -222,6 +414,35 @@ cdef class IDA(Implicit_ODE):
     def set_event_info(self, event_info):
         self._event_info = event_info
     
+    cdef set_timed_callbacks(self):
+        """
+        Points the problem data to the timed versions of the problem
+        functions if the option profile is set (otherwise to the functions
+        themselves).
+        """
+        self.pt_fcn = self._timed(self.problem.res, "res")
+        self.pData.RHS = <void*>self.pt_fcn
+        
+        if self.problem_info["state_events"] is True:
+            self.pt_root = self._timed(self.problem.state_events, "state_events")
+            self.pData.ROOT = <void*>self.pt_root
+        
+        if self.problem_info["jac_fcn"] is True:
+            self.pt_jac = self._timed(self.problem.jac, "jac")
+            self.pData.JAC = <void*>self.pt_jac
+        
+        if self.problem_info["jacv_fcn"] is True:
+            self.pt_jacv = self._timed(self.problem.jacv, "jacv")
+            self.pData.JACV = <void*>self.pt_jacv
+        
+        if self.problem_info["prec_solve"] is True:
+            self.pt_prec_solve = self._timed(self.problem.prec_solve, "prec_solve")
+            self.pData.PREC_SOLVE = <void*>self.pt_prec_solve
+            
+        if self.problem_info["prec_setup"] is True:
+            self.pt_prec_setup = self._timed(self.problem.prec_setup, "prec_setup")
+            self.pData.PREC_SETUP = <void*>self.pt_prec_setup
+    
     cpdef initialize(self):
         
         #Initialize storing of sensitivity result in handle_result
@@ -230,6 +451,7 @@ cdef class IDA(Implicit_ODE):
         
         #Reset statistics
         self.statistics.reset()
+        self.set_timed_callbacks()
         
         self.initialize_ida()
     
@@ -256,6 +478,14 @@ cdef class IDA(Implicit_ODE):
                  if self.yS0 is not None:
                     for j in range(self.pData.dim):
                         (<N_VectorContent_Serial>self.ySO[i].content).data[j] = self.yS0[i,j]
+            
+            #Create the vectors used for interpolating the sensitivities
+            if self.dkySO != NULL:
+                SUNDIALS.N_VDestroyVectorArray_Serial(self.dkySO, self._sens_buffer.shape[0])
+            self._sens_buffer = N.empty((self.pData.dimSens, self.pData.dim))
+            self.dkySO = SUNDIALS.N_VCloneVectorArrayEmpty_Serial(self.pData.dimSens, self.yTemp)
+            for i in range(self.pData.dimSens):
+                SUNDIALS.N_VSetArrayPointer_Serial((<realtype*>self._sens_buffer.data) + (<int>i)*self.pData.dim, self.dkySO[i])
 
         if self.ida_mem == NULL: #The solver is not initialized
         
@@ -264,7 +494,15 @@ cdef class IDA(Implicit_ODE):
                 raise IDAError(IDA_MEM_FAIL)
             
             #Specify the residual and the initial conditions to the solver
-            flag = SUNDIALS.IDAInit(self.ida_mem, ida_res, self.t, self.yTemp, self.ydTemp)
+            if self.native:
+                flag = SUNDIALS.IDAInit(self.ida_mem, ida_res_native, self.t, self.yTemp, self.ydTemp)
+            else:
+                flag = SUNDIALS.IDAInit(self.ida_mem, ida_res, self.t, self.yTemp, self.ydTemp)
+            if flag < 0:
+                raise IDAError(flag, self.t)
+            
+            #Set the user data (before the linear solver, which copies it in SUNDIALS < 3.0)
+            flag = SUNDIALS.IDASetUserData(self.ida_mem, self.user_data())
             if flag < 0:
                 raise IDAError(flag, self.t)
                 
@@ -283,15 +521,39 @@ cdef class IDA(Implicit_ODE):
                 if flag < 0:
                     raise IDAError(flag, self.t)
                         
-            elif self.options["linear_solver"] == 'SPGMR':
+            elif self.options["linear_solver"] in KRYLOV_SOLVERS:
+                #IDA only supports left preconditioning
+                pretype = PREC_LEFT if (self.pData.PREC_SOLVE != NULL or self.options["builtin_precond"] != "NONE") else PREC_NONE
                 IF SUNDIALS_VERSION >= (3,0,0):
                     #Create the linear solver
-                    self.sun_linearsolver = SUNDIALS.SUNSPGMR(self.yTemp, PREC_NONE, 0)
+                    if self.options["linear_solver"] == 'SPGMR':
+                        self.sun_linearsolver = SUNDIALS.SUNSPGMR(self.yTemp, pretype, self.options["maxkrylov"])
+                        flag = SUNDIALS.SUNSPGMRSetMaxRestarts(self.sun_linearsolver, self.options["maxrestarts"])
+                        if flag < 0:
+                            raise IDAError(flag, self.t)
+                    elif self.options["linear_solver"] == 'SPFGMR':
+                        self.sun_linearsolver = SUNDIALS.SUNSPFGMR(self.yTemp, pretype, self.options["maxkrylov"])
+                        flag = SUNDIALS.SUNSPFGMRSetMaxRestarts(self.sun_linearsolver, self.options["maxrestarts"])
+                        if flag < 0:
+                            raise IDAError(flag, self.t)
+                    elif self.options["linear_solver"] == 'SPBCGS':
+                        self.sun_linearsolver = SUNDIALS.SUNSPBCGS(self.yTemp, pretype, self.options["maxkrylov"])
+                    else:
+                        self.sun_linearsolver = SUNDIALS.SUNSPTFQMR(self.yTemp, pretype, self.options["maxkrylov"])
                     #Attach it to IDAS
                     flag = SUNDIALS.IDASpilsSetLinearSolver(self.ida_mem, self.sun_linearsolver)
                 ELSE:
-                    #Specify the use of SPGMR linear solver.
-                    flag = SUNDIALS.IDASpgmr(self.ida_mem, 0) #0 == Default krylov iterations
+                    #Specify the use of the iterative linear solver.
+                    if self.options["linear_solver"] == 'SPGMR':
+                        flag = SUNDIALS.IDASpgmr(self.ida_mem, self.options["maxkrylov"])
+                        if flag >= 0:
+                            flag = SUNDIALS.IDASpilsSetMaxRestarts(self.ida_mem, self.options["maxrestarts"])
+                    elif self.options["linear_solver"] == 'SPBCGS':
+                        flag = SUNDIALS.IDASpbcg(self.ida_mem, self.options["maxkrylov"])
+                    elif self.options["linear_solver"] == 'SPTFQMR':
+                        flag = SUNDIALS.IDASptfqmr(self.ida_mem, self.options["maxkrylov"])
+                    else:
+                        raise AssimuloException("The linear solver 'SPFGMR' requires SUNDIALS 3.0 or newer.")
                 if flag < 0: 
                     raise IDAError(flag, self.t)
                 
@@ -302,6 +564,8 @@ cdef class IDA(Implicit_ODE):
             if self.pData.ROOT != NULL:
                 if self.options["external_event_detection"]:
                     flag = SUNDIALS.IDARootInit(self.ida_mem, 0, ida_root)
+                elif self.native:
+                    flag = SUNDIALS.IDARootInit(self.ida_mem, self.pData.dimRoot, ida_root_native)
                 else:
                     flag = SUNDIALS.IDARootInit(self.ida_mem, self.pData.dimRoot, ida_root)
                 if flag < 0:
@@ -331,7 +595,14 @@ cdef class IDA(Implicit_ODE):
         
         if self.options["linear_solver"] == 'DENSE':
             #Specify the jacobian to the solver
-            if self.pData.JAC != NULL and self.options["usejac"]:
+            if self.native and self.nData.JAC != NULL and self.options["usejac"]:
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    flag = SUNDIALS.IDADlsSetJacFn(self.ida_mem, ida_jac_native)
+                ELSE:
+                    flag = SUNDIALS.IDADlsSetDenseJacFn(self.ida_mem, ida_jac_native)
+                if flag < 0:
+                    raise IDAError(flag,self.t)
+            elif self.pData.JAC != NULL and self.options["usejac"]:
                 IF SUNDIALS_VERSION >= (3,0,0):
                     flag = SUNDIALS.IDADlsSetJacFn(self.ida_mem, ida_jac)
                 ELSE:
@@ -346,7 +617,7 @@ cdef class IDA(Implicit_ODE):
                 if flag < 0:
                     raise IDAError(flag,self.t)
                     
-        elif self.options["linear_solver"] == 'SPGMR':
+        elif self.options["linear_solver"] in KRYLOV_SOLVERS:
             #Specify the jacobian times vector function
             if self.pData.JACV != NULL and self.options["usejac"]:
                 IF SUNDIALS_VERSION >= (3,0,0):
@@ -362,13 +633,34 @@ cdef class IDA(Implicit_ODE):
                     flag = SUNDIALS.IDASpilsSetJacTimesVecFn(self.ida_mem, NULL);
                 if flag < 0:
                     raise IDAError(flag, self.t)
+            
+            #Specify the preconditioner
+            if self.native and self.options["builtin_precond"] != "NONE":
+                raise AssimuloException("The built-in preconditioners are not supported for native problems.")
+            if self.options["builtin_precond"] == "BAND":
+                flag = SUNDIALS.IDABBDPrecInit(self.ida_mem, self.pData.dim, self.options["mupper"], self.options["mlower"],
+                                               self.options["mupper"], self.options["mlower"], 0.0, ida_bbd_local, NULL)
+                if flag < 0:
+                    raise IDAError(flag, self.t)
+            elif self.options["builtin_precond"] == "BLOCK_JACOBI":
+                self.pData.BJ = BlockJacobiPreconditioner(_checked_prec_blocks(self))
+                flag = SUNDIALS.IDASpilsSetPreconditioner(self.ida_mem, ida_bj_prec_setup, ida_bj_prec_solve)
+                if flag < 0:
+                    raise IDAError(flag, self.t)
+            elif self.pData.PREC_SOLVE != NULL:
+                if self.pData.PREC_SETUP != NULL:
+                    flag = SUNDIALS.IDASpilsSetPreconditioner(self.ida_mem, ida_prec_setup, ida_prec_solve)
+                else:
+                    flag = SUNDIALS.IDASpilsSetPreconditioner(self.ida_mem, NULL, ida_prec_solve)
+                if flag < 0:
+                    raise IDAError(flag, self.t)
+            
+            #Specify the safety factor in the linear convergence test
+            flag = SUNDIALS.IDASpilsSetEpsLin(self.ida_mem, self.options["epslin"])
+            if flag < 0:
+                raise IDAError(flag, self.t)
         else:
             raise IDAError(100, self.t)
-        
-        #Set the user data
-        flag = SUNDIALS.IDASetUserData(self.ida_mem, <void*>self.pData)
-        if flag < 0:
-            raise IDAError(flag, self.t)
             
     def initialize_event_detection(self):
         if self.problem_info["type"] == 1:
@@ -487,6 +779,8 @@ cdef class IDA(Implicit_ODE):
             self.initialize_options()
             if self.options["external_event_detection"]:
                 self.initialize_event_detection()
+            if self._step_trace is not None:
+                self._step_trace.restart()
         
         #Set stop time
         flag = SUNDIALS.IDASetStopTime(self.ida_mem, tf)
@@ -498,9 +792,12 @@ cdef class IDA(Implicit_ODE):
             while True:
                 
                 #Integration loop
-                flag = SUNDIALS.IDASolve(self.ida_mem,tf,&tret,yout,ydout,IDA_ONE_STEP)
+                flag = self.ida_solve(tf,&tret,yout,ydout,IDA_ONE_STEP)
                 if flag < 0:
                     raise IDAError(flag, tret)
+                
+                if self._step_trace is not None:
+                    self.trace_step(tret)
                     
                 t = tret 
                 y = nv2arr(yout)
@@ -539,7 +836,7 @@ cdef class IDA(Implicit_ODE):
             
             for tout in output_list:
                 #Integration loop
-                flag = SUNDIALS.IDASolve(self.ida_mem,tout,&tret,yout,ydout,IDA_NORMAL)
+                flag = self.ida_solve(tout,&tret,yout,ydout,IDA_NORMAL)
                 if flag < 0:
                     raise IDAError(flag, tret)
                 
@@ -598,7 +895,7 @@ cdef class IDA(Implicit_ODE):
             raise IDAError(flag, t)
         
         #Integration loop
-        flag = SUNDIALS.IDASolve(self.ida_mem,tf,&tret,yout,ydout,IDA_ONE_STEP)
+        flag = self.ida_solve(tf,&tret,yout,ydout,IDA_ONE_STEP)
         if flag < 0:
             raise IDAError(flag, tret)
             
@@ -711,6 +1008,23 @@ cdef class IDA(Implicit_ODE):
         
         return err
     
+    def _get_dense_output_polynomial(self, double t_left, double t_right):
+        """
+        Returns the interpolation polynomial of the last step through its
+        scaled derivatives h**k/k!*y^(k)(t_right), k up to the order used.
+        """
+        cdef int k
+        cdef double h = t_right - t_left
+        cdef double scale = 1.0
+        cdef int q = self.get_last_order()
+        
+        coefficients = N.empty((q+1, self.pData.dim))
+        for k in range(q+1):
+            coefficients[k,:] = scale*self.interpolate(t_right, k)
+            scale *= h/(k+1)
+        
+        return coefficients, t_right, h
+    
     cpdef N.ndarray interpolate(self,double t,int k = 0):
         """
         Calls the internal IDAGetDky for the interpolated values at time t.
@@ -754,29 +1068,18 @@ cdef class IDA(Implicit_ODE):
             
                     A matrix containing the Ns vectors or a vector if i is specified.
         """
-        cdef N_Vector dkyS=N_VNew_Serial(self.pData.dim)
+        cdef N_Vector dkyS
         cdef flag
         cdef N.ndarray res
         
         if i==-1:
-            
-            matrix = []
-            
-            for x in xrange(self.pData.dimSens):
-                flag = SUNDIALS.IDAGetSensDky1(self.ida_mem, t, k, x, dkyS)
-                
-                if flag<0:
-                    raise IDAError(flag, t)
-                
-                matrix += [nv2arr(dkyS)]
-            
-            N_VDestroy_Serial(dkyS)
-            
-            return np.array(matrix)
+            return self.interpolate_sensitivities(t, k).copy()
         else:
+            dkyS=N_VNew_Serial(self.pData.dim)
             flag = SUNDIALS.IDAGetSensDky1(self.ida_mem, t, k, i, dkyS)
             
             if flag <0:
+                N_VDestroy_Serial(dkyS)
                 raise IDAError(flag, t)
             
             res = nv2arr(dkyS)
@@ -784,6 +1087,38 @@ cdef class IDA(Implicit_ODE):
             N_VDestroy_Serial(dkyS)
             
             return res
+    
+    cpdef N.ndarray interpolate_sensitivities(self, double t, int k = 0):
+        """
+        This method calls the internal method IDAGetSensDky which computes the k-th derivatives
+        of the interpolating polynomials for all the sensitivity variables at time t in one call.
+        
+            Parameters::
+                    
+                    t
+                        - Specifies the time at which sensitivity information is requested. The time
+                          t must fall within the interval defined by the last successful step taken
+                          by IDAS.
+                    
+                    k   
+                        - The order of derivatives.
+                        
+            Return::
+            
+                    A matrix of shape (Ns, dim) containing the Ns sensitivity vectors. The matrix
+                    is a buffer owned by the solver which is overwritten by the next call.
+        """
+        cdef int flag
+        
+        if self.pData.dimSens == 0:
+            return N.empty((0, self.pData.dim))
+        
+        flag = SUNDIALS.IDAGetSensDky(self.ida_mem, t, k, self.dkySO)
+        
+        if flag < 0:
+            raise IDAError(flag, t)
+        
+        return self._sens_buffer
             
     def _set_lsoff(self, lsoff):
         try:
@@ -1099,10 +1434,10 @@ cdef class IDA(Implicit_ODE):
     maxh=property(_get_max_h,_set_max_h)
     
     def _set_linear_solver(self, lsolver):
-        if lsolver.upper() == "DENSE" or lsolver.upper() == "SPGMR":
+        if lsolver.upper() == "DENSE" or lsolver.upper() in KRYLOV_SOLVERS:
             self.options["linear_solver"] = lsolver.upper()
         else:
-            raise AssimuloException('The linear solver must be either "DENSE" or "SPGMR".')
+            raise AssimuloException('The linear solver must be either "DENSE", "SPGMR", "SPBCGS", "SPTFQMR" or "SPFGMR".')
         
     def _get_linear_solver(self):
         """
@@ -1111,12 +1446,115 @@ cdef class IDA(Implicit_ODE):
             Parameters::
             
                 linearsolver
-                        - Default 'DENSE'. Can also be 'SPGMR'.
+                        - Default 'DENSE'. Can also be one of the
+                          iterative solvers 'SPGMR', 'SPBCGS', 'SPTFQMR'
+                          or 'SPFGMR' (requires SUNDIALS >= 3.0).
         """
         return self.options["linear_solver"]
     
     linear_solver = property(_get_linear_solver, _set_linear_solver)
     
+    def _set_max_krylov(self, maxkrylov):
+        try:
+            self.options["maxkrylov"] = int(maxkrylov)
+        except:
+            raise AssimuloException("Maximum number of krylov dimension should be an integer.")
+        if self.options["maxkrylov"] < 0:
+            raise AssimuloException("Maximum number of krylov dimension should be an positive integer.")
+            
+    def _get_max_krylov(self):
+        """
+        Specifies the maximum dimension of the Krylov subspace to be used
+        by the iterative linear solvers.
+        
+            Parameters::
+            
+                    maxkrylov
+                            - A positive integer.
+                            - Default 5
+            
+            Returns::
+            
+                The current value of maxkrylov.
+                
+        See SUNDIALS documentation 'IDASpgmr'
+        """
+        return self.options["maxkrylov"]
+    
+    maxkrylov = property(_get_max_krylov, _set_max_krylov)
+    
+    def _set_max_restarts(self, maxrestarts):
+        try:
+            self.options["maxrestarts"] = int(maxrestarts)
+        except:
+            raise AssimuloException("Maximum number of restarts should be an integer.")
+        if self.options["maxrestarts"] < 0:
+            raise AssimuloException("Maximum number of restarts should be a positive integer.")
+            
+    def _get_max_restarts(self):
+        """
+        Specifies the maximum number of restarts for the linear solvers
+        'SPGMR' and 'SPFGMR'.
+        
+            Parameters::
+            
+                    maxrestarts
+                            - A positive integer.
+                            - Default 5
+            
+            Returns::
+            
+                The current value of maxrestarts.
+                
+        See SUNDIALS documentation 'IDASpilsSetMaxRestarts'
+        """
+        return self.options["maxrestarts"]
+    
+    maxrestarts = property(_get_max_restarts, _set_max_restarts)
+    
+    def _set_eps_lin(self, epslin):
+        try:
+            self.options["epslin"] = float(epslin)
+        except (ValueError, TypeError):
+            raise AssimuloException("The safety factor epslin should be a float.")
+        if self.options["epslin"] < 0.0:
+            raise AssimuloException("The safety factor epslin should be a positive float.")
+            
+    def _get_eps_lin(self):
+        """
+        Specifies the safety factor used in the linear convergence test
+        of the iterative linear solvers.
+        
+            Parameters::
+            
+                    epslin
+                            - A positive float (0.0 gives the default).
+                            - Default 0.05
+            
+            Returns::
+            
+                The current value of epslin.
+                
+        See SUNDIALS documentation 'IDASpilsSetEpsLin'
+        """
+        return self.options["epslin"]
+    
+    epslin = property(_get_eps_lin, _set_eps_lin)
+    
+    _set_builtin_precond = _set_builtin_precond
+    _get_builtin_precond = _get_builtin_precond
+    _set_mupper = _set_mupper
+    _get_mupper = _get_mupper
+    _set_mlower = _set_mlower
+    _get_mlower = _get_mlower
+    _set_prec_blocks = _set_prec_blocks
+    _get_prec_blocks = _get_prec_blocks
+    
+    builtin_precond = property(_get_builtin_precond, _set_builtin_precond)
+    mupper = property(_get_mupper, _set_mupper)
+    mlower = property(_get_mlower, _set_mlower)
+    prec_blocks = property(_get_prec_blocks, _set_prec_blocks)
+    
     def _set_algvar(self,algvar):
         self.options["algvar"] = N.array(algvar,dtype=N.float) if len(N.array(algvar,dtype=N.float).shape)>0 else N.array([algvar],dtype=N.float)
         
@@ -1349,6 +1787,23 @@ cdef class IDA(Implicit_ODE):
     external_event_detection = property(_get_external_event_detection, 
                                         _set_external_event_detection)
     
+    cdef trace_step(self, double t):
+        """
+        Records the last step in the step trace.
+        """
+        cdef long int nsteps = 0, nrevals = 0, nlinsetups = 0, netfails = 0
+        cdef long int nniters = 0, nncfails = 0, njevals = -1
+        cdef int klast = 0, kcur = 0
+        cdef realtype hinused = 0.0, hlast = 0.0, hcur = 0.0, tcur = 0.0
+        
+        flag = SUNDIALS.IDAGetIntegratorStats(self.ida_mem, &nsteps, &nrevals, &nlinsetups, &netfails,
+                                         &klast, &kcur, &hinused, &hlast, &hcur, &tcur)
+        flag = SUNDIALS.IDAGetNumNonlinSolvIters(self.ida_mem, &nniters)
+        if self.options["linear_solver"] not in KRYLOV_SOLVERS:
+            flag = SUNDIALS.IDADlsGetNumJacEvals(self.ida_mem, &njevals)
+        
+        self._step_trace.record(t, hlast, klast, nniters, netfails, njevals, nlinsetups)
+    
     cdef void store_statistics(self, return_flag):
         """
         Retrieves and stores the statistics.
@@ -1357,7 +1812,7 @@ cdef class IDA(Implicit_ODE):
         cdef long int nniters = 0, nncfails = 0, ngevals = 0
         cdef long int nSniters = 0, nSncfails = 0, njevals = 0, nrevalsLS = 0
         cdef long int nfSevals = 0, nfevalsS = 0, nSetfails = 0, nlinsetupsS = 0
-        cdef long int njvevals = 0, nfevalsLS = 0
+        cdef long int njvevals = 0, nfevalsLS = 0, npevals = 0, npsolves = 0, nfevalsBP = 0
         cdef int klast, kcur
         cdef realtype hinused, hlast, hcur, tcur
         
@@ -1368,11 +1823,26 @@ cdef class IDA(Implicit_ODE):
         #flag = SUNDIALS.IDADlsGetNumJacEvals(self.ida_mem, &njevals)
         #flag = SUNDIALS.IDADlsGetNumResEvals(self.ida_mem, &nrevalsLS)
         
-        if self.options["linear_solver"] == "SPGMR":
+        if self.options["linear_solver"] in KRYLOV_SOLVERS:
             flag = SUNDIALS.IDASpilsGetNumJtimesEvals(self.ida_mem, &njvevals) #Number of jac*vector
             flag = SUNDIALS.IDASpilsGetNumResEvals(self.ida_mem, &nfevalsLS) #Number of rhs due to jac*vector
             self.statistics["nfcnjacs"] += nfevalsLS
             self.statistics["njacvecs"] += njvevals
+            
+            if self.pData.PREC_SOLVE != NULL or self.options["builtin_precond"] != "NONE":
+                flag = SUNDIALS.IDASpilsGetNumPrecSolves(self.ida_mem, &npsolves)
+                self.statistics["nprecs"] += npsolves
+            
+            if self.pData.PREC_SETUP != NULL or self.options["builtin_precond"] != "NONE":
+                flag = SUNDIALS.IDASpilsGetNumPrecEvals(self.ida_mem, &npevals)
+                self.statistics["nprecsetups"] += npevals
+            
+            #Residual evaluations due to the built-in preconditioners
+            if self.options["builtin_precond"] == "BAND":
+                flag = SUNDIALS.IDABBDPrecGetNumGfnEvals(self.ida_mem, &nfevalsBP)
+                self.statistics["nfcnjacs"] += nfevalsBP
+            elif self.options["builtin_precond"] == "BLOCK_JACOBI" and self.pData.BJ is not None:
+                self.statistics["nfcnjacs"] += self.pData.BJ.nfevals
         else:
             flag = SUNDIALS.IDADlsGetNumJacEvals(self.ida_mem, &njevals)
             flag = SUNDIALS.IDADlsGetNumResEvals(self.ida_mem, &nrevalsLS)
@@ -1418,6 +1888,7 @@ cdef class IDA(Implicit_ODE):
         self.log_message(' Solver                       : IDA (BDF)',                      verbose)
         self.log_message(' Maximal order                : ' + str(self.options["maxord"]), verbose)
         self.log_message(' Suppressed algebr. variables : ' + str(self.options["suppress_alg"]), verbose)
+        self.log_message(' Linear solver type           : ' + self.options["linear_solver"],  verbose)
         self.log_message(' Tolerances (absolute)        : ' + str(self._compact_atol()),   verbose)
         self.log_message(' Tolerances (relative)        : ' + str(self.options["rtol"]),   verbose)
         self.log_message('',                                                          verbose)
@@ -1440,8 +1911,12 @@ cdef class CVode(Explicit_ODE):
     """
     cdef void* cvode_mem
     cdef ProblemData pData      #A struct containing information about the problem
+    cdef NativeProblemData nData #The compiled functions of a native problem
+    cdef bint native            #Whether the compiled functions are used
     cdef N_Vector yTemp, ydTemp, nv_atol
     cdef N_Vector *ySO
+    cdef N_Vector *dkySO        #Views of the rows of _sens_buffer
+    cdef N.ndarray _sens_buffer
     cdef object f
     cdef public object event_func
     #cdef public dict statistics
@@ -1487,6 +1962,12 @@ cdef class CVode(Explicit_ODE):
         self.options["norm"] = "WRMS"
         
         self.options["maxkrylov"] = 5
+        self.options["maxrestarts"] = 0 #Maximum number of restarts (SPGMR, SPFGMR)
+        self.options["epslin"] = 0.05 #Safety factor in the linear convergence test
+        self.options["builtin_precond"] = "NONE" #Built-in preconditioner (BAND, BLOCK_JACOBI)
+        self.options["mupper"] = 0 #Upper half-bandwidth of the banded preconditioner
+        self.options["mlower"] = 0 #Lower half-bandwidth of the banded preconditioner
+        self.options["prec_blocks"] = None #Block sizes of the block-Jacobi preconditioner
         self.options["precond"] = PREC_NONE
         
         #Solver support
@@ -1494,6 +1975,7 @@ cdef class CVode(Explicit_ODE):
         self.supports["interpolated_output"] = True
         self.supports["interpolated_sensitivity_output"] = True
         self.supports["state_events"] = True
+        self.supports["step_trace"] = True
         
         self.statistics.add_key("nlsred", "Number of order reductions due to stability")
          
@@ -1514,6 +1996,9 @@ cdef class CVode(Explicit_ODE):
         if self.nv_atol != NULL:
             N_VDestroy_Serial(self.nv_atol)
         
+        if self.dkySO != NULL:
+            SUNDIALS.N_VDestroyVectorArray_Serial(self.dkySO, self._sens_buffer.shape[0])
+        
         if self.cvode_mem != NULL:
             #Free Memory
             SUNDIALS.CVodeFree(&self.cvode_mem)
@@ -1668,9 +2153,45 @@ cdef class CVode(Explicit_ODE):
         else:
             self.pData.dimSens = 0
             
+        #Sets the compiled functions of a native problem
+        self.native = hasattr(self.problem, "rhs_address")
+        if self.native:
+            self.nData.RHS = <void*><size_t>self.problem.rhs_address
+            self.nData.JAC = <void*><size_t>self.problem.jac_address if self.problem.jac_address else NULL
+            self.nData.ROOT = <void*><size_t>self.problem.state_events_address if self.problem.state_events_address else NULL
+            self.nData.user_data = <void*><size_t>self.problem.user_data
+            
+            if (self.problem_info["state_events"] and self.nData.ROOT == NULL) or (self.problem_info["jac_fcn"] and self.nData.JAC == NULL) \
+               or self.problem_info["jacv_fcn"] or self.problem_info["prec_solve"] or self.problem_info["dimSens"] > 0:
+                raise AssimuloException("A native problem can only be combined with compiled right-hand-side, Jacobian and state event functions.")
+            
         self.pData.verbose = 2
         self.pData.create_work_arrays()
     
+    cdef void* user_data(self):
+        """
+        Returns the user data given to CVode, the compiled functions of a
+        native problem or the problem data.
+        """
+        if self.native:
+            return <void*>&self.nData
+        return <void*>self.pData
+    
+    cdef int cvode(self, realtype tout, N_Vector yout, realtype *tret, int itask):
+        """
+        Calls CVode. The GIL is released if the problem is native.
+        """
+        cdef int flag
+        cdef void* cvode_mem = self.cvode_mem
+        
+        if self.native:
+            with nogil:
+                flag = SUNDIALS.CVode(cvode_mem, tout, yout, tret, itask)
+        else:
+            flag = SUNDIALS.CVode(cvode_mem, tout, yout, tret, itask)
+        
+        return flag
+    
     cdef initialize_cvode(self):
         cdef int flag #Used for return
         cdef realtype ZERO = 0.0
@@ -1690,6 +2211,14 @@ cdef class CVode(Explicit_ODE):
                  if self.yS0 is not None:
                     for j in range(self.pData.dim):
                         (<N_VectorContent_Serial>self.ySO[i].content).data[j] = self.yS0[i,j]
+            
+            #Create the vectors used for interpolating the sensitivities
+            if self.dkySO != NULL:
+                SUNDIALS.N_VDestroyVectorArray_Serial(self.dkySO, self._sens_buffer.shape[0])
+            self._sens_buffer = N.empty((self.pData.dimSens, self.pData.dim))
+            self.dkySO = SUNDIALS.N_VCloneVectorArrayEmpty_Serial(self.pData.dimSens, self.yTemp)
+            for i in range(self.pData.dimSens):
+                SUNDIALS.N_VSetArrayPointer_Serial((<realtype*>self._sens_buffer.data) + (<int>i)*self.pData.dim, self.dkySO[i])
 
 
         #Updates the switches
@@ -1704,7 +2233,10 @@ cdef class CVode(Explicit_ODE):
                 raise CVodeError(CV_MEM_FAIL)
             
             #Specify the residual and the initial conditions to the solver
-            flag = SUNDIALS.CVodeInit(self.cvode_mem, cv_rhs, self.t, self.yTemp)
+            if self.native:
+                flag = SUNDIALS.CVodeInit(self.cvode_mem, cv_rhs_native, self.t, self.yTemp)
+            else:
+                flag = SUNDIALS.CVodeInit(self.cvode_mem, cv_rhs, self.t, self.yTemp)
             if flag < 0:
                 raise CVodeError(flag, self.t)
                 
@@ -1712,6 +2244,8 @@ cdef class CVode(Explicit_ODE):
             if self.problem_info["state_events"]:
                 if self.options["external_event_detection"]:
                     flag = SUNDIALS.CVodeRootInit(self.cvode_mem, 0, cv_root)
+                elif self.native:
+                    flag = SUNDIALS.CVodeRootInit(self.cvode_mem, self.pData.dimRoot, cv_root_native)
                 else:
                     flag = SUNDIALS.CVodeRootInit(self.cvode_mem, self.pData.dimRoot, cv_root)
                 if flag < 0:
@@ -1723,7 +2257,7 @@ cdef class CVode(Explicit_ODE):
                 raise CVodeError(flag, self.t)
                 
             #Set the user data
-            flag = SUNDIALS.CVodeSetUserData(self.cvode_mem, <void*>self.pData)
+            flag = SUNDIALS.CVodeSetUserData(self.cvode_mem, self.user_data())
             if flag < 0:
                 raise CVodeError(flag, self.t)
                 
@@ -1749,7 +2283,7 @@ cdef class CVode(Explicit_ODE):
                     raise CVodeError(flag, self.t)
             
             #Set the user data
-            flag = SUNDIALS.CVodeSetUserData(self.cvode_mem, <void*>self.pData)
+            flag = SUNDIALS.CVodeSetUserData(self.cvode_mem, self.user_data())
             if flag < 0:
                 raise CVodeError(flag, self.t)
             
@@ -1761,6 +2295,23 @@ cdef class CVode(Explicit_ODE):
         self._event_info = N.array([0] * self.problem_info["dimRoot"])
         
     
+    def _get_dense_output_polynomial(self, double t_left, double t_right):
+        """
+        Returns the interpolation polynomial of the last step through its
+        scaled derivatives h**k/k!*y^(k)(t_right), k up to the order used.
+        """
+        cdef int k
+        cdef double h = t_right - t_left
+        cdef double scale = 1.0
+        cdef int q = self.get_last_order()
+        
+        coefficients = N.empty((q+1, self.pData.dim))
+        for k in range(q+1):
+            coefficients[k,:] = scale*self.interpolate(t_right, k)
+            scale *= h/(k+1)
+        
+        return coefficients, t_right, h
+    
     cpdef N.ndarray interpolate(self,double t,int k = 0):
         """
         Calls the internal CVodeGetDky for the interpolated values at time t.
@@ -1805,28 +2356,17 @@ cdef class CVode(Explicit_ODE):
             
                     A matrix containing the Ns vectors or a vector if i is specified.
         """
-        #cdef N_Vector dkyS=N_VNew_Serial(self.pData.dimSens)
-        cdef N_Vector dkyS=N_VNew_Serial(self.pData.dim)
+        cdef N_Vector dkyS
         cdef int flag
         cdef N.ndarray res
         
         if i==-1:
-            
-            matrix = []
-            
-            for x in range(self.pData.dimSens):
-                flag = SUNDIALS.CVodeGetSensDky1(self.cvode_mem, t, k, x, dkyS)
-                if flag<0:
-                    raise CVodeError(flag, t)
-                
-                matrix += [nv2arr(dkyS)]
-            
-            N_VDestroy_Serial(dkyS)
-            
-            return N.array(matrix)
+            return self.interpolate_sensitivities(t, k).copy()
         else:
+            dkyS=N_VNew_Serial(self.pData.dim)
             flag = SUNDIALS.CVodeGetSensDky1(self.cvode_mem, t, k, i, dkyS)
             if flag <0:
+                N_VDestroy_Serial(dkyS)
                 raise CVodeError(flag, t)
             
             res = nv2arr(dkyS)
@@ -1835,6 +2375,67 @@ cdef class CVode(Explicit_ODE):
             
             return res
     
+    cpdef N.ndarray interpolate_sensitivities(self, realtype t, int k = 0):
+        """
+        This method calls the internal method CVodeGetSensDky which computes the k-th derivatives
+        of the interpolating polynomials for all the sensitivity variables at time t in one call.
+        
+            Parameters::
+                    
+                    t
+                        - Specifies the time at which sensitivity information is requested. The time
+                          t must fall within the interval defined by the last successful step taken
+                          by CVodeS.
+                    
+                    k   
+                        - The order of derivatives.
+                        
+            Return::
+            
+                    A matrix of shape (Ns, dim) containing the Ns sensitivity vectors. The matrix
+                    is a buffer owned by the solver which is overwritten by the next call.
+        """
+        cdef int flag
+        
+        if self.pData.dimSens == 0:
+            return N.empty((0, self.pData.dim))
+        
+        flag = SUNDIALS.CVodeGetSensDky(self.cvode_mem, t, k, self.dkySO)
+        
+        if flag < 0:
+            raise CVodeError(flag, t)
+        
+        return self._sens_buffer
+    
+    cdef set_timed_callbacks(self):
+        """
+        Points the problem data to the timed versions of the problem
+        functions if the option profile is set (otherwise to the functions
+        themselves).
+        """
+        self.pt_fcn = self._timed(self.problem.rhs, "rhs")
+        self.pData.RHS = <void*>self.pt_fcn
+        
+        if self.problem_info["state_events"] is True:
+            self.pt_root = self._timed(self.problem.state_events, "state_events")
+            self.pData.ROOT = <void*>self.pt_root
+        
+        if self.problem_info["jac_fcn"] is True:
+            self.pt_jac = self._timed(self.problem.jac, "jac")
+            self.pData.JAC = <void*>self.pt_jac
+        
+        if self.problem_info["jacv_fcn"] is True:
+            self.pt_jacv = self._timed(self.problem.jacv, "jacv")
+            self.pData.JACV = <void*>self.pt_jacv
+        
+        if self.problem_info["prec_solve"] is True:
+            self.pt_prec_solve = self._timed(self.problem.prec_solve, "prec_solve")
+            self.pData.PREC_SOLVE = <void*>self.pt_prec_solve
+            
+        if self.problem_info["prec_setup"] is True:
+            self.pt_prec_setup = self._timed(self.problem.prec_setup, "prec_setup")
+            self.pData.PREC_SETUP = <void*>self.pt_prec_setup
+    
     cpdef initialize(self):
         
         #Initialize storing of sensitivyt result in handle_result
@@ -1843,6 +2444,7 @@ cdef class CVode(Explicit_ODE):
         
         #Reset statistics
         self.statistics.reset()
+        self.set_timed_callbacks()
         
         self.initialize_cvode() 
     
@@ -1870,7 +2472,7 @@ cdef class CVode(Explicit_ODE):
             raise CVodeError(flag, t)
         
         #Integration loop
-        flag = SUNDIALS.CVode(self.cvode_mem,tf,yout,&tret,CV_ONE_STEP)
+        flag = self.cvode(tf,yout,&tret,CV_ONE_STEP)
         if flag < 0:
             raise CVodeError(flag, tret)
             
@@ -1909,6 +2511,8 @@ cdef class CVode(Explicit_ODE):
             self.initialize_options()
             if self.options["external_event_detection"]:
                 self.initialize_event_detection()
+            if self._step_trace is not None:
+                self._step_trace.restart()
         
         #Set stop time
         flag = SUNDIALS.CVodeSetStopTime(self.cvode_mem, tf)
@@ -1920,11 +2524,14 @@ cdef class CVode(Explicit_ODE):
             #Integration loop
             while True:
                     
-                flag = SUNDIALS.CVode(self.cvode_mem,tf,yout,&tret,CV_ONE_STEP)
+                flag = self.cvode(tf,yout,&tret,CV_ONE_STEP)
                 if flag < 0:
                     N_VDestroy_Serial(yout)
                     raise CVodeError(flag, tret)
                 
+                if self._step_trace is not None:
+                    self.trace_step(tret)
+                
                 t = tret
                 y = nv2arr(yout)
                 if self.options["external_event_detection"] and self.problem_info["state_events"]:
@@ -1958,7 +2565,7 @@ cdef class CVode(Explicit_ODE):
             output_list  = opts["output_list"][output_index:]
 
             for tout in output_list:
-                flag = SUNDIALS.CVode(self.cvode_mem,tout,yout,&tret,CV_NORMAL)
+                flag = self.cvode(tout,yout,&tret,CV_NORMAL)
                 if flag < 0:
                     N_VDestroy_Serial(yout)
                     raise CVodeError(flag, tret)
@@ -2092,7 +2699,14 @@ cdef class CVode(Explicit_ODE):
                     raise CVodeError(flag)
                 
             #Specify the jacobian to the solver
-            if self.pData.JAC != NULL and self.options["usejac"]:
+            if self.native and self.nData.JAC != NULL and self.options["usejac"]:
+                IF SUNDIALS_VERSION >= (3,0,0):
+                    flag = SUNDIALS.CVDlsSetJacFn(self.cvode_mem, cv_jac_native);
+                ELSE:
+                    flag = SUNDIALS.CVDlsSetDenseJacFn(self.cvode_mem, cv_jac_native)
+                if flag < 0:
+                    raise CVodeError(flag)
+            elif self.pData.JAC != NULL and self.options["usejac"]:
                 IF SUNDIALS_VERSION >= (3,0,0):
                     flag = SUNDIALS.CVDlsSetJacFn(self.cvode_mem, cv_jac);
                 ELSE:
@@ -2107,19 +2721,60 @@ cdef class CVode(Explicit_ODE):
                 if flag < 0:
                     raise CVodeError(flag)
                     
-        elif self.options["linear_solver"] == 'SPGMR' and self.options["iter"] == "Newton":
+        elif self.options["linear_solver"] in KRYLOV_SOLVERS and self.options["iter"] == "Newton":
+            #The built-in preconditioners require a preconditioning type
+            pretype = self.options["precond"]
+            if self.options["builtin_precond"] != "NONE" and pretype == PREC_NONE:
+                pretype = PREC_LEFT
+            
             IF SUNDIALS_VERSION >= (3,0,0):
                 #Create the linear solver
-                self.sun_linearsolver = SUNDIALS.SUNSPGMR(self.yTemp, self.options["precond"], self.options["maxkrylov"])
+                if self.options["linear_solver"] == 'SPGMR':
+                    self.sun_linearsolver = SUNDIALS.SUNSPGMR(self.yTemp, pretype, self.options["maxkrylov"])
+                    flag = SUNDIALS.SUNSPGMRSetMaxRestarts(self.sun_linearsolver, self.options["maxrestarts"])
+                    if flag < 0:
+                        raise CVodeError(flag)
+                elif self.options["linear_solver"] == 'SPFGMR':
+                    self.sun_linearsolver = SUNDIALS.SUNSPFGMR(self.yTemp, pretype, self.options["maxkrylov"])
+                    flag = SUNDIALS.SUNSPFGMRSetMaxRestarts(self.sun_linearsolver, self.options["maxrestarts"])
+                    if flag < 0:
+                        raise CVodeError(flag)
+                elif self.options["linear_solver"] == 'SPBCGS':
+                    self.sun_linearsolver = SUNDIALS.SUNSPBCGS(self.yTemp, pretype, self.options["maxkrylov"])
+                else:
+                    self.sun_linearsolver = SUNDIALS.SUNSPTFQMR(self.yTemp, pretype, self.options["maxkrylov"])
                 #Attach it to CVode
                 flag = SUNDIALS.CVSpilsSetLinearSolver(self.cvode_mem, self.sun_linearsolver)
             ELSE:
-                #Specify the use of CVSPGMR linear solver.
-                flag = SUNDIALS.CVSpgmr(self.cvode_mem, self.options["precond"], self.options["maxkrylov"])
+                #Specify the use of the iterative linear solver.
+                if self.options["linear_solver"] == 'SPGMR':
+                    flag = SUNDIALS.CVSpgmr(self.cvode_mem, pretype, self.options["maxkrylov"])
+                elif self.options["linear_solver"] == 'SPBCGS':
+                    flag = SUNDIALS.CVSpbcg(self.cvode_mem, pretype, self.options["maxkrylov"])
+                elif self.options["linear_solver"] == 'SPTFQMR':
+                    flag = SUNDIALS.CVSptfqmr(self.cvode_mem, pretype, self.options["maxkrylov"])
+                else:
+                    raise AssimuloException("The linear solver 'SPFGMR' requires SUNDIALS 3.0 or newer.")
             if flag < 0:
                 raise CVodeError(flag) 
+            
+            #Specify the safety factor in the linear convergence test
+            flag = SUNDIALS.CVSpilsSetEpsLin(self.cvode_mem, self.options["epslin"])
+            if flag < 0:
+                raise CVodeError(flag)
                 
-            if self.pData.PREC_SOLVE != NULL:
+            if self.options["builtin_precond"] == "BAND":
+                flag = SUNDIALS.CVBandPrecInit(self.cvode_mem, self.pData.dim, self.options["mupper"], self.options["mlower"])
+                if flag < 0:
+                    raise CVodeError(flag)
+            elif self.options["builtin_precond"] == "BLOCK_JACOBI":
+                if self.native:
+                    raise AssimuloException("The BLOCK_JACOBI preconditioner is not supported for native problems.")
+                self.pData.BJ = BlockJacobiPreconditioner(_checked_prec_blocks(self))
+                flag = SUNDIALS.CVSpilsSetPreconditioner(self.cvode_mem, cv_bj_prec_setup, cv_bj_prec_solve)
+                if flag < 0:
+                    raise CVodeError(flag)
+            elif self.pData.PREC_SOLVE != NULL:
                 if self.pData.PREC_SETUP != NULL: 
                     flag = SUNDIALS.CVSpilsSetPreconditioner(self.cvode_mem, cv_prec_setup, cv_prec_solve)
                     if flag < 0:
@@ -2146,6 +2801,8 @@ cdef class CVode(Explicit_ODE):
                     raise CVodeError(flag)
         elif self.options["linear_solver"] == 'SPARSE' and self.options["iter"] == "Newton":
             
+            if self.native:
+                raise AssimuloException("The SPARSE linear solver is not supported for native problems.")
             if SUNDIALS.version() < (2,6,0): 
                 raise AssimuloException("Not supported with this SUNDIALS version.")
             if SUNDIALS.with_superlu() == 0:
@@ -2450,10 +3107,10 @@ cdef class CVode(Explicit_ODE):
     maxord=property(_get_max_ord,_set_max_ord)
     
     def _set_linear_solver(self, lsolver):
-        if lsolver.upper() == "DENSE" or lsolver.upper() == "SPGMR" or lsolver.upper() == "SPARSE":
+        if lsolver.upper() == "DENSE" or lsolver.upper() == "SPARSE" or lsolver.upper() in KRYLOV_SOLVERS:
             self.options["linear_solver"] = lsolver.upper()
         else:
-            raise AssimuloException('The linear solver must be either "DENSE", "SPGMR" or "SPARSE".')
+            raise AssimuloException('The linear solver must be either "DENSE", "SPARSE", "SPGMR", "SPBCGS", "SPTFQMR" or "SPFGMR".')
         
     def _get_linear_solver(self):
         """
@@ -2462,7 +3119,9 @@ cdef class CVode(Explicit_ODE):
             Parameters::
             
                 linearsolver
-                        - Default 'DENSE'. Can also be 'SPGMR' or 'SPARSE'.
+                        - Default 'DENSE'. Can also be 'SPARSE' or one
+                          of the iterative solvers 'SPGMR', 'SPBCGS',
+                          'SPTFQMR' or 'SPFGMR' (requires SUNDIALS >= 3.0).
         """
         return self.options["linear_solver"]
     
@@ -2920,6 +3579,78 @@ cdef class CVode(Explicit_ODE):
     
     precond = property(_get_pre_cond, _set_pre_cond)
     
+    def _set_max_restarts(self, maxrestarts):
+        try:
+            self.options["maxrestarts"] = int(maxrestarts)
+        except:
+            raise AssimuloException("Maximum number of restarts should be an integer.")
+        if self.options["maxrestarts"] < 0:
+            raise AssimuloException("Maximum number of restarts should be a positive integer.")
+            
+    def _get_max_restarts(self):
+        """
+        Specifies the maximum number of restarts for the linear solvers
+        'SPGMR' and 'SPFGMR'. Only used with SUNDIALS >= 3.0.
+        
+            Parameters::
+            
+                    maxrestarts
+                            - A positive integer.
+                            - Default 0
+            
+            Returns::
+            
+                The current value of maxrestarts.
+                
+        See SUNDIALS documentation 'SUNSPGMRSetMaxRestarts'
+        """
+        return self.options["maxrestarts"]
+    
+    maxrestarts = property(_get_max_restarts, _set_max_restarts)
+    
+    def _set_eps_lin(self, epslin):
+        try:
+            self.options["epslin"] = float(epslin)
+        except (ValueError, TypeError):
+            raise AssimuloException("The safety factor epslin should be a float.")
+        if self.options["epslin"] < 0.0:
+            raise AssimuloException("The safety factor epslin should be a positive float.")
+            
+    def _get_eps_lin(self):
+        """
+        Specifies the safety factor used in the linear convergence test
+        of the iterative linear solvers.
+        
+            Parameters::
+            
+                    epslin
+                            - A positive float (0.0 gives the default).
+                            - Default 0.05
+            
+            Returns::
+            
+                The current value of epslin.
+                
+        See SUNDIALS documentation 'CVSpilsSetEpsLin'
+        """
+        return self.options["epslin"]
+    
+    epslin = property(_get_eps_lin, _set_eps_lin)
+    
+    _set_builtin_precond = _set_builtin_precond
+    _get_builtin_precond = _get_builtin_precond
+    _set_mupper = _set_mupper
+    _get_mupper = _get_mupper
+    _set_mlower = _set_mlower
+    _get_mlower = _get_mlower
+    _set_prec_blocks = _set_prec_blocks
+    _get_prec_blocks = _get_prec_blocks
+    
+    builtin_precond = property(_get_builtin_precond, _set_builtin_precond)
+    mupper = property(_get_mupper, _set_mupper)
+    mlower = property(_get_mlower, _set_mlower)
+    prec_blocks = property(_get_prec_blocks, _set_prec_blocks)
+    
     def _set_pbar(self, pbar):
         if len(pbar) != self.problem_info['dimSens']:
             raise AssimuloException('pbar must be of equal length as the parameters.')
@@ -2977,6 +3708,31 @@ cdef class CVode(Explicit_ODE):
     external_event_detection = property(_get_external_event_detection,
                                         _set_external_event_detection)
     
+    cdef trace_step(self, double t):
+        """
+        Records the last step in the step trace.
+        """
+        cdef long int nsteps = 0, nfevals = 0, nlinsetups = -1, netfails = 0
+        cdef long int nniters = 0, njevals = -1
+        cdef int qlast = 0, qcur = 0
+        cdef realtype hinused = 0.0, hlast = 0.0, hcur = 0.0, tcur = 0.0
+        
+        flag = SUNDIALS.CVodeGetIntegratorStats(self.cvode_mem, &nsteps, &nfevals, &nlinsetups, &netfails, &qlast,
+                                       &qcur, &hinused, &hlast, &hcur, &tcur)
+        flag = SUNDIALS.CVodeGetNumNonlinSolvIters(self.cvode_mem, &nniters)
+        
+        if self.options["iter"] != "Newton":
+            nlinsetups = -1 #No linear solver
+        elif self.options["linear_solver"] == "SPARSE":
+            IF SUNDIALS_VERSION >= (3,0,0):
+                flag = SUNDIALS.CVDlsGetNumJacEvals(self.cvode_mem, &njevals)
+            ELSE:
+                flag = SUNDIALS.CVSlsGetNumJacEvals(self.cvode_mem, &njevals)
+        elif self.options["linear_solver"] not in KRYLOV_SOLVERS:
+            flag = SUNDIALS.CVDlsGetNumJacEvals(self.cvode_mem, &njevals)
+        
+        self._step_trace.record(t, hlast, qlast, nniters, netfails, njevals, nlinsetups)
+    
     cdef void store_statistics(self, int return_flag):
         """
         Retrieves and stores the statistics.
@@ -2984,11 +3740,11 @@ cdef class CVode(Explicit_ODE):
         cdef long int nsteps = 0, njevals = 0, ngevals = 0, netfails = 0, nniters = 0, nncfails = 0
         cdef long int nSniters = 0, nSncfails = 0, nfevalsLS = 0, njvevals = 0, nfevals = 0
         cdef long int nfSevals = 0,nfevalsS = 0,nSetfails = 0,nlinsetupsS = 0, nlinsetups = 0
-        cdef long int npevals = 0, npsolves = 0, nlsred = 0
+        cdef long int npevals = 0, npsolves = 0, nlsred = 0, nfevalsBP = 0
         cdef int qlast = 0, qcur = 0
         cdef realtype hinused = 0.0, hlast = 0.0, hcur = 0.0, tcur = 0.0
 
-        if self.options["linear_solver"] == "SPGMR":
+        if self.options["linear_solver"] in KRYLOV_SOLVERS:
             flag = SUNDIALS.CVSpilsGetNumJtimesEvals(self.cvode_mem, &njvevals) #Number of jac*vector
             flag = SUNDIALS.CVSpilsGetNumRhsEvals(self.cvode_mem, &nfevalsLS) #Number of rhs due to jac*vector
             self.statistics["njacvecs"]  += njvevals
@@ -3002,12 +3758,19 @@ cdef class CVode(Explicit_ODE):
             flag = SUNDIALS.CVDlsGetNumJacEvals(self.cvode_mem, &njevals) #Number of jac evals
             flag = SUNDIALS.CVDlsGetNumRhsEvals(self.cvode_mem, &nfevalsLS) #Number of res evals due to jac evals
             self.statistics["njacs"]   += njevals
-        if self.pData.PREC_SOLVE != NULL:
+        if self.pData.PREC_SOLVE != NULL or self.options["builtin_precond"] != "NONE":
             flag = SUNDIALS.CVSpilsGetNumPrecSolves(self.cvode_mem, &npsolves)
             self.statistics["nprecs"]  += npsolves
-        if self.pData.PREC_SETUP != NULL:
+        if self.pData.PREC_SETUP != NULL or self.options["builtin_precond"] != "NONE":
             flag = SUNDIALS.CVSpilsGetNumPrecEvals(self.cvode_mem, &npevals)
             self.statistics["nprecsetups"]   += npevals
+        if self.options["linear_solver"] in KRYLOV_SOLVERS:
+            #Rhs evaluations due to the built-in preconditioners
+            if self.options["builtin_precond"] == "BAND":
+                flag = SUNDIALS.CVBandPrecGetNumRhsEvals(self.cvode_mem, &nfevalsBP)
+                self.statistics["nfcnjacs"] += nfevalsBP
+            elif self.options["builtin_precond"] == "BLOCK_JACOBI" and self.pData.BJ is not None:
+                self.statistics["nfcnjacs"] += self.pData.BJ.nfevals
             
         flag = SUNDIALS.CVodeGetNumGEvals(self.cvode_mem, &ngevals) #Number of root evals
         
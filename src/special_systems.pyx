@@ -19,6 +19,11 @@ import assimulo.problem as ap
 from assimulo.support import set_type_shape_array
 import numpy as N
 cimport numpy as N
+import scipy.sparse as sp
+
+INDEX_CONSTRAINTS = {'ind1': ('constr1',), 'ind2': ('constr2',), 'ind3': ('constr3',),
+                     'ovstab2': ('constr2', 'constr3'), 'ggl2': ('constr2', 'constr3'),
+                     'ovstab1': ('constr1', 'constr3', 'constr2')}
 
 cdef class cMechanical_System:
     u"""
@@ -60,6 +65,18 @@ cdef class cMechanical_System:
                  'ind1' Index-1 DAE (lambda constraints)
                  'ostab2' overdetermined stabilized index 2
                  'ostab1' overdetermined stabilized index 1
+            dforces_dp(t,p,v), dforces_dv(t,p,v)
+                  n_p x n_p derivatives of the forces (optional)
+            dGT_dp(p,la)  n_p x n_p derivative of GT(p)*la with
+                  respect to p (optional)
+            dconstr3(t,y), dconstr2(t,y), dconstr1(t,y)
+                  n_la x (2*n_p+n_la) derivatives of the constraints
+                  with respect to (p,v,lambda) (optional)
+            The derivatives may be dense arrays or scipy.sparse matrices,
+            the latter with a sparsity pattern independent of the values.
+            Derivatives which are not given are approximated by
+            difference quotients in the Jacobian of the generated
+            problem.
                  
     """         
     def __init__(self, int n_p,  object forces, int n_la, object pos0,
@@ -67,7 +84,10 @@ cdef class cMechanical_System:
                  object veld0, object GT,  
                  double t0 = 0.0, object mass_matrix = None, 
                  object constr3 = None, object constr2 = None, 
-                 object constr1 = None, p0=None, sw0=None):
+                 object constr1 = None, p0=None, sw0=None,
+                 object dforces_dp = None, object dforces_dv = None,
+                 object dGT_dp = None, object dconstr3 = None,
+                 object dconstr2 = None, object dconstr1 = None):
                                         
         self.pos0 = set_type_shape_array(pos0)
         self.vel0 = set_type_shape_array(vel0)
@@ -91,6 +111,12 @@ cdef class cMechanical_System:
         self.constr1=constr1
         self.mass_matrix=mass_matrix
         self.sw0=sw0
+        self.dforces_dp=dforces_dp
+        self.dforces_dv=dforces_dv
+        self.dGT_dp=dGT_dp
+        self.dconstr3=dconstr3
+        self.dconstr2=dconstr2
+        self.dconstr1=dconstr1
             
     def make_res(self,index):
         n_p,n_v,n_la=self.n_p, 2*self.n_p, self.n_la
@@ -147,7 +173,19 @@ cdef class cMechanical_System:
         else:   
             return set_constraints(res,index)
             
-    def generate_problem(self,index):
+    def generate_problem(self,index,compiled=False,sparse=False):
+        """
+        Generates the residual problem of the system in the given index
+        formulation. If compiled is True, the residual is a
+        Mechanical_Residual, which is evaluated without temporary arrays
+        into a preallocated vector, and the problem is also given its
+        Jacobian.
+        
+        The Jacobian, together with jac_nnz, is also attached if any of
+        the derivatives dforces_dp, dforces_dv, dGT_dp or dconstr1-3 are
+        given. It is returned as a dense array, or in CSC format if
+        sparse is True.
+        """
         # 0. Input check
         index_values=['ind0', 'ind1','ind2', 'ind3','ovstab1','ovstab2','ggl1','ggl2'] 
         index_error= 'index got not correct value.\n Should be one of {}'.format(index_values)         
@@ -195,13 +233,292 @@ cdef class cMechanical_System:
                          + 2*self.lam0.size*[0]
         elif index is None:
             algvar = (self.pos0.size + self.vel0.size) * [1]
+        res = Mechanical_Residual(self, index) if compiled else self.make_res(index)
         if index in ('ovstab2','ovstab1'):
-            problem=ap.Overdetermined_Problem(self.make_res(index), y0, yd0, self.t0, self.sw0)
+            problem=ap.Overdetermined_Problem(res, y0, yd0, self.t0, self.sw0)
             problem.neq=neq           
         else:
-            problem=ap.Implicit_Problem(self.make_res(index), y0, yd0, self.t0, self.sw0)
+            problem=ap.Implicit_Problem(res, y0, yd0, self.t0, self.sw0)
+        derivatives = [self.dforces_dp, self.dforces_dv, self.dGT_dp,
+                       self.dconstr3, self.dconstr2, self.dconstr1]
+        if compiled or derivatives != 6*[None]:
+            jac_res = res if compiled else Mechanical_Residual(self, index)
+            problem.jac = jac_res.sparse_jac if sparse else jac_res.jac
+            problem.jac_nnz = jac_res.sparse_jac(1.0, self.t0, y0, yd0).nnz
         problem.algvar=algvar
         return problem          
+
+cdef _add_sparse_product(object A, N.ndarray x, N.ndarray out):
+    """
+    Adds the product of the sparse matrix A and x to out, without
+    temporary arrays for CSC and CSR matrices.
+    """
+    cdef int i, j, k
+    cdef N.ndarray[double, ndim=1] data
+    cdef N.ndarray[int, ndim=1] indices, indptr
+    cdef N.ndarray[double, ndim=1] xv = x
+    cdef N.ndarray[double, ndim=1] outv = out
+    
+    if not (sp.isspmatrix_csc(A) or sp.isspmatrix_csr(A)):
+        A = sp.csr_matrix(A)
+    data = N.asarray(A.data, dtype=N.double)
+    indices = N.asarray(A.indices, dtype=N.intc)
+    indptr = N.asarray(A.indptr, dtype=N.intc)
+    
+    if sp.isspmatrix_csc(A):
+        for j in range(A.shape[1]):
+            for k in range(indptr[j], indptr[j+1]):
+                outv[indices[k]] += data[k]*xv[j]
+    else:
+        for i in range(A.shape[0]):
+            for k in range(indptr[i], indptr[i+1]):
+                outv[i] += data[k]*xv[indices[k]]
+
+cdef _mass_product(object M, N.ndarray vd, N.ndarray out):
+    """
+    Computes out = M*vd for a mass matrix given as None (the identity),
+    a dense or sparse matrix, a vector of diagonal entries or an array
+    of shape (nblocks, b, b) of diagonal blocks.
+    """
+    cdef int nblocks, b
+    
+    if M is None:
+        out[:] = vd
+    elif sp.issparse(M):
+        out[:] = 0.0
+        _add_sparse_product(M, vd, out)
+    elif M.ndim == 1:
+        N.multiply(M, vd, out=out)
+    elif M.ndim == 2:
+        N.dot(M, vd, out=out)
+    else:
+        nblocks, b = M.shape[0], M.shape[1]
+        N.einsum('kij,kj->ki', M, vd.reshape(nblocks, b), out=out.reshape(nblocks, b))
+
+cdef _mass_block(object M, int n_p):
+    """
+    Returns the mass matrix as a dense or sparse matrix.
+    """
+    if M is None:
+        return sp.identity(n_p, format="coo")
+    elif sp.issparse(M) or M.ndim == 2:
+        return M
+    elif M.ndim == 1:
+        return sp.diags(M, format="coo")
+    else:
+        return sp.block_diag(M, format="coo")
+
+cdef _coo_entries(object A, int row, int col, list rows, list cols, list data):
+    """
+    Appends the entries of the dense or sparse block A, placed at
+    (row, col), to rows, cols and data. All entries of a dense block and
+    all stored entries of a sparse block are kept, so that the pattern
+    of the assembled matrix does not depend on the values.
+    """
+    if sp.issparse(A):
+        A = A.tocoo()
+        rows.append(A.row + row)
+        cols.append(A.col + col)
+        data.append(N.asarray(A.data, dtype=N.double))
+    else:
+        A = N.atleast_2d(N.asarray(A, dtype=N.double))
+        r, c = N.indices(A.shape)
+        rows.append(r.ravel() + row)
+        cols.append(c.ravel() + col)
+        data.append(A.ravel())
+
+cdef N.ndarray _difference_quotient(object func, N.ndarray x, int ncols):
+    """
+    Returns the difference quotient approximation of the derivative of
+    func() with respect to x[:ncols]. The entries of x are perturbed in
+    place, so func has to read them from x (or from a view of x).
+    """
+    cdef int j
+    cdef double delta, sqrt_eps = N.sqrt(N.finfo(N.double).eps)
+    cdef N.ndarray f0 = N.array(func(), dtype=N.double).ravel()
+    cdef N.ndarray J = N.empty((f0.size, ncols))
+    
+    for j in range(ncols):
+        delta = sqrt_eps*max(abs(x[j]), 1.0)
+        x[j] += delta
+        J[:,j] = (N.asarray(func(), dtype=N.double).ravel() - f0)/delta
+        x[j] -= delta
+    
+    return J
+
+cdef _as_mass(object M):
+    """
+    Converts a (constant) mass matrix to one of the forms handled by
+    _mass_product.
+    """
+    if M is None or sp.issparse(M):
+        return M
+    return N.asarray(M, dtype=N.double)
+
+cdef class Mechanical_Residual:
+    """
+    Residual of a mechanical system in one of the index formulations of
+    cMechanical_System.generate_problem. The residual is evaluated into a
+    preallocated vector, i.e. the returned array is overwritten by the
+    next evaluation.
+    
+    GT(p) may return a dense array or a scipy.sparse matrix. The mass
+    matrix may be a dense or sparse matrix, a vector of diagonal entries,
+    an array of shape (nblocks, b, b) of diagonal blocks or a function of
+    p returning one of these.
+    
+    The Jacobian dF/dy + c*dF/dyd is given by jac, and in CSC format by
+    sparse_jac. Its structural blocks are exact. The derivatives of the
+    forces, of GT(p)*lambda and of the constraints are taken from the
+    system if given and are otherwise difference quotients of those
+    functions. The same holds for the derivative of M(p)*vd if the mass
+    matrix depends on p.
+    """
+    cdef public object system, index
+    cdef public int n_p, n_la, neq, dim
+    cdef object _forces, _GT, _M
+    cdef object _dforces_dp, _dforces_dv, _dGT_dp
+    cdef list _constraints, _dconstraints
+    cdef N.ndarray _res, _tmp
+    
+    def __init__(self, object system, object index):
+        self.system = system
+        self.index = index
+        self.n_p = system.n_p
+        self.n_la = system.n_la
+        self._forces = system.forces
+        self._GT = system.GT
+        self._M = system.mass_matrix if callable(system.mass_matrix) else _as_mass(system.mass_matrix)
+        self._dforces_dp = getattr(system, "dforces_dp", None)
+        self._dforces_dv = getattr(system, "dforces_dv", None)
+        self._dGT_dp = getattr(system, "dGT_dp", None)
+        
+        if self.n_la == 0:
+            self._constraints = []
+            self._dconstraints = []
+        elif index in INDEX_CONSTRAINTS:
+            self._constraints = [getattr(system, name) for name in INDEX_CONSTRAINTS[index]]
+            self._dconstraints = [getattr(system, "d"+name, None) for name in INDEX_CONSTRAINTS[index]]
+        else:
+            raise Exception("index should be one of 'ind1', 'ind2', 'ind3', "+
+                            "'ovstab2', 'ovstab1', 'ggl2'")
+        
+        self.dim = 2*self.n_p + (self.n_la*(2 if index == 'ggl2' else 1) if self.n_la > 0 else 0)
+        self.neq = 2*self.n_p + self.n_la*len(self._constraints)
+        self._res = N.zeros(self.neq)
+        self._tmp = N.zeros(self.n_p)
+    
+    cdef _mass(self, N.ndarray p):
+        return _as_mass(self._M(p)) if callable(self._M) else self._M
+    
+    cdef _add_GT_product(self, object GT, N.ndarray la, N.ndarray out):
+        if sp.issparse(GT):
+            _add_sparse_product(GT, la, out)
+        else:
+            N.dot(GT, la, out=self._tmp)
+            out += self._tmp
+    
+    cdef _velocity_residual(self, double t, N.ndarray p, N.ndarray v, N.ndarray vd, N.ndarray la, N.ndarray out):
+        """
+        Computes out = M(p)*vd - forces(t,p,v) + GT(p)*la.
+        """
+        _mass_product(self._mass(p), vd, out)
+        out -= self._forces(t, p, v)
+        if self.n_la > 0:
+            self._add_GT_product(self._GT(p), la, out)
+    
+    def __call__(self, double t, N.ndarray y, N.ndarray yd):
+        cdef int n_p = self.n_p, n_v = 2*self.n_p, n_la = self.n_la
+        cdef int offset
+        cdef N.ndarray res = self._res
+        
+        p, v = y[:n_p], y[n_p:n_v]
+        
+        N.subtract(yd[:n_p], v, out=res[:n_p])
+        self._velocity_residual(t, p, v, yd[n_p:n_v], y[n_v:n_v+n_la], res[n_p:n_v])
+        
+        if n_la > 0:
+            if self.index == 'ggl2':
+                self._add_GT_product(self._GT(p), y[n_v+n_la:n_v+2*n_la], res[:n_p])
+            
+            offset = n_v
+            for constraint in self._constraints:
+                res[offset:offset+n_la] = constraint(t, y)
+                offset += n_la
+        
+        return res
+    
+    def _GT_product(self, N.ndarray p, N.ndarray la):
+        cdef N.ndarray out = N.zeros(self.n_p)
+        self._add_GT_product(self._GT(p), la, out)
+        return out
+    
+    def _mass_product_p(self, N.ndarray p, N.ndarray vd):
+        cdef N.ndarray out = N.empty(self.n_p)
+        _mass_product(self._mass(p), vd, out)
+        return out
+    
+    def sparse_jac(self, double c, double t, N.ndarray y, N.ndarray yd):
+        """
+        Returns the Jacobian dF/dy + c*dF/dyd of the residual as a
+        scipy.sparse CSC matrix.
+        """
+        cdef int n_p = self.n_p, n_v = 2*self.n_p, n_la = self.n_la
+        cdef int offset
+        cdef list rows = [], cols = [], data = []
+        cdef N.ndarray yp = N.array(y, dtype=N.double)
+        
+        p, v, vd, la = yp[:n_p], yp[n_p:n_v], N.asarray(yd[n_p:n_v], dtype=N.double), yp[n_v:n_v+n_la]
+        
+        #Position rows, pd - v (+ GT(p)*mue)
+        _coo_entries(c*sp.identity(n_p, format="coo"), 0, 0, rows, cols, data)
+        _coo_entries(-sp.identity(n_p, format="coo"), 0, n_p, rows, cols, data)
+        
+        #Velocity rows, M(p)*vd - forces(t,p,v) + GT(p)*la
+        _coo_entries(c*_mass_block(self._mass(p), n_p), n_p, n_p, rows, cols, data)
+        if callable(self._M):
+            _coo_entries(_difference_quotient(lambda: self._mass_product_p(p, vd), p, n_p), n_p, 0, rows, cols, data)
+        if self._dforces_dp is not None:
+            _coo_entries(-self._dforces_dp(t, p, v), n_p, 0, rows, cols, data)
+        else:
+            _coo_entries(-_difference_quotient(lambda: self._forces(t, p, v), p, n_p), n_p, 0, rows, cols, data)
+        if self._dforces_dv is not None:
+            _coo_entries(-self._dforces_dv(t, p, v), n_p, n_p, rows, cols, data)
+        else:
+            _coo_entries(-_difference_quotient(lambda: self._forces(t, p, v), v, n_p), n_p, n_p, rows, cols, data)
+        
+        if n_la > 0:
+            GT = self._GT(p)
+            _coo_entries(GT, n_p, n_v, rows, cols, data)
+            _coo_entries(self._dGT_product_dp(p, la), n_p, 0, rows, cols, data)
+            
+            if self.index == 'ggl2':
+                mue = yp[n_v+n_la:]
+                _coo_entries(GT, 0, n_v+n_la, rows, cols, data)
+                _coo_entries(self._dGT_product_dp(p, mue), 0, 0, rows, cols, data)
+            
+            #Constraint rows
+            offset = n_v
+            for constraint, dconstraint in zip(self._constraints, self._dconstraints):
+                if dconstraint is not None:
+                    _coo_entries(dconstraint(t, yp), offset, 0, rows, cols, data)
+                else:
+                    _coo_entries(_difference_quotient(lambda: constraint(t, yp), yp, n_v+n_la), offset, 0, rows, cols, data)
+                offset += n_la
+        
+        return sp.coo_matrix((N.hstack(data), (N.hstack(rows), N.hstack(cols))),
+                             shape=(self.neq, self.dim)).tocsc()
+    
+    cdef _dGT_product_dp(self, N.ndarray p, N.ndarray la):
+        if self._dGT_dp is not None:
+            return self._dGT_dp(p, la)
+        return _difference_quotient(lambda: self._GT_product(p, la), p, self.n_p)
+    
+    def jac(self, double c, double t, N.ndarray y, N.ndarray yd):
+        """
+        Returns the Jacobian dF/dy + c*dF/dyd of the residual.
+        """
+        return self.sparse_jac(c, t, y, yd).toarray()
                     
                        
 class Mechanical_System(cMechanical_System):
@@ -18,7 +18,14 @@
 import numpy as N
 cimport numpy as N
 
+import os
+import hashlib
 from collections import OrderedDict
+from timeit import default_timer as timer
+
+from exception import AssimuloException
+
+include "constants.pxi" #Includes the constants (textual include)
 
 realtype = N.float
 
@@ -32,6 +39,8 @@ class Statistics:
     def __init__(self):
         self.statistics = OrderedDict()
         self.statistics_msg = OrderedDict()
+        self.timings = OrderedDict()
+        self._timing_depth = 0
         
     def __setitem__(self, key, value):
         if self.statistics[key] == -1:
@@ -62,6 +71,27 @@ class Statistics:
                 continue
             print(" %s %s: %d")%(self.statistics_msg[k], " "*(max_len_msg-len(self.statistics_msg[k])+1) ,self.statistics[k])
         
+        if self.timings:
+            max_len_key = max([len(k) for k in self.timings.keys()])
+            print("")
+            print(" Time spent per category (seconds):")
+            for k in self.timings.keys():
+                print("  %s %s: %g" % (k, " "*(max_len_key-len(k)), self.timings[k]))
+    
+    def add_timing(self, category, seconds):
+        """
+        Adds the wall time (in seconds) to the given timing category.
+        """
+        self.timings[category] = self.timings.get(category, 0.0) + seconds
+    
+    def get_timings(self):
+        """
+        Returns the accumulated wall times (in seconds) per category as a
+        dictionary. The timings are only collected when the option profile
+        is set on the solver.
+        """
+        return dict(self.timings)
+        
     def reset(self):
         """
         Resets the statistics (to zero) that has been previously used
@@ -69,6 +99,7 @@ class Statistics:
         for k in list(self.statistics.keys()):
             if self.statistics[k] > -1:
                 self.statistics[k] = 0
+        self.timings.clear()
             
     def full_reset(self):
         """
@@ -76,6 +107,462 @@ class Statistics:
         """
         for k in list(self.statistics.keys()):
             self.statistics[k] = -1
+        self.timings.clear()
         
     def keys(self):
         return self.statistics.keys()
+
+
+cdef class TimedCallback:
+    """
+    Wraps a function so that the wall time spent in it is accumulated in
+    a timing category of the statistics. Used by the solvers when the
+    option profile is set. Nested timed calls (for instance the right-hand
+    side evaluated during a finite difference Jacobian) are attributed to
+    the outermost category.
+    
+    Being an extension type, f2py passes all the arguments of a call-back
+    to it, the same as for the wrapped function.
+    """
+    cdef public object func, category, statistics
+    
+    def __init__(self, func, category, statistics):
+        self.func = func
+        self.category = category
+        self.statistics = statistics
+    
+    def __call__(self, *args, **kwargs):
+        statistics = self.statistics
+        if statistics._timing_depth > 0:
+            return self.func(*args, **kwargs)
+        
+        statistics._timing_depth += 1
+        time_start = timer()
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            statistics.add_timing(self.category, timer()-time_start)
+            statistics._timing_depth -= 1
+
+
+cpdef int rk_stages(object rhs, double t0, N.ndarray[double, ndim=1] y0,
+                    N.ndarray[double, ndim=2] A, N.ndarray[double, ndim=1] C,
+                    double H, N.ndarray[double, ndim=2] K,
+                    N.ndarray[double, ndim=1] ytmp, tuple extra_args=(),
+                    object problem=None):
+    """
+    Evaluates the stages of an explicit Runge-Kutta method,
+    
+        K[i] = rhs(t0 + C[i]*H, y0 + H*sum_j A[i,j]*K[j], *extra_args)
+    
+    for i = 0,...,A.shape[0]-1. The stage values are formed in ytmp and
+    the stage derivatives are stored in the rows of K, both of which are
+    preallocated by the caller. Only the strictly lower triangular part
+    of A is used.
+    
+    If an explicit problem is given and there are no extra arguments,
+    the stages are evaluated by its rhs_internal, which writes directly
+    into the rows of K (compiled problems do so without calling Python).
+    If rhs_internal fails, the stage is evaluated again by rhs, which
+    raises the error.
+    
+    Returns the number of right-hand side evaluations.
+    """
+    cdef int i, j, k
+    cdef int n = y0.shape[0], s = A.shape[0]
+    cdef double a
+    cdef object rhs_internal = None
+    
+    if problem is not None and len(extra_args) == 0:
+        rhs_internal = problem.rhs_internal
+    
+    for i in range(s):
+        for k in range(n):
+            ytmp[k] = y0[k]
+        for j in range(i):
+            a = H*A[i,j]
+            if a != 0.0:
+                for k in range(n):
+                    ytmp[k] += a*K[j,k]
+        if rhs_internal is not None and rhs_internal(K[i], t0+C[i]*H, ytmp) == ID_OK:
+            continue
+        K[i,:] = rhs(t0+C[i]*H, ytmp, *extra_args)
+    
+    return s
+
+
+class DenseSolution:
+    """
+    Continuous representation of a solution, built from the continuous
+    extension (dense output) of the solver in each step. It is returned
+    from simulate when the option dense_output is set and can be
+    evaluated at any time inside the simulated interval.
+    
+    Each step is stored as the coefficients c_j of its interpolation
+    polynomial in Nordsieck form,
+    
+        y(t) = sum_j c_j*((t - t_ref)/h_ref)**j,
+    
+    with only as many coefficients as the degree used in the step.
+    Multistep solvers hand over their own polynomial (add_step), for the
+    other solvers the polynomial is fitted to the values in degree+1
+    Chebyshev points of the step (add_step_values).
+    
+        Example::
+        
+            t, y, sol = solver.simulate(10.0)
+            y_fine = sol(N.linspace(0.0, 10.0, 10001))
+    """
+    def __init__(self, dim, degree=3, backward=False):
+        if degree < 1:
+            raise AssimuloException("The degree of the dense output must be at least one.")
+        
+        self.dim = dim
+        self.degree = degree
+        self.backward = bool(backward)
+        
+        #Chebyshev points on [0,1] and the inverse of the Vandermonde
+        #matrix in theta = (t-t_right)/h, giving coefficients from values
+        self._nodes = 0.5*(1.0-N.cos(N.pi*N.arange(degree+1)/degree))
+        self._fit = N.linalg.inv(N.vander(self._nodes-1.0, degree+1, increasing=True))
+        
+        self._nsteps = 0
+        self._ncoefficients = 0
+        self._t_left = N.empty(0)
+        self._t_right = N.empty(0)
+        self._t_ref = N.empty(0)
+        self._h_ref = N.empty(0)
+        self._offset = N.empty(0, dtype=N.intp)
+        self._order = N.empty(0, dtype=N.intp)
+        self._coefficients = N.empty((0, dim))
+    
+    def __len__(self):
+        return self._nsteps
+    
+    def nodes(self, t_left, t_right):
+        """
+        Returns the times at which the values of the step [t_left, t_right]
+        are to be given to add_step_values.
+        """
+        return t_left + (t_right-t_left)*self._nodes
+    
+    def add_step(self, t_left, t_right, coefficients, t_ref, h_ref):
+        """
+        Adds a step to the solution.
+        
+            Parameters::
+            
+                t_left, t_right
+                        - The interval of the step.
+                        
+                coefficients
+                        - The coefficients of the interpolation polynomial
+                          in the step, an array of shape (q+1, dim) for a
+                          polynomial of degree q.
+                          
+                t_ref, h_ref
+                        - The reference time and the scaling of the
+                          polynomial.
+        """
+        cdef int n = self._nsteps
+        cdef int m = self._ncoefficients
+        cdef int q1 = len(coefficients)
+        
+        if n == self._t_left.shape[0]:
+            capacity = max(16, 2*n)
+            self._t_left = N.resize(self._t_left, capacity)
+            self._t_right = N.resize(self._t_right, capacity)
+            self._t_ref = N.resize(self._t_ref, capacity)
+            self._h_ref = N.resize(self._h_ref, capacity)
+            self._offset = N.resize(self._offset, capacity)
+            self._order = N.resize(self._order, capacity)
+        if m + q1 > self._coefficients.shape[0]:
+            coefficients_new = N.empty((max(64, 2*(m+q1)), self.dim))
+            coefficients_new[:m] = self._coefficients[:m]
+            self._coefficients = coefficients_new
+        
+        self._t_left[n] = t_left
+        self._t_right[n] = t_right
+        self._t_ref[n] = t_ref
+        self._h_ref[n] = h_ref
+        self._offset[n] = m
+        self._order[n] = q1
+        self._coefficients[m:m+q1] = coefficients
+        self._nsteps = n + 1
+        self._ncoefficients = m + q1
+    
+    def add_step_values(self, t_left, t_right, values):
+        """
+        Adds a step to the solution from its values at the times given by
+        nodes(t_left, t_right), an array of shape (degree+1, dim).
+        """
+        self.add_step(t_left, t_right, N.dot(self._fit, values), t_right, t_right-t_left)
+    
+    def _get_t_span(self):
+        """
+        The interval (t_start, t_end) covered by the solution.
+        """
+        if self._nsteps == 0:
+            return None
+        return (self._t_left[0], self._t_right[self._nsteps-1])
+    
+    t_span = property(_get_t_span)
+    
+    def __call__(self, t):
+        """
+        Evaluates the solution at the time(s) t.
+        
+            Parameters::
+            
+                t
+                        - A time or an array of times inside t_span.
+                        
+            Returns::
+            
+                The solution, an array of shape (dim,) if t is a scalar
+                and of shape (len(t), dim) otherwise.
+        """
+        cdef int n = self._nsteps
+        
+        if n == 0:
+            raise AssimuloException("The dense solution does not contain any steps.")
+        
+        scalar = N.ndim(t) == 0
+        t = N.atleast_1d(N.asarray(t, dtype=realtype))
+        
+        sign = -1.0 if self.backward else 1.0
+        t_right = sign*self._t_right[:n]
+        t_start, t_end = self._t_left[0], self._t_right[n-1]
+        tol = N.finfo(float).eps*100*max(abs(t_start), abs(t_end), 1.0)
+        
+        if N.any(sign*(t - t_start) < -tol) or N.any(sign*(t - t_end) > tol):
+            raise AssimuloException("The dense solution can only be evaluated in the interval [%g, %g]."%(t_start, t_end))
+        
+        #Find the step of each time and evaluate its polynomial (Horner)
+        idx = N.searchsorted(t_right, sign*t).clip(0, n-1)
+        theta = ((t - self._t_ref[idx])/self._h_ref[idx])[:,N.newaxis]
+        offset = self._offset[idx]
+        order = self._order[idx]
+        
+        y = N.zeros((len(t), self.dim))
+        for j in range(order.max()-1, -1, -1):
+            y *= theta
+            active = order > j
+            y[active] += self._coefficients[offset[active]+j]
+        
+        return y[0] if scalar else y
+
+
+class StepTrace:
+    """
+    Record of the steps taken by a solver, filled in after each step when
+    the option trace_steps is set. The record is a NumPy structured
+    array with the fields:
+    
+        t, h        - The time reached and the size of the step.
+        order       - The order used in the step.
+        nniters     - The number of nonlinear iterations in the step.
+        nerrfails   - The number of error test failures in the step.
+        jac_update  - 1 if the Jacobian was evaluated in the step.
+        lu_update   - 1 if the iteration matrix was factorized in the
+                      step.
+    
+    Integer fields which are not available for a solver are -1.
+    
+        Example::
+        
+            solver.trace_steps = True
+            solver.simulate(10.0)
+            trace = solver.get_step_trace()
+            trace.data["h"] #The step sizes
+            trace.save("steps.npy")
+    """
+    dtype = N.dtype([("t", realtype), ("h", realtype), ("order", N.int32), ("nniters", N.int32), 
+                     ("nerrfails", N.int32), ("jac_update", N.int8), ("lu_update", N.int8)])
+    
+    def __init__(self, capacity=1024):
+        self._data = N.empty(max(int(capacity), 1), dtype=StepTrace.dtype)
+        self._nsteps = 0
+        self._counters = N.zeros(4, dtype=N.int64)
+    
+    def __len__(self):
+        return self._nsteps
+    
+    def __getitem__(self, field):
+        return self.data[field]
+    
+    def restart(self):
+        """
+        Restarts the counters given to record. Called when the solver
+        restarts its own counters, i.e. after it has been reinitialized.
+        """
+        self._counters[:] = 0
+    
+    def record(self, t, h, order, nniters=-1, nerrfails=-1, njacs=-1, nlus=-1):
+        """
+        Records a step.
+        
+            Parameters::
+            
+                t, h
+                        - The time reached and the size of the step.
+                        
+                order
+                        - The order used in the step.
+                        
+                nniters, nerrfails, njacs, nlus
+                        - The accumulated number of nonlinear iterations,
+                          error test failures, Jacobian evaluations and
+                          factorizations of the solver (-1 if not
+                          available). The values for the step are given
+                          by the increase since the last record.
+        """
+        cdef int n = self._nsteps
+        cdef int i
+        
+        if n == self._data.shape[0]:
+            data = N.empty(2*n, dtype=StepTrace.dtype)
+            data[:n] = self._data
+            self._data = data
+        
+        counters = (nniters, nerrfails, njacs, nlus)
+        increase = [-1]*4
+        for i in range(4):
+            if counters[i] >= 0:
+                increase[i] = max(counters[i] - self._counters[i], 0)
+                self._counters[i] = counters[i]
+        
+        self._data[n] = (t, h, order, increase[0], increase[1], 
+                         min(increase[2], 1), min(increase[3], 1))
+        self._nsteps = n + 1
+    
+    def _get_data(self):
+        """
+        The recorded steps as a NumPy structured array.
+        """
+        return self._data[:self._nsteps]
+    
+    data = property(_get_data)
+    
+    def save(self, filename):
+        """
+        Saves the recorded steps as a NumPy structured array (.npy), which
+        can be loaded with numpy.load.
+        """
+        N.save(filename, self.data)
+
+
+class SimulationCache:
+    """
+    Persistent on-disk cache of simulation results. A result is a set of
+    named arrays which are stored as .npy files, named after the key of
+    the result, and memory-mapped when loaded. When the total size of the
+    cache exceeds max_size (in bytes) the least recently used results
+    are removed.
+    """
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+    
+    @staticmethod
+    def key(*items):
+        """
+        Returns a key (a hexadecimal digest) identifying the given items,
+        which may be (nested) dicts, lists, tuples, arrays, numbers and
+        strings. Raises a TypeError for any other item, as its encoding 
+        (e.g. the repr of a function) is not necessarily the same in 
+        different processes.
+        """
+        digest = hashlib.sha1()
+        for item in items:
+            _update_digest(digest, item)
+        return digest.hexdigest()
+    
+    def _path(self, key, name):
+        return os.path.join(self.directory, "%s.%s.npy"%(key, name))
+    
+    def load(self, key, names):
+        """
+        Returns a dict with the (memory-mapped) arrays stored under key
+        or None if the result is not in the cache.
+        """
+        result = {}
+        try:
+            for name in names:
+                result[name] = N.load(self._path(key, name), mmap_mode="r")
+        except (IOError, OSError, ValueError):
+            return None
+        
+        #Mark the result as recently used
+        for name in names:
+            os.utime(self._path(key, name), None)
+        
+        return result
+    
+    def store(self, key, arrays):
+        """
+        Stores the arrays (a dict name -> array) under key and removes
+        the least recently used results if the cache is too large.
+        """
+        for name, array in arrays.items():
+            tmp = self._path(key, name) + ".tmp"
+            with open(tmp, "wb") as f:
+                N.save(f, N.asarray(array))
+            os.rename(tmp, self._path(key, name))
+        
+        self.evict(keep=key)
+    
+    def evict(self, keep=None):
+        """
+        Removes the least recently used results until the size of the
+        cache is within max_size. The result stored under keep is not
+        removed.
+        """
+        entries = {}
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".npy"):
+                continue
+            path = os.path.join(self.directory, filename)
+            key = filename.split(".")[0]
+            size, used = entries.get(key, (0, 0.0))
+            entries[key] = (size + os.path.getsize(path), max(used, os.path.getmtime(path)))
+        
+        total = sum(size for size, used in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k][1]):
+            if total <= self.max_size:
+                break
+            if key == keep:
+                continue
+            for filename in os.listdir(self.directory):
+                if filename.startswith(key + "."):
+                    os.remove(os.path.join(self.directory, filename))
+            total -= entries[key][0]
+
+def _update_digest(digest, item):
+    if item is None or isinstance(item, (bool, int, float, complex, N.number, N.bool_)):
+        digest.update(("%s%r"%(type(item).__name__, item)).encode())
+    elif isinstance(item, str):
+        digest.update(("str%d"%len(item)).encode())
+        digest.update(item.encode("utf-8"))
+    elif isinstance(item, bytes):
+        digest.update(("bytes%d"%len(item)).encode())
+        digest.update(item)
+    elif isinstance(item, N.ndarray):
+        if item.dtype.hasobject:
+            raise TypeError("Arrays of Python objects have no stable encoding.")
+        digest.update(("array%s%s"%(item.dtype, item.shape)).encode())
+        digest.update(N.ascontiguousarray(item).tobytes())
+    elif isinstance(item, dict):
+        digest.update(b"dict")
+        for k in sorted(item):
+            _update_digest(digest, k)
+            _update_digest(digest, item[k])
+    elif isinstance(item, (list, tuple)):
+        digest.update(("seq%d"%len(item)).encode())
+        for x in item:
+            _update_digest(digest, x)
+    else:
+        raise TypeError("Values of type '%s' have no stable encoding."%type(item).__name__)
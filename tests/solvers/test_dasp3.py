@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import nose
+from assimulo import testattr
+from assimulo.solvers import DASP3ODE
+from assimulo.problem import SingPerturbed_Problem
+from assimulo.exception import *
+
+import numpy as N
+
+class Test_DASP3:
+    """
+    Tests the DASP3 solver.
+    """
+    def setUp(self):
+        """
+        This sets up the test case.
+        """
+        def dydt(t,y,z):
+            eps=(1./3)*1.e-3
+            return N.array([-(.6*z[0]+.8*y[2])*y[0]+10.*y[1],
+                            -10.*y[1]+ 1.6*z[0] *y[2],
+                            -1.33*eps**2*y[2]*(y[0]+2.*z[0])])
+        
+        def dzdt(t,y,z):
+            eps=(1./3)*1.e-3
+            return N.array([1.6*z[0]*y[2]-.6*z[0]*y[0]
+                            -45.*(eps*z[0])**2+.8*y[2]*y[0]])
+        
+        self.mod = SingPerturbed_Problem(dydt, dzdt, yy0=[3.0, 0.216, 1.0], zz0=[1.35], eps=N.array([.33333333e-3]))
+        
+        self.sim = DASP3ODE(self.mod)
+        self.sim.rtol = 1e-5
+        self.sim.atol = 1e-5
+    
+    @testattr(stddist = True)
+    def test_simulation(self):
+        """
+        Tests that each step is stored once.
+        """
+        t, y = self.sim.simulate(1.0)
+        
+        nose.tools.assert_equal(len(t), self.sim.statistics["nsteps"]+1)
+        nose.tools.assert_equal(len(N.unique(t)), len(t))
+        nose.tools.assert_almost_equal(t[-1], 1.0)
+        nose.tools.assert_equal(y.shape, (len(t), 4))
+    
+    @testattr(stddist = True)
+    def test_simulation_ncp(self):
+        """
+        Tests the interpolated output points.
+        """
+        t, y = self.sim.simulate(1.0)
+        y_steps = y[-1].copy()
+        
+        self.sim.reset()
+        t, y = self.sim.simulate(1.0, 50)
+        
+        nose.tools.assert_equal(len(t), 51)
+        nose.tools.assert_almost_equal(t[25], 0.5)
+        for i in range(4):
+            nose.tools.assert_almost_equal(y[-1,i], y_steps[i])
+        
+        self.sim.reset()
+        t, y = self.sim.simulate(1.0, ncp_list=[0.25, 0.5])
+        
+        nose.tools.assert_equal(len(t), 4)
+        nose.tools.assert_almost_equal(t[2], 0.5)
+    
+    @testattr(stddist = True)
+    def test_interpolate(self):
+        """
+        Tests the interpolation in the last step.
+        """
+        self.sim.report_continuously = True
+        t, y = self.sim.simulate(1.0)
+        
+        y_interp = self.sim.interpolate(t[-1])
+        y_middle = self.sim.interpolate(0.5*(t[-1]+t[-2]))
+        
+        for i in range(4):
+            nose.tools.assert_almost_equal(y_interp[i], y[-1,i])
+            nose.tools.assert_less(abs(y_middle[i]-0.5*(y[-1,i]+y[-2,i])), 1e-2*abs(y[-1,i]))
+    
+    @testattr(stddist = True)
+    def test_report_continuously(self):
+        """
+        Tests that the result is the same when it is reported after each step.
+        """
+        t, y = self.sim.simulate(1.0, 10)
+        
+        self.sim.reset()
+        self.sim.report_continuously = True
+        t_rc, y_rc = self.sim.simulate(1.0, 10)
+        
+        nose.tools.assert_equal(len(t_rc), 11)
+        for i in range(4):
+            nose.tools.assert_almost_equal(y_rc[-1,i], y[-1,i])
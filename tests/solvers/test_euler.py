@@ -182,6 +182,23 @@ class Test_Implicit_Euler:
         nose.tools.assert_almost_equal(exp_sim.y_sol[-1][0], -121.995500, 4)
         assert exp_sim.statistics["nfcnjacs"] > 0
     
+    @testattr(stddist = True)
+    def test_lu_reuse(self):
+        f = lambda t,y: -y
+        jac = lambda t,y: N.array([[-1.0]])
+        
+        exp_mod = Explicit_Problem(f, [1.0])
+        exp_mod.jac = jac
+        
+        exp_sim = ImplicitEuler(exp_mod)
+        exp_sim.simulate(1.0)
+        
+        #The problem is linear, the Jacobian and its factorization are kept
+        assert exp_sim.statistics["njacs"] == 1
+        assert exp_sim.statistics["nlus"] <= 2
+        assert exp_sim.statistics["nlureuses"] >= exp_sim.statistics["nsteps"] - 2
+        nose.tools.assert_almost_equal(exp_sim.y_sol[-1][0], (1.0/1.01)**100, 4)
+    
     @testattr(stddist = True)
     def test_h(self):
         
@@ -194,3 +194,74 @@ class Test_GLIMDA:
         
         nose.tools.assert_raises(GLIMDA_Exception, self.sim._set_maxretry, -1)
         
+    @testattr(stddist = True)
+    def test_usejac(self):
+        """
+        Tests GLIMDA with the partial derivatives from a user-defined Jacobian.
+        """
+        nres = [0]
+        def f(t,y,yd):
+            nres[0] += 1
+            return N.array([yd[0]-y[1], yd[1]-1e6*((1.-y[0]**2)*y[1]-y[0])])
+        def jac(c,t,y,yd):
+            return N.array([[c, -1.0], [1e6*(2*y[0]*y[1]+1), c-1e6*(1-y[0]**2)]])
+        
+        results = []
+        for usejac in [False, True]:
+            nres[0] = 0
+            problem = Implicit_Problem(f, [2.0,-0.6], [-.6,-200000.])
+            problem.jac = jac
+            sim = GLIMDA(problem)
+            sim.usejac = usejac
+            sim.atol = 1e-4
+            sim.rtol = 1e-4
+            sim.inith = 1.e-4
+            sim.simulate(1.0)
+            results.append((sim.y_sol[-1], nres[0]))
+        
+        nose.tools.assert_almost_equal(results[1][0][0], results[0][0][0], 4)
+        nose.tools.assert_almost_equal(results[1][0][1], results[0][0][1], 4)
+        assert results[1][1] < results[0][1]
+    
+    @testattr(stddist = True)
+    def test_usejac_switches_sparse(self):
+        """
+        Tests GLIMDA with a sparse user-defined Jacobian and switches.
+        """
+        import scipy.sparse as sp
+        
+        def f(t,y,yd,sw):
+            return N.array([yd[0]+y[0]])
+        def jac(c,t,y,yd,switches):
+            assert switches == [True]
+            return sp.csc_matrix([[1.0+c]])
+        
+        problem = Implicit_Problem(f, [1.0], [-1.0], sw0=[True])
+        problem.jac = jac
+        sim = GLIMDA(problem)
+        sim.usejac = True
+        sim.simulate(1.0)
+        
+        nose.tools.assert_almost_equal(sim.y_sol[-1][0], N.exp(-1.0), 3)
+    
+    @testattr(stddist = True)
+    def test_adconst(self):
+        """
+        Tests the option for a non-constant leading term.
+        """
+        assert self.sim.adconst
+        
+        self.sim.adconst = False
+        
+        assert not self.sim.adconst
+        assert not self.sim.options["adconst"]
+        
+        self.sim.simulate(0.5)
+        
+        sim = GLIMDA(Implicit_Problem(self.mod.res, [2.0,-0.6], [-.6,-200000.]))
+        sim.atol = 1e-4
+        sim.rtol = 1e-4
+        sim.inith = 1.e-4
+        sim.simulate(0.5)
+        
+        nose.tools.assert_almost_equal(self.sim.y_sol[-1][0], sim.y_sol[-1][0], 3)
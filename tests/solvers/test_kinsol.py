@@ -54,3 +54,106 @@ class Test_KINSOL:
         
         solver.max_beta_fails = 15
         assert solver.max_beta_fails == 15
+        
+        solver.max_restarts = 3
+        assert solver.max_restarts == 3
+        
+        solver.anderson_depth = 5
+        assert solver.anderson_depth == 5
+    
+    @testattr(stddist = True)
+    def test_linear_solver(self):
+        res = lambda y: N.array([2*y[0]+y[1]-3.0, y[0]+3*y[1]-4.0])
+        model  = Algebraic_Problem(res, [0.0, 0.0])
+        
+        for lsolver in ['SPGMR', 'SPBCGS', 'SPTFQMR']:
+            solver = KINSOL(model)
+            solver.linear_solver = lsolver.lower()
+            assert solver.linear_solver == lsolver
+            
+            y = solver.solve()
+            nose.tools.assert_almost_equal(y[0], 1.0, 6)
+            nose.tools.assert_almost_equal(y[1], 1.0, 6)
+        
+        nose.tools.assert_raises(Exception, solver._set_linear_solver, 'Test')
+        
+        solver.linear_solver = 'sparse'
+        assert solver.linear_solver == 'SPARSE'
+    
+    @testattr(stddist = True)
+    def test_fixed_point(self):
+        res = lambda y: y - 0.5*N.cos(y)
+        model  = Algebraic_Problem(res, [0.0])
+        
+        for maa in [0, 3]:
+            solver = KINSOL(model)
+            solver.globalization_strategy = "fp"
+            solver.anderson_depth = maa
+            solver.ftol = 1e-10
+            
+            y = solver.solve()
+            nose.tools.assert_almost_equal(y[0], 0.450183611, 6)
+            assert solver.statistics["njevals"] == 0
+        
+        nose.tools.assert_raises(Exception, solver._set_globalization_strategy, 'Test')
+        nose.tools.assert_raises(Exception, solver._set_anderson_depth, -1)
+    
+    @testattr(stddist = True)
+    def test_picard(self):
+        res = lambda y: 2.0*y - 0.5*N.cos(y)
+        jac = lambda y: N.array([[2.0]])
+        model  = Algebraic_Problem(res, [0.0], jac=jac)
+        
+        solver = KINSOL(model)
+        solver.globalization_strategy = "picard"
+        solver.anderson_depth = 2
+        
+        y = solver.solve()
+        nose.tools.assert_almost_equal(y[0], 0.242674681, 6)
+        
+        solver = KINSOL(Algebraic_Problem(res, [0.0]))
+        solver.globalization_strategy = "picard"
+        nose.tools.assert_raises(AssimuloException, solver.solve)
+    
+    @testattr(stddist = True)
+    def test_jac_memory_order(self):
+        res = lambda y: N.array([2*y[0]+3*y[1]-6, 4*y[0]+9*y[1]-15])
+        
+        for order in ['C', 'F']:
+            jac = lambda y: N.array([[2.,3.],[4.,9.]], order=order)
+            model  = Algebraic_Problem(res, [0.0, 0.0], jac=jac)
+            
+            solver = KINSOL(model)
+            y = solver.solve()
+            nose.tools.assert_almost_equal(y[0], 1.5, 5)
+            nose.tools.assert_almost_equal(y[1], 1.0, 5)
+            assert solver.statistics["njevals"] > 0
+    
+    @testattr(stddist = True)
+    def test_jac_wrong_shape(self):
+        res = lambda y: N.array([2*y[0]+3*y[1]-6, 4*y[0]+9*y[1]-15])
+        jac = lambda y: N.array([[2.,3.,0.],[4.,9.,0.]])
+        model  = Algebraic_Problem(res, [0.0, 0.0], jac=jac)
+        
+        solver = KINSOL(model)
+        nose.tools.assert_raises(AssimuloException, solver.solve)
+    
+    @testattr(stddist = True)
+    def test_builtin_precond(self):
+        res = lambda y: N.array([y[0]-1.0, y[1]-y[0]])
+        model  = Algebraic_Problem(res, [0.0, 0.0])
+        
+        for precond, blocks in [("BAND", None), ("BLOCK_JACOBI", [2]), ("BLOCK_JACOBI", [1,1])]:
+            solver = KINSOL(model)
+            solver.linear_solver = "SPGMR"
+            solver.builtin_precond = precond
+            solver.mupper = 1
+            solver.mlower = 1
+            solver.prec_blocks = blocks
+            
+            y = solver.solve()
+            nose.tools.assert_almost_equal(y[0], 1.0, 6)
+            nose.tools.assert_almost_equal(y[1], 1.0, 6)
+        
+        nose.tools.assert_raises(Exception, solver._set_builtin_precond, 'Test')
+        nose.tools.assert_raises(Exception, solver._set_prec_blocks, [1,2])
@@ -96,3 +96,37 @@ class Test_ODASSL:
         
         #Test a simulation
         self.simulator.simulate(1)    
+    
+    @testattr(stddist = True)
+    def test_usejac(self):
+        A = np.array([[-1.0, 2.0], [-3.0, -1.0]])
+        res = lambda t,y,yd: np.hstack((yd - A.dot(y), y[0] + y[1] - 1.0))
+        jac = lambda c,t,y,yd: np.vstack((c*np.eye(2) - A, [1.0, 1.0]))
+        
+        def simulate(usejac):
+            problem = Overdetermined_Problem(res, [1.0, 0.0], A.dot([1.0, 0.0]))
+            problem.jac = jac
+            problem.neq = 3
+            simulator = ODASSL(problem)
+            simulator.usejac = usejac
+            simulator.scaled_rows = (0, 2)
+            simulator.simulate(1.0)
+            return simulator
+        
+        sim_fd = simulate(False)
+        sim_jac = simulate(True)
+        
+        nose.tools.assert_almost_equal(sim_jac.y_sol[-1][0], sim_fd.y_sol[-1][0], 4)
+        nose.tools.assert_almost_equal(sim_jac.y_sol[-1][1], sim_fd.y_sol[-1][1], 4)
+        assert sim_jac.statistics["njacs"] > 0
+        assert sim_jac.statistics["nfcnjacs"] == 0
+        assert sim_fd.statistics["nfcnjacs"] > 0
+    
+    @testattr(stddist = True)
+    def test_neq(self):
+        f = lambda t,y,yd: np.hstack((yd + 1, yd +1))
+        problem = Overdetermined_Problem(f, [1.0, 1.0, 1.0], [-1.0, -1.0, -1.0])
+        simulator = ODASSL(problem)
+        
+        assert simulator.problem_info["neq"] == 6
+        nose.tools.assert_raises(ODASSL_Exception, simulator._set_scaled_rows, (0, 7))
@@ -19,7 +19,7 @@ import nose
 import numpy.testing
 from assimulo import testattr
 from assimulo.lib.odepack import dsrcar, dcfode
-from assimulo.solvers import LSODAR, odepack
+from assimulo.solvers import LSODAR, LSODES, odepack
 from assimulo.problem import Explicit_Problem
 from assimulo.exception import *
 
@@ -154,6 +154,92 @@ class Test_LSODAR:
         computed=rkNordsieck(0,y0)       
         numpy.testing.assert_allclose(computed[1], nordsieck_at_0, atol=H/100., verbose=True)      
         """              
+    
+    @testattr(stddist = True)
+    def test_rkstarter_events(self):
+        """
+        This tests the restart with the RK starter after events, with
+        and without switches.
+        """
+        def f(t,y):
+            return N.array([y[1],-9.81])
+        def f_sw(t,y,sw):
+            return N.array([y[1],-9.81 if sw[0] else 0.0])
+        def state_events(t,y,sw):
+            return N.array([y[0]])
+        def handle_event(solver, event_info):
+            solver.y[1] = 0.9*abs(solver.y[1])
+        
+        y_end = {}
+        for rhs, sw0 in [(f,None),(f_sw,[True])]:
+            for rkstarter in [1,2,3,4,5]:
+                exp_mod = Explicit_Problem(rhs,[1.0,0.0],sw0=sw0)
+                exp_mod.state_events = state_events
+                exp_mod.handle_event = handle_event
+                
+                sim = LSODAR(exp_mod)
+                sim.rkstarter = rkstarter
+                sim.simulate(1.)
+                
+                y_end[rkstarter] = sim.y_sol[-1]
+                if rkstarter > 1:
+                    nose.tools.assert_greater(sim.statistics["nstarterfcns"], 0)
+                    nose.tools.assert_almost_equal(y_end[rkstarter][0], y_end[1][0], 3)
+                    nose.tools.assert_almost_equal(y_end[rkstarter][1], y_end[1][1], 3)
+                else:
+                    nose.tools.assert_equal(sim.statistics["nstarterfcns"], 0)
+    
+    @testattr(stddist = True)
+    def test_rkstarter_nordsieck(self):
+        """
+        This tests the Nordsieck array and the function evaluations of 
+        the RK starter.
+        """
+        A = N.array([[0.,1.],[-4.,0.]])
+        def f(t,y):
+            return N.dot(A,y)
+        y0 = N.array([1.,0.])
+        H = 1.e-2
+        
+        for s, nfcns in [(2,2),(3,5),(4,7),(5,14)]:
+            rkNordsieck = odepack.RKStarterNordsieck(f,H,number_of_steps=s)
+            t, nordsieck = rkNordsieck(0.,y0)
+            
+            nose.tools.assert_equal(rkNordsieck.nfcns, nfcns)
+            nose.tools.assert_equal(nordsieck.shape, (s+1,2))
+            numpy.testing.assert_allclose(nordsieck[0], y0)
+            numpy.testing.assert_allclose(nordsieck[1], (s-1)*H*f(0.,y0))
+            numpy.testing.assert_allclose(nordsieck[2], ((s-1)*H)**2/2.*N.dot(A,f(0.,y0)), atol=H**3)
+    
+    @testattr(stddist = True)
+    def test_rkstarter_rhs_internal(self):
+        """
+        This tests that the RK starter evaluates the stages with the
+        problem's rhs_internal, and with rhs if rhs_internal fails.
+        """
+        A = N.array([[0.,1.],[-4.,0.]])
+        def f(t,y):
+            return N.dot(A,y)
+        class Problem(Explicit_Problem):
+            ninternal = 0
+            flag = 0
+            def rhs_internal(self, yd, t, y):
+                self.ninternal += 1
+                yd[:] = N.dot(A,y)
+                return self.flag
+        y0 = N.array([1.,0.])
+        H = 1.e-2
+        
+        for s in [2,3,4,5]:
+            t, nordsieck_ref = odepack.RKStarterNordsieck(f,H,number_of_steps=s)(0.,y0)
+            for flag in [0,-1]:
+                problem = Problem(f,y0)
+                problem.flag = flag
+                rkNordsieck = odepack.RKStarterNordsieck(f,H,number_of_steps=s,problem=problem)
+                t, nordsieck = rkNordsieck(0.,y0)
+                
+                nose.tools.assert_equal(problem.ninternal, rkNordsieck.nfcns)
+                numpy.testing.assert_allclose(nordsieck, nordsieck_ref)
         
     @testattr(stddist = True)
     def test_interpol(self):
@@ -165,6 +251,57 @@ class Test_LSODAR:
         ind05=N.nonzero(N.array(t_sol)==0.5)[0][0]
         #print y_sol[ind05],y_sol1[-1]
         nose.tools.assert_almost_equal(y_sol[ind05,0],y_sol1[-1,0],6)
+    
+    @testattr(stddist = True)
+    def test_interpolate_array(self):
+        """
+        This tests the interpolation at several time points at once.
+        """
+        self.sim.report_continuously = True
+        self.sim.simulate(0.5)
+        
+        h = self.sim._RWORK[10] #The last step size
+        t = N.linspace(self.sim.t-h, self.sim.t, 5)
+        y = self.sim.interpolate(t)
+        
+        nose.tools.assert_equal(y.shape, (5,2))
+        for i in range(5):
+            numpy.testing.assert_allclose(y[i], self.sim.interpolate(t[i]))
+        numpy.testing.assert_allclose(y[-1], self.sim.y)
+        numpy.testing.assert_allclose(self.sim.interpolate(self.sim.t+1.), self.sim.y)
+    
+    @testattr(stddist = True)
+    def test_dense_output(self):
+        """
+        This tests that the dense output stores the Nordsieck polynomial
+        of each step, with the order used in the step.
+        """
+        self.sim.dense_output = True
+        t, y, sol = self.sim.simulate(0.5)
+        
+        nose.tools.assert_equal(len(sol), len(t) - 1)
+        nose.tools.assert_equal(sol._ncoefficients, N.sum(sol._order[:len(sol)]))
+        numpy.testing.assert_allclose(sol(t), y, rtol=1e-10, atol=1e-10)
+        
+        h = self.sim._RWORK[10] #The last step size
+        t_step = N.linspace(self.sim.t-h, self.sim.t, 5)
+        numpy.testing.assert_allclose(sol(t_step), self.sim.interpolate(t_step), rtol=1e-10, atol=1e-10)
+    
+    @testattr(stddist = True)
+    def test_simulation_ncp_interpolated(self):
+        """
+        This tests that the output points are interpolated from the steps.
+        """
+        t_sol, y_sol = self.sim.simulate(1.,1000)
+        
+        nose.tools.assert_equal(len(t_sol), 1001)
+        nose.tools.assert_less(self.sim.statistics["nsteps"], 1000)
+        nose.tools.assert_almost_equal(t_sol[500], 0.5)
+        nose.tools.assert_almost_equal(y_sol[-1][0], -1.863646028, 4)
+        
+        self.sim.reset()
+        t_sol1, y_sol1 = self.sim.simulate(0.5)
+        nose.tools.assert_almost_equal(y_sol[500][0], y_sol1[-1][0], 4)
         
         
     def test_simulation_with_jac(self):
@@ -224,3 +361,172 @@ class Test_LSODAR:
         self.sim.simulate(1.,100) #Simulate 2 seconds
 
         nose.tools.assert_almost_equal(self.sim.y_sol[-1][0], -1.863646028, 4)
+    
+    @testattr(stddist = True)
+    def test_banded_jacobian(self):
+        """
+        This tests the banded Jacobian, given as a sparse, full or
+        band-packed matrix or approximated by difference quotients.
+        """
+        n = 20
+        D = sp.diags([N.ones(n-1),-2.*N.ones(n),N.ones(n-1)],[-1,0,1])
+        def f(t,y):
+            return 100.*D.dot(y) - y**3
+        def jac_sparse(t,y):
+            return (100.*D - sp.diags(3.*y**2)).tocsc()
+        def jac_full(t,y):
+            return jac_sparse(t,y).toarray()
+        def jac_packed(t,y):
+            pd = N.zeros((3,n))
+            pd[0,1:] = 100.
+            pd[1,:] = -200. - 3.*y**2
+            pd[2,:-1] = 100.
+            return pd
+        y0 = N.sin(N.linspace(0.,3.,n))
+        
+        sim = LSODAR(Explicit_Problem(f,y0))
+        sim.simulate(1.)
+        y_ref = sim.y_sol[-1]
+        
+        for jac in [None, jac_sparse, jac_full, jac_packed]:
+            exp_mod = Explicit_Problem(f,y0)
+            if jac is not None:
+                exp_mod.jac = jac
+            sim = LSODAR(exp_mod)
+            sim.usejac = jac is not None
+            sim.ml = 1
+            sim.mu = 1
+            sim.simulate(1.)
+            
+            nose.tools.assert_less(len(sim._RWORK), 22+n*max(16,n+9))
+            numpy.testing.assert_allclose(sim.y_sol[-1], y_ref, rtol=1e-5, atol=1e-8)
+        
+        nose.tools.assert_raises(ODEPACK_Exception, setattr, sim, "ml", -1)
+        nose.tools.assert_raises(ODEPACK_Exception, setattr, sim, "mu", n)
+
+class Test_LSODES:
+    """
+    Tests the LSODES solver.
+    """
+    def setUp(self):
+        """
+        This sets up the test case.
+        """
+        def f(t,y):
+            eps = 1.e-6
+            my = 1./eps
+            yd_0 = y[1]
+            yd_1 = my*((1.-y[0]**2)*y[1]-y[0])
+            
+            return N.array([yd_0,yd_1])
+        
+        def jac(t,y):
+            eps = 1.e-6
+            my = 1./eps
+            J = N.zeros([2,2])
+            
+            J[0,0]=0.
+            J[0,1]=1.
+            J[1,0]=my*(-2.*y[0]*y[1]-1.)
+            J[1,1]=my*(1.-y[0]**2)
+            
+            return sp.csc_matrix(J)
+        
+        #Define an Assimulo problem
+        y0 = [2.0,-0.6] #Initial conditions
+        
+        exp_mod = Explicit_Problem(f,y0)
+        exp_mod.jac = jac
+        
+        #Define an explicit solver
+        self.sim = LSODES(exp_mod) #Create a LSODES solver
+        
+    @testattr(stddist = True)
+    def test_simulation(self):
+        """
+        This tests the LSODES with a simulation of the van der pol problem.
+        """
+        assert self.sim.usejac
+        self.sim.simulate(1.)
+        
+        nose.tools.assert_almost_equal(self.sim.y_sol[-1][0], -1.863646028, 4)
+        nose.tools.assert_greater(self.sim.statistics["njacs"], 0)
+        nose.tools.assert_greater(self.sim.statistics["nlus"], 0)
+    
+    @testattr(stddist = True)
+    def test_simulation_without_jac(self):
+        self.sim.usejac = False
+        self.sim.simulate(1.)
+        
+        nose.tools.assert_almost_equal(self.sim.y_sol[-1][0], -1.863646028, 4)
+    
+    @testattr(stddist = True)
+    def test_simulation_ncp(self):
+        self.sim.simulate(1.,100)
+        
+        nose.tools.assert_equal(len(self.sim.t_sol), 101)
+        nose.tools.assert_almost_equal(self.sim.y_sol[-1][0], -1.863646028, 4)
+        
+        self.sim.reset()
+        self.sim.report_continuously = True
+        self.sim.simulate(1.,100)
+        
+        nose.tools.assert_equal(len(self.sim.t_sol), 101)
+        nose.tools.assert_almost_equal(self.sim.y_sol[-1][0], -1.863646028, 4)
+    
+    @testattr(stddist = True)
+    def test_simulation_ncp_interpolated(self):
+        """
+        This tests that the output points are interpolated from the steps.
+        """
+        t_sol, y_sol = self.sim.simulate(1.,1000)
+        
+        nose.tools.assert_equal(len(t_sol), 1001)
+        nose.tools.assert_less(self.sim.statistics["nsteps"], 1000)
+        nose.tools.assert_almost_equal(t_sol[500], 0.5)
+        
+        self.sim.reset()
+        t_sol1, y_sol1 = self.sim.simulate(0.5)
+        nose.tools.assert_almost_equal(y_sol[500][0], y_sol1[-1][0], 4)
+    
+    @testattr(stddist = True)
+    def test_atol(self):
+        self.sim.atol = 1e-8
+        numpy.testing.assert_array_equal(self.sim.atol, [1e-8, 1e-8])
+        
+        self.sim.atol = [1e-8, 1e-6]
+        numpy.testing.assert_array_equal(self.sim.atol, [1e-8, 1e-6])
+        nose.tools.assert_raises(ODEPACK_Exception, setattr, self.sim, "atol", [1e-8, 1e-6, 1e-6])
+    
+    @testattr(stddist = True)
+    def test_work_space(self):
+        """
+        This tests that the work space is enlarged when the structure 
+        of the Jacobian is denser than estimated.
+        """
+        n = 40
+        A = -5.*N.eye(n) + 0.05*N.ones((n,n))
+        exp_mod = Explicit_Problem(lambda t,y: N.dot(A,y), N.ones(n))
+        sim = LSODES(exp_mod)
+        sim.simulate(1.)
+        
+        nose.tools.assert_greater(len(sim._RWORK), 20+9*n+3*10*n+20*n)
+        numpy.testing.assert_allclose(sim.y_sol[-1], N.exp(-3.)*N.ones(n), rtol=1e-4)
+    
+    @testattr(stddist = True)
+    def test_discr(self):
+        self.sim.discr = "Adams"
+        nose.tools.assert_equal(self.sim.discr, "Adams")
+        nose.tools.assert_equal(self.sim.maxord, 12)
+        
+        self.sim.discr = "BDF"
+        nose.tools.assert_equal(self.sim.maxord, 5)
+        nose.tools.assert_raises(ODEPACK_Exception, setattr, self.sim, "maxord", 6)
+        nose.tools.assert_raises(ODEPACK_Exception, setattr, self.sim, "discr", "Euler")
+        
+        exp_mod = Explicit_Problem(lambda t,y: -y, [1.0])
+        sim = LSODES(exp_mod)
+        sim.discr = "Adams"
+        sim.simulate(1.)
+        
+        nose.tools.assert_almost_equal(sim.y_sol[-1][0], N.exp(-1.), 5)
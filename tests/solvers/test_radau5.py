@@ -453,6 +453,23 @@ class Test_Explicit_Fortran_Radau5:
         
         nose.tools.assert_almost_equal(self.sim.y_sol[-1][0], 1.7061680350, 4)
     
+    @testattr(stddist = True)
+    def test_step_trace(self):
+        """
+        This tests that the step trace takes the counters of each step.
+        """
+        self.sim.trace_steps = True
+        self.sim.simulate(2.)
+        
+        trace = self.sim.get_step_trace()
+        nose.tools.assert_equal(len(trace), self.sim.statistics["nsteps"])
+        nose.tools.assert_almost_equal(N.sum(trace["h"]), 2.)
+        assert N.all(trace["order"] == 5)
+        assert N.all(trace["nniters"] >= 1)
+        nose.tools.assert_equal(N.sum(trace["nerrfails"]), self.sim.statistics["nerrfails"])
+        assert 0 < N.sum(trace["jac_update"]) <= self.sim.statistics["njacs"]
+        assert 0 < N.sum(trace["lu_update"]) <= self.sim.statistics["nlus"]
+    
     @testattr(stddist = True)
     def test_usejac_csc_matrix(self):
         """
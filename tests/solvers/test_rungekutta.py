@@ -42,7 +42,21 @@ class Test_Dopri5:
         
         nose.tools.assert_almost_equal(self.simulator.t_sol[-1], 1.0)
         nose.tools.assert_almost_equal(float(self.simulator.y_sol[-1]), 2.0)
+    
     @testattr(stddist = True)
+    def test_dense_output(self):
+        f = lambda t,y: N.array([-y[0], 4.0*t**3])
+        prob = Explicit_Problem(f, [1.0, 0.0])
+        sim = Dopri5(prob)
+        sim.dense_output = True
+        
+        t, y, sol = sim.simulate(2.0)
+        
+        t_fine = N.linspace(0.0, 2.0, 201)
+        y_fine = sol(t_fine)
+        nose.tools.assert_almost_equal(N.max(N.abs(y_fine[:,0] - N.exp(-t_fine))), 0.0, 4)
+        nose.tools.assert_almost_equal(N.max(N.abs(y_fine[:,1] - t_fine**4)), 0.0, 4)
+        
     
     @testattr(stddist = True)
     def test_time_event(self):
@@ -136,6 +150,14 @@ class Test_RungeKutta34:
         nose.tools.assert_almost_equal(self.simulator.t_sol[-1], 1.0)
         nose.tools.assert_almost_equal(self.simulator.y_sol[-1], 2.0)
     
+    @testattr(stddist = True)
+    def test_profile(self):
+        self.simulator.profile = True
+        self.simulator.simulate(1)
+        
+        nose.tools.assert_almost_equal(self.simulator.y_sol[-1], 2.0)
+        assert self.simulator.statistics.get_timings()["rhs"] > 0.0
+    
     @testattr(stddist = True)
     def test_time_event(self):
         f = lambda t,y: [1.0]
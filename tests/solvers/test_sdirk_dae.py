@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import nose
+from assimulo import testattr
+from assimulo.solvers import SDIRK_DAE
+from assimulo.problem import Implicit_Problem, Explicit_Problem
+from assimulo.exception import *
+
+import numpy as N
+
+class Test_SDIRK_DAE:
+    """
+    Tests the SDIRK_DAE solver.
+    """
+    def setUp(self):
+        """
+        This sets up the test case.
+        """
+        #An index one DAE, y0' = -y0 + y1, 0 = y1 - cos(t)
+        def res(t,y,yd):
+            return N.array([yd[0]+y[0]-y[1], y[1]-N.cos(t)])
+
+        def jac(c,t,y,yd):
+            return N.array([[1.+c,-1.],[0.,1.]])
+
+        self.exact = lambda t: 0.5*(N.cos(t)+N.sin(t)+N.exp(-t))
+
+        self.mod = Implicit_Problem(res,[1.0,1.0],[0.0,0.0])
+        self.mod_jac = Implicit_Problem(res,[1.0,1.0],[0.0,0.0])
+        self.mod_jac.jac = jac
+
+        self.sim = SDIRK_DAE(self.mod)
+        self.sim_jac = SDIRK_DAE(self.mod_jac)
+
+    @testattr(stddist = True)
+    def test_simulation(self):
+        """
+        Tests a simulation with a finite difference Jacobian.
+        """
+        assert self.sim.usejac == False
+        t,y,yd = self.sim.simulate(5.0)
+
+        nose.tools.assert_almost_equal(t[-1], 5.0)
+        nose.tools.assert_almost_equal(y[-1][0], self.exact(5.0), 5)
+        nose.tools.assert_almost_equal(y[-1][1], N.cos(5.0), 9)
+        nose.tools.assert_equal(self.sim.statistics["nsteps"], len(t)-1)
+        nose.tools.assert_equal(self.sim.statistics["nfcnjacs"], 5*self.sim.statistics["njacs"])
+
+    @testattr(stddist = True)
+    def test_simulation_with_jac(self):
+        """
+        Tests a simulation with the user-defined Jacobian.
+        """
+        assert self.sim_jac.usejac == True
+        t,y,yd = self.sim_jac.simulate(5.0)
+
+        nose.tools.assert_almost_equal(y[-1][0], self.exact(5.0), 5)
+        nose.tools.assert_equal(self.sim_jac.statistics["nfcnjacs"], 0)
+        nose.tools.assert_greater(self.sim_jac.statistics["njacs"], 0)
+
+    @testattr(stddist = True)
+    def test_nested_simulation(self):
+        """
+        Tests simulating a second SDIRK_DAE in the residual of the first.
+        """
+        t_ref, y_ref, yd_ref = self.sim_jac.simulate(5.0)
+        nfcns_ref = self.sim_jac.statistics["nfcns"]
+
+        inner = []
+        def res(t,y,yd):
+            if len(inner) < 3:
+                sim = SDIRK_DAE(self.mod)
+                sim.verbosity = 50
+                inner.append(sim)
+                sim.simulate(1.0)
+            return N.array([yd[0]+y[0]-y[1], y[1]-N.cos(t)])
+        problem = Implicit_Problem(res,[1.0,1.0],[0.0,0.0])
+        problem.jac = self.mod_jac.jac
+        sim = SDIRK_DAE(problem)
+        t,y,yd = sim.simulate(5.0)
+
+        nose.tools.assert_equal(len(t), len(t_ref))
+        nose.tools.assert_almost_equal(y[-1][0], y_ref[-1][0], 12)
+        nose.tools.assert_equal(sim.statistics["nfcns"], nfcns_ref)
+        for s in inner:
+            nose.tools.assert_almost_equal(s.y_sol[-1][0], self.exact(1.0), 5)
+            nose.tools.assert_equal(s.statistics["nsteps"], len(s.t_sol)-1)
+
+    @testattr(stddist = True)
+    def test_simulation_threads(self):
+        """
+        Tests simulating SDIRK_DAE in several threads at once.
+        """
+        import threading
+
+        t_ref, y_ref, yd_ref = self.sim.simulate(5.0)
+        nfcns_ref = self.sim.statistics["nfcns"]
+
+        sims = [SDIRK_DAE(self.mod) for i in range(4)]
+        threads = [threading.Thread(target=sim.simulate, args=(5.0,)) for sim in sims]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for sim in sims:
+            nose.tools.assert_almost_equal(sim.y_sol[-1][0], y_ref[-1][0], 12)
+            nose.tools.assert_equal(sim.statistics["nfcns"], nfcns_ref)
+
+    @testattr(stddist = True)
+    def test_simulation_ncp(self):
+        """
+        Tests that the output points are interpolated.
+        """
+        t,y,yd = self.sim.simulate(5.0, 100)
+
+        nose.tools.assert_equal(len(t), 101)
+        nose.tools.assert_less(N.max(N.abs(y[:,0]-self.exact(N.array(t)))), 1e-5)
+        nose.tools.assert_less(N.max(N.abs(yd[:,1]+N.sin(t))), 1e-4)
+
+    @testattr(stddist = True)
+    def test_interpolate(self):
+        """
+        Tests the interpolation in the last step.
+        """
+        self.sim.report_continuously = True
+        self.sim.simulate(1.0)
+
+        nose.tools.assert_almost_equal(self.sim.interpolate(1.0)[0], self.sim.y[0], 12)
+        nose.tools.assert_almost_equal(self.sim.interpolate(1.0,1)[0], self.sim.yd[0], 12)
+        nose.tools.assert_raises(SDIRK_DAE_Exception, self.sim.interpolate, 1.0, 2)
+
+    @testattr(stddist = True)
+    def test_simulate_explicit(self):
+        """
+        Tests a simulation of an explicit problem.
+        """
+        problem = Explicit_Problem(lambda t,y: -y, [1.0])
+        sim = SDIRK_DAE(problem)
+
+        t,y = sim.simulate(1.0)
+
+        nose.tools.assert_almost_equal(y[-1][0], N.exp(-1.0), 5)
+
+    @testattr(stddist = True)
+    def test_state_events(self):
+        """
+        Tests a bouncing ball, with the bounces as state events.
+        """
+        def res(t,y,yd,sw):
+            return N.array([yd[0]-y[1], yd[1]+9.81])
+
+        def state_events(t,y,yd,sw):
+            return N.array([y[0]])
+
+        def handle_event(solver, event_info):
+            if event_info[0][0] < 0: #The ball hits the floor
+                solver.y[1] = -0.9*solver.y[1]
+                solver.yd[0] = solver.y[1]
+
+        problem = Implicit_Problem(res,[1.0,0.0],[0.0,-9.81],sw0=[True])
+        problem.state_events = state_events
+        problem.handle_event = handle_event
+
+        sim = SDIRK_DAE(problem)
+        t,y,yd = sim.simulate(2.0, 100)
+
+        #The ball hits the floor at t1 = sqrt(2/g) and then after 2*v/g
+        g = 9.81
+        t1 = N.sqrt(2./g)
+        v = 0.9**3*g*t1
+        t4 = t1+2*(0.9+0.9**2)*t1
+
+        nose.tools.assert_equal(sim.statistics["nstateevents"], 6)
+        nose.tools.assert_almost_equal(t[-1], 2.0)
+        nose.tools.assert_almost_equal(y[-1][0], v*(2.-t4)-g/2.*(2.-t4)**2, 4)
+
+    @testattr(stddist = True)
+    def test_recoverable_error(self):
+        """
+        Tests that a step is retried after a recoverable error.
+        """
+        def res(t,y,yd):
+            if t - self.sim.t > 0.05:
+                raise AssimuloRecoverableError
+            return yd+y
+
+        self.sim = SDIRK_DAE(Implicit_Problem(res,[1.0],[-1.0]))
+        self.sim.report_continuously = True
+        t,y,yd = self.sim.simulate(1.0)
+
+        nose.tools.assert_less(N.max(N.diff(t)), 0.05)
+        nose.tools.assert_almost_equal(y[-1][0], N.exp(-1.0), 5)
+
+    @testattr(stddist = True)
+    def test_error(self):
+        """
+        Tests that errors in the residual are raised.
+        """
+        def res(t,y,yd):
+            if t > 0.5:
+                raise ValueError
+            return yd+y
+
+        sim = SDIRK_DAE(Implicit_Problem(res,[1.0],[-1.0]))
+
+        nose.tools.assert_raises(ValueError, sim.simulate, 1.0)
+
+    @testattr(stddist = True)
+    def test_maxsteps(self):
+        """
+        Tests the maximum number of steps.
+        """
+        nose.tools.assert_equal(self.sim.maxsteps, 100000)
+
+        self.sim.maxsteps = 10
+        nose.tools.assert_raises(SDIRK_DAE_Exception, self.sim.simulate, 5.0)
+        nose.tools.assert_raises(SDIRK_DAE_Exception, self.sim._set_maxsteps, 0)
+
+    @testattr(stddist = True)
+    def test_options(self):
+        """
+        Tests the options inith and maxh.
+        """
+        self.sim.inith = 1e-4
+        self.sim.maxh = 0.1
+        t,y,yd = self.sim.simulate(1.0)
+
+        nose.tools.assert_less(t[1], 2e-4)
+        nose.tools.assert_less(N.max(N.diff(t)), 0.1+1e-12)
+        nose.tools.assert_raises(SDIRK_DAE_Exception, self.sim._set_initial_step, -1.0)
+        nose.tools.assert_raises(SDIRK_DAE_Exception, self.sim._set_max_h, 0.0)
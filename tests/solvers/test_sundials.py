@@ -20,9 +20,12 @@ from assimulo import testattr
 from assimulo.solvers.sundials import *
 from assimulo.problem import Explicit_Problem
 from assimulo.problem import Implicit_Problem
+from assimulo.problem import Native_Explicit_Problem, Native_Implicit_Problem
 from assimulo.exception import *
 import numpy as np
 import scipy.sparse as sp
+import ctypes
+import threading
 
 class Test_CVode:
     
@@ -56,7 +59,122 @@ class Test_CVode:
         t, y = sim.simulate(0, ncp_list=np.arange(1, 10)[::-1])
         
         assert np.all(t == np.arange(0,11)[::-1])
-
+    
+    @testattr(stddist = True)
+    def test_dense_output(self):
+        self.simulator.dense_output = True
+        self.simulator.rtol = 1e-8
+        self.simulator.atol = 1e-8
+        t, y, sol = self.simulator.simulate(1.0)
+        
+        assert self.simulator.report_continuously
+        assert len(sol) == len(t) - 1
+        nose.tools.assert_almost_equal(float(sol(1.0)[0]), float(y[-1][0]))
+        
+        t_fine = N.linspace(0.0, 1.0, 101)
+        y_fine = sol(t_fine)
+        assert y_fine.shape == (101, 1)
+        nose.tools.assert_almost_equal(N.max(N.abs(y_fine[:,0] - N.exp(t_fine))), 0.0, 5)
+        
+        nose.tools.assert_raises(AssimuloException, sol, 1.5)
+    
+    @testattr(stddist = True)
+    def test_profile(self):
+        f = lambda t,y:N.array(y)
+        jac = lambda t,y:N.array([[1.0]])
+        problem = Explicit_Problem(f,[1.0])
+        problem.jac = jac
+        
+        sim = CVode(problem)
+        sim.verbosity = 0
+        sim.profile = True
+        sim.usejac = True
+        sim.simulate(1.0, 10)
+        
+        timings = sim.statistics.get_timings()
+        for category in ["rhs", "jac", "handle_result", "solver"]:
+            assert timings[category] > 0.0
+        
+        #No timings are collected by default
+        self.simulator.simulate(1.0)
+        assert self.simulator.statistics.get_timings() == {}
+    
+    @testattr(stddist = True)
+    def test_step_trace(self):
+        self.simulator.trace_steps = True
+        t, y = self.simulator.simulate(1.0, 10)
+        
+        assert len(t) == 11
+        
+        trace = self.simulator.get_step_trace()
+        assert len(trace) == self.simulator.statistics["nsteps"]
+        nose.tools.assert_almost_equal(trace["t"][-1], 1.0)
+        nose.tools.assert_almost_equal(N.sum(trace["h"]), 1.0)
+        assert N.all(trace["order"] >= 1)
+        assert N.all(trace["nniters"] >= 1)
+        assert N.sum(trace["nerrfails"]) == self.simulator.statistics["nerrfails"]
+        assert N.sum(trace["jac_update"]) <= self.simulator.statistics["njacs"]
+        assert N.all(trace["lu_update"] >= 0)
+    
+    @testattr(stddist = True)
+    def test_simulation_cache(self):
+        import tempfile, shutil
+        cache_dir = tempfile.mkdtemp()
+        
+        try:
+            self.problem.fingerprint = "exponential growth"
+            
+            sim = CVode(self.problem)
+            sim.cache_dir = cache_dir
+            t, y = sim.simulate(1.0, 10)
+            
+            assert sim.statistics["ncachemisses"] == 1
+            assert sim.statistics["ncachehits"] == 0
+            
+            sim = CVode(self.problem)
+            sim.cache_dir = cache_dir
+            t_cached, y_cached = sim.simulate(1.0, 10)
+            
+            assert sim.statistics["ncachehits"] == 1
+            assert t_cached == t
+            nose.tools.assert_almost_equal(N.max(N.abs(y_cached - y)), 0.0)
+            nose.tools.assert_almost_equal(sim.t, 1.0)
+            nose.tools.assert_almost_equal(sim.y[0], y[-1][0])
+            
+            #The cached points are passed on to handle_result
+            points = []
+            def handle_result(solver, t, y):
+                points.append(t)
+            self.problem.handle_result = handle_result
+            
+            sim = CVode(self.problem)
+            sim.cache_dir = cache_dir
+            sim.simulate(1.0, 10)
+            
+            assert sim.statistics["ncachehits"] == 1
+            assert points == t
+            del self.problem.handle_result
+            
+            #Values without a stable encoding are not cached
+            self.problem.fingerprint = ("exponential growth", lambda t: t)
+            
+            sim = CVode(self.problem)
+            sim.cache_dir = cache_dir
+            sim.simulate(1.0, 10)
+            
+            assert sim.statistics["ncachehits"] == 0
+            assert sim.statistics["ncachemisses"] == 0
+            self.problem.fingerprint = "exponential growth"
+            
+            #Other options give another result
+            sim = CVode(self.problem)
+            sim.cache_dir = cache_dir
+            sim.rtol = 1e-8
+            sim.simulate(1.0, 10)
+            
+            assert sim.statistics["ncachemisses"] == 1
+        finally:
+            shutil.rmtree(cache_dir)
     
     @testattr(stddist = True)
     def test_get_error_weights(self):
@@ -613,9 +731,96 @@ class Test_CVode:
         assert self.simulator.linear_solver == 'DENSE'
         self.simulator.linear_solver = 'spgmr'
         assert self.simulator.linear_solver == 'SPGMR'
+        self.simulator.linear_solver = 'spbcgs'
+        assert self.simulator.linear_solver == 'SPBCGS'
+        self.simulator.linear_solver = 'sptfqmr'
+        assert self.simulator.linear_solver == 'SPTFQMR'
+        self.simulator.linear_solver = 'spfgmr'
+        assert self.simulator.linear_solver == 'SPFGMR'
         
         nose.tools.assert_raises(Exception, self.simulator._set_linear_solver, 'Test')
     
+    @testattr(stddist = True)
+    def test_krylov_solvers(self):
+        """
+        This tests the iterative linear solvers SPBCGS and SPTFQMR.
+        """
+        f = lambda t,y: N.array([y[1], -9.82])
+        jacv = lambda t,y,fy,v: N.dot(N.array([[0,1.],[0,0]]),v)
+        
+        for lsolver in ['SPBCGS', 'SPTFQMR']:
+            exp_mod = Explicit_Problem(f,[1.0,0.0])
+            exp_mod.jacv = jacv
+            
+            exp_sim = CVode(exp_mod)
+            exp_sim.linear_solver = lsolver
+            
+            t, y = exp_sim.simulate(5, 1000)
+            
+            nose.tools.assert_almost_equal(y[-1][0],-121.75000000,4)
+            nose.tools.assert_almost_equal(y[-1][1],-49.100000000)
+            assert exp_sim.statistics["njacvecs"] > 0
+    
+    @testattr(stddist = True)
+    def test_maxrestarts(self):
+        """
+        This tests the maximum number of restarts.
+        """
+        assert self.simulator.maxrestarts == 0
+        self.simulator.maxrestarts = 3
+        assert self.simulator.maxrestarts == 3
+        
+        nose.tools.assert_raises(AssimuloException, self.simulator._set_max_restarts, -1)
+        nose.tools.assert_raises(AssimuloException, self.simulator._set_max_restarts, 'Test')
+    
+    @testattr(stddist = True)
+    def test_epslin(self):
+        """
+        This tests the safety factor in the linear convergence test.
+        """
+        assert self.simulator.epslin == 0.05
+        self.simulator.epslin = 0.1
+        assert self.simulator.epslin == 0.1
+        
+        nose.tools.assert_raises(AssimuloException, self.simulator._set_eps_lin, -1.0)
+        nose.tools.assert_raises(AssimuloException, self.simulator._set_eps_lin, 'Test')
+    
+    @testattr(stddist = True)
+    def test_builtin_precond(self):
+        """
+        This tests the built-in banded and block-Jacobi preconditioners.
+        """
+        assert self.simulator.builtin_precond == "NONE"
+        self.simulator.builtin_precond = "band"
+        assert self.simulator.builtin_precond == "BAND"
+        self.simulator.mupper = 1
+        self.simulator.mlower = 1
+        assert self.simulator.mupper == 1
+        assert self.simulator.mlower == 1
+        
+        nose.tools.assert_raises(AssimuloException, self.simulator._set_builtin_precond, 'Test')
+        nose.tools.assert_raises(AssimuloException, self.simulator._set_mupper, -1)
+        nose.tools.assert_raises(AssimuloException, self.simulator._set_prec_blocks, [1,1])
+        
+        f = lambda t,y: N.array([y[1], -9.82])
+        
+        for precond, blocks in [("BAND", None), ("BLOCK_JACOBI", [2]), ("BLOCK_JACOBI", [1,1])]:
+            exp_mod = Explicit_Problem(f,[1.0,0.0])
+            
+            exp_sim = CVode(exp_mod)
+            exp_sim.iter = "Newton"
+            exp_sim.linear_solver = "SPGMR"
+            exp_sim.builtin_precond = precond
+            exp_sim.mupper = 1
+            exp_sim.mlower = 1
+            exp_sim.prec_blocks = blocks
+            
+            t, y = exp_sim.simulate(5, 1000)
+            
+            nose.tools.assert_almost_equal(y[-1][0],-121.75000000,4)
+            nose.tools.assert_almost_equal(y[-1][1],-49.100000000)
+            assert exp_sim.statistics["nprecsetups"] > 0
+    
     @testattr(stddist = True)
     def test_terminate_simulation(self):
         """
@@ -663,6 +868,64 @@ class Test_CVode:
         sim.simulate(2.)
         assert len(sim.t_sol) == sim.statistics["nsteps"]+1
         assert nsteps == sim.statistics["nsteps"]
+    
+    @testattr(stddist = True)
+    def test_native_problem(self):
+        """
+        Tests a problem with compiled (ctypes) functions.
+        """
+        D = ctypes.POINTER(ctypes.c_double)
+        
+        @ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, D, D, ctypes.c_void_p)
+        def rhs(t, y, yd, data):
+            yd[0] = -y[0]
+            return 0
+        
+        @ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, D, D, ctypes.c_void_p)
+        def jac(t, y, J, data):
+            J[0] = -1.0
+            return 0
+        
+        @ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, D, D, ctypes.c_void_p)
+        def state_events(t, y, g, data):
+            g[0] = y[0] - 0.5
+            return 0
+        
+        address = lambda f: ctypes.cast(f, ctypes.c_void_p).value
+        
+        def handle_event(solver, event_info):
+            self.tevent = solver.t
+        
+        mod = Native_Explicit_Problem(address(rhs), [1.0], jac_address=address(jac), 
+                                      state_events_address=address(state_events), nstate_events=1)
+        mod.handle_event = handle_event
+        
+        sim = CVode(mod)
+        assert sim.usejac == True
+        
+        t, y = sim.simulate(1.0)
+        
+        nose.tools.assert_almost_equal(y[-1][0], N.exp(-1.0), 4)
+        nose.tools.assert_almost_equal(self.tevent, N.log(2.0), 4)
+        nose.tools.assert_equal(sim.statistics["nstateevents"], 1)
+        assert sim.statistics["njacs"] > 0
+        
+        #Several simulations in threads
+        sims = [CVode(Native_Explicit_Problem(address(rhs), [1.0])) for i in range(2)]
+        for sim in sims:
+            sim.verbosity = 0
+        threads = [threading.Thread(target=sim.simulate, args=(1.0,)) for sim in sims]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for sim in sims:
+            nose.tools.assert_almost_equal(sim.y_sol[-1][0], N.exp(-1.0), 4)
+        
+        sim = CVode(mod)
+        sim.linear_solver = "SPGMR"
+        sim.builtin_precond = "BLOCK_JACOBI"
+        nose.tools.assert_raises(AssimuloException, sim.simulate, 1.0)
         
 class Test_IDA:
     
@@ -929,6 +1192,79 @@ class Test_IDA:
         nose.tools.assert_almost_equal(imp_sim.y_sol[-1][0], 45.1900000, 4)
         assert imp_sim.statistics["nfcnjacs"] > 0
     
+    @testattr(stddist = True)
+    def test_linearsolver(self):
+        """
+        This test the choice of the linear solver.
+        """
+        assert self.simulator.linear_solver == 'DENSE'
+        for lsolver in ['SPGMR', 'SPBCGS', 'SPTFQMR', 'SPFGMR']:
+            self.simulator.linear_solver = lsolver.lower()
+            assert self.simulator.linear_solver == lsolver
+        
+        nose.tools.assert_raises(AssimuloException, self.simulator._set_linear_solver, 'Test')
+        
+        assert self.simulator.maxkrylov == 5
+        self.simulator.maxkrylov = 10
+        assert self.simulator.maxkrylov == 10
+        assert self.simulator.maxrestarts == 5
+        self.simulator.maxrestarts = 2
+        assert self.simulator.maxrestarts == 2
+        assert self.simulator.epslin == 0.05
+        self.simulator.epslin = 0.01
+        assert self.simulator.epslin == 0.01
+    
+    @testattr(stddist = True)
+    def test_preconditioner(self):
+        """
+        This tests the iterative linear solvers together with a preconditioner.
+        """
+        f = lambda t,x,xd: N.array([xd[0]-x[1], xd[1]-9.82])
+        
+        def prec_setup(t, x, xd, res, cj, data):
+            return cj
+        
+        def prec_solve(t, x, xd, res, r, cj, delta, data):
+            #Diagonal part of the iteration matrix
+            return r/data
+        
+        for lsolver in ['SPGMR', 'SPBCGS', 'SPTFQMR']:
+            imp_mod = Implicit_Problem(f,[1.0,0.0],[0.,-9.82])
+            imp_mod.prec_setup = prec_setup
+            imp_mod.prec_solve = prec_solve
+            
+            imp_sim = IDA(imp_mod)
+            imp_sim.linear_solver = lsolver
+            imp_sim.simulate(3,100)
+            
+            nose.tools.assert_almost_equal(imp_sim.y_sol[-1][0], 45.1900000, 4)
+            assert imp_sim.statistics["nprecs"] > 0
+            assert imp_sim.statistics["nprecsetups"] > 0
+    
+    @testattr(stddist = True)
+    def test_builtin_precond(self):
+        """
+        This tests the built-in banded and block-Jacobi preconditioners.
+        """
+        f = lambda t,x,xd: N.array([xd[0]-x[1], xd[1]-9.82])
+        
+        for precond, blocks in [("BAND", None), ("BLOCK_JACOBI", [2]), ("BLOCK_JACOBI", [1,1])]:
+            imp_mod = Implicit_Problem(f,[1.0,0.0],[0.,-9.82])
+            
+            imp_sim = IDA(imp_mod)
+            imp_sim.linear_solver = "SPGMR"
+            imp_sim.builtin_precond = precond
+            imp_sim.mupper = 1
+            imp_sim.mlower = 1
+            imp_sim.prec_blocks = blocks
+            imp_sim.simulate(3,100)
+            
+            nose.tools.assert_almost_equal(imp_sim.y_sol[-1][0], 45.1900000, 4)
+            assert imp_sim.statistics["nprecsetups"] > 0
+        
+        nose.tools.assert_raises(AssimuloException, imp_sim._set_builtin_precond, 'Test')
+        nose.tools.assert_raises(AssimuloException, imp_sim._set_prec_blocks, [1,2])
+    
     @testattr(stddist = True)
     def test_terminate_simulation(self):
         """
@@ -1102,6 +1438,51 @@ class Test_IDA:
         sim.simulate(2.)
         assert len(sim.t_sol) == sim.statistics["nsteps"] + 1
         assert nsteps == sim.statistics["nsteps"]
+    
+    @testattr(stddist = True)
+    def test_native_problem(self):
+        """
+        Tests a problem with compiled (ctypes) functions.
+        """
+        D = ctypes.POINTER(ctypes.c_double)
+        
+        @ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, D, D, D, ctypes.c_void_p)
+        def res(t, y, yd, r, data):
+            r[0] = yd[0] + y[0]
+            return 0
+        
+        @ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, ctypes.c_double, D, D, D, ctypes.c_void_p)
+        def jac(t, c, y, yd, J, data):
+            J[0] = 1.0 + c
+            return 0
+        
+        @ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_double, D, D, D, ctypes.c_void_p)
+        def state_events(t, y, yd, g, data):
+            g[0] = y[0] - 0.5
+            return 0
+        
+        address = lambda f: ctypes.cast(f, ctypes.c_void_p).value
+        
+        def handle_event(solver, event_info):
+            self.tevent = solver.t
+        
+        mod = Native_Implicit_Problem(address(res), [1.0], [-1.0], jac_address=address(jac), 
+                                      state_events_address=address(state_events), nstate_events=1)
+        mod.handle_event = handle_event
+        
+        sim = IDA(mod)
+        assert sim.usejac == True
+        
+        t, y, yd = sim.simulate(1.0)
+        
+        nose.tools.assert_almost_equal(y[-1][0], N.exp(-1.0), 4)
+        nose.tools.assert_almost_equal(self.tevent, N.log(2.0), 4)
+        nose.tools.assert_equal(sim.statistics["nstateevents"], 1)
+        assert sim.statistics["njacs"] > 0
+        
+        #Python functions cannot be combined with a native problem
+        mod.jacv = lambda t, y, yd, res, v, c: v
+        nose.tools.assert_raises(AssimuloException, IDA, mod)
 
 
 
@@ -1342,3 +1723,43 @@ class Test_Sundials:
         
         nose.tools.assert_almost_equal(imp_sim.pbar[0], 1000.00000,4)
         nose.tools.assert_almost_equal(imp_sim.pbar[1], 100.000000,4)
+    
+    @testattr(stddist = True)
+    def test_interpolate_sensitivities(self):
+        """
+        Tests the batched sensitivity interpolation and the p_sol array.
+        """
+        f = lambda t,y,p: N.array([-p[0]*y[0], -p[1]*y[1]])
+        y0 = [1.0]*2
+        p0 = [1.0, 2.0]
+        exp_mod = Explicit_Problem(f,y0,p0=p0)
+        
+        exp_sim = CVode(exp_mod)
+        exp_sim.report_continuously = True
+        t, y = exp_sim.simulate(1.0, 10)
+        
+        sens = exp_sim.interpolate_sensitivities(1.0)
+        assert sens.shape == (2, 2)
+        for i in range(2):
+            nose.tools.assert_almost_equal(N.max(N.abs(sens[i] - exp_sim.interpolate_sensitivity(1.0, i=i))), 0.0)
+        
+        assert exp_sim.p_sol.shape == (2, len(t), 2)
+        nose.tools.assert_almost_equal(exp_sim.p_sol[0][-1][0], -N.exp(-1.0), 3)
+        nose.tools.assert_almost_equal(exp_sim.p_sol[1][-1][1], -N.exp(-2.0), 3)
+        
+        f = lambda t,y,yd,p: N.array([yd[0]+p[0]*y[0], yd[1]+p[1]*y[1]])
+        yd0 = [-1.0, -2.0]
+        imp_mod = Implicit_Problem(f,y0,yd0,p0=p0)
+        
+        imp_sim = IDA(imp_mod)
+        imp_sim.report_continuously = True
+        t, y, yd = imp_sim.simulate(1.0, 10)
+        
+        sens = imp_sim.interpolate_sensitivities(1.0)
+        assert sens.shape == (2, 2)
+        for i in range(2):
+            nose.tools.assert_almost_equal(N.max(N.abs(sens[i] - imp_sim.interpolate_sensitivity(1.0, i=i))), 0.0)
+        
+        assert imp_sim.p_sol.shape == (2, len(t), 2)
+        nose.tools.assert_almost_equal(imp_sim.p_sol[0][-1][0], -N.exp(-1.0), 3)
+        nose.tools.assert_almost_equal(imp_sim.p_sol[1][-1][1], -N.exp(-2.0), 3)
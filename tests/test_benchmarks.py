@@ -0,0 +1,59 @@
+#!/usr/bin/env python 
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import nose
+import numpy as N
+from assimulo import testattr
+from assimulo.benchmarks.problems import PROBLEMS
+from assimulo.benchmarks import suite
+
+class Test_Benchmarks:
+    
+    @testattr(stddist = True)
+    def test_problems(self):
+        for name in PROBLEMS:
+            problem = PROBLEMS[name]()
+            
+            f = problem.rhs(problem.t0, N.array(problem.y0, dtype=float))
+            assert len(f) == len(problem.y0)
+            
+            problem.explicit_problem()
+            problem.implicit_problem()
+    
+    @testattr(stddist = True)
+    def test_run(self):
+        result = suite.run("robertson", "CVode", 1e-6)
+        
+        assert result["time"] > 0.0
+        assert result["nfcns"] > 0
+        assert result["njacs"] > 0
+        assert result["error"] < 1e-3
+        assert result["peak_memory"] > 0
+        
+        result = suite.run("robertson", "CVode", 1e-6, error=False, memory=False)
+        assert result["peak_memory"] is None
+    
+    @testattr(stddist = True)
+    def test_work_precision(self):
+        results = suite.work_precision("vanderpol_mu1", ["Dopri5", "CVode"], [1e-4, 1e-6])
+        
+        for solver_name in ["Dopri5", "CVode"]:
+            assert len(results[solver_name]) == 2
+            assert results[solver_name][1]["error"] < results[solver_name][0]["error"]
+        
+        results = suite.work_precision("robertson", ["Dopri5"], [1e-4])
+        assert "Dopri5" not in results
@@ -18,9 +18,11 @@
 import nose
 from assimulo import testattr
 from assimulo.explicit_ode import *
-from assimulo.problem import Explicit_Problem
+from assimulo.problem import Explicit_Problem, SingPerturbed_Problem
 from assimulo.exception import *
 
+import numpy as N
+
 class Test_Explicit_ODE:
     pass
     
@@ -57,3 +59,29 @@ class Test_Explicit_ODE:
         
         assert solv.t == 1.0
         assert solv.y[0] == 2.0
+    
+    @testattr(stddist = True)
+    def test_sing_perturbed_rhs(self):
+        rhs1 = lambda t,y,z: -y+z[0]
+        rhs2 = lambda t,y,z: -z+t
+        
+        prob = SingPerturbed_Problem(rhs1, rhs2, yy0=[1.0], zz0=[2.0, 3.0], eps=N.array([0.5, 0.25]))
+        y = N.array([1.0, 2.0, 3.0])
+        yd = N.zeros(3)
+        
+        assert not hasattr(prob, "jac")
+        assert prob.rhs_internal(yd, 1.0, y) == 0
+        nose.tools.assert_equal(list(yd), [1.0, -2.0, -8.0])
+        nose.tools.assert_equal(list(prob.rhs(1.0, y)), [1.0, -2.0, -8.0])
+    
+    @testattr(stddist = True)
+    def test_sing_perturbed_block_jac(self):
+        rhs1 = lambda t,y,z: -y+z[0]
+        rhs2 = lambda t,y,z: -z+y
+        jac1 = lambda t,y,z: (N.array([[-1.0]]), N.array([[1.0, 0.0]]))
+        jac2 = lambda t,y,z: (N.array([[1.0],[1.0]]), -N.eye(2))
+        
+        prob = SingPerturbed_Problem(rhs1, rhs2, yy0=[1.0], zz0=[2.0, 3.0], eps=N.array([0.5, 0.25]), jac1=jac1, jac2=jac2)
+        jac = prob.jac(0.0, N.array([1.0, 2.0, 3.0]))
+        
+        assert N.all(jac == N.array([[-1.0, 1.0, 0.0],[2.0, -2.0, 0.0],[4.0, 0.0, -4.0]]))
@@ -72,3 +72,17 @@ class Test_Solvers:
         nose.tools.assert_almost_equal(float(y[-1]), 0.135, 3)
 
     
+    
+    @testattr(stddist = True)
+    def test_lazy_solver_import(self):
+        import sys
+        if sys.version_info < (3,7):
+            raise nose.SkipTest("Solvers are imported lazily from Python 3.7")
+        
+        from assimulo.benchmarks.import_time import measure_import
+        
+        elapsed, loaded = measure_import("from assimulo.solvers import CVode", repeat=1)
+        
+        assert "assimulo.solvers.radau5" not in loaded
+        assert "assimulo.lib.odepack" not in loaded
+        assert "scipy.sparse" not in loaded
@@ -0,0 +1,114 @@
+#!/usr/bin/env python 
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2010 Modelon AB
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import nose
+import numpy as N
+import scipy.sparse as sp
+from assimulo import testattr
+from assimulo.special_systems import Mechanical_System
+
+INDEX_VALUES = ['ind1', 'ind2', 'ind3', 'ggl2', 'ovstab2', 'ovstab1']
+
+def pendulum(mass_matrix=None, sparse_GT=False, derivatives=False):
+    g = 13.7503671
+    def forces(t, p, v):
+        return N.array([0., -g])
+    def GT(p):
+        G = N.array([p[0], p[1]]).reshape((2,1))
+        return sp.csc_matrix(G) if sparse_GT else G
+    def constr3(t, y):
+        p = y[0:2]
+        return N.array([p[0]**2 + p[1]**2 - 1.])
+    def constr2(t, y):
+        p, v = y[0:2], y[2:4]
+        return N.array([p[0]*v[0] + p[1]*v[1]])
+    def constr1(t, y):
+        p, v, la = y[0:2], y[2:4], y[4:5]
+        return N.array([v[0]**2 + v[1]**2 - la[0]*(p[0]**2 + p[1]**2) - p[1]*g])
+    def dGT_dp(p, la):
+        return sp.identity(2)*la[0]
+    def dconstr3(t, y):
+        return sp.csr_matrix(([2*y[0], 2*y[1]], ([0, 0], [0, 1])), shape=(1,5))
+    def dconstr2(t, y):
+        return N.array([[y[2], y[3], y[0], y[1], 0.]])
+    def dconstr1(t, y):
+        p, v, la = y[0:2], y[2:4], y[4]
+        return N.array([[-2*la*p[0], -2*la*p[1]-g, 2*v[0], 2*v[1], -(p[0]**2 + p[1]**2)]])
+    if not derivatives:
+        dGT_dp = dconstr3 = dconstr2 = dconstr1 = None
+    return Mechanical_System(2, forces, 1, [1.,0.], [0.,0.], [0], [0.,0.], [0.,-g], 
+                             GT=GT, mass_matrix=mass_matrix, constr3=constr3, 
+                             constr2=constr2, constr1=constr1, dGT_dp=dGT_dp,
+                             dconstr3=dconstr3, dconstr2=dconstr2, dconstr1=dconstr1)
+
+class Test_Mechanical_System:
+    
+    @testattr(stddist = True)
+    def test_compiled_residual(self):
+        M = N.array([[2.0, 0.5], [0.5, 1.0]])
+        y = N.linspace(0.1, 0.9, 6)
+        yd = N.linspace(-1.0, 1.0, 6)
+        
+        for index in INDEX_VALUES:
+            res = pendulum(M).make_res(index)
+            for mass_matrix in [M, sp.csr_matrix(M)]:
+                problem = pendulum(mass_matrix, sparse_GT=True).generate_problem(index, compiled=True)
+                n = len(problem.y0)
+                
+                nose.tools.assert_almost_equal(N.max(N.abs(problem.res(0.5, y[:n], yd[:n]) - res(0.5, y[:n], yd[:n]))), 0.0)
+        
+        #Diagonal and block diagonal mass matrices
+        res = pendulum(N.diag([2.0, 3.0])).make_res('ind3')
+        for mass_matrix in [N.array([2.0, 3.0]), N.array([[[2.0]], [[3.0]]])]:
+            problem = pendulum(mass_matrix).generate_problem('ind3', compiled=True)
+            nose.tools.assert_almost_equal(N.max(N.abs(problem.res(0.5, y[:5], yd[:5]) - res(0.5, y[:5], yd[:5]))), 0.0)
+    
+    @testattr(stddist = True)
+    def test_compiled_jacobian(self):
+        c = 0.7
+        
+        for index in INDEX_VALUES:
+            res = pendulum().make_res(index)
+            problem = pendulum().generate_problem(index, compiled=True)
+            n = len(problem.y0)
+            y = N.linspace(0.1, 0.9, n)
+            yd = N.linspace(-1.0, 1.0, n)
+            
+            r0 = res(0.5, y, yd)
+            jac = N.zeros((len(r0), n))
+            for j in range(n):
+                e = N.zeros(n)
+                e[j] = 1e-7
+                jac[:,j] = (res(0.5, y+e, yd) - r0)/1e-7 + c*(res(0.5, y, yd+e) - r0)/1e-7
+            
+            nose.tools.assert_almost_equal(N.max(N.abs(problem.jac(c, 0.5, y, yd) - jac)), 0.0, 4)
+    
+    @testattr(stddist = True)
+    def test_analytic_jacobian(self):
+        c = 0.7
+        
+        for index in INDEX_VALUES:
+            problem = pendulum(derivatives=True).generate_problem(index, sparse=True)
+            reference = pendulum().generate_problem(index, compiled=True)
+            n = len(problem.y0)
+            y = N.linspace(0.1, 0.9, n)
+            yd = N.linspace(-1.0, 1.0, n)
+            
+            jac = problem.jac(c, 0.5, y, yd)
+            assert sp.isspmatrix_csc(jac)
+            assert jac.nnz <= problem.jac_nnz
+            nose.tools.assert_almost_equal(N.max(N.abs(jac.toarray() - reference.jac(c, 0.5, y, yd))), 0.0, 4)
@@ -42,6 +42,6 @@ C ----> COMMON BLOCKS <----
      &                  IMAS,SOLOUT,IOUT, 
      &                  WORK,IWORK,RPAR,IPAR,IDID, 
      &                  GRID,IPAST,MAS,MLMAS,MUMAS,
-     &                  PAST)
+     &                  PAST,LRPAST)
      
       END
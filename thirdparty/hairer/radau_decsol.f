@@ -686,6 +686,8 @@ C ----------------------------------------------------------
       INTEGER IP1(NM1),IP2(NM1),IPHES(NM1)
       COMMON /CONRA5/NN,NN2,NN3,NN4,XSOL,HSOL,C2M1,C1M1
       COMMON/LINAL/MLE,MUE,MBJAC,MBB,MDIAG,MDIFF,MBDIAG
+C --- COUNTERS OF THE LAST CALL OF SOLOUT (READ BY ASSIMULO)
+      COMMON /STATR5/NJACS,NDECS,NSOLS,NREJS
       LOGICAL REJECT,FIRST,IMPLCT,BANDED,CALJAC,STARTN,CALHES
       LOGICAL INDEX1,INDEX2,INDEX3,LAST,PRED
       EXTERNAL FCN
@@ -767,6 +769,10 @@ C ---------- CONSTANTS ---------
           END DO
           NSOLU=N
           HSOL=HOLD
+          NJACS=NJAC
+          NDECS=NDEC
+          NSOLS=NSOL
+          NREJS=NREJCT
           CALL SOLOUT(NRSOL,XOSOL,XSOL,Y,CONT,WERR,LRC,NSOLU,
      &                RPAR,IPAR,IRTRN)
           IF (IRTRN.LT.0) GOTO 179
@@ -1063,6 +1069,10 @@ C       --- PREDICTIVE CONTROLLER OF GUSTAFSSON
              END DO
              NSOLU=N
              HSOL=HOLD
+             NJACS=NJAC
+             NDECS=NDEC
+             NSOLS=NSOL
+             NREJS=NREJCT
              CALL SOLOUT(NRSOL,XOSOL,XSOL,Y,CONT,WERR,LRC,NSOLU,
      &                   RPAR,IPAR,IRTRN)
              IF (IRTRN.LT.0) GOTO 179
@@ -0,0 +1,53 @@
+/*
+ * Header used by assimulo/solvers/sdirk_dae.pyx to compile the SDIRK-DAE
+ * code by Anne Kvaernoe into the extension.
+ *
+ * SDIRK-DAE.c calls the residual and the exact Jacobian through the global
+ * functions func and exact_jacobi, which are mapped here to function
+ * pointers set by the wrapper. The work structure etc, which is in scope
+ * wherever SDIRK-DAE.c calls them, is passed on so that the wrapper can
+ * find the solver taking the step. Prototypes are provided for the
+ * functions which are used before they are defined in SDIRK-DAE.c.
+ */
+#ifndef SDIRK_DAE_KERNEL_H
+#define SDIRK_DAE_KERNEL_H
+
+struct problem;
+struct information;
+struct etcetera;
+struct method;
+
+/* The residual f(v', v, x) and its Jacobians df/dv' and df/dv (row major) */
+static void (*sdirk_dae_res)(struct etcetera *etc, double *vp, double *v, double x, double *res);
+static void (*sdirk_dae_jac)(struct etcetera *etc, double *v, double *vp, double x, double *dfdvp, double *dfdv);
+
+#define func(vp, v, x, res) sdirk_dae_res(etc, (vp), (v), (x), (res))
+#define exact_jacobi(v, vp, x, dfdvp, dfdv) sdirk_dae_jac(etc, (v), (vp), (x), (dfdvp), (dfdv))
+
+int sdirk_dae(struct problem *prob, struct information *info);
+int one_step(struct problem **var, struct problem **var_old,
+             struct information *info, struct method *rk,
+             struct etcetera *etc);
+int solve_stages(struct problem *var, struct method *rk, struct etcetera *etc);
+int solve_nonlinear_equations(int n, double *vp, double xi,
+                              double *roc, struct etcetera *etc);
+int make_newton(struct problem *var, struct etcetera *etc, struct information *info);
+int jacobi(struct problem *var, struct etcetera *etc);
+int compute_tolerance_vector(struct problem *var, struct information *info,
+                             struct etcetera *etc);
+int prediction(struct problem *var, struct problem *var_old,
+               struct method *rk, struct etcetera *etc);
+int adjust_stepsize(double step_fact, struct etcetera *etc);
+int decomp(int n, double *a, int *piv);
+int backsub(int n, double *a, int *piv, double *b);
+int set_coeff(struct method *rk);
+int zero_stat(void);
+int work_alloc(int n, struct problem *var, struct etcetera *etc);
+int work_free(struct problem *var, struct etcetera *etc);
+
+#include "SDIRK-DAE.c"
+
+#undef func
+#undef exact_jacobi
+
+#endif
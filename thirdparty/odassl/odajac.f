@@ -77,7 +77,12 @@ C
 C        1A. COMPUTATION OF THE ITERATION MATRIX                                 
 C                  DG/DY + CJ*DG/DYPRIME                                        
 C                  BY CALLING JAC
-         CALL JAC(T,Y,YPRIME,A1,A2,CJ,RPAR,IPAR) 
+         IF (M1 .GT. 0) THEN
+            CALL JAC(X,NEQ,NY,Y,YPRIME,A1,A2,CJ,RPAR,IPAR)
+         ELSE
+C           A2 IS EMPTY, AUX IS USED FOR THE (1,NY) DUMMY OF THE WRAPPER
+            CALL JAC(X,NEQ,NY,Y,YPRIME,A1,AUX,CJ,RPAR,IPAR)
+         END IF
          DO 5, I=1,M1
             DO 5,J=1,NY
                A2T(J,I) = A2(I,J)
@@ -448,8 +448,12 @@ C               YOU DO CHOOSE TO USE THEM, DIMENSION THEM IN YOUR CALLIN
 C               PROGRAM AND IN RES (AND IN JAC) AS ARRAYS OF APPROPRIATE        
 C               LENGTH.                                                         
 C                                                                               
-C  JAC -- THIS PARAMETER PARAMETER SHOULD BE IGNORED AND TREATED AS             
-C               A DUMMY ARGUMENT.                                               
+C  JAC -- IF INFO(5) = 1, THIS IS A SUBROUTINE OF THE FORM                     
+C               SUBROUTINE JAC(T,NEQ,NY,Y,YPRIME,A1,A2,CJ,RPAR,IPAR)            
+C               DIMENSION Y(NY),YPRIME(NY),A1(NY,NY),A2(NEQ-NY,NY)              
+C            WHICH RETURNS THE ITERATION MATRIX DG/DY + CJ*DG/DYPRIME.          
+C            ROWS 1 TO NY ARE STORED IN A1, ROWS NY+1 TO NEQ IN A2.             
+C            OTHERWISE IT IS A DUMMY ARGUMENT.                                  
 C                                                                               
 C                                                                               
 C                                                                               